@@ -5,13 +5,14 @@
 
 import sys
 import logging
+import importlib.util
+import multiprocessing
 from pathlib import Path
 
 # 添加src目录到路径
 sys.path.insert(0, str(Path(__file__).parent / "src"))
 
 from src.config import LOGGING_CONFIG, APP_NAME
-from src.models.database import Database
 
 
 def setup_logging():
@@ -35,16 +36,14 @@ def setup_logging():
 
 
 def check_dependencies():
-    """检查依赖包"""
-    try:
-        import customtkinter
-        import pandas
-        import openpyxl
-        return True
-    except ImportError as e:
-        print(f"缺少依赖包: {e}")
+    """检查依赖包（只查找是否安装，不导入，pandas等在首次使用时才导入）"""
+    missing = [name for name in ("customtkinter", "pandas", "openpyxl")
+               if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"缺少依赖包: {', '.join(missing)}")
         print("请运行: pip install -r requirements.txt")
         return False
+    return True
 
 
 def main():
@@ -61,8 +60,8 @@ def main():
     
     try:
         # 导入GUI模块（延迟导入以确保依赖检查通过）
+        # 主窗口依赖的模块较多，选择项目后再导入（启动器显示后会在后台预先导入）
         from src.gui.project_launcher import ProjectLauncher
-        from src.gui.main_window import MainWindow
         
         # 首先显示项目启动器
         launcher = ProjectLauncher()
@@ -70,6 +69,8 @@ def main():
         
         # 如果用户选择了项目，则启动主窗口
         if selected_project_id:
+            from src.gui.main_window import MainWindow
+            
             logger.info(f"启动主窗口，当前项目: {selected_project_id}")
             app = MainWindow()
             app.run()
@@ -83,4 +84,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包为可执行文件时，全文索引的文本提取子进程需要
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -78,24 +78,56 @@ TABLE_COLUMNS = {
 
 # 支持的文件格式
 SUPPORTED_EXCEL_FORMATS = [".xlsx", ".xls"]
+SUPPORTED_CSV_FORMATS = [".csv", ".tsv", ".txt"]
+SUPPORTED_EXPORT_FORMATS = {
+    ".xlsx": "Excel",
+    ".csv": "CSV",
+    ".jsonl": "JSON Lines",
+    ".parquet": "Parquet",  # 需要pyarrow
+    ".feather": "Feather"  # 需要pyarrow
+}
 SUPPORTED_ATTACHMENT_FORMATS = [
     ".pdf", ".png", ".jpg", ".jpeg", ".gif", ".bmp", 
     ".zip", ".rar", ".7z", ".doc", ".docx", ".txt",
     ".eml", ".msg", ".tiff", ".tif"
 ]
 
+# 附件存储配置
+ATTACHMENT_CONFIG = {
+    "dedup_enabled": True,  # 相同内容的附件只保存一份（内容寻址存储+硬链接）
+    "ingest_mode": "fast",  # 新项目默认的附件导入方式，见 INGEST_MODES
+    "ingest_workers": 8,  # 批量添加附件的并发线程数
+    "thumbnail_size": 160,  # 附件预览缩略图的边长（像素）
+    "thumbnail_workers": 4  # 生成缩略图的并发线程数
+}
+
+# 附件导入方式（可按项目设置）
+INGEST_MODES = {
+    "copy": "完整复制",
+    "fast": "快速复制（写时复制/内核复制）",
+    "link": "硬链接（与源文件共用数据）"
+}
+
 # 导入配置
 IMPORT_CONFIG = {
-    "max_rows": 10000,  # 最大导入行数
+    "max_rows": 1000000,  # 最大导入行数（后台导入支持大文件）
     "required_columns": ["合同号", "客户名", "本年确认的收入"],
-    "unique_column": "合同号"
+    "unique_column": "合同号",
+    "csv_chunk_size": 100000,  # CSV分块读取行数
+    "csv_sniff_bytes": 64 * 1024,  # 编码和分隔符探测的采样字节数
+    "csv_encodings": ["utf-8", "gb18030"],  # 依次尝试的编码（gb18030兼容GBK）
+    "csv_delimiters": ",\t;|"  # 可识别的分隔符
 }
 
 # 备份配置
 BACKUP_CONFIG = {
     "auto_backup": True,
     "backup_interval_days": 7,
-    "max_backup_files": 10
+    "max_backup_files": 10,
+    "include_attachments": False,  # 自动备份是否包含附件
+    "idle_seconds": 120,  # 无键盘鼠标操作多久后才开始自动备份
+    "check_interval_seconds": 60,  # 检查是否需要备份的间隔
+    "max_read_mb_per_second": 20  # 自动备份读取文件的速度上限
 }
 
 # 默认设置
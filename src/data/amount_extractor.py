@@ -0,0 +1,314 @@
+"""
+附件金额提取模块
+从附件文本中提取候选金额（货币符号、“元/万元”、中文大写金额），
+按与本年确认收入的接近程度排序，生成附件确认收入的建议值
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from .text_extractor import can_extract, extract_text
+
+_CN_DIGITS = {
+    "零": 0, "〇": 0, "壹": 1, "贰": 2, "貳": 2, "叁": 3, "參": 3, "肆": 4, "伍": 5,
+    "陆": 6, "陸": 6, "柒": 7, "捌": 8, "玖": 9
+}
+_CN_UNITS = {"拾": 10, "佰": 100, "仟": 1000}
+_CN_SECTIONS = {"万": 10 ** 4, "萬": 10 ** 4, "亿": 10 ** 8, "億": 10 ** 8}
+_CN_YUAN = "元圆圓"
+
+# 中文大写金额：至少包含一个大写数字和一个货币单位
+_CHINESE_RE = re.compile(r"[零〇壹贰貳叁參肆伍陆陸柒捌玖拾佰仟万萬亿億元圆圓角分整正]{2,}")
+# 阿拉伯数字金额：需要有货币符号或“元/万元”，或带千分位/两位小数
+_NUMBER_RE = re.compile(
+    r"(?P<prefix>[¥￥]|RMB|CNY|人民币)?\s*"
+    r"(?P<num>\d{1,3}(?:[,，]\d{3})+(?:\.\d{1,2})?|\d+(?:\.\d{1,2})?)"
+    r"\s*(?P<unit>万元|元|圆)?",
+    re.IGNORECASE
+)
+_KEYWORDS = ("价税合计", "合计", "总计", "总金额", "总价", "金额", "含税", "实收", "收入", "付款", "应付", "结算", "大写")
+
+KIND_CHINESE = "大写"
+KIND_CURRENCY = "货币"
+KIND_NUMBER = "数字"
+
+MAX_AMOUNT = Decimal("1000000000000")
+CONTEXT_CHARS = 20
+CENT = Decimal("0.01")
+
+
+def parse_chinese_amount(text: str) -> Optional[Decimal]:
+    """
+    解析中文大写金额，如“壹拾贰万叁仟肆佰伍拾陆元柒角捌分”“人民币伍万元整”
+
+    Returns:
+        金额，无法解析时返回None
+    """
+    total = 0  # 已完成的亿/万节
+    section = 0  # 当前节（万以下）
+    number = 0  # 当前数字
+    yuan = None
+    fraction = Decimal(0)
+    seen_digit = False
+
+    for ch in text:
+        if ch in _CN_DIGITS:
+            number = _CN_DIGITS[ch]
+            seen_digit = True
+        elif ch in _CN_UNITS:
+            # “拾万”这类省略了“壹”的写法
+            section += (number or 1) * _CN_UNITS[ch]
+            number = 0
+            seen_digit = True
+        elif ch in _CN_SECTIONS:
+            section += number
+            number = 0
+            if _CN_SECTIONS[ch] == 10 ** 8:
+                total = (total + section) * 10 ** 8
+            else:
+                total += section * 10 ** 4
+            section = 0
+        elif ch in _CN_YUAN:
+            yuan = total + section + number
+            total = section = number = 0
+        elif ch == "角":
+            fraction += Decimal(number) / 10
+            number = 0
+        elif ch == "分":
+            fraction += Decimal(number) / 100
+            number = 0
+        elif ch in "整正":
+            break
+
+    if not seen_digit:
+        return None
+    if yuan is None:
+        yuan = total + section + number
+    return (Decimal(yuan) + fraction).quantize(CENT)
+
+
+def _context(text: str, start: int, end: int) -> str:
+    """金额前后的文本"""
+    return text[max(0, start - CONTEXT_CHARS):end + CONTEXT_CHARS].replace("\n", " ")
+
+
+def _has_keyword(text: str, start: int) -> bool:
+    """金额前面是否有“合计”“金额”等关键词"""
+    before = text[max(0, start - CONTEXT_CHARS):start]
+    return any(keyword in before for keyword in _KEYWORDS)
+
+
+def extract_amounts(text: str) -> List[Dict[str, Any]]:
+    """
+    从文本中提取候选金额
+
+    Returns:
+        候选列表: amount(Decimal)、kind(大写/货币/数字)、keyword(前面是否有金额关键词)、context
+    """
+    candidates = []
+
+    for match in _CHINESE_RE.finditer(text):
+        value = match.group()
+        if not any(ch in value for ch in _CN_YUAN + "角分"):
+            continue
+        if not any(ch in _CN_DIGITS or ch in _CN_UNITS for ch in value):
+            continue
+        amount = parse_chinese_amount(value)
+        if amount and amount < MAX_AMOUNT:
+            candidates.append({"amount": amount, "kind": KIND_CHINESE, "keyword": True,
+                               "context": _context(text, match.start(), match.end())})
+
+    for match in _NUMBER_RE.finditer(text):
+        prefix, number, unit = match.group("prefix"), match.group("num"), match.group("unit")
+        formatted = "," in number or "，" in number or re.search(r"\.\d{2}$", number)
+        if not prefix and not unit and not formatted:
+            continue
+        # 排除更长数字串（发票号、日期等）中的一段
+        if match.start("num") > 0 and text[match.start("num") - 1].isdigit():
+            continue
+        try:
+            amount = Decimal(number.replace(",", "").replace("，", ""))
+        except InvalidOperation:
+            continue
+        if unit == "万元":
+            amount *= 10000
+        amount = amount.quantize(CENT)
+        if amount <= 0 or amount >= MAX_AMOUNT:
+            continue
+        candidates.append({
+            "amount": amount,
+            "kind": KIND_CURRENCY if prefix or unit else KIND_NUMBER,
+            "keyword": _has_keyword(text, match.start()),
+            "context": _context(text, match.start(), match.end())
+        })
+
+    return candidates
+
+
+def extract_file_amounts(file_path) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    提取文件中的候选金额（用于进程池）
+
+    Returns:
+        (候选列表, 错误信息)
+    """
+    try:
+        return extract_amounts(extract_text(file_path)), ""
+    except Exception as e:
+        return [], str(e)
+
+
+def rank_candidates(candidates: List[Dict[str, Any]], target: Decimal) -> List[Dict[str, Any]]:
+    """
+    按与目标金额的接近程度、出现次数和上下文给候选金额打分
+
+    Args:
+        candidates: 候选列表（extract_amounts 的结果，另含 file）
+        target: 本年确认收入
+
+    Returns:
+        按得分从高到低排列的候选金额: amount、score、count、files、context、kind
+    """
+    groups = defaultdict(list)
+    for candidate in candidates:
+        groups[candidate["amount"]].append(candidate)
+
+    ranked = []
+    for amount, group in groups.items():
+        difference = abs(amount - target)
+        closeness = float(max(Decimal(0), 1 - difference / target)) if target > 0 else 0.0
+        keyword = any(c["keyword"] for c in group)
+        chinese = any(c["kind"] == KIND_CHINESE for c in group)
+        best = next((c for c in group if c["kind"] == KIND_CHINESE), None) or \
+            next((c for c in group if c["keyword"]), group[0])
+
+        score = 0.5 * closeness + 0.2 * keyword + 0.15 * chinese + 0.15 * min(len(group), 3) / 3
+        if difference <= CENT:
+            score += 0.3
+        ranked.append({
+            "amount": amount,
+            "score": round(min(score, 1.0), 3),
+            "count": len(group),
+            "files": sorted({c["file"] for c in group}),
+            "context": best["context"],
+            "kind": best["kind"]
+        })
+
+    ranked.sort(key=lambda r: (r["score"], r["count"]), reverse=True)
+    return ranked
+
+
+class AmountExtractor:
+    """附件金额批量提取类
+
+    对每个合同的可提取文本的附件（.txt/.eml/.docx/带文字层的PDF）在进程池中提取候选金额，
+    按与本年确认收入的接近程度排序后生成建议，建议需人工审核后才写入记录。
+    """
+
+    EXTRACT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+    INLINE_LIMIT = 8  # 文件不超过该数量时不启动进程池
+    MAX_CANDIDATES = 5  # 每个建议保留的候选金额数量
+    HIGH_CONFIDENCE = 0.8
+    MEDIUM_CONFIDENCE = 0.5
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def confidence_level(self, score: float) -> str:
+        """可信度等级"""
+        if score >= self.HIGH_CONFIDENCE:
+            return "高"
+        if score >= self.MEDIUM_CONFIDENCE:
+            return "中"
+        return "低"
+
+    def build_proposals(self, jobs: List[Tuple[str, Decimal, List[Path]]],
+                        progress_callback: Optional[Callable[[int, int], None]] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        提取候选金额并生成建议
+
+        Args:
+            jobs: (合同号, 本年确认收入, 附件路径列表) 列表
+            progress_callback: 进度回调 (已处理文件数, 总文件数)
+            cancel_event: 取消事件（已处理完全部附件的合同仍会生成建议）
+
+        Returns:
+            合同号 -> 建议: contract_id、amount、annual_income、score、confidence、
+            source（来源文件名）、context、candidates（候选金额列表）、created_time
+        """
+        tasks = [(contract_id, Path(path)) for contract_id, _, paths in jobs for path in paths if can_extract(path)]
+        total = len(tasks)
+        remaining = defaultdict(int)
+        for contract_id, _ in tasks:
+            remaining[contract_id] += 1
+        incomes = {contract_id: income for contract_id, income, _ in jobs}
+
+        executor = None
+        sources = [str(path) for _, path in tasks]
+        if total > self.INLINE_LIMIT:
+            # 界面进程中有多个线程，使用 spawn 启动子进程，避免 fork 后死锁
+            executor = ProcessPoolExecutor(max_workers=min(self.EXTRACT_WORKERS, total),
+                                           mp_context=multiprocessing.get_context("spawn"))
+            results = executor.map(extract_file_amounts, sources, chunksize=4)
+        else:
+            results = map(extract_file_amounts, sources)
+
+        candidates = defaultdict(list)
+        proposals = {}
+        done = 0
+        failed = 0
+        try:
+            for (contract_id, path), (amounts, error) in zip(tasks, results):
+                done += 1
+                if error:
+                    failed += 1
+                    self.logger.warning(f"提取附件金额失败: {path}: {error}")
+                for amount in amounts:
+                    amount["file"] = path.name
+                candidates[contract_id].extend(amounts)
+
+                remaining[contract_id] -= 1
+                if remaining[contract_id] == 0 and candidates[contract_id]:
+                    proposal = self._make_proposal(contract_id, incomes[contract_id], candidates.pop(contract_id))
+                    if proposal:
+                        proposals[contract_id] = proposal
+
+                if progress_callback and (done % 20 == 0 or done == total):
+                    progress_callback(done, total)
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        self.logger.info(f"附件金额提取完成: 处理{done}个文件，失败{failed}个，生成{len(proposals)}条建议")
+        return proposals
+
+    def _make_proposal(self, contract_id: str, annual_income: Decimal,
+                       candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """根据排序后的候选金额生成建议"""
+        ranked = rank_candidates(candidates, Decimal(annual_income))[:self.MAX_CANDIDATES]
+        if not ranked:
+            return None
+        best = ranked[0]
+        return {
+            "contract_id": contract_id,
+            "amount": best["amount"],
+            "annual_income": Decimal(annual_income),
+            "score": best["score"],
+            "confidence": self.confidence_level(best["score"]),
+            "source": ", ".join(best["files"]),
+            "context": best["context"],
+            "candidates": ranked,
+            "created_time": datetime.now()
+        }
@@ -0,0 +1,139 @@
+"""
+压缩包读取模块
+只读取压缩包目录（zip 的中央目录）列出成员，按需提取单个成员而不解压整个压缩包
+
+zip 使用标准库 zipfile；7z 和 rar 分别需要安装 py7zr 和 rarfile，未安装时不读取。
+"""
+
+import importlib.util
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+ARCHIVE_SUFFIXES = {".zip", ".7z", ".rar"}
+
+_OPTIONAL_LIBRARIES = {".7z": "py7zr", ".rar": "rarfile"}
+_COPY_BUFFER = 1024 * 1024
+
+
+def is_archive(file_path) -> bool:
+    """是否为压缩包"""
+    return Path(file_path).suffix.lower() in ARCHIVE_SUFFIXES
+
+
+def can_read(file_path) -> bool:
+    """当前环境是否可以读取该压缩包（7z/rar 需要可选依赖）"""
+    suffix = Path(file_path).suffix.lower()
+    if suffix not in ARCHIVE_SUFFIXES:
+        return False
+    library = _OPTIONAL_LIBRARIES.get(suffix)
+    return library is None or importlib.util.find_spec(library) is not None
+
+
+def _zip_member_name(info: zipfile.ZipInfo) -> str:
+    """zip 成员名；未标记 UTF-8 的文件名按 GBK 解码（Windows 中文系统压缩的文件）"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode("cp437").decode("gbk")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+
+def list_members(file_path) -> Optional[List[Dict[str, Any]]]:
+    """
+    列出压缩包中的文件（不含目录）
+
+    Args:
+        file_path: 压缩包路径
+
+    Returns:
+        成员列表: member（包内路径）、size、compressed_size、crc（CRC32，未知时为None）；
+        缺少读取该格式所需的库时返回None
+    """
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if not can_read(file_path):
+        return None
+
+    if suffix == ".zip":
+        # ZipFile 打开时只读取文件末尾的中央目录
+        with zipfile.ZipFile(file_path) as archive:
+            return [
+                {"member": _zip_member_name(info), "size": info.file_size,
+                 "compressed_size": info.compress_size, "crc": info.CRC}
+                for info in archive.infolist() if not info.is_dir()
+            ]
+
+    if suffix == ".7z":
+        import py7zr
+
+        with py7zr.SevenZipFile(file_path, mode="r") as archive:
+            return [
+                {"member": info.filename, "size": info.uncompressed,
+                 "compressed_size": info.compressed, "crc": info.crc32}
+                for info in archive.list() if not info.is_directory
+            ]
+
+    import rarfile
+
+    with rarfile.RarFile(str(file_path)) as archive:
+        return [
+            {"member": info.filename, "size": info.file_size,
+             "compressed_size": info.compress_size, "crc": info.CRC}
+            for info in archive.infolist() if not info.is_dir()
+        ]
+
+
+def extract_member(file_path, member: str, target_dir) -> Path:
+    """
+    提取压缩包中的单个成员到目标文件夹（只保留文件名，不还原包内目录）
+
+    Args:
+        file_path: 压缩包路径
+        member: 包内路径（list_members 返回的 member）
+        target_dir: 目标文件夹
+
+    Returns:
+        提取出的文件路径
+    """
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if not can_read(file_path):
+        raise RuntimeError(f"未安装读取 {suffix} 压缩包所需的 {_OPTIONAL_LIBRARIES[suffix]}")
+
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    # 只使用成员的文件名，避免包内路径（如 ../）写到目标文件夹之外
+    target_path = target_dir / Path(member.replace("\\", "/")).name
+
+    if suffix == ".zip":
+        with zipfile.ZipFile(file_path) as archive:
+            info = next((i for i in archive.infolist() if _zip_member_name(i) == member), None)
+            if info is None:
+                raise KeyError(f"压缩包中没有 {member}")
+            # 读取完成时 zipfile 会校验 CRC
+            with archive.open(info) as source, open(target_path, "wb") as target:
+                shutil.copyfileobj(source, target, _COPY_BUFFER)
+        return target_path
+
+    if suffix == ".7z":
+        import py7zr
+
+        with tempfile.TemporaryDirectory(dir=target_dir) as temp_dir:
+            with py7zr.SevenZipFile(file_path, mode="r") as archive:
+                archive.extract(path=temp_dir, targets=[member])
+            extracted = Path(temp_dir) / member
+            if not extracted.is_file():
+                raise KeyError(f"压缩包中没有 {member}")
+            shutil.move(str(extracted), target_path)
+        return target_path
+
+    import rarfile
+
+    with rarfile.RarFile(str(file_path)) as archive:
+        with archive.open(member) as source, open(target_path, "wb") as target:
+            shutil.copyfileobj(source, target, _COPY_BUFFER)
+    return target_path
@@ -0,0 +1,322 @@
+"""
+休眠附件包模块
+项目休眠时将附件存储目录中的合同文件夹打包为一个zip文件（中央目录可随机读取单个成员），
+打开合同时只解出该合同的附件
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+from .blob_store import unlink_file
+
+
+class AttachmentArchive:
+    """休眠附件包类
+
+    附件包保存在 <存储根目录>/.hibernate/ 中（附件目录和全文索引都会跳过以点开头的目录）：
+    - attachments.zip: 成员路径为 合同文件夹/文件名，已压缩的格式不再压缩
+    - index.json: 每个合同文件夹的附件数量和字节数，以及已解包的合同，读取统计时无需打开附件包；
+      硬链接的同一文件只保存一个成员，其余路径记录在 aliases 中（路径 -> 成员），解包时重新创建硬链接
+    全部合同解包后删除附件包。
+    """
+
+    ARCHIVE_DIR_NAME = ".hibernate"
+    ARCHIVE_FILE_NAME = "attachments.zip"
+    INDEX_FILE_NAME = "index.json"
+    # 本身已压缩的格式直接存储
+    STORED_EXTENSIONS = {
+        ".zip", ".rar", ".7z", ".gz", ".jpg", ".jpeg", ".png", ".gif", ".pdf",
+        ".docx", ".xlsx", ".pptx", ".mp4", ".mp3"
+    }
+
+    def __init__(self, storage_root: Path):
+        self.logger = logging.getLogger(__name__)
+        self.storage_root = Path(storage_root)
+        self.archive_dir = self.storage_root / self.ARCHIVE_DIR_NAME
+        self.archive_file = self.archive_dir / self.ARCHIVE_FILE_NAME
+        self.index_file = self.archive_dir / self.INDEX_FILE_NAME
+
+        self._lock = threading.Lock()
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._index: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def exists(cls, storage_root: Path) -> bool:
+        """存储目录中是否有未解包完的附件包"""
+        return (Path(storage_root) / cls.ARCHIVE_DIR_NAME / cls.INDEX_FILE_NAME).is_file()
+
+    def close(self):
+        """关闭附件包"""
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+
+    def _load_index(self) -> Dict[str, Any]:
+        """读取附件包索引"""
+        if self._index is None:
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {"contracts": {}, "thawed": []}
+            self._index.setdefault("aliases", {})
+        return self._index
+
+    def _save_index(self):
+        """写入附件包索引"""
+        temp = self.index_file.with_name(self.index_file.name + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(temp, self.index_file)
+
+    def is_packed(self, folder: str) -> bool:
+        """合同文件夹是否在附件包中且尚未解包"""
+        with self._lock:
+            index = self._load_index()
+            return folder in index["contracts"] and folder not in index["thawed"]
+
+    def pending_totals(self) -> Dict[str, int]:
+        """尚未解包的附件数量和字节数"""
+        with self._lock:
+            index = self._load_index()
+            thawed = set(index["thawed"])
+            pending = [totals for folder, totals in index["contracts"].items() if folder not in thawed]
+        return {
+            "file_count": sum(totals["file_count"] for totals in pending),
+            "total_size": sum(totals["total_size"] for totals in pending)
+        }
+
+    def _collect_files(self) -> List[Path]:
+        """合同文件夹中的全部文件（跳过以点开头的目录）"""
+        files = []
+        with os.scandir(self.storage_root) as it:
+            folders = [Path(entry.path) for entry in it if entry.is_dir() and not entry.name.startswith(".")]
+        for folder in folders:
+            for root, dirs, names in os.walk(folder):
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                files.extend(Path(root) / name for name in names)
+        return files
+
+    def pack(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+             cancel_event: Optional[threading.Event] = None,
+             release: Optional[Callable[[Path], None]] = None) -> Optional[Dict[str, Any]]:
+        """
+        将全部合同文件夹打包，写入完成后删除原文件
+
+        Args:
+            progress_callback: 进度回调 (已打包文件数, 文件总数)
+            cancel_event: 设置后停止（不删除任何原文件）
+            release: 删除每个原文件前调用（如释放去重存储的引用）
+
+        Returns:
+            统计信息: file_count、total_size、archive_size、linked_count（只记录为硬链接的文件数）；取消时返回None
+        """
+        if self.exists(self.storage_root):
+            raise RuntimeError("附件已经打包")
+
+        files = self._collect_files()
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        temp_file = self.archive_file.with_name(self.archive_file.name + ".tmp")
+        contracts: Dict[str, Dict[str, int]] = {}
+        # 硬链接的文件（如去重存储中的附件）只写入第一次出现的路径
+        members: Dict[Tuple[int, int], str] = {}
+        aliases: Dict[str, str] = {}
+
+        try:
+            with zipfile.ZipFile(temp_file, "w", allowZip64=True) as zf:
+                for done, file_path in enumerate(files, start=1):
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise InterruptedError
+                    relative = file_path.relative_to(self.storage_root)
+                    name = relative.as_posix()
+                    stat = file_path.stat()
+                    key = (stat.st_dev, stat.st_ino)
+                    if stat.st_nlink > 1 and key in members:
+                        aliases[name] = members[key]
+                    else:
+                        compression = (zipfile.ZIP_STORED if file_path.suffix.lower() in self.STORED_EXTENSIONS
+                                       else zipfile.ZIP_DEFLATED)
+                        zf.write(file_path, name, compress_type=compression)
+                        if stat.st_nlink > 1:
+                            members[key] = name
+
+                    totals = contracts.setdefault(relative.parts[0], {"file_count": 0, "total_size": 0})
+                    totals["file_count"] += 1
+                    totals["total_size"] += stat.st_size
+                    if progress_callback and (done % 100 == 0 or done == len(files)):
+                        progress_callback(done, len(files))
+        except InterruptedError:
+            temp_file.unlink(missing_ok=True)
+            return None
+        except BaseException:
+            temp_file.unlink(missing_ok=True)
+            raise
+
+        os.replace(temp_file, self.archive_file)
+        with self._lock:
+            self._index = {"created_time": datetime.now().isoformat(), "contracts": contracts,
+                           "aliases": aliases, "thawed": []}
+            self._save_index()
+
+        # 附件包和索引都写入后才删除原文件
+        for file_path in files:
+            if release:
+                release(file_path)
+            unlink_file(file_path)
+        for folder in contracts:
+            for root, dirs, names in os.walk(self.storage_root / folder, topdown=False):
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+
+        stats = {
+            "file_count": len(files),
+            "total_size": sum(totals["total_size"] for totals in contracts.values()),
+            "archive_size": self.archive_file.stat().st_size,
+            "linked_count": len(aliases)
+        }
+        self.logger.info(f"附件打包完成: {stats}")
+        return stats
+
+    def _open_zip(self) -> zipfile.ZipFile:
+        """打开附件包（只读取一次中央目录）"""
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.archive_file, "r")
+        return self._zip
+
+    def _pending_names(self, zf: zipfile.ZipFile, folders: Optional[set] = None) -> List[str]:
+        """尚未解包的文件路径（成员和硬链接路径），folders 不为None时只列出这些合同文件夹"""
+        index = self._load_index()
+        thawed = set(index["thawed"])
+        names = [info.filename for info in zf.infolist() if not info.is_dir()] + list(index["aliases"])
+        return [name for name in names
+                if name.split("/", 1)[0] not in thawed and (folders is None or name.split("/", 1)[0] in folders)]
+
+    def _link_groups(self) -> Dict[str, List[str]]:
+        """成员 -> 同一硬链接组的全部路径（只包含有硬链接的成员）"""
+        groups: Dict[str, List[str]] = {}
+        for alias, member in self._load_index()["aliases"].items():
+            groups.setdefault(member, [member]).append(alias)
+        return groups
+
+    def _extract(self, zf: zipfile.ZipFile, name: str, groups: Dict[str, List[str]]) -> bool:
+        """
+        解出一个文件并恢复修改时间，目标文件已存在时不覆盖
+
+        name 是硬链接路径时读取对应的成员；同一组中已解出且未修改的文件存在时直接创建硬链接
+        """
+        target = self.storage_root / name
+        if self.storage_root.resolve() not in target.resolve().parents:
+            self.logger.warning(f"跳过附件包中的非法路径: {name}")
+            return False
+        if target.exists():
+            return False
+
+        info = zf.getinfo(self._load_index()["aliases"].get(name, name))
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        target.parent.mkdir(parents=True, exist_ok=True)
+        for other in groups.get(info.filename, []):
+            source = self.storage_root / other
+            if other == name or not source.is_file():
+                continue
+            stat = source.stat()
+            if stat.st_size == info.file_size and int(stat.st_mtime) == int(mtime):
+                try:
+                    os.link(source, target)
+                    return True
+                except OSError:
+                    break
+
+        temp = target.with_name(target.name + ".thaw")
+        with zf.open(info) as src, open(temp, "wb") as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.utime(temp, (mtime, mtime))
+        os.replace(temp, target)
+        return True
+
+    def thaw_contract(self, folder: str) -> int:
+        """
+        解出一个合同文件夹的附件
+
+        Args:
+            folder: 合同文件夹名
+
+        Returns:
+            解出的文件数
+        """
+        with self._lock:
+            index = self._load_index()
+            if folder not in index["contracts"] or folder in index["thawed"]:
+                return 0
+
+            zf = self._open_zip()
+            groups = self._link_groups()
+            count = sum(self._extract(zf, name, groups) for name in self._pending_names(zf, {folder}))
+
+            index["thawed"].append(folder)
+            self._save_index()
+            self.logger.info(f"解包合同附件: {folder}，{count}个文件")
+
+            if len(index["thawed"]) >= len(index["contracts"]):
+                self._remove_archive()
+        return count
+
+    def thaw_all(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+                 cancel_event: Optional[threading.Event] = None) -> int:
+        """
+        解出全部尚未解包的附件，完成后删除附件包
+
+        Returns:
+            解出的文件数
+        """
+        with self._lock:
+            index = self._load_index()
+            zf = self._open_zip()
+            groups = self._link_groups()
+            # 按合同文件夹排序，取消时已处理的合同都是完整解出的
+            names = sorted(self._pending_names(zf), key=lambda name: name.split("/", 1)[0])
+
+            count = 0
+            for done, name in enumerate(names, start=1):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                count += self._extract(zf, name, groups)
+                if progress_callback and (done % 100 == 0 or done == len(names)):
+                    progress_callback(done, len(names))
+            else:
+                self._remove_archive()
+                return count
+
+            # 取消时只记录完整解出的合同
+            finished = {name.split("/", 1)[0] for name in names[:done - 1]}
+            last = name.split("/", 1)[0]
+            finished.discard(last)
+            index["thawed"].extend(sorted(finished))
+            self._save_index()
+        return count
+
+    def _remove_archive(self):
+        """全部解包后删除附件包"""
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        self.archive_file.unlink(missing_ok=True)
+        self.index_file.unlink(missing_ok=True)
+        try:
+            self.archive_dir.rmdir()
+        except OSError:
+            pass
+        self.logger.info("附件已全部解包，删除附件包")
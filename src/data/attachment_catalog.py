@@ -0,0 +1,545 @@
+"""
+附件目录模块
+在本地数据库中记录附件的路径、大小、修改时间、哈希和所属合同，
+列表、数量和大小统计直接从目录读取，无需遍历附件存储目录
+"""
+
+import logging
+import hashlib
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+
+
+class AttachmentCatalog:
+    """附件目录类
+
+    目录保存在本地（项目数据目录），附件存储目录可能位于网络驱动器上。
+    - files: 每个附件一行，路径为相对存储根目录的键（合同文件夹/文件名）
+    - dirs: 已扫描的合同文件夹及其修改时间，用于增量核对
+    - usage: 每个合同的附件数量和字节数，由触发器随 files 的变更维护
+    - archives/archive_members: 压缩包的成员列表，压缩包删除、移动或内容变化时由触发器同步
+    files 中的 digest（完整哈希）和 partial_hash（首尾块哈希）是缓存，文件变化时清空。
+    FileManager 的操作会同步更新目录；reconcile 通过 os.scandir 增量核对外部改动。
+    """
+
+    SCAN_WORKERS = 8  # 并行扫描合同文件夹的线程数（网络驱动器上延迟远大于带宽）
+
+    # 新增或更新文件记录；使用 UPSERT 而不是 INSERT OR REPLACE，
+    # 因为 REPLACE 删除旧行时不会触发删除触发器，累计统计会出错。
+    # 外层语句的冲突处理方式会覆盖触发器内语句的冲突处理方式，因此触发器中不使用 OR IGNORE
+    UPSERT_FILE_SQL = (
+        "INSERT INTO files (path, contract, name, size, mtime_ns, digest) VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT(path) DO UPDATE SET "
+        "contract = excluded.contract, name = excluded.name, size = excluded.size, "
+        "mtime_ns = excluded.mtime_ns, digest = excluded.digest, partial_hash = NULL"
+    )
+
+    def __init__(self, catalog_file: Path, storage_root: Path):
+        self.logger = logging.getLogger(__name__)
+        self.catalog_file = Path(catalog_file)
+        self.storage_root = Path(storage_root)
+        self.catalog_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.catalog_file), check_same_thread=False, timeout=30)
+        self._reconcile_thread = None
+        self._init_schema()
+
+    @staticmethod
+    def default_catalog_file(catalog_dir: Path, storage_root: Path) -> Path:
+        """按存储路径生成目录文件名，存储路径变更后使用新的目录"""
+        key = hashlib.sha1(str(Path(storage_root).resolve()).encode("utf-8")).hexdigest()[:16]
+        return Path(catalog_dir) / f"attachments_{key}.db"
+
+    def _init_schema(self):
+        """初始化目录表结构"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, contract TEXT NOT NULL, name TEXT NOT NULL, "
+                "size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_files_contract ON files(contract)")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+            if "partial_hash" not in columns:
+                self._conn.execute("ALTER TABLE files ADD COLUMN partial_hash TEXT")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS dirs (contract TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL)"
+            )
+
+            has_usage = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'usage'"
+            ).fetchone()
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage ("
+                "contract TEXT PRIMARY KEY, file_count INTEGER NOT NULL, total_size INTEGER NOT NULL)"
+            )
+            self._conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS trg_files_insert AFTER INSERT ON files BEGIN
+                    INSERT INTO usage SELECT NEW.contract, 0, 0
+                    WHERE NOT EXISTS (SELECT 1 FROM usage WHERE contract = NEW.contract);
+                    UPDATE usage SET file_count = file_count + 1, total_size = total_size + NEW.size
+                    WHERE contract = NEW.contract;
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_files_delete AFTER DELETE ON files BEGIN
+                    UPDATE usage SET file_count = file_count - 1, total_size = total_size - OLD.size
+                    WHERE contract = OLD.contract;
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_files_update AFTER UPDATE OF contract, size ON files BEGIN
+                    UPDATE usage SET file_count = file_count - 1, total_size = total_size - OLD.size
+                    WHERE contract = OLD.contract;
+                    INSERT INTO usage SELECT NEW.contract, 0, 0
+                    WHERE NOT EXISTS (SELECT 1 FROM usage WHERE contract = NEW.contract);
+                    UPDATE usage SET file_count = file_count + 1, total_size = total_size + NEW.size
+                    WHERE contract = NEW.contract;
+                END;
+            """)
+            if not has_usage:
+                self._rebuild_usage()
+
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS archives ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, member_count INTEGER NOT NULL, "
+                "members_size INTEGER NOT NULL, error TEXT)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS archive_members ("
+                "path TEXT NOT NULL, member TEXT NOT NULL, size INTEGER NOT NULL, "
+                "compressed_size INTEGER, crc INTEGER, PRIMARY KEY (path, member))"
+            )
+            self._conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS trg_archive_delete AFTER DELETE ON files BEGIN
+                    DELETE FROM archive_members WHERE path = OLD.path;
+                    DELETE FROM archives WHERE path = OLD.path;
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_archive_move AFTER UPDATE OF path ON files BEGIN
+                    UPDATE archive_members SET path = NEW.path WHERE path = OLD.path;
+                    UPDATE archives SET path = NEW.path WHERE path = OLD.path;
+                END;
+                CREATE TRIGGER IF NOT EXISTS trg_archive_change AFTER UPDATE OF mtime_ns ON files
+                WHEN OLD.mtime_ns != NEW.mtime_ns BEGIN
+                    DELETE FROM archive_members WHERE path = NEW.path;
+                    DELETE FROM archives WHERE path = NEW.path;
+                END;
+            """)
+
+    def close(self):
+        """关闭目录连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _split_path(self, file_path: Path) -> Tuple[str, str, str]:
+        """拆分附件路径为 (相对路径键, 合同文件夹名, 文件名)"""
+        relative = Path(file_path).relative_to(self.storage_root)
+        return relative.as_posix(), relative.parts[0], relative.name
+
+    def _dir_mtime(self, contract: str) -> Optional[int]:
+        """获取合同文件夹的修改时间，不存在时返回None"""
+        try:
+            return os.stat(self.storage_root / contract).st_mtime_ns
+        except OSError:
+            return None
+
+    def _touch_dirs(self, contracts: Iterable[str]):
+        """操作后同步合同文件夹的修改时间，避免下次核对时重复扫描（需持有锁）"""
+        for contract in set(contracts):
+            mtime_ns = self._dir_mtime(contract)
+            if mtime_ns is None:
+                self._conn.execute("DELETE FROM dirs WHERE contract = ?", (contract,))
+            else:
+                self._conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (contract, mtime_ns))
+
+    def add_files(self, entries: Iterable[Tuple[Path, Optional[str]]]):
+        """
+        在一个事务中登记新增或变更的附件
+
+        Args:
+            entries: (附件路径, 内容哈希或None) 列表
+        """
+        rows = []
+        for file_path, digest in entries:
+            stat = os.stat(file_path)
+            key, contract, name = self._split_path(file_path)
+            rows.append((key, contract, name, stat.st_size, stat.st_mtime_ns, digest))
+
+        if not rows:
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(self.UPSERT_FILE_SQL, rows)
+            self._touch_dirs(row[1] for row in rows)
+
+    def remove_file(self, file_path: Path):
+        """移除附件记录"""
+        key, contract, _ = self._split_path(file_path)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (key,))
+            self._touch_dirs([contract])
+
+    def move_file(self, old_path: Path, new_path: Path):
+        """附件移动或重命名后更新记录"""
+        old_key, old_contract, _ = self._split_path(old_path)
+        new_key, new_contract, new_name = self._split_path(new_path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE files SET path = ?, contract = ?, name = ? WHERE path = ?",
+                (new_key, new_contract, new_name, old_key)
+            )
+            self._touch_dirs([old_contract, new_contract])
+
+    def list_contract(self, contract: str) -> List[Dict[str, Any]]:
+        """
+        获取合同文件夹中的附件，首次访问的合同会先扫描一次
+
+        Args:
+            contract: 合同文件夹名
+
+        Returns:
+            附件信息列表: path、name、size、mtime_ns、digest、member_count（压缩包内文件数，未读取时为None）
+        """
+        with self._lock:
+            scanned = self._conn.execute("SELECT 1 FROM dirs WHERE contract = ?", (contract,)).fetchone()
+        if not scanned:
+            self.scan_contract(contract)
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT files.path, name, size, files.mtime_ns, digest, archives.member_count FROM files "
+                "LEFT JOIN archives ON archives.path = files.path WHERE contract = ? ORDER BY name",
+                (contract,)
+            ).fetchall()
+
+        return [
+            {"path": self.storage_root / path, "name": name, "size": size, "mtime_ns": mtime_ns, "digest": digest,
+             "member_count": member_count}
+            for path, name, size, mtime_ns, digest, member_count in rows
+        ]
+
+    def list_files(self) -> List[Tuple[str, str, str, int, int]]:
+        """
+        获取全部附件记录
+
+        Returns:
+            [(相对路径键, 合同文件夹名, 文件名, 大小, 修改时间), ...]
+        """
+        with self._lock:
+            return self._conn.execute("SELECT path, contract, name, size, mtime_ns FROM files").fetchall()
+
+    def _rebuild_usage(self) -> bool:
+        """根据 files 重新计算 usage（需持有锁并在事务中），返回原统计是否有偏差"""
+        before = self._conn.execute(
+            "SELECT contract, file_count, total_size FROM usage WHERE file_count > 0 ORDER BY contract"
+        ).fetchall()
+        self._conn.execute("DELETE FROM usage")
+        self._conn.execute(
+            "INSERT INTO usage SELECT contract, COUNT(*), SUM(size) FROM files GROUP BY contract"
+        )
+        after = self._conn.execute(
+            "SELECT contract, file_count, total_size FROM usage ORDER BY contract"
+        ).fetchall()
+        return before != after
+
+    def get_size_collisions(self, min_size: int = 1) -> List[Dict[str, Any]]:
+        """
+        获取大小相同（可能重复）的附件
+
+        Args:
+            min_size: 忽略小于该字节数的文件（空文件不参与比较）
+
+        Returns:
+            附件信息列表: path、contract、name、size、mtime_ns、digest、partial_hash
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, contract, name, size, mtime_ns, digest, partial_hash FROM files "
+                "WHERE size >= ? AND size IN (SELECT size FROM files WHERE size >= ? GROUP BY size HAVING COUNT(*) > 1) "
+                "ORDER BY size",
+                (min_size, min_size)
+            ).fetchall()
+
+        keys = ("path", "contract", "name", "size", "mtime_ns", "digest", "partial_hash")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def set_hashes(self, column: str, values: Iterable[Tuple[str, str, int]]):
+        """
+        缓存文件哈希，文件的修改时间与记录不一致时不写入
+
+        Args:
+            column: "digest" 或 "partial_hash"
+            values: (相对路径键, 哈希, 修改时间) 列表
+        """
+        if column not in ("digest", "partial_hash"):
+            raise ValueError(f"未知的哈希列: {column}")
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"UPDATE files SET {column} = ? WHERE path = ? AND mtime_ns = ?",
+                [(value, path, mtime_ns) for path, value, mtime_ns in values]
+            )
+
+    def get_totals(self) -> Dict[str, int]:
+        """获取合同数量、附件数量、总字节数和压缩包内文件数（读取累计统计，不遍历文件记录）"""
+        with self._lock:
+            contract_count = self._conn.execute("SELECT COUNT(*) FROM dirs").fetchone()[0]
+            file_count, total_size = self._conn.execute(
+                "SELECT COALESCE(SUM(file_count), 0), COALESCE(SUM(total_size), 0) FROM usage"
+            ).fetchone()
+            member_count = self._conn.execute("SELECT COALESCE(SUM(member_count), 0) FROM archives").fetchone()[0]
+        return {"contract_count": contract_count, "file_count": file_count, "total_size": total_size,
+                "member_count": member_count}
+
+    def get_pending_archives(self, suffixes: Iterable[str]) -> List[Tuple[str, int]]:
+        """
+        获取尚未读取成员列表的压缩包
+
+        Args:
+            suffixes: 压缩包扩展名（如 .zip）
+
+        Returns:
+            [(相对路径键, 修改时间), ...]
+        """
+        patterns = [f"%{suffix.lower()}" for suffix in suffixes]
+        if not patterns:
+            return []
+        conditions = " OR ".join("lower(files.name) LIKE ?" for _ in patterns)
+        with self._lock:
+            return self._conn.execute(
+                f"SELECT files.path, files.mtime_ns FROM files LEFT JOIN archives ON archives.path = files.path "
+                f"WHERE archives.path IS NULL AND ({conditions})",
+                patterns
+            ).fetchall()
+
+    def set_archive_members(self, entries: Iterable[Tuple[str, int, List[Dict[str, Any]], str]]):
+        """
+        记录压缩包的成员列表，压缩包的修改时间与记录不一致时不写入
+
+        Args:
+            entries: (相对路径键, 读取时的修改时间, 成员列表, 读取错误) 列表，
+                成员包含 member、size、compressed_size、crc
+        """
+        with self._lock, self._conn:
+            for path, mtime_ns, members, error in entries:
+                current = self._conn.execute("SELECT mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+                if not current or current[0] != mtime_ns:
+                    continue
+                self._conn.execute("DELETE FROM archive_members WHERE path = ?", (path,))
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO archive_members VALUES (?, ?, ?, ?, ?)",
+                    [(path, m["member"], m["size"], m.get("compressed_size"), m.get("crc")) for m in members]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO archives VALUES (?, ?, ?, ?, ?)",
+                    (path, mtime_ns, len(members), sum(m["size"] for m in members), error or None)
+                )
+
+    def get_archive_members(self, file_path: Path) -> Optional[List[Dict[str, Any]]]:
+        """
+        获取压缩包的成员列表
+
+        Returns:
+            成员列表: member、size、compressed_size、crc；尚未读取时返回None
+        """
+        key = self._split_path(file_path)[0]
+        with self._lock:
+            if not self._conn.execute("SELECT 1 FROM archives WHERE path = ?", (key,)).fetchone():
+                return None
+            rows = self._conn.execute(
+                "SELECT member, size, compressed_size, crc FROM archive_members WHERE path = ? ORDER BY member",
+                (key,)
+            ).fetchall()
+        return [dict(zip(("member", "size", "compressed_size", "crc"), row)) for row in rows]
+
+    def search_archive_members(self, query: str, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        按成员名检索压缩包内的文件，多个关键词（空格分隔）需同时出现
+
+        Returns:
+            结果列表: path（压缩包路径）、contract、name（压缩包名）、member、size
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        patterns = ["%" + t.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%" for t in terms]
+        conditions = " AND ".join("archive_members.member LIKE ? ESCAPE '\\'" for _ in patterns)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT files.path, files.contract, files.name, archive_members.member, archive_members.size "
+                "FROM archive_members JOIN files ON files.path = archive_members.path "
+                f"WHERE {conditions} ORDER BY files.contract, files.name, archive_members.member LIMIT ?",
+                patterns + [limit]
+            ).fetchall()
+        return [
+            {"path": self.storage_root / path, "contract": contract, "name": name, "member": member, "size": size}
+            for path, contract, name, member, size in rows
+        ]
+
+    def get_contract_usage(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取每个合同的附件数量和字节数，按字节数从大到小排列
+
+        Args:
+            limit: 最多返回的合同数量
+
+        Returns:
+            [{"contract": 合同文件夹名, "file_count": 附件数, "total_size": 字节数}, ...]
+        """
+        sql = "SELECT contract, file_count, total_size FROM usage WHERE file_count > 0 ORDER BY total_size DESC"
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (limit,)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"contract": c, "file_count": n, "total_size": size} for c, n, size in rows]
+
+    def is_empty(self) -> bool:
+        """目录是否从未扫描过"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM dirs LIMIT 1").fetchone() is None
+
+    def scan_contract(self, contract: str) -> int:
+        """
+        扫描一个合同文件夹并与目录核对，只更新新增、删除以及大小或修改时间变化的文件
+
+        Args:
+            contract: 合同文件夹名
+
+        Returns:
+            变更的文件数量
+        """
+        dir_mtime, found = self._list_folder(contract)
+        return self._apply_scan(contract, dir_mtime, found)
+
+    def _list_folder(self, contract: str) -> Tuple[Optional[int], Dict[str, Tuple[str, int, int]]]:
+        """列出合同文件夹中的文件（只做文件系统读取，可在多个线程中并行调用）"""
+        folder = self.storage_root / contract
+        found = {}
+        try:
+            dir_mtime = os.stat(folder).st_mtime_ns
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_file():
+                        # Windows 上 scandir 的 stat 信息来自目录列表，不需要额外请求
+                        stat = entry.stat()
+                        found[f"{contract}/{entry.name}"] = (entry.name, stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            dir_mtime = None
+        return dir_mtime, found
+
+    def _apply_scan(self, contract: str, dir_mtime: Optional[int],
+                    found: Dict[str, Tuple[str, int, int]]) -> int:
+        """将文件夹列表与目录核对并写入变更"""
+        with self._lock, self._conn:
+            existing = {
+                path: (size, mtime_ns) for path, size, mtime_ns in self._conn.execute(
+                    "SELECT path, size, mtime_ns FROM files WHERE contract = ?", (contract,)
+                )
+            }
+
+            removed = [(path,) for path in existing if path not in found]
+            changed = [
+                (path, contract, name, size, mtime_ns, None)
+                for path, (name, size, mtime_ns) in found.items()
+                if existing.get(path) != (size, mtime_ns)
+            ]
+
+            self._conn.executemany("DELETE FROM files WHERE path = ?", removed)
+            self._conn.executemany(self.UPSERT_FILE_SQL, changed)
+            if dir_mtime is None:
+                self._conn.execute("DELETE FROM dirs WHERE contract = ?", (contract,))
+            else:
+                self._conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (contract, dir_mtime))
+
+        return len(removed) + len(changed)
+
+    def reconcile(self, force: bool = False) -> Dict[str, int]:
+        """
+        增量核对目录与存储目录
+
+        只扫描修改时间发生变化的合同文件夹（新增、删除、重命名文件都会改变文件夹修改时间），
+        force=True 时扫描全部合同文件夹以发现原位修改的文件，并重新校验累计统计。
+        文件夹列表在线程池中并行读取。
+
+        Returns:
+            {"scanned": 扫描的文件夹数, "changed": 变更的文件数, "removed_dirs": 移除的文件夹数,
+             "usage_fixed": 累计统计是否被修正}
+        """
+        stats = {"scanned": 0, "changed": 0, "removed_dirs": 0, "usage_fixed": False}
+
+        current = {}
+        try:
+            with os.scandir(self.storage_root) as it:
+                for entry in it:
+                    # 跳过去重对象库等内部目录
+                    if entry.is_dir() and not entry.name.startswith("."):
+                        current[entry.name] = entry.stat().st_mtime_ns
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            known = dict(self._conn.execute("SELECT contract, mtime_ns FROM dirs").fetchall())
+
+        to_scan = [contract for contract, mtime_ns in current.items() if force or known.get(contract) != mtime_ns]
+        if to_scan:
+            with ThreadPoolExecutor(max_workers=self.SCAN_WORKERS, thread_name_prefix="CatalogScan") as executor:
+                for contract, (dir_mtime, found) in zip(to_scan, executor.map(self._list_folder, to_scan)):
+                    stats["changed"] += self._apply_scan(contract, dir_mtime, found)
+            stats["scanned"] = len(to_scan)
+
+        vanished = [contract for contract in known if contract not in current]
+        if vanished:
+            with self._lock, self._conn:
+                for contract in vanished:
+                    self._conn.execute("DELETE FROM files WHERE contract = ?", (contract,))
+                    self._conn.execute("DELETE FROM dirs WHERE contract = ?", (contract,))
+            stats["removed_dirs"] = len(vanished)
+
+        if force:
+            with self._lock, self._conn:
+                stats["usage_fixed"] = self._rebuild_usage()
+            if stats["usage_fixed"]:
+                self.logger.warning("附件累计统计与目录不一致，已重新计算")
+
+        if stats["changed"] or stats["removed_dirs"]:
+            self.logger.info(
+                f"附件目录核对完成: 扫描{stats['scanned']}个文件夹，"
+                f"变更{stats['changed']}个文件，移除{stats['removed_dirs']}个文件夹"
+            )
+        return stats
+
+    def is_reconciling(self) -> bool:
+        """后台核对是否正在进行"""
+        return bool(self._reconcile_thread and self._reconcile_thread.is_alive())
+
+    def start_background_reconcile(self, force: bool = False, callback=None) -> bool:
+        """
+        在后台线程中核对目录
+
+        Args:
+            force: 是否扫描全部合同文件夹并校验累计统计
+            callback: 完成后在后台线程中调用 callback(统计信息)
+
+        Returns:
+            是否启动了新的核对（已有核对在进行时返回False）
+        """
+        if self.is_reconciling():
+            return False
+
+        def run():
+            stats = {}
+            try:
+                stats = self.reconcile(force)
+            except Exception as e:
+                self.logger.warning(f"后台核对附件目录失败: {e}")
+            if callback:
+                callback(stats)
+
+        self._reconcile_thread = threading.Thread(target=run, name="CatalogReconcile", daemon=True)
+        self._reconcile_thread.start()
+        return True
@@ -0,0 +1,500 @@
+"""
+增量备份仓库模块
+按内容定义分块（Gear 滚动哈希）保存文件，相同内容的块只保存一份；
+每次备份只写入新的块和一份清单，可以恢复任意一次备份
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Iterator, Tuple
+
+# 分块参数（改变后已有的块无法再被复用）
+CHUNK_MIN_SIZE = 16 * 1024
+CHUNK_MAX_SIZE = 256 * 1024
+CHUNK_MASK_BITS = 16  # 平均块大小约 CHUNK_MIN_SIZE + 64KB
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+# 块文件首字节：原始数据或 zlib 压缩数据
+_RAW = b"\x00"
+_ZLIB = b"\x01"
+_COMPRESS_RATIO = 0.95  # 压缩后不小于原来的 95% 时保存原始数据（图片、PDF 等）
+
+_gear_table = None
+
+
+def _get_gear_table():
+    """Gear 哈希表：每个字节值对应一个固定的 16 位随机数"""
+    global _gear_table
+    if _gear_table is None:
+        import numpy as np
+
+        _gear_table = np.array(
+            [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:2], "little") for i in range(256)],
+            dtype=np.uint16
+        )
+    return _gear_table
+
+
+def _cut_candidates(buffer: bytes):
+    """
+    计算缓冲区中满足分块条件的位置
+
+    Gear 哈希 h = (h << 1) + gear[byte]，只检查低 CHUNK_MASK_BITS 位时，
+    结果只和最近 CHUNK_MASK_BITS 个字节有关，可以用 numpy 一次计算整个缓冲区：
+    h[i] = sum(gear[b[i-k]] << k, k < 16)，按窗口倍增只需 4 次移位相加。
+    """
+    import numpy as np
+
+    hashes = _get_gear_table()[np.frombuffer(buffer, dtype=np.uint8)]
+    window = 1
+    while window < CHUNK_MASK_BITS:
+        shifted = hashes[:-window] << np.uint16(window)
+        hashes[window:] += shifted
+        window *= 2
+    return np.flatnonzero(hashes == 0) + 1  # 分块结束位置
+
+
+def iter_chunks(fileobj) -> Iterator[bytes]:
+    """
+    按内容定义分块读取文件
+
+    分块位置只取决于内容，文件中间插入或删除数据时，只有附近的块会变化。
+    """
+    pending = b""
+    while True:
+        block = fileobj.read(READ_BLOCK_SIZE)
+        buffer = pending + block if pending else block
+        if not buffer:
+            return
+
+        start = 0
+        for end in _cut_candidates(buffer).tolist():
+            if end - start < CHUNK_MIN_SIZE:
+                continue
+            while end - start > CHUNK_MAX_SIZE:
+                yield buffer[start:start + CHUNK_MAX_SIZE]
+                start += CHUNK_MAX_SIZE
+            if end - start >= CHUNK_MIN_SIZE:
+                yield buffer[start:end]
+                start = end
+
+        pending = buffer[start:]
+        if not block:
+            # 文件结束
+            while pending:
+                yield pending[:CHUNK_MAX_SIZE]
+                pending = pending[CHUNK_MAX_SIZE:]
+            return
+        while len(pending) > CHUNK_MAX_SIZE:
+            yield pending[:CHUNK_MAX_SIZE]
+            pending = pending[CHUNK_MAX_SIZE:]
+
+
+class BackupRepository:
+    """增量备份仓库类
+
+    仓库目录结构:
+        chunks/<哈希前两位>/<sha256>  数据块（可能经过 zlib 压缩）
+        manifests/<备份ID>.json       每次备份的清单（文件列表和对应的块）
+
+    清单在所有块写入并重新读取校验后才保存，备份中断时不会留下不完整的备份。
+    大小和修改时间都没有变化的文件直接沿用上一次备份的块，不再读取。
+    """
+
+    CHUNKS_DIR_NAME = "chunks"
+    MANIFESTS_DIR_NAME = "manifests"
+    MANIFEST_VERSION = 1
+    WRITE_WORKERS = max(2, min(8, os.cpu_count() or 2))  # 压缩写入和校验数据块的线程数
+
+    # 同一仓库的多个实例（手动备份和自动备份）共用一把锁，避免清理时删除正在备份的块
+    _repo_locks: Dict[str, threading.Lock] = {}
+    _repo_locks_guard = threading.Lock()
+
+    def __init__(self, repo_dir):
+        self.logger = logging.getLogger(__name__)
+        self.repo_dir = Path(repo_dir)
+        self.chunks_dir = self.repo_dir / self.CHUNKS_DIR_NAME
+        self.manifests_dir = self.repo_dir / self.MANIFESTS_DIR_NAME
+        self.chunks_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        with self._repo_locks_guard:
+            self._lock = self._repo_locks.setdefault(str(self.repo_dir.resolve()), threading.Lock())
+
+    def chunk_path(self, digest: str) -> Path:
+        """数据块文件路径"""
+        return self.chunks_dir / digest[:2] / digest
+
+    def _known_chunks(self) -> set:
+        """仓库中已有的数据块"""
+        known = set()
+        for subdir in self.chunks_dir.iterdir():
+            if subdir.is_dir():
+                known.update(entry.name for entry in os.scandir(subdir) if not entry.name.endswith(".tmp"))
+        return known
+
+    def _write_chunk(self, digest: str, data: bytes) -> int:
+        """写入数据块，返回写入的字节数"""
+        compressed = zlib.compress(data, 1)
+        payload = _ZLIB + compressed if len(compressed) < len(data) * _COMPRESS_RATIO else _RAW + data
+
+        target = self.chunk_path(digest)
+        target.parent.mkdir(exist_ok=True)
+        temp = target.with_name(target.name + ".tmp")
+        with open(temp, "wb") as f:
+            f.write(payload)
+        os.replace(temp, target)
+        return len(payload)
+
+    def read_chunk(self, digest: str) -> bytes:
+        """读取并校验数据块"""
+        with open(self.chunk_path(digest), "rb") as f:
+            payload = f.read()
+        data = zlib.decompress(payload[1:]) if payload[:1] == _ZLIB else payload[1:]
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"数据块已损坏: {digest}")
+        return data
+
+    def _new_snapshot_id(self) -> str:
+        """生成备份ID（按时间排序）"""
+        snapshot_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        suffix = 1
+        candidate = snapshot_id
+        while (self.manifests_dir / f"{candidate}.json").exists():
+            suffix += 1
+            candidate = f"{snapshot_id}_{suffix:02d}"
+        return candidate
+
+    def _scan_source(self, source_path: Path, exclude: List[str],
+                     include_hidden: Optional[List[str]] = None) -> Iterator[Tuple[str, Path]]:
+        """列出备份源中的文件: (相对路径, 文件路径)；跳过隐藏文件夹（include_hidden 中的除外）和排除的文件"""
+        include_hidden = include_hidden or []
+        if source_path.is_file():
+            yield source_path.name, source_path
+            return
+        if not source_path.is_dir():
+            return
+
+        for dirpath, dirnames, filenames in os.walk(source_path):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") or d in include_hidden)
+            for filename in sorted(filenames):
+                file_path = Path(dirpath) / filename
+                relative = file_path.relative_to(source_path).as_posix()
+                if any(fnmatch.fnmatch(relative, pattern) for pattern in exclude):
+                    continue
+                yield relative, file_path
+
+    def create_snapshot(self, sources: Dict[str, Path], label: str = "",
+                        exclude: Optional[List[str]] = None,
+                        progress_callback: Optional[Callable[[int, int], None]] = None,
+                        cancel_event: Optional[threading.Event] = None,
+                        throttle: Optional[Callable[[int], None]] = None,
+                        include_hidden: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        创建一次备份
+
+        Args:
+            sources: 备份源名称 -> 文件夹或文件路径
+            label: 备份说明
+            exclude: 排除的相对路径模式（fnmatch）
+            progress_callback: 进度回调 (已处理文件数, 总文件数)
+            cancel_event: 取消事件，取消时不保存清单
+            throttle: 每读取一个数据块后调用（参数为字节数），可在其中等待以限制读取速度
+            include_hidden: 需要备份的隐藏文件夹名称（默认跳过所有以 . 开头的文件夹）
+
+        Returns:
+            备份信息（见 _snapshot_info），取消时返回空字典
+        """
+        with self._lock, ThreadPoolExecutor(max_workers=self.WRITE_WORKERS,
+                                            thread_name_prefix="BackupWrite") as executor:
+            start = time.perf_counter()
+            exclude = exclude or []
+            previous = self.load_latest_manifest()
+            previous_files = {(f["source"], f["path"]): f for f in previous["files"]} if previous else {}
+            known = self._known_chunks()
+
+            files = [(name, relative, path) for name, source_path in sources.items()
+                     for relative, path in self._scan_source(Path(source_path), exclude, include_hidden)]
+            total = len(files)
+
+            # 新的块在线程池中压缩和写入（zlib 和文件读写会释放 GIL），读取和分块在当前线程进行；
+            # 限制排队的块数量，避免读取速度快于写入时占用过多内存
+            slots = threading.BoundedSemaphore(self.WRITE_WORKERS * 4)
+            writes: Dict[str, Future] = {}
+
+            def submit_write(digest: str, data: bytes):
+                slots.acquire()
+                future = executor.submit(self._write_chunk, digest, data)
+                future.add_done_callback(lambda _: slots.release())
+                writes[digest] = future
+
+            entries = []
+            reused_files = read_bytes = 0
+            for done, (source, relative, path) in enumerate(files, 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    self.logger.info("备份已取消")
+                    return {}
+                try:
+                    stat = path.stat()
+                except OSError as e:
+                    self.logger.warning(f"跳过无法读取的文件: {path}: {e}")
+                    continue
+
+                old = previous_files.get((source, relative))
+                if (old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns
+                        and all(digest in known for digest in old["chunks"])):
+                    entries.append(old)
+                    reused_files += 1
+                else:
+                    chunks = []
+                    try:
+                        with open(path, "rb") as f:
+                            for data in iter_chunks(f):
+                                if throttle:
+                                    throttle(len(data))
+                                if cancel_event is not None and cancel_event.is_set():
+                                    self.logger.info("备份已取消")
+                                    return {}
+                                digest = hashlib.sha256(data).hexdigest()
+                                if digest not in known:
+                                    submit_write(digest, data)
+                                    known.add(digest)
+                                chunks.append(digest)
+                                read_bytes += len(data)
+                    except OSError as e:
+                        self.logger.warning(f"跳过无法读取的文件: {path}: {e}")
+                        continue
+                    entries.append({"source": source, "path": relative, "size": stat.st_size,
+                                    "mtime_ns": stat.st_mtime_ns, "chunks": chunks})
+
+                if progress_callback and (done % 50 == 0 or done == total):
+                    progress_callback(done, total)
+
+            # 写入失败时抛出异常，不保存清单
+            new_bytes = sum(future.result() for future in writes.values())
+
+            # 重新读取新写入的块并校验哈希，确认备份可以恢复
+            verify_start = time.perf_counter()
+            failed = [digest for digest, ok in zip(writes, executor.map(self._verify_chunk, writes)) if not ok]
+            if failed:
+                for digest in failed:
+                    self.chunk_path(digest).unlink(missing_ok=True)
+                raise IOError(f"备份校验失败: {len(failed)}个数据块写入后无法正确读取")
+            verification = {
+                "verified_time": datetime.now().isoformat(),
+                "checked_chunks": len(writes),
+                "failed_chunks": 0,
+                "elapsed": round(time.perf_counter() - verify_start, 2)
+            }
+
+            manifest = {
+                "version": self.MANIFEST_VERSION,
+                "id": self._new_snapshot_id(),
+                "label": label,
+                "created_time": datetime.now().isoformat(),
+                "sources": sorted(sources),
+                "file_sources": sorted(name for name, path in sources.items() if Path(path).is_file()),
+                "file_count": len(entries),
+                "total_size": sum(e["size"] for e in entries),
+                "reused_files": reused_files,
+                "read_bytes": read_bytes,
+                "new_chunks": len(writes),
+                "new_bytes": new_bytes,
+                "elapsed": round(time.perf_counter() - start, 2),
+                "verification": verification,
+                "files": entries
+            }
+            self._save_manifest(manifest)
+
+            self.logger.info(
+                f"备份完成: {manifest['id']}，{len(entries)}个文件，沿用{reused_files}个未变化的文件，"
+                f"新增{len(writes)}个数据块（{new_bytes}字节），用时{manifest['elapsed']}秒"
+            )
+            return self._snapshot_info(manifest)
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        """保存备份清单（先写临时文件再替换）"""
+        manifest_file = self.manifests_dir / f"{manifest['id']}.json"
+        temp = manifest_file.with_name(manifest_file.name + ".tmp")
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(temp, manifest_file)
+
+    def _verify_chunk(self, digest: str) -> bool:
+        """数据块是否存在且内容与哈希一致"""
+        try:
+            self.read_chunk(digest)
+            return True
+        except Exception as e:
+            self.logger.warning(f"数据块校验失败: {digest}: {e}")
+            return False
+
+    def verify_snapshot(self, snapshot_id: str) -> Dict[str, Any]:
+        """
+        完整校验一次备份：读取它引用的全部数据块并核对哈希，结果记录到清单的 verification 中
+
+        Returns:
+            校验结果: verified_time、checked_chunks、failed_chunks、elapsed
+        """
+        with self._lock:
+            manifest = self.load_manifest(snapshot_id)
+            if manifest is None:
+                raise FileNotFoundError(f"备份不存在: {snapshot_id}")
+
+            start = time.perf_counter()
+            digests = list({digest for entry in manifest["files"] for digest in entry["chunks"]})
+            with ThreadPoolExecutor(max_workers=self.WRITE_WORKERS, thread_name_prefix="BackupVerify") as executor:
+                failed = sum(1 for ok in executor.map(self._verify_chunk, digests) if not ok)
+
+            manifest["verification"] = {
+                "verified_time": datetime.now().isoformat(),
+                "checked_chunks": len(digests),
+                "failed_chunks": failed,
+                "elapsed": round(time.perf_counter() - start, 2)
+            }
+            self._save_manifest(manifest)
+            self.logger.info(f"校验备份 {snapshot_id}: {len(digests)}个数据块，失败{failed}个")
+            return manifest["verification"]
+
+    def _snapshot_info(self, manifest: Dict[str, Any]) -> Dict[str, Any]:
+        """备份信息（清单中除文件列表外的内容）"""
+        return {key: value for key, value in manifest.items() if key != "files"}
+
+    def load_manifest(self, snapshot_id: str) -> Optional[Dict[str, Any]]:
+        """读取备份清单"""
+        manifest_file = self.manifests_dir / f"{snapshot_id}.json"
+        if not manifest_file.exists():
+            return None
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def load_latest_manifest(self) -> Optional[Dict[str, Any]]:
+        """读取最近一次备份的清单"""
+        snapshot_ids = self.list_snapshot_ids()
+        return self.load_manifest(snapshot_ids[-1]) if snapshot_ids else None
+
+    def list_snapshot_ids(self) -> List[str]:
+        """按时间顺序列出备份ID"""
+        return sorted(p.stem for p in self.manifests_dir.glob("*.json"))
+
+    def latest_snapshot(self) -> Optional[Dict[str, Any]]:
+        """最近一次备份的信息"""
+        manifest = self.load_latest_manifest()
+        return self._snapshot_info(manifest) if manifest else None
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        """列出所有备份（最新的在前）"""
+        snapshots = []
+        for snapshot_id in reversed(self.list_snapshot_ids()):
+            try:
+                snapshots.append(self._snapshot_info(self.load_manifest(snapshot_id)))
+            except Exception as e:
+                self.logger.warning(f"读取备份清单失败: {snapshot_id}: {e}")
+        return snapshots
+
+    def restore_snapshot(self, snapshot_id: str, target_dir,
+                         progress_callback: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        将备份恢复到目标文件夹
+
+        文件夹备份源恢复到 <目标文件夹>/<备份源名称>/，文件备份源恢复到 <目标文件夹>/<文件名>。
+
+        Args:
+            snapshot_id: 备份ID
+            target_dir: 目标文件夹
+            progress_callback: 进度回调 (已恢复文件数, 总文件数)
+
+        Returns:
+            恢复的文件数量
+        """
+        manifest = self.load_manifest(snapshot_id)
+        if manifest is None:
+            raise FileNotFoundError(f"备份不存在: {snapshot_id}")
+
+        target_dir = Path(target_dir)
+        file_sources = set(manifest.get("file_sources", []))
+        total = len(manifest["files"])
+        for done, entry in enumerate(manifest["files"], 1):
+            if entry["source"] in file_sources:
+                target = target_dir / entry["path"]
+            else:
+                target = target_dir / entry["source"] / entry["path"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+
+            temp = target.with_name(target.name + ".restoring")
+            with open(temp, "wb") as f:
+                for digest in entry["chunks"]:
+                    f.write(self.read_chunk(digest))
+            os.replace(temp, target)
+            os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+            if progress_callback and (done % 50 == 0 or done == total):
+                progress_callback(done, total)
+
+        self.logger.info(f"已恢复备份 {snapshot_id}: {total}个文件 -> {target_dir}")
+        return total
+
+    def prune(self, keep: int) -> Dict[str, int]:
+        """
+        只保留最近的若干次备份，删除其余备份的清单和不再被引用的数据块
+
+        Args:
+            keep: 保留的备份数量（至少保留一次）
+
+        Returns:
+            删除的备份数量 removed_snapshots、数据块数量 removed_chunks、释放的字节数 freed_bytes
+        """
+        with self._lock:
+            snapshot_ids = self.list_snapshot_ids()
+            expired = snapshot_ids[:-max(1, keep)] if len(snapshot_ids) > max(1, keep) else []
+            result = {"removed_snapshots": 0, "removed_chunks": 0, "freed_bytes": 0}
+            if not expired:
+                return result
+
+            for snapshot_id in expired:
+                (self.manifests_dir / f"{snapshot_id}.json").unlink()
+                result["removed_snapshots"] += 1
+
+            # 清单删除后再清理数据块，中断时最多留下未被引用的块
+            referenced = set()
+            for snapshot_id in self.list_snapshot_ids():
+                for entry in self.load_manifest(snapshot_id)["files"]:
+                    referenced.update(entry["chunks"])
+
+            for subdir in self.chunks_dir.iterdir():
+                if not subdir.is_dir():
+                    continue
+                for entry in os.scandir(subdir):
+                    if entry.name not in referenced:
+                        result["freed_bytes"] += entry.stat().st_size
+                        os.unlink(entry.path)
+                        result["removed_chunks"] += 1
+
+            self.logger.info(
+                f"清理旧备份: 删除{result['removed_snapshots']}次备份、{result['removed_chunks']}个数据块，"
+                f"释放{result['freed_bytes']}字节"
+            )
+            return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """仓库统计信息"""
+        chunk_count = 0
+        stored_size = 0
+        for subdir in self.chunks_dir.iterdir():
+            if subdir.is_dir():
+                for entry in os.scandir(subdir):
+                    chunk_count += 1
+                    stored_size += entry.stat().st_size
+        return {
+            "snapshot_count": len(self.list_snapshot_ids()),
+            "chunk_count": chunk_count,
+            "stored_size": stored_size
+        }
@@ -0,0 +1,172 @@
+"""
+自动备份调度模块
+按 BACKUP_CONFIG 在程序空闲时于后台低优先级线程中增量备份当前项目，限制读取速度，并清理旧备份
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, Callable
+
+from .project_manager import ProjectManager
+from ..config import BACKUP_CONFIG
+
+
+class BackupThrottle:
+    """备份限速：限制读取速度，用户操作时暂停"""
+
+    def __init__(self, max_bytes_per_second: float, idle_check: Callable[[], bool],
+                 stop_event: threading.Event):
+        self.max_bytes_per_second = max_bytes_per_second
+        self.idle_check = idle_check
+        self.stop_event = stop_event
+        self.start = time.monotonic()
+        self.read_bytes = 0
+
+    def __call__(self, size: int):
+        self.read_bytes += size
+        if self.max_bytes_per_second > 0:
+            expected = self.read_bytes / self.max_bytes_per_second
+            delay = expected - (time.monotonic() - self.start)
+            if delay > 0:
+                self.stop_event.wait(delay)
+
+        # 用户重新开始操作时暂停，空闲后继续
+        paused = False
+        while not self.stop_event.is_set() and not self.idle_check():
+            paused = True
+            self.stop_event.wait(1)
+        if paused:
+            self.start = time.monotonic()
+            self.read_bytes = 0
+
+
+class BackupScheduler:
+    """自动备份调度类
+
+    后台线程定期检查距上次备份是否已超过 backup_interval_days，且程序空闲（一段时间内
+    没有键盘鼠标操作、没有进行中的导入）时，以较低的线程优先级创建增量备份。
+    状态通过 get_status 读取，界面线程定时刷新显示，调度线程不直接操作界面。
+    """
+
+    RETRY_DELAY = 3600  # 备份失败后多久再重试（秒）
+
+    def __init__(self, project_manager: ProjectManager, project_id: str,
+                 idle_seconds: Callable[[], float], is_busy: Optional[Callable[[], bool]] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            project_manager: 项目管理器
+            project_id: 要备份的项目ID
+            idle_seconds: 返回距离上次用户操作的秒数
+            is_busy: 返回程序是否正在执行不宜同时备份的任务（如导入）
+            config: 备份配置，默认为 BACKUP_CONFIG
+        """
+        self.logger = logging.getLogger(__name__)
+        self.project_manager = project_manager
+        self.project_id = project_id
+        self.idle_seconds = idle_seconds
+        self.is_busy = is_busy or (lambda: False)
+        self.config = dict(BACKUP_CONFIG, **(config or {}))
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._retry_time = 0.0
+        self._status_lock = threading.Lock()
+        self._status: Dict[str, Any] = {"running": False, "last_backup": None, "last_error": ""}
+
+    def start(self):
+        """启动调度线程（未开启自动备份时只读取上次备份信息）"""
+        self._load_last_backup()
+        if not self.config.get("auto_backup") or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="BackupScheduler", daemon=True)
+        self._thread.start()
+        self.logger.info(f"自动备份已启动，间隔{self.config['backup_interval_days']}天")
+
+    def stop(self, timeout: float = 5):
+        """停止调度线程，进行中的备份会被取消（不保存不完整的备份）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """当前状态: running（是否正在备份）、last_backup（上次备份信息）、last_error"""
+        with self._status_lock:
+            return dict(self._status)
+
+    def _set_status(self, **values):
+        with self._status_lock:
+            self._status.update(values)
+
+    def refresh(self):
+        """重新读取上次备份信息（手动备份后调用）"""
+        self._load_last_backup()
+
+    def _load_last_backup(self):
+        """读取上次备份信息"""
+        try:
+            repository = self.project_manager.get_backup_repository(self.project_id)
+            if repository:
+                self._set_status(last_backup=repository.latest_snapshot())
+        except Exception as e:
+            self.logger.warning(f"读取上次备份信息失败: {e}")
+
+    def is_due(self) -> bool:
+        """距上次备份是否已超过备份间隔"""
+        last_backup = self.get_status()["last_backup"]
+        if not last_backup:
+            return True
+        try:
+            last_time = datetime.fromisoformat(last_backup["created_time"])
+        except (KeyError, ValueError):
+            return True
+        return datetime.now() - last_time >= timedelta(days=self.config["backup_interval_days"])
+
+    def is_idle(self) -> bool:
+        """程序是否空闲"""
+        return self.idle_seconds() >= self.config["idle_seconds"] and not self.is_busy()
+
+    def _lower_priority(self):
+        """降低当前线程的调度优先级（Linux 上 nice 值按线程生效，其他系统忽略）"""
+        try:
+            if sys.platform.startswith("linux"):
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+        except OSError:
+            pass
+
+    def _run(self):
+        """调度线程主循环"""
+        self._lower_priority()
+        while not self._stop_event.wait(self.config["check_interval_seconds"]):
+            try:
+                if time.monotonic() < self._retry_time or not self.is_due() or not self.is_idle():
+                    continue
+                # 期间可能手动备份过，重新确认
+                self._load_last_backup()
+                if self.is_due():
+                    if not self.run_backup() and not self._stop_event.is_set():
+                        self._retry_time = time.monotonic() + self.RETRY_DELAY
+            except Exception as e:
+                self.logger.error(f"自动备份失败: {e}")
+                self._set_status(running=False, last_error=str(e))
+
+    def run_backup(self) -> bool:
+        """执行一次限速的增量备份"""
+        self._set_status(running=True)
+        throttle = BackupThrottle(self.config["max_read_mb_per_second"] * 1024 * 1024,
+                                  self.is_idle, self._stop_event)
+        success, snapshot, error_msg = self.project_manager.backup_project(
+            self.project_id, self.config.get("include_attachments", False),
+            cancel_event=self._stop_event, throttle=throttle
+        )
+        if success:
+            self._set_status(running=False, last_backup=snapshot, last_error="")
+            self.logger.info(f"自动备份完成: {snapshot['id']}")
+        else:
+            self._set_status(running=False, last_error=error_msg)
+        return success
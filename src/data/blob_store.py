@@ -0,0 +1,493 @@
+"""
+附件内容寻址存储模块
+按内容哈希保存附件对象并记录引用，相同内容的附件只保存一份
+"""
+
+import logging
+import hashlib
+import os
+import shutil
+import sqlite3
+import stat
+import sys
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional, Tuple, Dict, Any, List
+from datetime import datetime
+
+from .fast_copy import FastCopier
+
+READ_ONLY_MODE = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+WRITABLE_MODE = stat.S_IRUSR | stat.S_IWUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def unlink_file(file_path: Path):
+    """删除文件；Windows 上只读文件不能删除，先取消只读再删除"""
+    file_path = Path(file_path)
+    try:
+        file_path.unlink(missing_ok=True)
+    except PermissionError:
+        os.chmod(file_path, WRITABLE_MODE)
+        file_path.unlink(missing_ok=True)
+
+
+def remove_tree(path: Path, ignore_errors: bool = False):
+    """删除目录树，其中的只读附件先取消只读"""
+    def retry(func, failed_path, _):
+        try:
+            os.chmod(failed_path, WRITABLE_MODE)
+            func(failed_path)
+        except OSError:
+            if not ignore_errors:
+                raise
+
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=retry)
+    else:
+        shutil.rmtree(path, onerror=retry)
+
+
+class BlobStore:
+    """内容寻址附件存储类
+
+    对象保存在 <存储根目录>/.objects/<哈希前两位>/<哈希>，
+    合同文件夹中的附件通过硬链接指向对象，引用关系记录在 .objects/index.db 中。
+    对象的引用全部释放后才会被删除。
+
+    硬链接与对象共用同一份数据，对象设为只读，防止原地修改一个合同的附件时改变其他合同的附件；
+    交给外部程序编辑前用 detach 换成独立的可写副本。
+    硬链接导入方式（link）下创建的对象与用户的源文件共用数据，记录在 linked_blobs 中且始终不设只读
+    （该方式本身即允许修改源文件影响附件），之后用其他方式导入相同内容时也不会把用户的源文件变成只读。
+    """
+
+    OBJECTS_DIR_NAME = ".objects"
+    HASH_ALGORITHM = "sha256"
+    CHUNK_SIZE = 1024 * 1024  # 读取文件的块大小
+
+    def __init__(self, storage_root: Path, copier: Optional[FastCopier] = None):
+        self.logger = logging.getLogger(__name__)
+        self.storage_root = Path(storage_root)
+        self.copier = copier or FastCopier()
+        self.objects_dir = self.storage_root / self.OBJECTS_DIR_NAME
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+        self.index_file = self.objects_dir / "index.db"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_file), check_same_thread=False, timeout=30)
+        self._init_index()
+
+    def _init_index(self):
+        """初始化引用索引"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "digest TEXT PRIMARY KEY, size INTEGER NOT NULL, created_time TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS refs (path TEXT PRIMARY KEY, digest TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_refs_digest ON refs(digest)")
+            # 硬链接到源文件创建的对象（与库外的文件共用数据）
+            self._conn.execute("CREATE TABLE IF NOT EXISTS linked_blobs (digest TEXT PRIMARY KEY)")
+            # 源文件哈希缓存，同一文件再次导入时无需重新读取内容
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS hash_cache ("
+                "device INTEGER, inode INTEGER, size INTEGER, mtime_ns INTEGER, digest TEXT NOT NULL, "
+                "PRIMARY KEY (device, inode, size, mtime_ns))"
+            )
+
+    def close(self):
+        """关闭索引连接"""
+        with self._lock:
+            self._conn.close()
+
+    def _relative_key(self, file_path: Path) -> str:
+        """将附件路径转换为相对存储根目录的键"""
+        file_path = Path(file_path)
+        try:
+            return file_path.relative_to(self.storage_root).as_posix()
+        except ValueError:
+            return file_path.as_posix()
+
+    def object_path(self, digest: str) -> Path:
+        """获取对象文件路径"""
+        return self.objects_dir / digest[:2] / digest
+
+    def hash_file(self, file_path: Path) -> str:
+        """计算文件内容哈希"""
+        hasher = hashlib.new(self.HASH_ALGORITHM)
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _cache_key(file_path: Path) -> Tuple[int, int, int, int]:
+        """哈希缓存键：设备、inode、大小、修改时间"""
+        stat = os.stat(file_path)
+        return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _cached_digest(self, key: Tuple[int, int, int, int]) -> Optional[str]:
+        """查询哈希缓存"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM hash_cache WHERE device = ? AND inode = ? AND size = ? AND mtime_ns = ?", key
+            ).fetchone()
+        return row[0] if row else None
+
+    def hash_file_cached(self, file_path: Path) -> str:
+        """计算文件内容哈希，文件未变化（设备、inode、大小、修改时间相同）时使用缓存"""
+        key = self._cache_key(file_path)
+        digest = self._cached_digest(key)
+        if digest:
+            return digest
+
+        digest = self.hash_file(file_path)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO hash_cache VALUES (?, ?, ?, ?, ?)", key + (digest,))
+        return digest
+
+    def put(self, source_path: Path) -> Tuple[str, bool]:
+        """
+        将文件内容存入对象库
+
+        Args:
+            source_path: 源文件路径
+
+        Returns:
+            (内容哈希, 是否新增了对象)，内容已存在时不再复制
+        """
+        source_path = Path(source_path)
+        digest = self.hash_file_cached(source_path)
+        object_file = self.object_path(digest)
+
+        if object_file.exists():
+            self._seal(object_file)
+            return digest, False
+
+        linked = self._store(source_path, digest) == "hardlink"
+        size = object_file.stat().st_size
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO blobs (digest, size, created_time) VALUES (?, ?, ?)",
+                (digest, size, datetime.now().isoformat())
+            )
+            if linked:
+                self._conn.execute("INSERT OR IGNORE INTO linked_blobs (digest) VALUES (?)", (digest,))
+        return digest, True
+
+    def _store(self, source_path: Path, digest: str) -> str:
+        """按导入方式将源文件写入对象库，返回使用的方式（见 FastCopier.copy）"""
+        object_file = self.object_path(digest)
+        object_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = object_file.with_name(f"{digest}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            method = self.copier.copy(source_path, temp_file)
+            os.replace(temp_file, object_file)
+            self._seal(object_file)
+            self.logger.debug(f"附件对象导入方式: {method}")
+            return method
+        finally:
+            if temp_file.exists():
+                temp_file.unlink()
+
+    def _is_linked(self, digest: str) -> bool:
+        """对象是否由硬链接源文件创建（与库外的文件共用数据）"""
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM linked_blobs WHERE digest = ?", (digest,)).fetchone()
+        return row is not None
+
+    def _seal(self, object_file: Path):
+        """将对象设为只读（已有的旧对象在再次导入相同内容时补设）；与库外文件共用数据的对象除外"""
+        if self.copier.mode == "link":
+            return
+        try:
+            if (stat.S_IMODE(object_file.stat().st_mode) != READ_ONLY_MODE
+                    and not self._is_linked(object_file.name)):
+                os.chmod(object_file, READ_ONLY_MODE)
+        except OSError as e:
+            self.logger.warning(f"设置附件对象只读失败: {e}")
+
+    def ingest(self, source_path: Path) -> Dict[str, Any]:
+        """
+        将文件存入对象库但不写索引，供批量导入在线程中调用，之后用 register 一次性登记
+
+        未命中哈希缓存时按导入方式复制到临时文件并计算哈希（见 FastCopier.copy_with_hash），
+        只能普通复制时边复制边哈希；命中缓存时先确定哈希，对象已存在则不再读写数据。
+
+        Args:
+            source_path: 源文件路径
+
+        Returns:
+            {"digest": 内容哈希, "size": 字节数, "created": 是否新增对象, "cache_key": 哈希缓存键,
+             "linked": 新对象是否硬链接到源文件}
+        """
+        source_path = Path(source_path)
+        key = self._cache_key(source_path)
+        digest = self._cached_digest(key)
+
+        if digest is None:
+            temp_file = self.objects_dir / f"incoming.{uuid.uuid4().hex}.tmp"
+            try:
+                method, digest, size = self.copier.copy_with_hash(source_path, temp_file, self.HASH_ALGORITHM)
+                self.logger.debug(f"附件对象导入方式: {method}")
+                object_file = self.object_path(digest)
+                created = not object_file.exists()
+                if created:
+                    object_file.parent.mkdir(parents=True, exist_ok=True)
+                    os.replace(temp_file, object_file)
+                self._seal(object_file)
+            finally:
+                temp_file.unlink(missing_ok=True)
+            return {"digest": digest, "size": size, "created": created, "cache_key": key,
+                    "linked": created and method == "hardlink"}
+
+        created = not self.object_path(digest).exists()
+        linked = False
+        if created:
+            linked = self._store(source_path, digest) == "hardlink"
+        else:
+            self._seal(self.object_path(digest))
+        return {"digest": digest, "size": key[2], "created": created, "cache_key": key, "linked": linked}
+
+    def register(self, entries: List[Dict[str, Any]]):
+        """
+        在一个事务中登记批量导入的对象、引用和哈希缓存
+
+        Args:
+            entries: ingest 的返回值并附加 "path"（附件路径）
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO blobs (digest, size, created_time) VALUES (?, ?, ?)",
+                [(e["digest"], e["size"], now) for e in entries]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO refs (path, digest) VALUES (?, ?)",
+                [(self._relative_key(e["path"]), e["digest"]) for e in entries]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hash_cache VALUES (?, ?, ?, ?, ?)",
+                [tuple(e["cache_key"]) + (e["digest"],) for e in entries if e.get("cache_key")]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO linked_blobs (digest) VALUES (?)",
+                [(e["digest"],) for e in entries if e.get("linked")]
+            )
+
+    def link(self, digest: str, target_path: Path, register: bool = True) -> str:
+        """
+        在合同文件夹中创建指向对象的附件文件并登记引用
+
+        Args:
+            digest: 内容哈希
+            target_path: 目标附件路径
+            register: 是否立即登记引用（批量导入时由 register 统一登记）
+
+        Returns:
+            使用的方式: "hardlink" 或 "copy"（文件系统不支持硬链接时）
+        """
+        target_path = Path(target_path)
+        object_file = self.object_path(digest)
+
+        try:
+            os.link(object_file, target_path)
+            mode = "hardlink"
+        except OSError:
+            # 复制出的文件与对象互不影响，不需要只读
+            shutil.copy2(object_file, target_path)
+            os.chmod(target_path, WRITABLE_MODE)
+            mode = "copy"
+
+        if register:
+            self.add_ref(target_path, digest)
+        return mode
+
+    def add_ref(self, file_path: Path, digest: str):
+        """登记附件对对象的引用"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO refs (path, digest) VALUES (?, ?)",
+                (self._relative_key(file_path), digest)
+            )
+
+    def get_digest(self, file_path: Path) -> Optional[str]:
+        """获取附件引用的内容哈希"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM refs WHERE path = ?", (self._relative_key(file_path),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def refcount(self, digest: str) -> int:
+        """获取对象的引用数量"""
+        with self._lock:
+            row = self._conn.execute("SELECT COUNT(*) FROM refs WHERE digest = ?", (digest,)).fetchone()
+        return row[0]
+
+    def move_ref(self, old_path: Path, new_path: Path):
+        """附件移动或重命名后更新引用路径"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE refs SET path = ? WHERE path = ?",
+                (self._relative_key(new_path), self._relative_key(old_path))
+            )
+
+    def detach(self, file_path: Path) -> bool:
+        """
+        将附件换成独立的可写副本并释放引用，之后原地修改附件不会影响对象和其他合同的附件
+
+        外部程序打开附件前调用（外部程序可能直接写入原文件）。
+
+        Args:
+            file_path: 附件路径
+
+        Returns:
+            是否替换了附件文件
+        """
+        file_path = Path(file_path)
+        digest = self.get_digest(file_path)
+        try:
+            file_stat = file_path.stat()
+        except OSError:
+            return False
+
+        if file_stat.st_nlink <= 1:
+            # 已经是独立的文件（复制方式导入或已替换过），只需保证可写
+            if not file_stat.st_mode & stat.S_IWUSR:
+                os.chmod(file_path, WRITABLE_MODE)
+            if digest:
+                self.release(file_path)
+            return False
+
+        temp_file = file_path.with_name(f"{file_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            shutil.copy2(file_path, temp_file)
+            os.chmod(temp_file, WRITABLE_MODE)
+            try:
+                os.replace(temp_file, file_path)
+            except PermissionError:
+                # Windows 上不能替换只读文件；取消只读会影响同一份数据的所有链接，替换后恢复对象的只读
+                os.chmod(file_path, WRITABLE_MODE)
+                os.replace(temp_file, file_path)
+        finally:
+            temp_file.unlink(missing_ok=True)
+
+        if digest:
+            object_file = self.object_path(digest)
+            if object_file.exists():
+                self._seal(object_file)
+            self.release(file_path)
+        self.logger.info(f"附件已换成独立副本: {file_path}")
+        return True
+
+    def remove(self, file_path: Path) -> bool:
+        """
+        删除附件文件并释放引用
+
+        Returns:
+            是否删除了对象
+        """
+        file_path = Path(file_path)
+        digest = self.get_digest(file_path)
+        unlink_file(file_path)
+        if digest and self.object_path(digest).exists():
+            # Windows 上删除只读文件时取消了同一份数据的只读
+            self._seal(self.object_path(digest))
+        return self.release(file_path)
+
+    def release(self, file_path: Path) -> bool:
+        """
+        释放附件引用，对象无引用时删除对象
+
+        Args:
+            file_path: 附件路径
+
+        Returns:
+            是否删除了对象
+        """
+        key = self._relative_key(file_path)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT digest FROM refs WHERE path = ?", (key,)).fetchone()
+            if not row:
+                return False
+
+            digest = row[0]
+            self._conn.execute("DELETE FROM refs WHERE path = ?", (key,))
+            remaining = self._conn.execute(
+                "SELECT COUNT(*) FROM refs WHERE digest = ?", (digest,)
+            ).fetchone()[0]
+            if remaining:
+                return False
+
+            self._conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            self._conn.execute("DELETE FROM linked_blobs WHERE digest = ?", (digest,))
+
+        self._remove_object(digest)
+        return True
+
+    def _remove_object(self, digest: str):
+        """删除对象文件"""
+        object_file = self.object_path(digest)
+        try:
+            unlink_file(object_file)
+            if object_file.parent.is_dir() and not any(object_file.parent.iterdir()):
+                object_file.parent.rmdir()
+        except OSError as e:
+            self.logger.warning(f"删除附件对象失败: {e}")
+
+    def collect_garbage(self) -> int:
+        """
+        清理失效引用（附件文件已被直接删除）和无引用的对象
+
+        Returns:
+            删除的对象数量
+        """
+        with self._lock:
+            refs = self._conn.execute("SELECT path FROM refs").fetchall()
+
+        stale = [path for (path,) in refs if not (self.storage_root / path).exists()]
+
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM refs WHERE path = ?", [(path,) for path in stale])
+            orphans = [row[0] for row in self._conn.execute(
+                "SELECT digest FROM blobs WHERE digest NOT IN (SELECT DISTINCT digest FROM refs)"
+            ).fetchall()]
+            self._conn.executemany("DELETE FROM blobs WHERE digest = ?", [(d,) for d in orphans])
+            self._conn.executemany("DELETE FROM linked_blobs WHERE digest = ?", [(d,) for d in orphans])
+            self._conn.execute("DELETE FROM hash_cache WHERE digest NOT IN (SELECT digest FROM blobs)")
+
+        for digest in orphans:
+            self._remove_object(digest)
+
+        if stale or orphans:
+            self.logger.info(f"清理失效引用{len(stale)}个，删除无引用对象{len(orphans)}个")
+        return len(orphans)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取对象库统计信息
+
+        Returns:
+            对象数量、实际占用字节、引用数量、逻辑字节（去重前）
+        """
+        with self._lock:
+            blob_count, stored_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+            ref_count, logical_size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(blobs.size), 0) FROM refs JOIN blobs ON refs.digest = blobs.digest"
+            ).fetchone()
+
+        return {
+            "blob_count": blob_count,
+            "stored_size": stored_size,
+            "ref_count": ref_count,
+            "logical_size": logical_size,
+            "saved_size": max(logical_size - stored_size, 0)
+        }
@@ -0,0 +1,258 @@
+"""
+附件全文索引模块
+把附件中提取的文本写入本地 SQLite FTS5 倒排索引，按附件目录增量更新
+"""
+
+import logging
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Callable
+
+from .attachment_catalog import AttachmentCatalog
+from .text_extractor import can_extract, extract_text_safe
+
+
+class ContentIndex:
+    """附件全文索引类
+
+    - docs: 已索引的附件（相对路径键、合同、文件名、大小、修改时间），用于增量更新
+    - content: FTS5 全文表，rowid 与 docs.id 对应；使用 trigram 分词，
+      中文、发票号、金额等任意不少于3个字符的子串都可以走索引检索
+    文本提取在进程池中进行（PDF/docx 解析是CPU密集型的），待提取的文件很少时直接在当前线程中提取。
+    """
+
+    EXTRACT_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+    INLINE_LIMIT = 8  # 待提取文件不超过该数量时不启动进程池
+    BATCH_SIZE = 200  # 每次提交写入的文档数量
+    SNIPPET_CHARS = 80
+
+    def __init__(self, index_file: Path, storage_root: Path):
+        self.logger = logging.getLogger(__name__)
+        self.index_file = Path(index_file)
+        self.storage_root = Path(storage_root)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_file), check_same_thread=False, timeout=30)
+        self._update_thread = None
+        self._update_again = False
+        self._state_lock = threading.Lock()
+        self.trigram = False
+        self._init_schema()
+
+    @staticmethod
+    def default_index_file(catalog_dir: Path, storage_root: Path) -> Path:
+        """按存储路径生成索引文件名（与附件目录文件对应）"""
+        key = hashlib.sha1(str(Path(storage_root).resolve()).encode("utf-8")).hexdigest()[:16]
+        return Path(catalog_dir) / f"content_{key}.db"
+
+    def _init_schema(self):
+        """初始化索引表结构，SQLite 不支持 trigram 分词（3.34 以前）时使用默认分词"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                "id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, contract TEXT NOT NULL, "
+                "name TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL)"
+            )
+            row = self._conn.execute(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'content'"
+            ).fetchone()
+            if row is None:
+                try:
+                    self._conn.execute(
+                        "CREATE VIRTUAL TABLE content USING fts5(name, body, tokenize = 'trigram')"
+                    )
+                    self.trigram = True
+                except sqlite3.OperationalError:
+                    self.logger.warning("SQLite 不支持 trigram 分词，全文检索将逐条比较")
+                    self._conn.execute("CREATE VIRTUAL TABLE content USING fts5(name, body)")
+            else:
+                self.trigram = "trigram" in row[0]
+
+    def close(self):
+        """关闭索引连接"""
+        with self._lock:
+            self._conn.close()
+
+    def update(self, catalog: AttachmentCatalog,
+               progress_callback: Optional[Callable[[int, int], None]] = None,
+               cancel_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """
+        按附件目录增量更新索引：新增和修改过的附件重新提取，已删除的附件移出索引
+
+        Args:
+            catalog: 附件目录
+            progress_callback: 进度回调 (已提取数量, 待提取数量)
+            cancel_event: 取消事件（已提取的部分会保留）
+
+        Returns:
+            统计信息: added、removed、failed
+        """
+        files = {path: (contract, name, size, mtime_ns)
+                 for path, contract, name, size, mtime_ns in catalog.list_files() if can_extract(name)}
+
+        with self._lock:
+            indexed = {path: (doc_id, size, mtime_ns)
+                       for doc_id, path, size, mtime_ns in self._conn.execute("SELECT id, path, size, mtime_ns FROM docs")}
+
+        stale = [doc_id for path, (doc_id, size, mtime_ns) in indexed.items()
+                 if path not in files or (files[path][2], files[path][3]) != (size, mtime_ns)]
+        pending = [path for path, info in files.items()
+                   if path not in indexed or (info[2], info[3]) != indexed[path][1:]]
+
+        if stale:
+            with self._lock, self._conn:
+                self._conn.executemany("DELETE FROM content WHERE rowid = ?", [(i,) for i in stale])
+                self._conn.executemany("DELETE FROM docs WHERE id = ?", [(i,) for i in stale])
+
+        stats = {"added": 0, "removed": sum(1 for path in indexed if path not in files), "failed": 0}
+        if not pending:
+            return stats
+
+        total = len(pending)
+        sources = [str(self.storage_root / path) for path in pending]
+        executor = None
+        if total > self.INLINE_LIMIT:
+            # 界面进程中有多个线程和打开的数据库连接，使用 spawn 启动子进程，避免 fork 后死锁
+            executor = ProcessPoolExecutor(max_workers=min(self.EXTRACT_WORKERS, total),
+                                           mp_context=multiprocessing.get_context("spawn"))
+            results = executor.map(extract_text_safe, sources, chunksize=4)
+        else:
+            results = map(extract_text_safe, sources)
+
+        batch = []
+        try:
+            for path, (text, error) in zip(pending, results):
+                if error:
+                    # 无法解析的文件也记录下来，文件修改前不再重复提取
+                    stats["failed"] += 1
+                    self.logger.warning(f"提取附件文本失败: {path}: {error}")
+                batch.append((path, files[path], text))
+                stats["added"] += 1
+
+                if len(batch) >= self.BATCH_SIZE:
+                    self._write_batch(batch)
+                    batch = []
+                if progress_callback and (stats["added"] % 20 == 0 or stats["added"] == total):
+                    progress_callback(stats["added"], total)
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+        finally:
+            if batch:
+                self._write_batch(batch)
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        self.logger.info(
+            f"全文索引更新完成: 新增{stats['added']}个，移除{stats['removed']}个，提取失败{stats['failed']}个"
+        )
+        return stats
+
+    def _write_batch(self, batch: List[tuple]):
+        """在一个事务中写入一批文档"""
+        with self._lock, self._conn:
+            for path, (contract, name, size, mtime_ns), text in batch:
+                cursor = self._conn.execute(
+                    "INSERT INTO docs (path, contract, name, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                    (path, contract, name, size, mtime_ns)
+                )
+                self._conn.execute(
+                    "INSERT INTO content (rowid, name, body) VALUES (?, ?, ?)", (cursor.lastrowid, name, text)
+                )
+
+    def is_updating(self) -> bool:
+        """后台更新是否正在进行"""
+        return bool(self._update_thread and self._update_thread.is_alive())
+
+    def start_background_update(self, catalog: AttachmentCatalog,
+                                callback: Optional[Callable[[Dict[str, int]], None]] = None) -> bool:
+        """
+        在后台线程中更新索引；更新进行中时再次调用会在本轮结束后再更新一次
+
+        Args:
+            catalog: 附件目录
+            callback: 每轮更新完成后在后台线程中调用 callback(统计信息)
+
+        Returns:
+            是否启动了新的后台线程
+        """
+        with self._state_lock:
+            if self.is_updating():
+                self._update_again = True
+                return False
+
+            def run():
+                while True:
+                    stats = {}
+                    try:
+                        stats = self.update(catalog)
+                    except Exception as e:
+                        self.logger.warning(f"后台更新全文索引失败: {e}")
+                    if callback:
+                        callback(stats)
+                    with self._state_lock:
+                        if not self._update_again:
+                            self._update_thread = None
+                            return
+                        self._update_again = False
+
+            self._update_thread = threading.Thread(target=run, name="ContentIndex", daemon=True)
+            self._update_thread.start()
+            return True
+
+    def search(self, query: str, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        检索附件内容和文件名，多个关键词（空格分隔）需同时出现
+
+        Args:
+            query: 关键词
+            limit: 最多返回的结果数量
+
+        Returns:
+            结果列表: path、contract、name、snippet（第一个关键词附近的文本）
+        """
+        terms = query.split()
+        if not terms:
+            return []
+
+        # trigram 索引只能检索不少于3个字符的关键词，更短的关键词逐条比较
+        indexed_terms = [t for t in terms if self.trigram and len(t) >= 3]
+        like_terms = [t for t in terms if t not in indexed_terms]
+
+        conditions = []
+        params: List[Any] = [terms[0], self.SNIPPET_CHARS // 4, self.SNIPPET_CHARS]
+        if indexed_terms:
+            conditions.append("content MATCH ?")
+            params.append(" ".join('"' + t.replace('"', '""') + '"' for t in indexed_terms))
+        for term in like_terms:
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(content.body LIKE ? ESCAPE '\\' OR content.name LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        params.append(limit)
+
+        sql = (
+            "SELECT docs.path, docs.contract, docs.name, "
+            "substr(content.body, max(instr(lower(content.body), lower(?)) - ?, 1), ?) "
+            "FROM content JOIN docs ON docs.id = content.rowid "
+            f"WHERE {' AND '.join(conditions)} ORDER BY docs.contract, docs.name LIMIT ?"
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        return [
+            {"path": self.storage_root / path, "contract": contract, "name": name,
+             "snippet": (snippet or "").replace("\n", " ")}
+            for path, contract, name, snippet in rows
+        ]
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取已索引的附件数量"""
+        with self._lock:
+            doc_count = self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+        return {"doc_count": doc_count}
@@ -498,6 +498,38 @@ class DataProcessor:
             self.logger.error(f"获取统计信息失败: {e}")
             return {}
     
+    # 支持的分组字段
+    GROUP_FIELDS = ["收入主体", "客户名", "是否新增", "差异状态", "附件状态"]
+    
+    def get_group_key(self, record: IncomeRecord, field: str) -> str:
+        """
+        获取记录在指定分组字段下的分组键
+        
+        Args:
+            record: 收入记录
+            field: 分组字段
+            
+        Returns:
+            分组键
+        """
+        if field == "收入主体":
+            return record.subject_entity or "未设置"
+        elif field == "客户名":
+            return record.client_name
+        elif field == "是否新增":
+            return "新增" if record.is_new else "现有"
+        elif field == "差异状态":
+            if record.difference is None:
+                return "未确认"
+            elif record.difference == 0:
+                return "无差异"
+            else:
+                return "有差异"
+        elif field == "附件状态":
+            return "已关联" if record.attachment_count > 0 else "未关联"
+        else:
+            return "其他"
+    
     def group_by_field(self, records: List[IncomeRecord], field: str) -> Dict[str, List[IncomeRecord]]:
         """
         按字段分组记录
@@ -513,21 +545,7 @@ class DataProcessor:
             groups = {}
             
             for record in records:
-                if field == "客户名":
-                    key = record.client_name
-                elif field == "是否新增":
-                    key = "新增" if record.is_new else "现有"
-                elif field == "差异状态":
-                    if record.difference is None:
-                        key = "未确认"
-                    elif record.difference == 0:
-                        key = "无差异"
-                    else:
-                        key = "有差异"
-                elif field == "附件状态":
-                    key = "已关联" if record.attachment_count > 0 else "未关联"
-                else:
-                    key = "其他"
+                key = self.get_group_key(record, field)
                 
                 if key not in groups:
                     groups[key] = []
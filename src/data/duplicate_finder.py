@@ -0,0 +1,178 @@
+"""
+重复附件查找模块
+按 文件大小 → 首尾块哈希 → 完整哈希 逐级筛选重复附件，哈希结果缓存在附件目录中
+"""
+
+import logging
+import hashlib
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+from .attachment_catalog import AttachmentCatalog
+
+
+class DuplicateFinder:
+    """重复附件查找类
+
+    1. 从附件目录中取出大小相同的文件（不访问存储目录）
+    2. 对仍可能重复的文件并行读取首尾各一块计算哈希
+    3. 首尾块也相同的文件才完整读取计算哈希
+    已缓存的哈希（包括导入附件时计算的完整哈希）不会重复计算。
+    去重存储中硬链接到同一对象的附件只占用一份空间，不计入可回收的空间。
+    """
+
+    HASH_ALGORITHM = "sha256"
+    BLOCK_SIZE = 64 * 1024  # 首尾块大小
+    CHUNK_SIZE = 1024 * 1024  # 完整哈希的读取块大小
+    HASH_WORKERS = 8
+
+    def __init__(self, catalog: AttachmentCatalog):
+        self.logger = logging.getLogger(__name__)
+        self.catalog = catalog
+        self.storage_root = catalog.storage_root
+
+    def _partial_hash(self, file_path: Path, size: int) -> str:
+        """计算文件首尾块的哈希"""
+        hasher = hashlib.new(self.HASH_ALGORITHM)
+        with open(file_path, 'rb') as f:
+            hasher.update(f.read(self.BLOCK_SIZE))
+            if size > self.BLOCK_SIZE:
+                f.seek(max(size - self.BLOCK_SIZE, self.BLOCK_SIZE))
+                hasher.update(f.read(self.BLOCK_SIZE))
+        return hasher.hexdigest()
+
+    def _full_hash(self, file_path: Path) -> str:
+        """计算文件完整哈希"""
+        hasher = hashlib.new(self.HASH_ALGORITHM)
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def _hash_stage(self, entries: List[Dict[str, Any]], column: str, hash_func: Callable,
+                    stage: str, progress_callback, cancel_event) -> List[Dict[str, Any]]:
+        """并行计算缺少缓存的哈希并写回目录，返回成功得到哈希的条目"""
+        pending = [e for e in entries if not e[column]]
+        total = len(pending)
+        done = 0
+        computed = []
+
+        def work(entry: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], str]]:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            try:
+                return entry, hash_func(self.storage_root / entry["path"], entry["size"])
+            except OSError as e:
+                # 目录尚未同步的已删除或无法读取的文件
+                self.logger.warning(f"读取附件失败: {entry['path']}: {e}")
+                return None
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.HASH_WORKERS, thread_name_prefix="DuplicateHash") as executor:
+                for result in executor.map(work, pending):
+                    done += 1
+                    if result:
+                        entry, value = result
+                        entry[column] = value
+                        computed.append((entry["path"], value, entry["mtime_ns"]))
+                    if progress_callback and (done % 100 == 0 or done == total):
+                        progress_callback(stage, done, total)
+
+            self.catalog.set_hashes(column, computed)
+
+        return [e for e in entries if e[column]]
+
+    def find(self, progress_callback: Optional[Callable[[str, int, int], None]] = None,
+             cancel_event: Optional[threading.Event] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        查找重复附件
+
+        Args:
+            progress_callback: 进度回调 (阶段, 当前数量, 总数量)，阶段为 partial 或 full
+            cancel_event: 取消事件
+
+        Returns:
+            (重复组列表, 是否已取消)；取消时重复组只包含已比较完的文件，并不完整。
+            重复组按浪费的空间从大到小排列，每组包含:
+            digest、size、files（path/contract/name）、contracts（涉及的合同）、
+            cross_contract（是否跨合同）、copies（实际占用空间的副本数，硬链接算一份）、
+            wasted_size（多余副本占用的字节数）
+        """
+        candidates = self.catalog.get_size_collisions()
+
+        # 已有完整哈希的文件无需读取首尾块
+        need_partial = [e for e in candidates if not e["digest"]]
+        known = [e for e in candidates if e["digest"]]
+        partial_done = self._hash_stage(
+            need_partial, "partial_hash",
+            lambda path, size: self._partial_hash(path, size),
+            "partial", progress_callback, cancel_event
+        )
+
+        # 首尾块相同（或与已知完整哈希的文件大小相同）的文件才需要完整哈希
+        partial_groups = defaultdict(list)
+        for entry in partial_done:
+            partial_groups[(entry["size"], entry["partial_hash"])].append(entry)
+        known_sizes = {e["size"] for e in known}
+        need_full = [
+            e for group in partial_groups.values() for e in group
+            if len(group) > 1 or e["size"] in known_sizes
+        ]
+
+        cancelled = cancel_event is not None and cancel_event.is_set()
+        full_done = [] if cancelled else self._hash_stage(
+            need_full, "digest",
+            lambda path, size: self._full_hash(path),
+            "full", progress_callback, cancel_event
+        )
+        cancelled = cancel_event is not None and cancel_event.is_set()
+
+        duplicates = []
+        for entry_group in self._group_by_digest(known + full_done):
+            files = sorted(entry_group, key=lambda e: e["path"])
+            contracts = sorted({e["contract"] for e in files})
+            size = files[0]["size"]
+            copies = self._count_copies(files)
+            duplicates.append({
+                "digest": files[0]["digest"],
+                "size": size,
+                "files": [{"path": self.storage_root / e["path"], "contract": e["contract"], "name": e["name"]}
+                          for e in files],
+                "contracts": contracts,
+                "cross_contract": len(contracts) > 1,
+                "copies": copies,
+                "wasted_size": size * (copies - 1)
+            })
+
+        duplicates.sort(key=lambda d: d["wasted_size"], reverse=True)
+        self.logger.info(
+            f"重复附件查找{'已取消' if cancelled else '完成'}: 候选{len(candidates)}个，"
+            f"首尾块哈希{len(need_partial)}个，完整哈希{len(need_full)}个，重复组{len(duplicates)}个"
+        )
+        return duplicates, cancelled
+
+    def _count_copies(self, files: List[Dict[str, Any]]) -> int:
+        """重复文件中实际占用空间的副本数（硬链接到同一数据的文件只算一份）"""
+        inodes = set()
+        for entry in files:
+            try:
+                stat = os.stat(self.storage_root / entry["path"])
+                inodes.add((stat.st_dev, stat.st_ino))
+            except OSError:
+                inodes.add(entry["path"])
+        return len(inodes)
+
+    @staticmethod
+    def _group_by_digest(entries: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """按完整哈希分组，只返回多于一个文件的组"""
+        groups = defaultdict(list)
+        for entry in entries:
+            groups[entry["digest"]].append(entry)
+        return [group for group in groups.values() if len(group) > 1]
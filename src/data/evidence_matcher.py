@@ -0,0 +1,258 @@
+"""
+证据文件匹配模块
+用 Aho-Corasick 自动机一次扫描文件名（以及 .eml 邮件主题），把证据文件对应到合同
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from email.parser import BytesHeaderParser
+from email import policy
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Iterable, Tuple
+
+
+class AhoCorasick:
+    """Aho-Corasick 多模式匹配自动机
+
+    转移表用一个以 (状态 << 21 | 字符编码) 为键的字典保存，
+    十万级合同号时比每个状态一个字典节省大量内存。
+    """
+
+    _CHAR_BITS = 21  # Unicode 码点最多 21 位
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        self._goto: Dict[int, int] = {}
+        self._fail: List[int] = [0]
+        self._output: List[int] = [-1]  # 状态对应的模式序号，-1 表示不是模式结尾
+        self._dict_link: List[int] = [0]  # 沿失败链最近的模式结尾状态，0 表示没有
+
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        """向字典树中加入一个模式"""
+        state = 0
+        for ch in pattern:
+            key = (state << self._CHAR_BITS) | ord(ch)
+            next_state = self._goto.get(key)
+            if next_state is None:
+                next_state = len(self._fail)
+                self._goto[key] = next_state
+                self._fail.append(0)
+                self._output.append(-1)
+                self._dict_link.append(0)
+            state = next_state
+
+        if self._output[state] == -1:
+            self._output[state] = len(self.patterns)
+            self.patterns.append(pattern)
+
+    def _build(self):
+        """按广度优先计算失败指针和输出链接"""
+        children: Dict[int, List[Tuple[int, int]]] = {}
+        for key, child in self._goto.items():
+            children.setdefault(key >> self._CHAR_BITS, []).append((key & ((1 << self._CHAR_BITS) - 1), child))
+
+        queue = deque()
+        for _, child in children.get(0, []):
+            queue.append(child)
+
+        while queue:
+            state = queue.popleft()
+            for code, child in children.get(state, []):
+                queue.append(child)
+
+                fail = self._fail[state]
+                while fail and ((fail << self._CHAR_BITS) | code) not in self._goto:
+                    fail = self._fail[fail]
+                fail = self._goto.get((fail << self._CHAR_BITS) | code, 0)
+                if fail == child:
+                    fail = 0
+
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._output[fail] != -1 else self._dict_link[fail]
+
+    def search(self, text: str) -> List[Tuple[int, int]]:
+        """
+        查找文本中出现的所有模式
+
+        Returns:
+            [(起始位置, 模式序号), ...]
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        dict_link = self._dict_link
+        bits = self._CHAR_BITS
+
+        matches = []
+        state = 0
+        for pos, ch in enumerate(text):
+            code = ord(ch)
+            while True:
+                next_state = goto.get((state << bits) | code)
+                if next_state is not None:
+                    state = next_state
+                    break
+                if state == 0:
+                    break
+                state = fail[state]
+
+            hit = state if output[state] != -1 else dict_link[state]
+            while hit:
+                index = output[hit]
+                matches.append((pos - len(self.patterns[index]) + 1, index))
+                hit = dict_link[hit]
+
+        return matches
+
+
+class EvidenceMatcher:
+    """证据文件与合同的批量匹配类
+
+    匹配规则：
+    - 忽略大小写；合同号两端若是字母或数字，则文件名中相邻的字符不能也是字母或数字，
+      避免 HT2024-015 误匹配 HT2024-0153
+    - 位置重叠的多个合同号只保留最长的一个
+    - 一个文件匹配到多个不同的合同号时标记为冲突，需要人工确认
+    """
+
+    STATUS_MATCHED = "matched"
+    STATUS_CONFLICT = "conflict"
+    STATUS_UNMATCHED = "unmatched"
+
+    EMAIL_SUFFIXES = {".eml"}
+
+    def __init__(self, contract_ids: Iterable[str]):
+        self.logger = logging.getLogger(__name__)
+
+        # 规范化后的合同号 -> 原合同号
+        self._contracts: Dict[str, str] = {}
+        for contract_id in contract_ids:
+            key = self._normalize(str(contract_id).strip())
+            if key:
+                self._contracts.setdefault(key, contract_id)
+
+        self.automaton = AhoCorasick(self._contracts.keys())
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        """规范化文本（忽略大小写）"""
+        return text.upper()
+
+    @staticmethod
+    def _is_word_char(ch: str) -> bool:
+        """是否为ASCII字母或数字（中文、下划线、连字符等视为分隔）"""
+        return ch.isascii() and ch.isalnum()
+
+    def match_text(self, text: str) -> List[str]:
+        """
+        在文本中查找合同号
+
+        Args:
+            text: 文件名或邮件主题
+
+        Returns:
+            匹配到的合同号列表（按出现顺序，已去重）
+        """
+        text = self._normalize(text)
+        candidates = []
+        for start, index in self.automaton.search(text):
+            pattern = self.automaton.patterns[index]
+            end = start + len(pattern)
+
+            if self._is_word_char(pattern[0]) and start > 0 and self._is_word_char(text[start - 1]):
+                continue
+            if self._is_word_char(pattern[-1]) and end < len(text) and self._is_word_char(text[end]):
+                continue
+            candidates.append((start, end, pattern))
+
+        # 重叠时保留最长的匹配
+        candidates.sort(key=lambda c: (c[0], -(c[1] - c[0])))
+        result = []
+        last_end = -1
+        for start, end, pattern in candidates:
+            if start < last_end:
+                continue
+            last_end = end
+            contract_id = self._contracts[pattern]
+            if contract_id not in result:
+                result.append(contract_id)
+        return result
+
+    def read_email_subject(self, file_path: Path) -> str:
+        """只读取邮件头部获取主题"""
+        try:
+            with open(file_path, 'rb') as f:
+                headers = BytesHeaderParser(policy=policy.default).parse(f)
+            return str(headers.get("Subject", "") or "")
+        except Exception as e:
+            self.logger.warning(f"读取邮件主题失败: {file_path}: {e}")
+            return ""
+
+    def match_file(self, file_path: Path, include_email_subject: bool = False) -> Dict[str, Any]:
+        """
+        匹配单个文件
+
+        Returns:
+            {"path": 文件路径, "contract_ids": 匹配到的合同号, "status": 状态, "source": 匹配来源}
+        """
+        file_path = Path(file_path)
+        contract_ids = self.match_text(file_path.stem)
+        source = "文件名"
+
+        if include_email_subject and file_path.suffix.lower() in self.EMAIL_SUFFIXES:
+            subject_ids = self.match_text(self.read_email_subject(file_path))
+            if subject_ids:
+                source = "邮件主题" if not contract_ids else "文件名+邮件主题"
+                contract_ids += [c for c in subject_ids if c not in contract_ids]
+
+        if not contract_ids:
+            status = self.STATUS_UNMATCHED
+            source = ""
+        elif len(contract_ids) == 1:
+            status = self.STATUS_MATCHED
+        else:
+            status = self.STATUS_CONFLICT
+
+        return {"path": file_path, "contract_ids": contract_ids, "status": status, "source": source}
+
+    def scan_folder(self, folder: str, include_email_subject: bool = False,
+                    progress_callback: Optional[Callable[[int], None]] = None,
+                    cancel_event: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+        """
+        扫描文件夹（含子文件夹）中的全部文件并匹配合同
+
+        Args:
+            folder: 证据文件夹
+            include_email_subject: 是否同时匹配 .eml 邮件主题
+            progress_callback: 进度回调 (已扫描文件数)
+            cancel_event: 取消事件
+
+        Returns:
+            每个文件的匹配结果，见 match_file
+        """
+        results = []
+        for dir_path, dir_names, file_names in os.walk(folder):
+            # 跳过隐藏目录
+            dir_names[:] = [d for d in dir_names if not d.startswith(".")]
+            if cancel_event is not None and cancel_event.is_set():
+                break
+
+            for name in file_names:
+                if name.startswith("."):
+                    continue
+                results.append(self.match_file(Path(dir_path) / name, include_email_subject))
+
+            if progress_callback:
+                progress_callback(len(results))
+
+        matched = sum(1 for r in results if r["status"] == self.STATUS_MATCHED)
+        conflicts = sum(1 for r in results if r["status"] == self.STATUS_CONFLICT)
+        self.logger.info(f"证据文件匹配完成: 共{len(results)}个文件，匹配{matched}个，冲突{conflicts}个")
+        return results
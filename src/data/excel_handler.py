@@ -3,23 +3,52 @@ Excel文件处理模块
 负责Excel文件的导入、导出、列映射等功能
 """
 
+import csv
+import json
+import codecs
 import logging
-import pandas as pd
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
-from decimal import Decimal
+from typing import Dict, List, Optional, Tuple, Any, Callable, Iterable, TYPE_CHECKING
+from decimal import Decimal, InvalidOperation
 from datetime import datetime
 
+from .data_processor import DataProcessor
 from ..models.income_record import IncomeRecord
-from ..config import TABLE_COLUMNS, IMPORT_CONFIG, SUPPORTED_EXCEL_FORMATS
+from ..config import TABLE_COLUMNS, IMPORT_CONFIG, SUPPORTED_EXCEL_FORMATS, SUPPORTED_CSV_FORMATS, SUPPORTED_EXPORT_FORMATS
+
+# pandas 导入较慢，只在读取文件时导入（启动和浏览数据时不需要）
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class ExcelHandler:
     """Excel文件处理类"""
     
+    # 导入时会读取的标准列名
+    STANDARD_COLUMNS = ['合同号', '客户名', '本年确认的收入', '收入主体', '附件确认的收入']
+    
+    # 按文本读取的标准列，避免合同号等被解析成数字
+    TEXT_COLUMNS = ['合同号', '客户名', '收入主体']
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
     
+    @staticmethod
+    def parse_amount(value: Any) -> Decimal:
+        """
+        将单元格中的金额转换为Decimal
+        
+        CSV等文本文件中的金额按文本读取（如 "1,000.50"），去掉千分位分隔符和空白后再转换。
+        无法转换时抛出 decimal.InvalidOperation。
+        """
+        if isinstance(value, str):
+            value = "".join(value.split()).replace(",", "").replace("，", "")
+        amount = Decimal(str(value))
+        if not amount.is_finite():
+            raise InvalidOperation(f"无效金额: {value}")
+        return amount
+    
     def import_excel(self, file_path: str, sheet_name: Optional[str] = None, 
                     column_mapping: Optional[Dict[str, str]] = None) -> List[IncomeRecord]:
         """
@@ -34,7 +63,7 @@ class ExcelHandler:
             导入的记录列表
         """
         try:
-            success, df, error_msg = self.read_excel_file(file_path, sheet_name)
+            success, df, error_msg = self.read_data_file(file_path, sheet_name, column_mapping)
             if not success:
                 self.logger.error(f"读取Excel失败: {error_msg}")
                 return []
@@ -53,18 +82,26 @@ class ExcelHandler:
     def export_excel(self, records: List[IncomeRecord], file_path: str, 
                     sheet_name: str = "收入数据") -> bool:
         """
-        简化的Excel导出方法
+        简化的导出方法，按文件扩展名选择Excel、CSV、JSON Lines、Parquet或Feather格式
         
         Args:
             records: 要导出的记录列表
             file_path: 导出文件路径
-            sheet_name: 工作表名称
+            sheet_name: 工作表名称（仅Excel格式使用）
             
         Returns:
             是否导出成功
         """
         try:
-            success, error_msg = self.export_to_excel(records, file_path, sheet_name)
+            suffix = Path(file_path).suffix.lower()
+            if suffix == ".csv":
+                success, error_msg = self.export_to_csv(records, file_path)
+            elif suffix == ".jsonl":
+                success, error_msg = self.export_to_jsonl(records, file_path)
+            elif suffix in (".parquet", ".feather"):
+                success, error_msg = self.export_to_arrow(records, file_path)
+            else:
+                success, error_msg = self.export_to_excel(records, file_path, sheet_name)
             if not success:
                 self.logger.error(f"导出Excel失败: {error_msg}")
             
@@ -74,14 +111,45 @@ class ExcelHandler:
             self.logger.error(f"导出Excel文件失败: {e}")
             return False
     
-    def read_excel_file(self, file_path: str, sheet_name: Optional[str] = None) -> Tuple[bool, pd.DataFrame, str]:
+    def is_csv_file(self, file_path: str) -> bool:
+        """判断是否为CSV等分隔文本文件"""
+        return Path(file_path).suffix.lower() in SUPPORTED_CSV_FORMATS
+    
+    def read_data_file(self, file_path: str, sheet_name: Optional[str] = None,
+                       column_mapping: Optional[Dict[str, str]] = None,
+                       progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Tuple[bool, "pd.DataFrame", str]:
+        """
+        读取导入数据文件，按扩展名选择Excel或CSV读取方式
+        
+        Args:
+            file_path: 文件路径
+            sheet_name: 工作表名称（CSV文件忽略）
+            column_mapping: 列映射字典，CSV文件只读取映射涉及的列
+            progress_callback: 进度回调 (阶段, 已读取行数, 预计总行数)
+            cancel_event: 取消事件
+            
+        Returns:
+            (是否成功, 数据表, 错误信息)
+        """
+        if self.is_csv_file(file_path):
+            return self.read_csv_file(file_path, column_mapping, progress_callback=progress_callback,
+                                      cancel_event=cancel_event)
+        return self.read_excel_file(file_path, sheet_name)
+    
+    def read_excel_file(self, file_path: str, sheet_name: Optional[str] = None) -> Tuple[bool, "pd.DataFrame", str]:
         """读取Excel文件"""
+        import pandas as pd
+        
         try:
             file_path = Path(file_path)
             
             if not file_path.exists():
                 return False, pd.DataFrame(), "文件不存在"
             
+            if file_path.suffix.lower() in SUPPORTED_CSV_FORMATS:
+                return self.read_csv_file(str(file_path))
+            
             if file_path.suffix.lower() not in SUPPORTED_EXCEL_FORMATS:
                 return False, pd.DataFrame(), f"不支持的文件格式: {file_path.suffix}"
             
@@ -104,9 +172,175 @@ class ExcelHandler:
             self.logger.error(error_msg)
             return False, pd.DataFrame(), error_msg
     
+    def detect_csv_encoding(self, file_path: str) -> str:
+        """
+        探测CSV文件编码
+        
+        Args:
+            file_path: 文件路径
+            
+        Returns:
+            编码名称
+        """
+        sniff_bytes = IMPORT_CONFIG["csv_sniff_bytes"]
+        with open(file_path, 'rb') as f:
+            sample = f.read(sniff_bytes)
+        
+        if sample.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+            return "utf-16"
+        
+        # 截掉可能不完整的最后一行，避免多字节字符被截断
+        if len(sample) == sniff_bytes:
+            last_newline = sample.rfind(b"\n")
+            if last_newline > 0:
+                sample = sample[:last_newline]
+        
+        for encoding in IMPORT_CONFIG["csv_encodings"]:
+            try:
+                sample.decode(encoding)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        
+        return IMPORT_CONFIG["csv_encodings"][-1]
+    
+    def detect_csv_delimiter(self, file_path: str, encoding: str) -> str:
+        """
+        探测CSV文件分隔符
+        
+        Args:
+            file_path: 文件路径
+            encoding: 文件编码
+            
+        Returns:
+            分隔符
+        """
+        default = "\t" if Path(file_path).suffix.lower() == ".tsv" else ","
+        try:
+            with open(file_path, 'r', encoding=encoding, errors='replace', newline='') as f:
+                sample = f.read(IMPORT_CONFIG["csv_sniff_bytes"])
+            
+            dialect = csv.Sniffer().sniff(sample, delimiters=IMPORT_CONFIG["csv_delimiters"])
+            return dialect.delimiter
+        except csv.Error:
+            return default
+    
+    def get_csv_projection(self, columns: List[str], 
+                           column_mapping: Optional[Dict[str, str]] = None) -> Tuple[List[str], List[str]]:
+        """
+        计算CSV导入需要读取的列
+        
+        Args:
+            columns: 文件中的全部列名
+            column_mapping: 列映射字典
+            
+        Returns:
+            (需要读取的列, 需要按文本读取的列)
+        """
+        import pandas as pd
+        
+        if column_mapping is None:
+            column_mapping = {
+                col: target for col, target in 
+                zip(columns, self.map_column_names(pd.DataFrame(columns=columns)).columns)
+                if target != col
+            }
+        
+        target_of = {col: column_mapping.get(col, col) for col in columns}
+        used_columns = [col for col in columns if target_of[col] in self.STANDARD_COLUMNS]
+        text_columns = [col for col in used_columns if target_of[col] in self.TEXT_COLUMNS]
+        return used_columns, text_columns
+    
+    def read_csv_file(self, file_path: str, column_mapping: Optional[Dict[str, str]] = None,
+                      nrows: Optional[int] = None,
+                      progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Tuple[bool, "pd.DataFrame", str]:
+        """
+        分块读取CSV等分隔文本文件
+        
+        Args:
+            file_path: 文件路径
+            column_mapping: 列映射字典，指定时只读取导入需要的列
+            nrows: 最多读取的行数（用于预览，预览时读取全部列）
+            progress_callback: 进度回调 (阶段, 已读取行数, 预计总行数)
+            cancel_event: 取消事件
+            
+        Returns:
+            (是否成功, 数据表, 错误信息)
+        """
+        import pandas as pd
+        
+        try:
+            file_path = Path(file_path)
+            
+            if not file_path.exists():
+                return False, pd.DataFrame(), "文件不存在"
+            
+            encoding = self.detect_csv_encoding(str(file_path))
+            delimiter = self.detect_csv_delimiter(str(file_path), encoding)
+            
+            if nrows is not None:
+                df = pd.read_csv(file_path, sep=delimiter, encoding=encoding, nrows=nrows, index_col=False)
+                return True, df, ""
+            
+            # 先读取表头，只解析导入需要的列
+            header = pd.read_csv(file_path, sep=delimiter, encoding=encoding, nrows=0, index_col=False)
+            used_columns, text_columns = self.get_csv_projection(list(header.columns), column_mapping)
+            if not used_columns:
+                used_columns = list(header.columns)
+            
+            file_size = file_path.stat().st_size
+            max_rows = IMPORT_CONFIG["max_rows"]
+            chunks = []
+            row_count = 0
+            
+            with open(file_path, 'rb') as f:
+                reader = pd.read_csv(
+                    f, sep=delimiter, encoding=encoding, index_col=False,
+                    usecols=used_columns,
+                    dtype={col: str for col in text_columns},
+                    chunksize=IMPORT_CONFIG["csv_chunk_size"]
+                )
+                for chunk in reader:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return False, pd.DataFrame(), "导入已取消"
+                    
+                    chunks.append(chunk)
+                    row_count += len(chunk)
+                    
+                    if row_count > max_rows:
+                        return False, pd.DataFrame(), f"文件行数超过限制({max_rows}行)"
+                    
+                    if progress_callback:
+                        # 按已读取字节比例估算总行数
+                        position = f.tell()
+                        estimated_total = int(row_count * file_size / position) if position else 0
+                        progress_callback("parse", row_count, max(estimated_total, row_count))
+            
+            if not chunks or row_count == 0:
+                return False, pd.DataFrame(), "文件为空"
+            
+            df = pd.concat(chunks, ignore_index=True)
+            
+            self.logger.info(f"成功读取CSV文件: {file_path}, 编码{encoding}, 共{len(df)}行数据")
+            return True, df, ""
+            
+        except Exception as e:
+            error_msg = f"读取CSV文件失败: {str(e)}"
+            self.logger.error(error_msg)
+            return False, pd.DataFrame(), error_msg
+    
     def get_sheet_names(self, file_path: str) -> Tuple[bool, List[str], str]:
         """获取Excel文件的工作表名称列表"""
+        import pandas as pd
+        
         try:
+            # CSV文件只有一个数据表，使用文件名作为工作表名
+            if self.is_csv_file(file_path):
+                return True, [Path(file_path).stem], ""
+            
             excel_file = pd.ExcelFile(file_path)
             sheet_names = excel_file.sheet_names
             return True, sheet_names, ""
@@ -115,7 +349,7 @@ class ExcelHandler:
             self.logger.error(error_msg)
             return False, [], error_msg
     
-    def map_column_names(self, df: pd.DataFrame) -> pd.DataFrame:
+    def map_column_names(self, df: "pd.DataFrame") -> "pd.DataFrame":
         """映射列名到标准格式"""
         try:
             # 创建列名映射字典
@@ -157,9 +391,24 @@ class ExcelHandler:
             self.logger.error(f"列名映射失败: {e}")
             return df
     
-    def dataframe_to_income_records(self, df: pd.DataFrame, 
-                                   column_mapping: Optional[Dict[str, str]] = None) -> Tuple[bool, List[IncomeRecord], str]:
-        """将DataFrame转换为IncomeRecord对象列表"""
+    def dataframe_to_income_records(self, df: "pd.DataFrame", 
+                                   column_mapping: Optional[Dict[str, str]] = None,
+                                   progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                                   cancel_event: Optional[threading.Event] = None) -> Tuple[bool, List[IncomeRecord], str]:
+        """
+        将DataFrame转换为IncomeRecord对象列表
+        
+        Args:
+            df: 数据表
+            column_mapping: 列映射字典
+            progress_callback: 进度回调 (阶段, 当前行数, 总行数)
+            cancel_event: 取消事件，设置后中止转换
+            
+        Returns:
+            (是否成功, 记录列表, 错误信息)
+        """
+        import pandas as pd
+        
         try:
             # 应用列映射
             if column_mapping:
@@ -181,23 +430,44 @@ class ExcelHandler:
                 error_msg = f"缺少必需的列: {missing_columns}\n可用的列: {list(df.columns)}"
                 return False, [], error_msg
             
-            for index, row in df.iterrows():
+            total_rows = len(df)
+            
+            # 按列取值后逐行组合，避免iterrows逐行构造Series的开销
+            def column_values(column: str) -> List[Any]:
+                if column in df.columns:
+                    return df[column].tolist()
+                return [None] * total_rows
+            
+            rows = zip(
+                df.index.tolist(),
+                column_values("合同号"),
+                column_values("客户名"),
+                column_values("本年确认的收入"),
+                column_values("收入主体"),
+                column_values("附件确认的收入")
+            )
+            
+            for position, (index, contract_id_raw, client_name_raw, annual_income,
+                           subject_entity_raw, attachment_income) in enumerate(rows):
+                # 每处理1000行检查取消并报告进度
+                if position % 1000 == 0 and position > 0:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return False, [], "导入已取消"
+                    if progress_callback:
+                        progress_callback("convert", position, total_rows)
+                
                 try:
                     # 更安全地获取字段值
-                    contract_id_raw = row.get("合同号")
                     if pd.isna(contract_id_raw) or contract_id_raw is None:
                         contract_id = ""
                     else:
                         contract_id = str(contract_id_raw).strip()
                     
-                    client_name_raw = row.get("客户名")
                     if pd.isna(client_name_raw) or client_name_raw is None:
                         client_name = ""
                     else:
                         client_name = str(client_name_raw).strip()
                     
-                    annual_income = row.get("本年确认的收入")
-                    
                     if not contract_id or contract_id == "nan":
                         error_rows.append(f"第{index+2}行: 合同号为空")
                         continue
@@ -206,30 +476,29 @@ class ExcelHandler:
                         error_rows.append(f"第{index+2}行: 客户名为空")
                         continue
                     
-                    if pd.isna(annual_income) or annual_income == "" or annual_income is None:
+                    if pd.isna(annual_income) or annual_income is None or str(annual_income).strip() == "":
                         error_rows.append(f"第{index+2}行: 本年确认的收入为空")
                         continue
                     
                     try:
-                        annual_income = Decimal(str(annual_income))
-                    except (ValueError, TypeError):
+                        annual_income = self.parse_amount(annual_income)
+                    except (InvalidOperation, ValueError, TypeError):
                         error_rows.append(f"第{index+2}行: 本年确认的收入格式错误")
                         continue
                     
                     # 获取收入主体
-                    subject_entity_raw = row.get("收入主体", "")
                     if pd.isna(subject_entity_raw) or subject_entity_raw is None:
                         subject_entity = ""
                     else:
                         subject_entity = str(subject_entity_raw).strip()
                     
                     # 获取附件确认的收入
-                    attachment_income = row.get("附件确认的收入")
                     attachment_confirmed_income = None
-                    if attachment_income is not None and not pd.isna(attachment_income):
+                    if (attachment_income is not None and not pd.isna(attachment_income)
+                            and str(attachment_income).strip() != ""):
                         try:
-                            attachment_confirmed_income = Decimal(str(attachment_income))
-                        except (ValueError, TypeError):
+                            attachment_confirmed_income = self.parse_amount(attachment_income)
+                        except (InvalidOperation, ValueError, TypeError):
                             pass  # 附件收入不是必需字段，忽略转换错误
                     
                     record = IncomeRecord(
@@ -246,6 +515,9 @@ class ExcelHandler:
                 except Exception as e:
                     error_rows.append(f"第{index+2}行: 处理失败 - {str(e)}")
             
+            if progress_callback:
+                progress_callback("convert", total_rows, total_rows)
+            
             if error_rows:
                 error_summary = f"共 {len(error_rows)} 行处理失败"
                 if not records:
@@ -264,26 +536,410 @@ class ExcelHandler:
             self.logger.error(error_msg)
             return False, [], error_msg
     
+    # 导出列定义：(列名, 取值函数, 数字格式, 列宽)
+    EXPORT_COLUMNS: List[Tuple[str, Callable[[IncomeRecord], Any], Optional[str], int]] = [
+        ("合同号", lambda r: r.contract_id, None, 18),
+        ("客户名", lambda r: r.client_name, None, 28),
+        ("收入主体", lambda r: r.subject_entity, None, 20),
+        ("本年确认的收入", lambda r: float(r.annual_confirmed_income), "#,##0.00", 16),
+        ("附件确认的收入", lambda r: float(r.attachment_confirmed_income) 
+            if r.attachment_confirmed_income is not None else None, "#,##0.00", 16),
+        ("差异", lambda r: float(r.difference) if r.difference is not None else None, "#,##0.00", 14),
+        ("差异备注", lambda r: r.difference_note, None, 30),
+        ("附件数量", lambda r: r.attachment_count, "0", 10),
+        ("导入时间", lambda r: r.import_time.strftime("%Y-%m-%d %H:%M:%S"), None, 20),
+        ("变化标识", lambda r: r.change_status, None, 16),
+        ("版本", lambda r: r.version, "0", 8)
+    ]
+    
+    # Excel单个工作表的最大行数（含表头）
+    EXCEL_MAX_ROWS = 1048576
+    
+    def export_headers(self) -> List[str]:
+        """获取导出列名"""
+        return [name for name, _, _, _ in self.EXPORT_COLUMNS]
+    
+    def record_to_row(self, record: IncomeRecord) -> List[Any]:
+        """将记录转换为导出行"""
+        return [getter(record) for _, getter, _, _ in self.EXPORT_COLUMNS]
+    
+    def _create_export_sheet(self, workbook, sheet_name: str):
+        """创建只写模式工作表并写入表头"""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+        from openpyxl.utils import get_column_letter
+        
+        worksheet = workbook.create_sheet(title=sheet_name[:31])
+        for index, (_, _, _, width) in enumerate(self.EXPORT_COLUMNS, start=1):
+            worksheet.column_dimensions[get_column_letter(index)].width = width
+        worksheet.freeze_panes = "A2"
+        
+        header_font = Font(bold=True)
+        header_cells = []
+        for name in self.export_headers():
+            cell = WriteOnlyCell(worksheet, value=name)
+            cell.font = header_font
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+        return worksheet
+    
+    def _write_record_rows(self, workbook, worksheet, sheet_name: str, records: Iterable[IncomeRecord],
+                           progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                           total: int = 0) -> Tuple[Any, int]:
+        """
+        将记录逐行写入只写工作表，超过Excel行数上限时自动续写到新工作表
+        
+        Returns:
+            (最后写入的工作表, 写入的记录数)
+        """
+        from openpyxl.cell import WriteOnlyCell
+        
+        # 金额等数字列使用带格式的单元格，其余列直接写值
+        formatted_columns = [
+            (index, number_format) for index, (_, _, number_format, _) in enumerate(self.EXPORT_COLUMNS)
+            if number_format
+        ]
+        
+        written = 0
+        sheet_rows = 1
+        sheet_index = 1
+        for record in records:
+            if sheet_rows >= self.EXCEL_MAX_ROWS:
+                sheet_index += 1
+                worksheet = self._create_export_sheet(workbook, f"{sheet_name[:28]}_{sheet_index}")
+                sheet_rows = 1
+            
+            row = self.record_to_row(record)
+            for index, number_format in formatted_columns:
+                if row[index] is not None:
+                    cell = WriteOnlyCell(worksheet, value=row[index])
+                    cell.number_format = number_format
+                    row[index] = cell
+            worksheet.append(row)
+            
+            sheet_rows += 1
+            written += 1
+            if progress_callback and written % 10000 == 0:
+                progress_callback("export", written, total)
+        
+        return worksheet, written
+    
     def export_to_excel(self, records: List[IncomeRecord], file_path: str, 
-                       sheet_name: str = "收入数据") -> Tuple[bool, str]:
-        """导出数据到Excel文件"""
+                       sheet_name: str = "收入数据",
+                       progress_callback: Optional[Callable[[str, int, int], None]] = None) -> Tuple[bool, str]:
+        """
+        流式导出数据到Excel文件
+        
+        使用openpyxl只写模式逐行写入，内存占用与记录数无关
+        
+        Args:
+            records: 要导出的记录列表
+            file_path: 导出文件路径
+            sheet_name: 工作表名称
+            progress_callback: 进度回调 (阶段, 已导出数量, 总数量)
+            
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            from openpyxl import Workbook
+            
+            if not records:
+                return False, "没有数据可导出"
+            
+            file_path = Path(file_path)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            workbook = Workbook(write_only=True)
+            worksheet = self._create_export_sheet(workbook, sheet_name)
+            _, written = self._write_record_rows(workbook, worksheet, sheet_name, records,
+                                                 progress_callback, len(records))
+            workbook.save(file_path)
+            
+            self.logger.info(f"成功导出{written}条记录到: {file_path}")
+            return True, ""
+            
+        except Exception as e:
+            error_msg = f"导出Excel文件失败: {str(e)}"
+            self.logger.error(error_msg)
+            return False, error_msg
+    
+    # 分组汇总表列定义：(列名, 数字格式, 列宽)
+    GROUP_SUMMARY_COLUMNS = [
+        ("分组", None, 28),
+        ("记录数", "0", 10),
+        ("本年确认的收入合计", "#,##0.00", 20),
+        ("附件确认的收入合计", "#,##0.00", 20),
+        ("差异合计", "#,##0.00", 16),
+        ("有差异记录数", "0", 14),
+        ("有附件记录数", "0", 14),
+        ("证据获取比例(%)", "0.00", 16)
+    ]
+    
+    def _unique_sheet_name(self, name: str, used_names: set) -> str:
+        """生成合法且不重复的工作表名称"""
+        clean_name = str(name)
+        for char in '[]:*?/\\':
+            clean_name = clean_name.replace(char, '_')
+        clean_name = clean_name.strip("'") or "未命名"
+        
+        candidate = clean_name[:31]
+        counter = 1
+        while candidate.lower() in used_names:
+            suffix = f"_{counter}"
+            candidate = f"{clean_name[:31 - len(suffix)]}{suffix}"
+            counter += 1
+        
+        used_names.add(candidate.lower())
+        return candidate
+    
+    def export_grouped_excel(self, records: List[IncomeRecord], file_path: str, group_field: str,
+                             progress_callback: Optional[Callable[[str, int, int], None]] = None) -> Tuple[bool, str]:
+        """
+        分组导出到Excel：每个分组一个工作表，最后附加分组汇总表
+        
+        按DataProcessor.group_by_field的分组规则一次划分，各分组依次流式写入只写工作表，
+        汇总数据在写入时同步累计，不再重复扫描记录
+        
+        Args:
+            records: 要导出的记录列表（当前筛选结果）
+            file_path: 导出文件路径
+            group_field: 分组字段，见DataProcessor.GROUP_FIELDS
+            progress_callback: 进度回调 (阶段, 已导出数量, 总数量)
+            
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            from openpyxl import Workbook
+            from openpyxl.cell import WriteOnlyCell
+            from openpyxl.styles import Font
+            from openpyxl.utils import get_column_letter
+            
+            if not records:
+                return False, "没有数据可导出"
+            
+            groups = DataProcessor().group_by_field(records, group_field)
+            if not groups:
+                return False, "分组失败"
+            
+            file_path = Path(file_path)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            workbook = Workbook(write_only=True)
+            used_names = set()
+            summary_rows = []
+            written_total = 0
+            
+            for group_key in sorted(groups.keys()):
+                group_records = groups[group_key]
+                
+                # 写入记录时同步累计汇总数据
+                totals = {"annual": Decimal(0), "attachment": Decimal(0), "difference": Decimal(0),
+                          "with_difference": 0, "with_files": 0}
+                
+                def accumulate(group_records=group_records, totals=totals):
+                    for record in group_records:
+                        totals["annual"] += record.annual_confirmed_income
+                        if record.attachment_confirmed_income is not None:
+                            totals["attachment"] += record.attachment_confirmed_income
+                            totals["difference"] += record.difference
+                            if record.difference != 0:
+                                totals["with_difference"] += 1
+                        if record.attachment_count > 0:
+                            totals["with_files"] += 1
+                        yield record
+                
+                sheet_name = self._unique_sheet_name(group_key, used_names)
+                worksheet = self._create_export_sheet(workbook, sheet_name)
+                _, written = self._write_record_rows(workbook, worksheet, sheet_name, accumulate())
+                
+                # 续写工作表的名称也需要登记，避免与其他分组重名
+                for extra_index in range(2, (written // (self.EXCEL_MAX_ROWS - 1)) + 2):
+                    used_names.add(f"{sheet_name[:28]}_{extra_index}".lower())
+                
+                written_total += written
+                if progress_callback:
+                    progress_callback("export", written_total, len(records))
+                
+                evidence_ratio = (
+                    float(totals["attachment"] / totals["annual"] * 100)
+                    if totals["annual"] > 0 else 0.0
+                )
+                summary_rows.append([
+                    str(group_key), written, float(totals["annual"]), float(totals["attachment"]),
+                    float(totals["difference"]), totals["with_difference"], totals["with_files"],
+                    round(evidence_ratio, 2)
+                ])
+            
+            # 汇总表
+            summary_sheet = workbook.create_sheet(title=self._unique_sheet_name("汇总", used_names))
+            for index, (_, _, width) in enumerate(self.GROUP_SUMMARY_COLUMNS, start=1):
+                summary_sheet.column_dimensions[get_column_letter(index)].width = width
+            summary_sheet.freeze_panes = "A2"
+            
+            header_font = Font(bold=True)
+            header_cells = []
+            for name, _, _ in self.GROUP_SUMMARY_COLUMNS:
+                cell = WriteOnlyCell(summary_sheet, value=name)
+                cell.font = header_font
+                header_cells.append(cell)
+            summary_sheet.append(header_cells)
+            
+            total_annual = sum(row[2] for row in summary_rows)
+            total_attachment = sum(row[3] for row in summary_rows)
+            total_row = [
+                "合计", written_total, total_annual, total_attachment,
+                sum(row[4] for row in summary_rows),
+                sum(row[5] for row in summary_rows),
+                sum(row[6] for row in summary_rows),
+                round(total_attachment / total_annual * 100, 2) if total_annual > 0 else 0.0
+            ]
+            
+            for row_values, is_total in [(row, False) for row in summary_rows] + [(total_row, True)]:
+                cells = []
+                for value, (_, number_format, _) in zip(row_values, self.GROUP_SUMMARY_COLUMNS):
+                    cell = WriteOnlyCell(summary_sheet, value=value)
+                    if number_format:
+                        cell.number_format = number_format
+                    if is_total:
+                        cell.font = header_font
+                    cells.append(cell)
+                summary_sheet.append(cells)
+            
+            workbook.save(file_path)
+            
+            self.logger.info(f"成功按{group_field}分组导出{written_total}条记录({len(groups)}个分组)到: {file_path}")
+            return True, ""
+            
+        except Exception as e:
+            error_msg = f"分组导出Excel文件失败: {str(e)}"
+            self.logger.error(error_msg)
+            return False, error_msg
+    
+    def get_export_formats(self) -> Dict[str, str]:
+        """获取当前环境可用的导出格式（扩展名 -> 名称）"""
+        formats = dict(SUPPORTED_EXPORT_FORMATS)
+        if not self.is_arrow_available():
+            formats.pop(".parquet", None)
+            formats.pop(".feather", None)
+        return formats
+    
+    def is_arrow_available(self) -> bool:
+        """检查是否安装了pyarrow"""
+        try:
+            import pyarrow  # noqa: F401
+            return True
+        except ImportError:
+            return False
+    
+    def export_to_csv(self, records: List[IncomeRecord], file_path: str) -> Tuple[bool, str]:
+        """
+        导出数据到CSV文件
+        
+        使用带BOM的UTF-8编码，Excel可直接打开
+        
+        Args:
+            records: 要导出的记录列表
+            file_path: 导出文件路径
+            
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            if not records:
+                return False, "没有数据可导出"
+            
+            file_path = Path(file_path)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            with open(file_path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(self.export_headers())
+                writer.writerows(self.record_to_row(record) for record in records)
+            
+            self.logger.info(f"成功导出{len(records)}条记录到CSV: {file_path}")
+            return True, ""
+            
+        except Exception as e:
+            error_msg = f"导出CSV文件失败: {str(e)}"
+            self.logger.error(error_msg)
+            return False, error_msg
+    
+    def export_to_jsonl(self, records: List[IncomeRecord], file_path: str) -> Tuple[bool, str]:
+        """
+        导出数据到JSON Lines文件，每行一条记录
+        
+        Args:
+            records: 要导出的记录列表
+            file_path: 导出文件路径
+            
+        Returns:
+            (是否成功, 错误信息)
+        """
         try:
             if not records:
                 return False, "没有数据可导出"
             
-            data = [record.to_dict() for record in records]
-            df = pd.DataFrame(data)
+            file_path = Path(file_path)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            
+            headers = self.export_headers()
+            with open(file_path, 'w', encoding='utf-8', newline='\n') as f:
+                for record in records:
+                    f.write(json.dumps(dict(zip(headers, self.record_to_row(record))), ensure_ascii=False))
+                    f.write("\n")
+            
+            self.logger.info(f"成功导出{len(records)}条记录到JSON Lines: {file_path}")
+            return True, ""
+            
+        except Exception as e:
+            error_msg = f"导出JSON Lines文件失败: {str(e)}"
+            self.logger.error(error_msg)
+            return False, error_msg
+    
+    def export_to_arrow(self, records: List[IncomeRecord], file_path: str) -> Tuple[bool, str]:
+        """
+        导出数据到Parquet或Feather文件（需要pyarrow）
+        
+        按列从记录中取值直接构建Arrow表，不经过DataFrame
+        
+        Args:
+            records: 要导出的记录列表
+            file_path: 导出文件路径，扩展名为.parquet或.feather
+            
+        Returns:
+            (是否成功, 错误信息)
+        """
+        try:
+            if not records:
+                return False, "没有数据可导出"
+            
+            try:
+                import pyarrow as pa
+            except ImportError:
+                return False, "导出Parquet/Feather格式需要安装pyarrow: pip install pyarrow"
             
             file_path = Path(file_path)
             file_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
+            columns = {
+                name: [getter(record) for record in records]
+                for name, getter, _, _ in self.EXPORT_COLUMNS
+            }
+            table = pa.table(columns)
+            
+            if file_path.suffix.lower() == ".feather":
+                import pyarrow.feather as feather
+                feather.write_feather(table, str(file_path))
+            else:
+                import pyarrow.parquet as pq
+                pq.write_table(table, str(file_path))
             
             self.logger.info(f"成功导出{len(records)}条记录到: {file_path}")
             return True, ""
             
         except Exception as e:
-            error_msg = f"导出Excel文件失败: {str(e)}"
+            error_msg = f"导出{Path(file_path).suffix}文件失败: {str(e)}"
             self.logger.error(error_msg)
-            return False, error_msg 
\ No newline at end of file
+            return False, error_msg
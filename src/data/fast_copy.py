@@ -0,0 +1,218 @@
+"""
+快速文件复制模块
+按写时复制(reflink)、硬链接、内核复制(copy_file_range)、普通复制的顺序尝试导入附件
+"""
+
+import logging
+import hashlib
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Optional, Tuple
+
+from ..config import ATTACHMENT_CONFIG, INGEST_MODES
+
+
+class FastCopier:
+    """快速文件复制类
+
+    导入方式：
+    - copy: 始终完整复制文件内容
+    - fast: 依次尝试 reflink、copy_file_range，最后普通复制；目标文件与源文件互不影响
+    - link: 先尝试 reflink，再尝试硬链接（与源文件共用同一份数据，修改源文件会影响附件），
+      都不可用时按 fast 方式复制
+    """
+
+    # Linux 的 FICLONE ioctl（_IOW(0x94, 9, int)），旧版本 Python 的 fcntl 模块未导出该常量
+    FICLONE = 0x40049409
+    COPY_CHUNK_SIZE = 64 * 1024 * 1024  # copy_file_range 单次复制的字节数
+    HASH_BUFFER_SIZE = 1024 * 1024  # 边复制边哈希时的缓冲区大小
+
+    def __init__(self, mode: Optional[str] = None):
+        self.logger = logging.getLogger(__name__)
+        self.mode = mode if mode in INGEST_MODES else ATTACHMENT_CONFIG.get("ingest_mode", "fast")
+
+    def copy(self, source_path: Path, target_path: Path) -> str:
+        """
+        将源文件导入到目标路径，目标路径不能已存在
+
+        Args:
+            source_path: 源文件路径
+            target_path: 目标文件路径
+
+        Returns:
+            实际使用的方式: "reflink"、"hardlink"、"copy_file_range" 或 "copy"
+        """
+        source_path = Path(source_path)
+        target_path = Path(target_path)
+
+        method = self._try_zero_copy(source_path, target_path)
+        if method:
+            return method
+
+        # 普通复制（Linux 上 shutil 内部会使用 sendfile）
+        shutil.copy2(source_path, target_path)
+        return "copy"
+
+    def copy_with_hash(self, source_path: Path, target_path: Path,
+                       algorithm: str = "sha256") -> Tuple[str, str, int]:
+        """
+        导入文件并计算内容哈希，目标路径不能已存在
+
+        reflink、硬链接或 copy_file_range 可用时数据不经过用户态，之后读取一次目标文件计算哈希；
+        只能普通复制时边复制边哈希，源文件只读取一次
+
+        Args:
+            source_path: 源文件路径
+            target_path: 目标文件路径
+            algorithm: 哈希算法
+
+        Returns:
+            (实际使用的方式, 内容哈希, 文件字节数)
+        """
+        source_path = Path(source_path)
+        target_path = Path(target_path)
+
+        method = self._try_zero_copy(source_path, target_path)
+        if method:
+            # 计算目标文件的哈希，即使源文件在复制后被修改，哈希也与保存的内容一致
+            try:
+                digest, size = self._hash_file(target_path, algorithm)
+            except BaseException:
+                target_path.unlink(missing_ok=True)
+                raise
+            return method, digest, size
+
+        digest, size = self.copy_and_hash(source_path, target_path, algorithm)
+        return "copy", digest, size
+
+    def _try_zero_copy(self, source_path: Path, target_path: Path) -> Optional[str]:
+        """按导入方式尝试 reflink、硬链接、copy_file_range，都不可用时返回None"""
+        if self.mode == "copy":
+            return None
+
+        if self._try_reflink(source_path, target_path):
+            return "reflink"
+
+        if self.mode == "link" and self._try_hardlink(source_path, target_path):
+            return "hardlink"
+
+        if self._try_copy_file_range(source_path, target_path):
+            return "copy_file_range"
+
+        return None
+
+    def _hash_file(self, file_path: Path, algorithm: str) -> Tuple[str, int]:
+        """计算文件内容哈希，返回 (内容哈希, 文件字节数)"""
+        hasher = hashlib.new(algorithm)
+        buffer = bytearray(self.HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        size = 0
+
+        with open(file_path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                hasher.update(view[:n])
+                size += n
+        return hasher.hexdigest(), size
+
+    def copy_and_hash(self, source_path: Path, target_path: Path, algorithm: str = "sha256") -> Tuple[str, int]:
+        """
+        复制文件并在同一次读取中计算内容哈希，目标路径不能已存在
+
+        Args:
+            source_path: 源文件路径
+            target_path: 目标文件路径
+            algorithm: 哈希算法
+
+        Returns:
+            (内容哈希, 文件字节数)
+        """
+        hasher = hashlib.new(algorithm)
+        buffer = bytearray(self.HASH_BUFFER_SIZE)
+        view = memoryview(buffer)
+        size = 0
+
+        try:
+            with open(source_path, 'rb', buffering=0) as src, open(target_path, 'xb') as dst:
+                while True:
+                    n = src.readinto(buffer)
+                    if not n:
+                        break
+                    chunk = view[:n]
+                    hasher.update(chunk)
+                    dst.write(chunk)
+                    size += n
+        except BaseException:
+            Path(target_path).unlink(missing_ok=True)
+            raise
+
+        shutil.copystat(source_path, target_path)
+        return hasher.hexdigest(), size
+
+    def _try_reflink(self, source_path: Path, target_path: Path) -> bool:
+        """尝试写时复制克隆（Btrfs、XFS 等支持的文件系统）"""
+        if not sys.platform.startswith("linux"):
+            return False
+
+        try:
+            import fcntl
+        except ImportError:
+            return False
+
+        try:
+            with open(source_path, 'rb') as src, open(target_path, 'xb') as dst:
+                try:
+                    fcntl.ioctl(dst.fileno(), getattr(fcntl, "FICLONE", self.FICLONE), src.fileno())
+                except OSError:
+                    cloned = False
+                else:
+                    cloned = True
+        except OSError:
+            return False
+
+        if not cloned:
+            target_path.unlink(missing_ok=True)
+            return False
+
+        shutil.copystat(source_path, target_path)
+        return True
+
+    def _try_hardlink(self, source_path: Path, target_path: Path) -> bool:
+        """尝试创建硬链接（需在同一文件系统上）"""
+        try:
+            os.link(source_path, target_path)
+            return True
+        except (OSError, NotImplementedError):
+            return False
+
+    def _try_copy_file_range(self, source_path: Path, target_path: Path) -> bool:
+        """尝试在内核中直接复制数据，不经过用户态缓冲区"""
+        if not hasattr(os, "copy_file_range"):
+            return False
+
+        try:
+            with open(source_path, 'rb') as src, open(target_path, 'xb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                try:
+                    while remaining > 0:
+                        copied = os.copy_file_range(src.fileno(), dst.fileno(),
+                                                    min(remaining, self.COPY_CHUNK_SIZE))
+                        if copied == 0:
+                            break
+                        remaining -= copied
+                except OSError:
+                    # 跨文件系统或不支持时退回普通复制
+                    remaining = -1
+        except OSError:
+            return False
+
+        if remaining != 0:
+            target_path.unlink(missing_ok=True)
+            return False
+
+        shutil.copystat(source_path, target_path)
+        return True
@@ -3,18 +3,35 @@
 负责附件文件的存储、管理和组织
 """
 
+import atexit
 import logging
+import os
 import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, Future
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Dict, Any, Callable
 from datetime import datetime
 import uuid
 
+from .blob_store import BlobStore, unlink_file
+from .fast_copy import FastCopier
+from .attachment_catalog import AttachmentCatalog
+from .attachment_archive import AttachmentArchive
+from .duplicate_finder import DuplicateFinder
+from .thumbnail_cache import ThumbnailCache
+from .content_index import ContentIndex
+from . import archive_reader
+from ..config import ATTACHMENT_CONFIG, INGEST_MODES, DATA_DIR
+
 
 class FileManager:
     """文件管理器类"""
     
-    def __init__(self, base_storage_path: Optional[str] = None):
+    def __init__(self, base_storage_path: Optional[str] = None, ingest_mode: Optional[str] = None,
+                 catalog_dir: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
         
         # 设置基础存储路径
@@ -26,6 +43,26 @@ class FileManager:
         # 确保基础目录存在
         self.base_storage_path.mkdir(parents=True, exist_ok=True)
         
+        # 附件导入方式（按项目设置）
+        self.copier = FastCopier(ingest_mode)
+        
+        # 内容寻址存储（去重）
+        self.blob_store = self._open_blob_store()
+        
+        # 休眠项目的附件包（打开合同时按需解包）
+        self.archive = self._open_archive()
+        
+        # 本地附件目录（列表和统计不再遍历存储目录）
+        self.catalog_dir = Path(catalog_dir) if catalog_dir else DATA_DIR / "catalogs"
+        self.content_index: Optional[ContentIndex] = None
+        self.catalog = self._open_catalog()
+        
+        # 附件缩略图缓存（首次预览时创建）
+        self.thumbnail_cache: Optional[ThumbnailCache] = None
+        
+        # 查看压缩包内文件时的临时文件夹（首次提取时创建，程序退出时删除）
+        self._preview_dir: Optional[Path] = None
+        
         self.logger.info(f"文件管理器初始化，存储路径: {self.base_storage_path}")
     
     def set_storage_path(self, storage_path: str) -> bool:
@@ -42,12 +79,294 @@ class FileManager:
             new_path = Path(storage_path)
             new_path.mkdir(parents=True, exist_ok=True)
             self.base_storage_path = new_path
+            
+            if self.blob_store:
+                self.blob_store.close()
+            self.blob_store = self._open_blob_store()
+            
+            if self.archive:
+                self.archive.close()
+            self.archive = self._open_archive()
+            
+            if self.content_index:
+                self.content_index.close()
+                self.content_index = None
+            if self.catalog:
+                self.catalog.close()
+            self.catalog = self._open_catalog()
             self.logger.info(f"存储路径已更新为: {self.base_storage_path}")
             return True
         except Exception as e:
             self.logger.error(f"设置存储路径失败: {e}")
             return False
     
+    def _open_blob_store(self) -> Optional[BlobStore]:
+        """打开当前存储路径下的内容寻址存储"""
+        if not ATTACHMENT_CONFIG.get("dedup_enabled", False):
+            return None
+        try:
+            return BlobStore(self.base_storage_path, self.copier)
+        except Exception as e:
+            self.logger.warning(f"打开附件去重存储失败，改为直接复制: {e}")
+            return None
+    
+    def _open_archive(self) -> Optional[AttachmentArchive]:
+        """打开当前存储路径下未解包完的附件包"""
+        if AttachmentArchive.exists(self.base_storage_path):
+            return AttachmentArchive(self.base_storage_path)
+        return None
+    
+    def thaw_contract(self, contract_id: str) -> int:
+        """
+        解出休眠项目中一个合同的附件（合同不在附件包中或已解包时不做任何操作）
+        
+        Args:
+            contract_id: 合同编号
+            
+        Returns:
+            解出的文件数
+        """
+        if not self.archive:
+            return 0
+        
+        folder = self._sanitize_filename(contract_id)
+        if not self.archive.is_packed(folder):
+            return 0
+        
+        try:
+            count = self.archive.thaw_contract(folder)
+            self.refresh_catalog(contract_id)
+            if not AttachmentArchive.exists(self.base_storage_path):
+                self.archive = None
+            return count
+        except Exception as e:
+            self.logger.error(f"解包合同附件失败: {e}")
+            return 0
+    
+    def _open_catalog(self) -> Optional[AttachmentCatalog]:
+        """打开当前存储路径对应的附件目录，并在后台核对外部改动"""
+        try:
+            catalog_file = AttachmentCatalog.default_catalog_file(self.catalog_dir, self.base_storage_path)
+            catalog = AttachmentCatalog(catalog_file, self.base_storage_path)
+            # 核对完成后读取外部加入的压缩包，并同步全文索引（仅在已建立索引时）
+            catalog.start_background_reconcile(callback=lambda stats: self._after_reconcile(catalog))
+            return catalog
+        except Exception as e:
+            self.logger.warning(f"打开附件目录失败，改为直接扫描存储目录: {e}")
+            return None
+    
+    def refresh_catalog(self, contract_id: Optional[str] = None, force: bool = False) -> dict:
+        """
+        核对附件目录与存储目录
+        
+        Args:
+            contract_id: 只核对指定合同（为空时增量核对全部合同）
+            force: 核对全部合同文件夹，包括修改时间未变化的
+            
+        Returns:
+            核对统计信息
+        """
+        if not self.catalog:
+            return {}
+        
+        try:
+            if contract_id:
+                changed = self.catalog.scan_contract(self._sanitize_filename(contract_id))
+                return {"scanned": 1, "changed": changed, "removed_dirs": 0}
+            return self.catalog.reconcile(force)
+        except Exception as e:
+            self.logger.error(f"核对附件目录失败: {e}")
+            return {}
+    
+    def _after_reconcile(self, catalog: AttachmentCatalog):
+        """后台核对完成后的处理（在核对线程中执行）"""
+        if catalog is not self.catalog:
+            return
+        self.index_pending_archives()
+        self._schedule_content_index()
+    
+    def _read_archive(self, file_path: Path) -> Optional[Tuple[str, int, List[dict], str]]:
+        """
+        读取压缩包成员列表
+        
+        Returns:
+            (相对路径键, 修改时间, 成员列表, 错误信息)，不是压缩包或缺少读取所需的库时返回None
+        """
+        if not archive_reader.can_read(file_path):
+            return None
+        key = Path(file_path).relative_to(self.base_storage_path).as_posix()
+        try:
+            mtime_ns = os.stat(file_path).st_mtime_ns
+        except OSError:
+            return None
+        try:
+            members, error = archive_reader.list_members(file_path), ""
+        except Exception as e:
+            # 损坏或加密的压缩包也记录下来，文件修改前不再重复读取
+            self.logger.warning(f"读取压缩包目录失败: {file_path}: {e}")
+            members, error = [], str(e)
+        return key, mtime_ns, members, error
+    
+    def index_pending_archives(self) -> int:
+        """
+        读取附件目录中尚未读取成员列表的压缩包（外部复制进存储目录的压缩包）
+        
+        Returns:
+            读取的压缩包数量
+        """
+        if not self.catalog:
+            return 0
+        try:
+            pending = [self.base_storage_path / path
+                       for path, _ in self.catalog.get_pending_archives(archive_reader.ARCHIVE_SUFFIXES)
+                       if archive_reader.can_read(path)]
+            if not pending:
+                return 0
+            with ThreadPoolExecutor(max_workers=AttachmentCatalog.SCAN_WORKERS,
+                                    thread_name_prefix="ArchiveIndex") as executor:
+                archives = [a for a in executor.map(self._read_archive, pending) if a]
+            self.catalog.set_archive_members(archives)
+            self.logger.info(f"已读取{len(archives)}个压缩包的成员列表")
+            return len(archives)
+        except Exception as e:
+            self.logger.warning(f"读取压缩包成员列表失败: {e}")
+            return 0
+    
+    def get_archive_members(self, file_path: str) -> Optional[List[dict]]:
+        """
+        获取压缩包的成员列表（优先使用附件目录中的记录）
+        
+        Returns:
+            成员列表: member、size、compressed_size、crc；无法读取时返回None
+        """
+        file_path = Path(file_path)
+        try:
+            if self.catalog:
+                members = self.catalog.get_archive_members(file_path)
+                if members is not None:
+                    return members
+            archive = self._read_archive(file_path)
+            if not archive:
+                return None
+            self._catalog_call("set_archive_members", [archive])
+            return archive[2]
+        except Exception as e:
+            self.logger.error(f"获取压缩包成员失败: {e}")
+            return None
+    
+    def search_archive_members(self, query: str, limit: int = 200) -> List[dict]:
+        """
+        按文件名检索压缩包内的文件
+        
+        Returns:
+            结果列表: path（压缩包路径）、contract、name（压缩包名）、member、size
+        """
+        if not self.catalog:
+            return []
+        try:
+            return self.catalog.search_archive_members(query, limit)
+        except Exception as e:
+            self.logger.error(f"检索压缩包成员失败: {e}")
+            return []
+    
+    def extract_archive_member(self, archive_path: str, member: str,
+                               target_dir: Optional[str] = None) -> Tuple[bool, str, str]:
+        """
+        从压缩包中提取单个文件，不解压整个压缩包
+        
+        Args:
+            archive_path: 压缩包路径
+            member: 包内路径
+            target_dir: 目标文件夹（为空时提取到本次运行的临时文件夹，用于查看，程序退出时删除）
+            
+        Returns:
+            (是否成功, 提取出的文件路径, 错误信息)
+        """
+        try:
+            if target_dir is None:
+                # 每次提取单独一个子文件夹，已在外部程序中打开的同名文件不会被覆盖
+                target_dir = tempfile.mkdtemp(dir=self._get_preview_dir())
+            extracted = archive_reader.extract_member(archive_path, member, target_dir)
+            self.logger.info(f"已从压缩包提取: {Path(archive_path).name} -> {extracted}")
+            return True, str(extracted), ""
+        except Exception as e:
+            self.logger.error(f"提取压缩包成员失败: {e}")
+            return False, "", str(e)
+    
+    def _get_preview_dir(self) -> Path:
+        """查看压缩包内文件的临时文件夹，程序退出时删除"""
+        if self._preview_dir is None:
+            self._preview_dir = Path(tempfile.mkdtemp(prefix="archive_member_"))
+            atexit.register(shutil.rmtree, self._preview_dir, True)
+        return self._preview_dir
+    
+    def _catalog_call(self, method: str, *args):
+        """更新附件目录，失败时只记录日志（下次核对时会修正）"""
+        if not self.catalog:
+            return
+        try:
+            getattr(self.catalog, method)(*args)
+        except Exception as e:
+            self.logger.warning(f"更新附件目录失败: {e}")
+            return
+        self._schedule_content_index()
+    
+    def get_content_index(self) -> Optional[ContentIndex]:
+        """打开当前存储路径对应的全文索引，附件目录不可用时返回None"""
+        if self.content_index is None and self.catalog:
+            try:
+                index_file = ContentIndex.default_index_file(self.catalog_dir, self.base_storage_path)
+                self.content_index = ContentIndex(index_file, self.base_storage_path)
+            except Exception as e:
+                self.logger.warning(f"打开全文索引失败: {e}")
+        return self.content_index
+    
+    def update_content_index(self) -> bool:
+        """在后台增量更新全文索引（进行中时本轮结束后再更新一次）"""
+        index = self.get_content_index()
+        if not index:
+            return False
+        index.start_background_update(self.catalog)
+        return True
+    
+    def _schedule_content_index(self):
+        """附件变更后更新全文索引；从未使用过全文检索时不建立索引"""
+        if self.content_index is None and (
+                not self.catalog or
+                not ContentIndex.default_index_file(self.catalog_dir, self.base_storage_path).exists()):
+            return
+        self.update_content_index()
+    
+    def search_attachment_content(self, query: str, limit: int = 200) -> List[dict]:
+        """
+        全文检索附件内容
+        
+        Args:
+            query: 关键词（空格分隔的多个关键词需同时出现）
+            limit: 最多返回的结果数量
+            
+        Returns:
+            结果列表: path、contract、name、snippet
+        """
+        index = self.get_content_index()
+        if not index:
+            return []
+        try:
+            return index.search(query, limit)
+        except Exception as e:
+            self.logger.error(f"全文检索失败: {e}")
+            return []
+    
+    def set_ingest_mode(self, mode: str) -> bool:
+        """设置附件导入方式（copy/fast/link）"""
+        if mode not in INGEST_MODES:
+            self.logger.error(f"未知的附件导入方式: {mode}")
+            return False
+        
+        self.copier.mode = mode
+        self.logger.info(f"附件导入方式已设置为: {INGEST_MODES[mode]}")
+        return True
+    
     def get_contract_folder_path(self, contract_id: str) -> Path:
         """
         获取合同文件夹路径，如果不存在则创建
@@ -104,18 +423,22 @@ class FileManager:
                 target_filename = source_path.name
             
             # 处理文件名冲突
-            target_path = contract_folder / target_filename
-            counter = 1
-            original_stem = target_path.stem
-            original_suffix = target_path.suffix
+            target_path = self._allocate_target_path(contract_folder, target_filename)
             
-            while target_path.exists():
-                target_filename = f"{original_stem}_{counter}{original_suffix}"
-                target_path = contract_folder / target_filename
-                counter += 1
+            # 存入去重存储并链接到合同文件夹，未启用去重时直接复制
+            digest = None
+            if self.blob_store:
+                digest, created = self.blob_store.put(source_path)
+                self.blob_store.link(digest, target_path)
+                if not created:
+                    self.logger.info(f"附件内容已存在，复用已有对象: {digest[:12]}")
+            else:
+                self.copier.copy(source_path, target_path)
             
-            # 复制文件
-            shutil.copy2(source_path, target_path)
+            self._catalog_call("add_files", [(target_path, digest)])
+            archive = self._read_archive(target_path)
+            if archive:
+                self._catalog_call("set_archive_members", [archive])
             
             relative_path = target_path.relative_to(self.base_storage_path)
             self.logger.info(f"成功保存附件: {relative_path}")
@@ -127,6 +450,149 @@ class FileManager:
             self.logger.error(error_msg)
             return False, "", error_msg
     
+    def _allocate_target_path(self, contract_folder: Path, filename: str,
+                              reserved: Optional[set] = None) -> Path:
+        """分配不冲突的目标路径，reserved 为本批次已分配但尚未写入的路径"""
+        target_path = contract_folder / filename
+        counter = 1
+        original_stem = target_path.stem
+        original_suffix = target_path.suffix
+        
+        while target_path.exists() or (reserved is not None and target_path in reserved):
+            target_path = contract_folder / f"{original_stem}_{counter}{original_suffix}"
+            counter += 1
+        
+        if reserved is not None:
+            reserved.add(target_path)
+        return target_path
+    
+    def save_attachments_bulk(self, source_file_paths: List[str], contract_id: str,
+                              progress_callback: Optional[Callable[[int, int, int, float], None]] = None,
+                              cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Dict[str, Any], str]:
+        """
+        批量保存附件，在线程池中按导入方式并发导入（优先写时复制/内核复制）并计算内容哈希
+        
+        Args:
+            source_file_paths: 源文件路径列表
+            contract_id: 合同编号
+            progress_callback: 进度回调 (已完成文件数, 总文件数, 已完成字节数, 已用秒数)
+            cancel_event: 取消事件，设置后不再开始新的文件
+            
+        Returns:
+            (是否全部成功, 结果, 错误信息)
+            结果包含 saved(成功列表: source/stored_path/digest/size)、failed(失败列表: (源文件, 错误))、
+            total_bytes、elapsed、throughput(字节/秒)、cancelled
+        """
+        return self.save_attachments_assigned(
+            [(source_file_path, contract_id) for source_file_path in source_file_paths],
+            progress_callback, cancel_event
+        )
+    
+    def save_attachments_assigned(self, assignments: List[Tuple[str, str]],
+                                  progress_callback: Optional[Callable[[int, int, int, float], None]] = None,
+                                  cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Dict[str, Any], str]:
+        """
+        批量保存分属不同合同的附件，所有文件共用一个线程池，完成后一次性登记
+        
+        Args:
+            assignments: (源文件路径, 合同编号) 列表
+            progress_callback: 进度回调 (已完成文件数, 总文件数, 已完成字节数, 已用秒数)
+            cancel_event: 取消事件，设置后不再开始新的文件
+            
+        Returns:
+            同 save_attachments_bulk，saved 中每项额外包含 contract_id
+        """
+        result = {"saved": [], "failed": [], "total_bytes": 0, "elapsed": 0.0,
+                  "throughput": 0.0, "cancelled": False}
+        try:
+            # 先在当前线程分配目标文件名，避免并发时重名
+            tasks = []
+            reserved = set()
+            contract_folders = {}
+            for source_file_path, contract_id in assignments:
+                source_path = Path(source_file_path)
+                if not source_path.is_file():
+                    result["failed"].append((source_file_path, "源文件不存在"))
+                    continue
+                if contract_id not in contract_folders:
+                    contract_folders[contract_id] = self.get_contract_folder_path(contract_id)
+                target_path = self._allocate_target_path(contract_folders[contract_id], source_path.name, reserved)
+                tasks.append((source_path, target_path, contract_id))
+            
+            def ingest_one(source_path: Path, target_path: Path) -> Optional[Dict[str, Any]]:
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                if self.blob_store:
+                    entry = self.blob_store.ingest(source_path)
+                    self.blob_store.link(entry["digest"], target_path, register=False)
+                else:
+                    method, digest, size = self.copier.copy_with_hash(source_path, target_path)
+                    entry = {"digest": digest, "size": size}
+                entry["path"] = target_path
+                # 压缩包刚写入，读取中央目录几乎没有额外开销
+                entry["archive"] = self._read_archive(target_path)
+                return entry
+            
+            total = len(tasks)
+            done = 0
+            start_time = time.perf_counter()
+            entries = []
+            
+            workers = max(1, ATTACHMENT_CONFIG.get("ingest_workers", 4))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="AttachmentIngest") as executor:
+                futures = {
+                    executor.submit(ingest_one, source, target): (source, contract_id)
+                    for source, target, contract_id in tasks
+                }
+                for future in as_completed(futures):
+                    source_path, contract_id = futures[future]
+                    try:
+                        entry = future.result()
+                    except Exception as e:
+                        self.logger.error(f"保存附件失败: {source_path}: {e}")
+                        result["failed"].append((str(source_path), str(e)))
+                        entry = None
+                    
+                    done += 1
+                    if entry:
+                        entries.append(entry)
+                        result["saved"].append({
+                            "source": str(source_path),
+                            "contract_id": contract_id,
+                            "stored_path": str(entry["path"]),
+                            "digest": entry["digest"],
+                            "size": entry["size"]
+                        })
+                        result["total_bytes"] += entry["size"]
+                    
+                    if progress_callback:
+                        progress_callback(done, total, result["total_bytes"], time.perf_counter() - start_time)
+            
+            # 一次性登记所有引用
+            if self.blob_store and entries:
+                self.blob_store.register(entries)
+            self._catalog_call("add_files", [(entry["path"], entry["digest"]) for entry in entries])
+            archives = [entry["archive"] for entry in entries if entry.get("archive")]
+            if archives:
+                self._catalog_call("set_archive_members", archives)
+            
+            result["cancelled"] = cancel_event is not None and cancel_event.is_set()
+            result["elapsed"] = time.perf_counter() - start_time
+            if result["elapsed"] > 0:
+                result["throughput"] = result["total_bytes"] / result["elapsed"]
+            
+            self.logger.info(
+                f"批量保存附件完成: 成功{len(result['saved'])}个，失败{len(result['failed'])}个，"
+                f"{result['total_bytes'] / (1024 * 1024):.1f} MB，"
+                f"{result['throughput'] / (1024 * 1024):.1f} MB/s"
+            )
+            return not result["failed"], result, ""
+            
+        except Exception as e:
+            error_msg = f"批量保存附件失败: {e}"
+            self.logger.error(error_msg)
+            return False, result, error_msg
+    
     def delete_attachment(self, file_path: str) -> bool:
         """
         删除附件文件
@@ -141,7 +607,10 @@ class FileManager:
             file_to_delete = Path(file_path)
             
             if file_to_delete.exists():
-                file_to_delete.unlink()
+                if self.blob_store:
+                    self.blob_store.remove(file_to_delete)
+                else:
+                    unlink_file(file_to_delete)
                 self.logger.info(f"成功删除附件: {file_path}")
                 
                 # 如果合同文件夹为空，则删除文件夹
@@ -153,9 +622,11 @@ class FileManager:
                     except:
                         pass  # 忽略删除文件夹的错误
                 
+                self._catalog_call("remove_file", file_to_delete)
                 return True
             else:
                 self.logger.warning(f"要删除的文件不存在: {file_path}")
+                self._catalog_call("remove_file", file_to_delete)
                 return True  # 文件不存在也算删除成功
                 
         except Exception as e:
@@ -199,6 +670,8 @@ class FileManager:
             
             # 移动文件
             shutil.move(str(old_path), str(new_path))
+            if self.blob_store:
+                self.blob_store.move_ref(old_path, new_path)
             
             # 清理原来的空文件夹
             old_folder = old_path.parent
@@ -209,6 +682,8 @@ class FileManager:
                 except:
                     pass
             
+            self._catalog_call("move_file", old_path, new_path)
+            
             self.logger.info(f"成功移动附件: {old_path} -> {new_path}")
             return True, str(new_path), ""
             
@@ -217,6 +692,63 @@ class FileManager:
             self.logger.error(error_msg)
             return False, "", error_msg
     
+    def rename_attachment(self, file_path: str, new_name: str) -> Tuple[bool, str, str]:
+        """
+        重命名附件文件
+        
+        Args:
+            file_path: 原文件路径
+            new_name: 新文件名（不含扩展名时保留原扩展名）
+            
+        Returns:
+            (是否成功, 新文件路径, 错误信息)
+        """
+        try:
+            old_path = Path(file_path)
+            
+            if not old_path.exists():
+                return False, "", "原文件不存在"
+            
+            new_name = self._sanitize_filename(new_name)
+            if not new_name.endswith(old_path.suffix):
+                new_name += old_path.suffix
+            
+            new_path = old_path.parent / new_name
+            if new_path.exists():
+                return False, "", "文件名已存在"
+            
+            old_path.rename(new_path)
+            if self.blob_store:
+                self.blob_store.move_ref(old_path, new_path)
+            self._catalog_call("move_file", old_path, new_path)
+            
+            self.logger.info(f"成功重命名附件: {old_path} -> {new_path}")
+            return True, str(new_path), ""
+            
+        except Exception as e:
+            error_msg = f"重命名附件失败: {e}"
+            self.logger.error(error_msg)
+            return False, "", error_msg
+    
+    def detach_attachment(self, file_path: str) -> bool:
+        """
+        外部程序打开附件前调用：去重存储中的附件换成独立的可写副本，
+        外部程序原地修改时不会改变其他合同中内容相同的附件
+        
+        Args:
+            file_path: 附件路径
+            
+        Returns:
+            是否替换了附件文件
+        """
+        if not self.blob_store:
+            return False
+        try:
+            return self.blob_store.detach(Path(file_path))
+        except Exception as e:
+            self.logger.warning(f"替换附件副本失败: {e}")
+            return False
+    
     def get_contract_attachments(self, contract_id: str) -> List[Path]:
         """
         获取合同的所有附件文件
@@ -227,6 +759,10 @@ class FileManager:
         Returns:
             附件文件路径列表
         """
+        self.thaw_contract(contract_id)
+        if self.catalog:
+            return [entry["path"] for entry in self.get_contract_attachment_entries(contract_id)]
+        
         try:
             contract_folder = self.get_contract_folder_path(contract_id)
             
@@ -239,6 +775,75 @@ class FileManager:
             self.logger.error(f"获取合同附件失败: {e}")
             return []
     
+    def get_contract_attachment_entries(self, contract_id: str) -> List[dict]:
+        """
+        获取合同的附件信息（来自附件目录，不访问存储目录）
+        
+        Args:
+            contract_id: 合同编号
+            
+        Returns:
+            附件信息列表: path、name、size、mtime_ns、digest
+        """
+        try:
+            self.thaw_contract(contract_id)
+            if self.catalog:
+                return self.catalog.list_contract(self._sanitize_filename(contract_id))
+            
+            entries = []
+            for file_path in self.get_contract_attachments(contract_id):
+                stat = file_path.stat()
+                entries.append({"path": file_path, "name": file_path.name, "size": stat.st_size,
+                                "mtime_ns": stat.st_mtime_ns, "digest": None})
+            return entries
+            
+        except Exception as e:
+            self.logger.error(f"获取合同附件失败: {e}")
+            return []
+    
+    def _get_thumbnail_cache(self) -> ThumbnailCache:
+        """获取缩略图缓存，缓存目录与附件目录放在一起"""
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache(self.catalog_dir / "thumbnails")
+        return self.thumbnail_cache
+    
+    def can_preview_attachment(self, file_path: str) -> bool:
+        """附件是否可以生成预览缩略图"""
+        return self._get_thumbnail_cache().can_preview(Path(file_path))
+    
+    def request_thumbnail(self, file_path: str, digest: Optional[str] = None,
+                          callback: Optional[Callable[[Path, Optional[Path]], None]] = None) -> Optional[Future]:
+        """
+        在后台生成附件缩略图
+        
+        Args:
+            file_path: 附件路径
+            digest: 内容哈希（来自附件目录，没有时按文件内容计算）
+            callback: 完成后在后台线程中调用 callback(附件路径, 缩略图路径或None)
+            
+        Returns:
+            Future，不支持预览的文件返回None
+        """
+        cache = self._get_thumbnail_cache()
+        if not cache.can_preview(Path(file_path)):
+            return None
+        return cache.request(Path(file_path), digest, callback)
+    
+    def get_attachment_totals(self) -> Optional[Dict[str, int]]:
+        """附件数量和总字节数（读取附件目录的累计统计，不遍历文件，包括附件包中未解包的附件）；目录不可用时返回None"""
+        if not self.catalog:
+            return None
+        try:
+            totals = dict(self.catalog.get_totals())
+            if self.archive:
+                pending = self.archive.pending_totals()
+                totals["file_count"] += pending["file_count"]
+                totals["total_size"] += pending["total_size"]
+            return totals
+        except Exception as e:
+            self.logger.warning(f"读取附件统计失败: {e}")
+            return None
+    
     def get_storage_info(self) -> dict:
         """
         获取存储信息
@@ -250,24 +855,47 @@ class FileManager:
             total_size = 0
             file_count = 0
             contract_count = 0
+            member_count = 0
             
-            if self.base_storage_path.exists():
+            verifying = False
+            if self.catalog:
+                # 读取累计统计；首次使用时在后台扫描，界面无需等待
+                if self.catalog.is_empty():
+                    self.catalog.start_background_reconcile(force=True)
+                verifying = self.catalog.is_reconciling()
+                totals = self.catalog.get_totals()
+                contract_count = totals["contract_count"]
+                file_count = totals["file_count"]
+                total_size = totals["total_size"]
+                member_count = totals["member_count"]
+            elif self.base_storage_path.exists():
                 for contract_folder in self.base_storage_path.iterdir():
-                    if contract_folder.is_dir():
+                    # 跳过去重对象库等内部目录
+                    if contract_folder.is_dir() and not contract_folder.name.startswith("."):
                         contract_count += 1
                         for file_path in contract_folder.iterdir():
                             if file_path.is_file():
                                 file_count += 1
                                 total_size += file_path.stat().st_size
             
-            return {
+            info = {
                 "storage_path": str(self.base_storage_path),
                 "contract_count": contract_count,
                 "file_count": file_count,
                 "total_size": total_size,
-                "total_size_mb": round(total_size / (1024 * 1024), 2)
+                "total_size_mb": round(total_size / (1024 * 1024), 2),
+                "archive_member_count": member_count,
+                "verifying": verifying
             }
             
+            # 去重节省的空间（硬链接的附件只占用一份磁盘空间）
+            if self.blob_store:
+                blob_stats = self.blob_store.get_stats()
+                info["dedup_saved_size"] = blob_stats["saved_size"]
+                info["dedup_saved_mb"] = round(blob_stats["saved_size"] / (1024 * 1024), 2)
+            
+            return info
+            
         except Exception as e:
             self.logger.error(f"获取存储信息失败: {e}")
             return {
@@ -278,6 +906,79 @@ class FileManager:
                 "total_size_mb": 0
             }
     
+    def get_contract_usage(self, limit: Optional[int] = None) -> List[dict]:
+        """
+        获取每个合同的附件数量和占用空间，按占用空间从大到小排列
+        
+        Args:
+            limit: 最多返回的合同数量
+            
+        Returns:
+            [{"contract": 合同文件夹名, "file_count": 附件数, "total_size": 字节数}, ...]
+        """
+        if not self.catalog:
+            return []
+        
+        try:
+            return self.catalog.get_contract_usage(limit)
+        except Exception as e:
+            self.logger.error(f"获取合同存储统计失败: {e}")
+            return []
+    
+    def find_duplicates(self, progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Dict[str, Any], str]:
+        """
+        查找内容相同的附件（包括跨合同的重复）
+        
+        Args:
+            progress_callback: 进度回调 (阶段, 当前数量, 总数量)
+            cancel_event: 取消事件
+            
+        Returns:
+            (是否成功, 结果, 错误信息)
+            结果包含 groups(重复组列表，格式见 DuplicateFinder.find)、cancelled(是否已取消，取消时结果不完整)
+        """
+        result = {"groups": [], "cancelled": False}
+        if not self.catalog:
+            return False, result, "附件目录不可用"
+        
+        try:
+            # 先增量同步目录，保证缓存的大小和哈希有效
+            self.catalog.reconcile()
+            result["groups"], result["cancelled"] = DuplicateFinder(self.catalog).find(progress_callback, cancel_event)
+            return True, result, ""
+        except Exception as e:
+            error_msg = f"查找重复附件失败: {e}"
+            self.logger.error(error_msg)
+            return False, result, error_msg
+    
+    def verify_storage(self, callback: Optional[Callable[[dict], None]] = None) -> bool:
+        """
+        在后台并行扫描全部合同文件夹，校验附件目录和累计统计，
+        之后清理去重存储中的失效引用和无引用的对象
+        
+        Args:
+            callback: 完成后在后台线程中调用 callback(统计信息)，统计信息包含删除的对象数 removed_objects
+            
+        Returns:
+            是否启动了校验
+        """
+        if not self.catalog:
+            return False
+        
+        blob_store = self.blob_store
+        
+        def after_reconcile(stats: dict):
+            if blob_store:
+                try:
+                    stats["removed_objects"] = blob_store.collect_garbage()
+                except Exception as e:
+                    self.logger.warning(f"清理附件对象失败: {e}")
+            if callback:
+                callback(stats)
+        
+        return self.catalog.start_background_reconcile(force=True, callback=after_reconcile)
+    
     def _sanitize_filename(self, filename: str) -> str:
         """
         清理文件名，移除不合法字符
@@ -319,7 +1020,8 @@ class FileManager:
             backup_dir.parent.mkdir(parents=True, exist_ok=True)
             
             if self.base_storage_path.exists():
-                shutil.copytree(self.base_storage_path, backup_dir, dirs_exist_ok=True)
+                shutil.copytree(self.base_storage_path, backup_dir, dirs_exist_ok=True,
+                                ignore=shutil.ignore_patterns(BlobStore.OBJECTS_DIR_NAME))
                 self.logger.info(f"成功备份存储目录到: {backup_path}")
                 return True
             else:
@@ -0,0 +1,292 @@
+"""
+跨项目索引模块
+在项目根目录下的本地数据库中记录所有项目的合同号、客户名、收入主体和金额，
+项目保存时更新，跨项目查找和汇总直接查询索引，无需加载各项目的数据库
+"""
+
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+class GlobalIndex:
+    """跨项目索引类
+
+    - projects: 已索引的项目及其记录版本号（Database.records_version），版本未变化时不重建
+    - records: 每个项目的每条收入记录一行，合同号、客户名、收入主体各有索引（不区分大小写）
+    - groups: 每个项目按合同号、客户名、收入主体预先汇总的记录数和金额，跨项目汇总只需合并各项目的分组
+    项目的记录变化后只改写变化的记录和受影响的分组，变化较多（如导入）时整体替换该项目的行；
+    索引只用于查找和汇总，可以随时从项目数据库重建。
+    """
+
+    # 可以查找和汇总的字段: 字段名 -> 显示名称
+    FIELDS = {
+        "contract_id": "合同号",
+        "client_name": "客户名",
+        "subject_entity": "收入主体"
+    }
+    # 变化的记录超过该数量时整体重建该项目的索引（逐个重算分组反而更慢）
+    INCREMENTAL_LIMIT = 1000
+
+    def __init__(self, index_file: Path):
+        self.logger = logging.getLogger(__name__)
+        self.index_file = Path(index_file)
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.index_file), check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._init_schema()
+
+    def _init_schema(self):
+        """初始化索引表结构"""
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS projects ("
+                "project_id TEXT PRIMARY KEY, records_version INTEGER NOT NULL, "
+                "record_count INTEGER NOT NULL, updated_time TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "project_id TEXT NOT NULL, contract_id TEXT NOT NULL, client_name TEXT NOT NULL, "
+                "subject_entity TEXT NOT NULL, annual_income REAL NOT NULL, attachment_income REAL, "
+                "attachment_count INTEGER NOT NULL, PRIMARY KEY (project_id, contract_id))"
+            )
+            for field in self.FIELDS:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_records_{field} ON records({field} COLLATE NOCASE)"
+                )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS groups ("
+                "field TEXT NOT NULL, key TEXT NOT NULL COLLATE NOCASE, project_id TEXT NOT NULL, "
+                "record_count INTEGER NOT NULL, annual_income REAL NOT NULL, attachment_income REAL NOT NULL, "
+                "PRIMARY KEY (field, key, project_id))"
+            )
+
+    def close(self):
+        """关闭索引连接"""
+        with self._lock:
+            self._conn.close()
+
+    def get_indexed_versions(self) -> Dict[str, int]:
+        """已索引的项目: {项目ID: 记录版本号}"""
+        with self._lock:
+            rows = self._conn.execute("SELECT project_id, records_version FROM projects").fetchall()
+        return {row["project_id"]: row["records_version"] for row in rows}
+
+    def update_project(self, project_id: str, database, force: bool = False) -> bool:
+        """
+        用项目数据库更新索引
+
+        Args:
+            project_id: 项目ID
+            database: 项目数据库
+            force: 记录版本号未变化时也重建
+
+        Returns:
+            是否重建了该项目的索引
+        """
+        version = database.records_version
+        if not force:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT records_version FROM projects WHERE project_id = ?", (project_id,)
+                ).fetchone()
+            if row and row["records_version"] == version:
+                return False
+
+        rows = [
+            (project_id, record.contract_id, record.client_name or "", record.subject_entity or "",
+             float(record.annual_confirmed_income),
+             float(record.attachment_confirmed_income) if record.attachment_confirmed_income is not None else None,
+             record.attachment_count)
+            for record in list(database.income_records.values())
+        ]
+
+        with self._lock:
+            existing = {row[1]: tuple(row) for row in self._conn.execute(
+                "SELECT project_id, contract_id, client_name, subject_entity, annual_income, "
+                "attachment_income, attachment_count FROM records WHERE project_id = ?", (project_id,)
+            )}
+        current = {row[1]: row for row in rows}
+        removed = [existing[contract_id] for contract_id in existing.keys() - current.keys()]
+        changed = [row for contract_id, row in current.items() if existing.get(contract_id) != row]
+        if existing and len(removed) + len(changed) <= self.INCREMENTAL_LIMIT:
+            self._update_rows(project_id, version, len(rows), removed, changed,
+                              [existing[row[1]] for row in changed if row[1] in existing])
+            return True
+
+        # 按字段预先汇总；SQLite 的 NOCASE 只忽略 ASCII 字母大小写，分组键与之保持一致
+        groups = []
+        for position, field in enumerate(self.FIELDS, start=1):
+            totals: Dict[bytes, list] = {}
+            for row in rows:
+                total = totals.setdefault(row[position].encode("utf-8").lower(), [row[position], 0, 0.0, 0.0])
+                total[1] += 1
+                total[2] += row[4]
+                total[3] += row[5] or 0.0
+            groups.extend((field, key, project_id, count, annual, attachment)
+                          for key, count, annual, attachment in totals.values())
+
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM records WHERE project_id = ?", (project_id,))
+            self._conn.execute("DELETE FROM groups WHERE project_id = ?", (project_id,))
+            self._conn.executemany("INSERT INTO records VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany("INSERT INTO groups VALUES (?, ?, ?, ?, ?, ?)", groups)
+            self._conn.execute(
+                "INSERT INTO projects (project_id, records_version, record_count, updated_time) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT(project_id) DO UPDATE SET "
+                "records_version = excluded.records_version, record_count = excluded.record_count, "
+                "updated_time = excluded.updated_time",
+                (project_id, version, len(rows), datetime.now().isoformat())
+            )
+        self.logger.info(f"更新跨项目索引: {project_id}，{len(rows)} 条记录")
+        return True
+
+    def _update_rows(self, project_id: str, version: int, record_count: int,
+                     removed: List[tuple], changed: List[tuple], replaced: List[tuple]):
+        """只改写变化的记录，并按 records 表重算受影响的分组"""
+        affected = set()
+        for row in removed + changed + replaced:
+            for position, field in enumerate(self.FIELDS, start=1):
+                affected.add((field, row[position].encode("utf-8").lower(), row[position]))
+
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM records WHERE project_id = ? AND contract_id = ?",
+                                   [(project_id, row[1]) for row in removed])
+            self._conn.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)", changed)
+
+            seen = set()
+            for field, folded, key in affected:
+                if (field, folded) in seen:
+                    continue
+                seen.add((field, folded))
+                count, annual, attachment = self._conn.execute(
+                    f"SELECT COUNT(*), TOTAL(annual_income), TOTAL(attachment_income) FROM records "
+                    f"WHERE project_id = ? AND {field} = ? COLLATE NOCASE", (project_id, key)
+                ).fetchone()
+                if count:
+                    # 保留分组已有的显示键（大小写可能不同）
+                    updated = self._conn.execute(
+                        "UPDATE groups SET record_count = ?, annual_income = ?, attachment_income = ? "
+                        "WHERE field = ? AND key = ? AND project_id = ?",
+                        (count, annual, attachment, field, key, project_id)
+                    ).rowcount
+                    if not updated:
+                        self._conn.execute("INSERT INTO groups VALUES (?, ?, ?, ?, ?, ?)",
+                                           (field, key, project_id, count, annual, attachment))
+                else:
+                    self._conn.execute("DELETE FROM groups WHERE field = ? AND key = ? AND project_id = ?",
+                                       (field, key, project_id))
+
+            self._conn.execute(
+                "UPDATE projects SET records_version = ?, record_count = ?, updated_time = ? WHERE project_id = ?",
+                (version, record_count, datetime.now().isoformat(), project_id)
+            )
+        self.logger.info(f"更新跨项目索引: {project_id}，改写 {len(changed)} 条、删除 {len(removed)} 条记录")
+
+    def remove_project(self, project_id: str):
+        """从索引中删除项目"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM records WHERE project_id = ?", (project_id,))
+            self._conn.execute("DELETE FROM groups WHERE project_id = ?", (project_id,))
+            self._conn.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
+
+    def _where(self, keyword: str, field: Optional[str], exact: bool):
+        """生成查找条件：指定字段或全部字段，精确匹配或包含关键词（不区分大小写）"""
+        fields = [field] if field else list(self.FIELDS)
+        for name in fields:
+            if name not in self.FIELDS:
+                raise ValueError(f"不支持的字段: {name}")
+
+        if exact:
+            clause = " OR ".join(f"{name} = ? COLLATE NOCASE" for name in fields)
+            params = [keyword] * len(fields)
+        else:
+            clause = " OR ".join(f"{name} LIKE ? ESCAPE '\\'" for name in fields)
+            params = [self._like_pattern(keyword)] * len(fields)
+        return f"({clause})", params
+
+    @staticmethod
+    def _like_pattern(keyword: str) -> str:
+        """包含关键词的 LIKE 模式（转义通配符）"""
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{escaped}%"
+
+    def find(self, keyword: str, field: Optional[str] = None, exact: bool = False,
+             limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        查找出现了指定合同号、客户名或收入主体的所有项目记录
+
+        Args:
+            keyword: 关键词
+            field: 查找的字段（contract_id、client_name、subject_entity），None表示全部字段
+            exact: 是否精确匹配（否则包含关键词即可）
+            limit: 最多返回的记录数
+
+        Returns:
+            记录列表，按项目和合同号排序
+        """
+        keyword = keyword.strip()
+        if not keyword:
+            return []
+
+        where, params = self._where(keyword, field, exact)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM records WHERE {where} ORDER BY project_id, contract_id LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def rollup(self, group_by: str = "client_name", keyword: str = "",
+               limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        按合同号、客户名或收入主体跨项目汇总
+
+        Args:
+            group_by: 汇总字段（contract_id、client_name、subject_entity）
+            keyword: 只汇总该字段包含关键词的记录，为空时汇总全部
+            limit: 最多返回的分组数
+
+        Returns:
+            分组列表: key、project_count、record_count、annual_income、attachment_income、
+            projects（出现的项目ID列表），按收入合计从大到小排序
+        """
+        if group_by not in self.FIELDS:
+            raise ValueError(f"不支持的字段: {group_by}")
+
+        where, params = "field = ?", [group_by]
+        keyword = keyword.strip()
+        if keyword:
+            where += " AND key LIKE ? ESCAPE '\\'"
+            params.append(self._like_pattern(keyword))
+
+        # 合并各项目的预汇总分组；项目ID可能包含逗号，用单元分隔符连接
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, COUNT(*) AS project_count, SUM(record_count) AS record_count, "
+                f"SUM(annual_income) AS annual_income, SUM(attachment_income) AS attachment_income, "
+                f"GROUP_CONCAT(project_id, char(31)) AS projects "
+                f"FROM groups WHERE {where} GROUP BY key ORDER BY annual_income DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+
+        result = []
+        for row in rows:
+            group = dict(row)
+            group["projects"] = group["projects"].split("\x1f") if group["projects"] else []
+            result.append(group)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """索引统计: 项目数、记录数"""
+        with self._lock:
+            project_count, record_count = self._conn.execute(
+                "SELECT COUNT(*), TOTAL(record_count) FROM projects"
+            ).fetchone()
+        return {"project_count": project_count, "record_count": int(record_count)}
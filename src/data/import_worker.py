@@ -0,0 +1,163 @@
+"""
+后台导入模块
+在工作线程中完成读取、转换、差异对比和写盘，通过队列向界面发送进度事件
+"""
+
+import logging
+import queue
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .excel_handler import ExcelHandler
+from ..models.database import Database
+
+
+class ImportWorker:
+    """后台导入工作线程类
+
+    事件通过 events 队列发送，每个事件为字典：
+    - {"type": "progress", "stage": 阶段, "current": 当前数量, "total": 总数量}
+    - {"type": "done", "snapshot": 数据快照, "temp_file": 临时文件, "record_count": 记录数}
+    - {"type": "error", "message": 错误信息}
+    - {"type": "cancelled"}
+
+    阶段包括 parse(读取行)、convert(转换行)、diff(差异对比)、write(写入字节)。
+    数据库只在界面线程调用 Database.commit_import 后才会改变，取消不会影响数据库。
+    """
+
+    STAGE_NAMES = {
+        "parse": "读取数据",
+        "convert": "转换记录",
+        "diff": "对比差异",
+        "write": "写入数据"
+    }
+
+    def __init__(self, excel_handler: ExcelHandler, database: Database, file_path: str,
+                 sheet_name: Optional[str], column_mapping: Optional[Dict[str, str]],
+                 version_info: Dict[str, Any]):
+        self.logger = logging.getLogger(__name__)
+        self.excel_handler = excel_handler
+        self.database = database
+        self.file_path = file_path
+        self.sheet_name = sheet_name
+        self.column_mapping = column_mapping
+        self.version_info = version_info
+
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self.cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ImportWorker", daemon=True)
+
+    def start(self):
+        """启动后台导入"""
+        self._thread.start()
+
+    def cancel(self):
+        """请求取消导入"""
+        self.cancel_event.set()
+
+    @property
+    def is_cancelled(self) -> bool:
+        """是否已请求取消"""
+        return self.cancel_event.is_set()
+
+    def is_alive(self) -> bool:
+        """工作线程是否仍在运行"""
+        return self._thread.is_alive()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待工作线程结束
+
+        Returns:
+            工作线程是否已结束
+        """
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def discard_pending(self):
+        """丢弃已完成但未提交的导入的临时文件"""
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                return
+            if event["type"] == "done":
+                self.discard(event.get("temp_file"))
+
+    def discard(self, temp_file: Optional[Path]):
+        """丢弃未提交的临时文件"""
+        if temp_file:
+            try:
+                self.database.discard_import(Path(temp_file))
+            except Exception as e:
+                self.logger.warning(f"删除导入临时文件失败: {e}")
+
+    def _emit(self, event_type: str, **kwargs):
+        """发送事件"""
+        event = {"type": event_type}
+        event.update(kwargs)
+        self.events.put(event)
+
+    def _progress(self, stage: str, current: int, total: int):
+        """发送进度事件"""
+        self._emit("progress", stage=stage, current=current, total=total)
+
+    def _run(self):
+        """工作线程主流程"""
+        try:
+            # 1. 读取文件
+            self._progress("parse", 0, 0)
+            success, df, error_msg = self.excel_handler.read_data_file(
+                self.file_path, self.sheet_name, self.column_mapping, self._progress, self.cancel_event
+            )
+            if self.is_cancelled:
+                self._emit("cancelled")
+                return
+            if not success:
+                self._emit("error", message=error_msg)
+                return
+            self._progress("parse", len(df), len(df))
+
+            if self.is_cancelled:
+                self._emit("cancelled")
+                return
+
+            # 2. 转换记录
+            success, records, error_msg = self.excel_handler.dataframe_to_income_records(
+                df, self.column_mapping, self._progress, self.cancel_event
+            )
+            del df
+
+            if self.is_cancelled:
+                self._emit("cancelled")
+                return
+
+            if not success or not records:
+                self._emit("error", message=error_msg or "没有找到有效的数据，请检查Excel文件格式和列映射")
+                return
+
+            # 3. 差异对比（在副本上进行）
+            snapshot = self.database.prepare_import(records, self.version_info, self._progress, self.cancel_event)
+            if snapshot is None:
+                if self.is_cancelled:
+                    self._emit("cancelled")
+                else:
+                    self._emit("error", message="数据对比失败")
+                return
+
+            # 4. 写入临时文件
+            temp_file = self.database.write_snapshot(snapshot, self._progress, self.cancel_event)
+            if temp_file is None:
+                if self.is_cancelled:
+                    self._emit("cancelled")
+                else:
+                    self._emit("error", message="保存导入数据失败")
+                return
+
+            self._emit("done", snapshot=snapshot, temp_file=temp_file, record_count=len(records))
+
+        except Exception as e:
+            self.logger.error(f"后台导入失败: {e}", exc_info=True)
+            self._emit("error", message=f"导入失败: {e}")
@@ -3,16 +3,41 @@
 负责项目的创建、切换和管理
 """
 
+import atexit
+import copy
 import logging
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, Callable
 from datetime import datetime
 import shutil
 
+from ..config import ATTACHMENT_CONFIG, INGEST_MODES, BACKUP_CONFIG
+from .backup_repository import BackupRepository
+from .project_summary import summary_file, load_summary
+from .global_index import GlobalIndex
+from .blob_store import remove_tree
+
 
 class ProjectManager:
-    """项目管理器类"""
+    """项目管理器类
+    
+    项目配置（projects_config.json）只在项目增删、设置修改时写入；最后访问时间、记录数量和
+    当前项目等经常变化的字段单独保存在 projects_state.json 中。两个文件都延迟合并写入
+    （SAVE_DELAY 秒内的多次修改只写一次），先写临时文件再替换，程序退出时写入未保存的修改。
+    """
+    
+    SAVE_DELAY = 1.0
+    STATE_FIELDS = ("last_accessed", "record_count")
+    BACKUP_REPOSITORY_NAME = "repository"
+    GLOBAL_INDEX_NAME = "global_index.db"
+    LINK_WORKERS = 8  # 年度结转时并行链接附件的线程数
+    HIBERNATE_KEEP_BACKUPS = 1  # 项目休眠时保留的增量备份数量
+    # 可以重新生成的缓存（附件目录、全文索引、缩略图）不备份
+    BACKUP_EXCLUDE = ["attachments_*.db*", "content_*.db*", "thumbnails/*", "*.tmp"]
     
     def __init__(self, projects_root: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
@@ -23,12 +48,31 @@ class ProjectManager:
         else:
             self.projects_root = Path("projects")
         
-        # 项目配置文件
+        # 项目配置文件和状态文件
         self.config_file = self.projects_root / "projects_config.json"
+        self.state_file = self.projects_root / "projects_state.json"
         
         # 确保目录存在
         self.projects_root.mkdir(parents=True, exist_ok=True)
         
+        # 延迟写入
+        self._config_lock = threading.RLock()
+        self._save_timer: Optional[threading.Timer] = None
+        self._config_dirty = False
+        self._state_dirty = False
+        atexit.register(self.flush)
+        
+        # 项目摘要缓存 {项目ID: (摘要文件修改时间, 摘要)}
+        self._summary_cache: Dict[str, Tuple[int, Optional[Dict]]] = {}
+        
+        # 跨项目索引（首次使用时打开）
+        self._global_index: Optional[GlobalIndex] = None
+        self._global_index_lock = threading.Lock()
+        # 等待后台更新索引的项目 {项目ID: 数据库}，同一项目连续保存只更新最后一次
+        self._index_pending: Dict[str, object] = {}
+        self._index_pending_lock = threading.Lock()
+        self._index_worker: Optional[threading.Thread] = None
+        
         # 加载项目配置
         self.projects_config = self.load_projects_config()
         
@@ -43,6 +87,7 @@ class ProjectManager:
             if self.config_file.exists():
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
+                self._apply_state(config)
                 self.logger.info(f"加载项目配置: {len(config.get('projects', {}))} 个项目")
                 return config
             else:
@@ -65,24 +110,100 @@ class ProjectManager:
                 "projects": {}
             }
     
-    def save_projects_config(self, config: Optional[Dict] = None) -> bool:
-        """保存项目配置"""
+    def _apply_state(self, config: Dict):
+        """将状态文件中的当前项目、最后访问时间和记录数量合并到项目配置中"""
+        if not self.state_file.exists():
+            return
         try:
-            if config is None:
-                config = self.projects_config
-            
-            config["last_modified"] = datetime.now().isoformat()
-            
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
-            
-            self.projects_config = config
-            self.logger.info("项目配置保存成功")
-            return True
-            
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
         except Exception as e:
-            self.logger.error(f"保存项目配置失败: {e}")
-            return False
+            self.logger.warning(f"加载项目状态失败: {e}")
+            return
+        
+        if "current_project" in state:
+            config["current_project"] = state["current_project"]
+        for project_id, project_state in state.get("projects", {}).items():
+            if project_id in config.get("projects", {}):
+                config["projects"][project_id].update(
+                    {key: value for key, value in project_state.items() if key in self.STATE_FIELDS}
+                )
+    
+    def reload(self):
+        """重新读取配置（其他窗口中的项目管理器修改配置后调用）"""
+        self.flush()
+        with self._config_lock:
+            self.projects_config = self.load_projects_config()
+            self.current_project = self.projects_config.get("current_project")
+    
+    def save_projects_config(self, config: Optional[Dict] = None) -> bool:
+        """保存项目配置（延迟写入）"""
+        with self._config_lock:
+            if config is not None:
+                self.projects_config = config
+            self._config_dirty = True
+            self._state_dirty = True
+            self._schedule_save()
+        return True
+    
+    def save_project_state(self) -> bool:
+        """保存当前项目、最后访问时间和记录数量（延迟写入，不重写项目配置）"""
+        with self._config_lock:
+            self._state_dirty = True
+            self._schedule_save()
+        return True
+    
+    def _schedule_save(self):
+        """SAVE_DELAY 秒后写入，期间的修改合并为一次写入"""
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+    
+    def flush(self) -> bool:
+        """立即写入未保存的配置和状态"""
+        with self._config_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            if not self._config_dirty and not self._state_dirty:
+                return True
+            
+            try:
+                if self._config_dirty:
+                    self.projects_config["last_modified"] = datetime.now().isoformat()
+                    config = {key: value for key, value in self.projects_config.items() if key != "current_project"}
+                    config["projects"] = {
+                        project_id: {key: value for key, value in project.items() if key not in self.STATE_FIELDS}
+                        for project_id, project in self.projects_config["projects"].items()
+                    }
+                    self._write_json(self.config_file, config, indent=2)
+                    self._config_dirty = False
+                
+                if self._state_dirty:
+                    state = {
+                        "current_project": self.projects_config.get("current_project"),
+                        "projects": {
+                            project_id: {key: project[key] for key in self.STATE_FIELDS if key in project}
+                            for project_id, project in self.projects_config["projects"].items()
+                        }
+                    }
+                    self._write_json(self.state_file, state)
+                    self._state_dirty = False
+                
+                self.logger.debug("项目配置保存成功")
+                return True
+                
+            except Exception as e:
+                self.logger.error(f"保存项目配置失败: {e}")
+                return False
+    
+    def _write_json(self, file_path: Path, data: Dict, indent: Optional[int] = None):
+        """先写临时文件再替换，避免写入中断损坏文件"""
+        temp_file = file_path.with_name(file_path.name + ".tmp")
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+        os.replace(temp_file, file_path)
     
     def create_project(self, project_name: str, project_description: str = "", 
                       storage_path: Optional[str] = None) -> Tuple[bool, str, str]:
@@ -145,11 +266,13 @@ class ProjectManager:
                 "backups_dir": str(backups_dir),
                 "database_file": str(data_dir / "database.pkl"),
                 "record_count": 0,
+                "ingest_mode": ATTACHMENT_CONFIG.get("ingest_mode", "fast"),
                 "status": "active"
             }
             
             # 保存项目配置
-            self.projects_config["projects"][project_id] = project_config
+            with self._config_lock:
+                self.projects_config["projects"][project_id] = project_config
             
             # 创建项目级别的配置文件
             project_config_file = project_dir / "project_config.json"
@@ -198,6 +321,34 @@ class ProjectManager:
             self.logger.error(f"获取项目列表失败: {e}")
             return []
     
+    def get_project_summary(self, project_id: str) -> Optional[Dict]:
+        """
+        读取项目摘要（数据库保存时写入的 summary.json），不加载项目数据库
+        
+        Args:
+            project_id: 项目ID
+            
+        Returns:
+            摘要字典，没有摘要（旧项目尚未打开过）时返回None
+        """
+        project_config = self.projects_config["projects"].get(project_id)
+        if not project_config or not project_config.get("data_dir"):
+            return None
+        
+        try:
+            mtime = summary_file(project_config["data_dir"]).stat().st_mtime_ns
+        except OSError:
+            self._summary_cache.pop(project_id, None)
+            return None
+        
+        cached = self._summary_cache.get(project_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        
+        summary = load_summary(project_config["data_dir"])
+        self._summary_cache[project_id] = (mtime, summary)
+        return summary
+    
     def switch_project(self, project_id: str) -> Tuple[bool, Dict, str]:
         """
         切换到指定项目
@@ -219,15 +370,23 @@ class ProjectManager:
             if not project_dir.exists():
                 return False, {}, "项目目录不存在"
             
-            # 更新当前项目
-            self.current_project = project_id
-            self.projects_config["current_project"] = project_id
-            
-            # 更新最后访问时间
-            project_config["last_accessed"] = datetime.now().isoformat()
+            with self._config_lock:
+                # 更新当前项目
+                self.current_project = project_id
+                self.projects_config["current_project"] = project_id
+                
+                # 更新最后访问时间
+                project_config["last_accessed"] = datetime.now().isoformat()
+                
+                # 休眠项目重新使用，附件在打开合同时按需解出
+                reactivated = project_config.get("status") == "hibernated"
+                if reactivated:
+                    project_config["status"] = "active"
             
-            # 保存配置
-            self.save_projects_config()
+            # 保存状态（不重写项目配置）
+            self.save_project_state()
+            if reactivated:
+                self.save_projects_config()
             
             self.logger.info(f"切换到项目: {project_config['name']} ({project_id})")
             return True, project_config, ""
@@ -273,24 +432,29 @@ class ProjectManager:
             
             project_config = self.projects_config["projects"][project_id]
             
-            # 如果是当前项目，则清除当前项目设置
-            if self.current_project == project_id:
-                self.current_project = None
-                self.projects_config["current_project"] = None
-            
-            # 删除项目配置
-            del self.projects_config["projects"][project_id]
+            with self._config_lock:
+                # 如果是当前项目，则清除当前项目设置
+                if self.current_project == project_id:
+                    self.current_project = None
+                    self.projects_config["current_project"] = None
+                
+                # 删除项目配置
+                del self.projects_config["projects"][project_id]
             
             # 如果需要删除文件
             if delete_files:
                 project_dir = Path(project_config["project_dir"])
                 if project_dir.exists():
-                    shutil.rmtree(project_dir)
+                    remove_tree(project_dir)
                     self.logger.info(f"删除项目文件: {project_dir}")
             
             # 保存配置
             self.save_projects_config()
             
+            global_index = self.get_global_index()
+            if global_index:
+                global_index.remove_project(project_id)
+            
             self.logger.info(f"删除项目: {project_config['name']} ({project_id})")
             return True, ""
             
@@ -306,9 +470,10 @@ class ProjectManager:
                 project_id = self.current_project
             
             if project_id and project_id in self.projects_config["projects"]:
-                self.projects_config["projects"][project_id]["record_count"] = count
-                self.projects_config["projects"][project_id]["last_accessed"] = datetime.now().isoformat()
-                return self.save_projects_config()
+                with self._config_lock:
+                    self.projects_config["projects"][project_id]["record_count"] = count
+                    self.projects_config["projects"][project_id]["last_accessed"] = datetime.now().isoformat()
+                return self.save_project_state()
             
             return False
             
@@ -316,59 +481,559 @@ class ProjectManager:
             self.logger.error(f"更新项目记录数量失败: {e}")
             return False
     
-    def backup_project(self, project_id: Optional[str] = None) -> Tuple[bool, str, str]:
+    def set_project_ingest_mode(self, mode: str, project_id: Optional[str] = None) -> bool:
+        """设置项目的附件导入方式（copy/fast/link）"""
+        try:
+            if project_id is None:
+                project_id = self.current_project
+            
+            if mode not in INGEST_MODES or project_id not in self.projects_config["projects"]:
+                return False
+            
+            project_config = self.projects_config["projects"][project_id]
+            with self._config_lock:
+                project_config["ingest_mode"] = mode
+            
+            # 同步项目级别的配置文件
+            project_config_file = Path(project_config["project_dir"]) / "project_config.json"
+            if project_config_file.exists():
+                with open(project_config_file, 'r', encoding='utf-8') as f:
+                    file_config = json.load(f)
+                file_config["ingest_mode"] = mode
+                with open(project_config_file, 'w', encoding='utf-8') as f:
+                    json.dump(file_config, f, indent=2, ensure_ascii=False)
+            
+            return self.save_projects_config()
+            
+        except Exception as e:
+            self.logger.error(f"设置附件导入方式失败: {e}")
+            return False
+    
+    def get_global_index(self) -> Optional[GlobalIndex]:
+        """获取跨项目索引，无法打开时返回None"""
+        with self._global_index_lock:
+            if self._global_index is None:
+                try:
+                    self._global_index = GlobalIndex(self.projects_root / self.GLOBAL_INDEX_NAME)
+                except Exception as e:
+                    self.logger.error(f"打开跨项目索引失败: {e}")
+                    return None
+            return self._global_index
+    
+    def update_global_index(self, project_id: str, database) -> bool:
+        """
+        用项目数据库更新跨项目索引（项目数据库保存后调用，记录未变化时不重建）
+        
+        Args:
+            project_id: 项目ID
+            database: 项目数据库
+            
+        Returns:
+            是否成功
+        """
+        global_index = self.get_global_index()
+        if not global_index:
+            return False
+        try:
+            global_index.update_project(project_id, database)
+            return True
+        except Exception as e:
+            self.logger.error(f"更新跨项目索引失败: {e}")
+            return False
+    
+    def schedule_global_index_update(self, project_id: str, database):
+        """
+        在后台线程中更新跨项目索引（项目数据库保存后调用，不阻塞界面）
+        
+        索引中记录了更新时的记录版本号，程序退出时未完成的更新会在下次打开项目时补上。
+        
+        Args:
+            project_id: 项目ID
+            database: 项目数据库
+        """
+        with self._index_pending_lock:
+            self._index_pending[project_id] = database
+            if self._index_worker is not None:
+                return
+            self._index_worker = threading.Thread(target=self._run_index_updates,
+                                                  name="GlobalIndexUpdate", daemon=True)
+            self._index_worker.start()
+    
+    def _run_index_updates(self):
+        """后台更新跨项目索引，直到没有等待更新的项目"""
+        while True:
+            with self._index_pending_lock:
+                if not self._index_pending:
+                    self._index_worker = None
+                    return
+                project_id, database = self._index_pending.popitem()
+            self.update_global_index(project_id, database)
+    
+    def index_missing_projects(self, progress_callback: Optional[Callable[[int, int], None]] = None,
+                               cancel_event: Optional[threading.Event] = None) -> Tuple[bool, int, str]:
+        """
+        将尚未收录到跨项目索引的项目（功能启用前创建、之后没有保存过的项目）加入索引，
+        需要逐个加载这些项目的数据库
+        
+        Args:
+            progress_callback: 进度回调 (已完成项目数, 项目总数)
+            cancel_event: 设置后停止
+            
+        Returns:
+            (是否成功, 新收录的项目数, 错误信息)
+        """
+        from ..models.database import Database
+        
+        global_index = self.get_global_index()
+        if not global_index:
+            return False, 0, "跨项目索引不可用"
+        
+        try:
+            indexed = global_index.get_indexed_versions()
+            missing = [
+                (project_id, project_config) for project_id, project_config in self.projects_config["projects"].items()
+                if project_id not in indexed and Path(project_config.get("database_file", "")).is_file()
+            ]
+            
+            for done, (project_id, project_config) in enumerate(missing):
+                if cancel_event is not None and cancel_event.is_set():
+                    return False, done, "已取消"
+                global_index.update_project(project_id, Database(Path(project_config["database_file"])))
+                if progress_callback:
+                    progress_callback(done + 1, len(missing))
+            
+            return True, len(missing), ""
+            
+        except Exception as e:
+            error_msg = f"收录项目到跨项目索引失败: {e}"
+            self.logger.error(error_msg)
+            return False, 0, error_msg
+    
+    def get_backup_repository(self, project_id: Optional[str] = None) -> Optional[BackupRepository]:
+        """获取项目的增量备份仓库（<备份目录>/repository）"""
+        if project_id is None:
+            project_id = self.current_project
+        project_config = self.projects_config["projects"].get(project_id) if project_id else None
+        if not project_config:
+            return None
+        return BackupRepository(Path(project_config["backups_dir"]) / self.BACKUP_REPOSITORY_NAME)
+    
+    def backup_project(self, project_id: Optional[str] = None, include_attachments: bool = False,
+                       progress_callback: Optional[Callable[[int, int], None]] = None,
+                       cancel_event: Optional[threading.Event] = None,
+                       throttle: Optional[Callable[[int], None]] = None) -> Tuple[bool, Dict, str]:
         """
-        备份项目
+        增量备份项目（数据目录和项目配置，可选附件）
+        
+        只保存变化的数据块和一份备份清单，未变化的文件不会重新读取。
+        备份附件时包括休眠项目的附件包（.hibernate 文件夹）。
+        备份完成后按 max_backup_files 删除最旧的备份。
         
         Args:
             project_id: 项目ID，如果为None则备份当前项目
+            include_attachments: 是否同时备份附件
+            progress_callback: 进度回调 (已处理文件数, 总文件数)
+            cancel_event: 取消事件
+            throttle: 限速回调（见 BackupRepository.create_snapshot）
             
         Returns:
-            (是否成功, 备份文件路径, 错误信息)
+            (是否成功, 备份信息, 错误信息)
         """
+        from .attachment_archive import AttachmentArchive
+        
         try:
             if project_id is None:
                 project_id = self.current_project
             
             if not project_id or project_id not in self.projects_config["projects"]:
-                return False, "", "项目不存在"
+                return False, {}, "项目不存在"
             
             project_config = self.projects_config["projects"][project_id]
             project_dir = Path(project_config["project_dir"])
             
             if not project_dir.exists():
-                return False, "", "项目目录不存在"
+                return False, {}, "项目目录不存在"
             
-            # 创建备份文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"backup_{project_config['name']}_{timestamp}"
-            backups_dir = Path(project_config["backups_dir"])
-            backup_path = backups_dir / f"{backup_name}.zip"
-            
-            # 创建备份
-            import zipfile
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                # 备份数据目录
-                data_dir = Path(project_config["data_dir"])
-                if data_dir.exists():
-                    for file_path in data_dir.rglob("*"):
-                        if file_path.is_file():
-                            arcname = file_path.relative_to(project_dir)
-                            zipf.write(file_path, arcname)
-                
-                # 备份项目配置
-                project_config_file = project_dir / "project_config.json"
-                if project_config_file.exists():
-                    zipf.write(project_config_file, "project_config.json")
+            sources = {
+                "data": Path(project_config["data_dir"]),
+                "config": project_dir / "project_config.json"
+            }
+            if include_attachments:
+                sources["attachments"] = Path(project_config["attachments_dir"])
+            
+            repository = self.get_backup_repository(project_id)
+            label = "数据和附件" if include_attachments else "数据"
+            snapshot = repository.create_snapshot(sources, label, self.BACKUP_EXCLUDE,
+                                                  progress_callback, cancel_event, throttle,
+                                                  include_hidden=[AttachmentArchive.ARCHIVE_DIR_NAME])
+            if not snapshot:
+                return False, {}, "备份已取消"
             
-            self.logger.info(f"项目备份成功: {backup_path}")
-            return True, str(backup_path), ""
+            try:
+                repository.prune(BACKUP_CONFIG.get("max_backup_files", 10))
+            except Exception as e:
+                self.logger.warning(f"清理旧备份失败: {e}")
+            
+            self.logger.info(f"项目备份成功: {project_config['name']} ({snapshot['id']})")
+            return True, snapshot, ""
             
         except Exception as e:
             error_msg = f"备份项目失败: {e}"
             self.logger.error(error_msg)
+            return False, {}, error_msg
+    
+    def list_project_backups(self, project_id: Optional[str] = None) -> List[Dict]:
+        """列出项目的备份（最新的在前）"""
+        try:
+            repository = self.get_backup_repository(project_id)
+            return repository.list_snapshots() if repository else []
+        except Exception as e:
+            self.logger.error(f"获取备份列表失败: {e}")
+            return []
+    
+    def verify_project_backup(self, snapshot_id: str, project_id: Optional[str] = None) -> Tuple[bool, Dict, str]:
+        """
+        完整校验项目备份（读取全部数据块并核对哈希）
+        
+        Args:
+            snapshot_id: 备份ID
+            project_id: 项目ID，如果为None则使用当前项目
+            
+        Returns:
+            (是否通过, 校验结果, 错误信息)
+        """
+        try:
+            repository = self.get_backup_repository(project_id)
+            if not repository:
+                return False, {}, "项目不存在"
+            
+            result = repository.verify_snapshot(snapshot_id)
+            if result["failed_chunks"]:
+                return False, result, f"{result['failed_chunks']} 个数据块缺失或已损坏"
+            return True, result, ""
+            
+        except Exception as e:
+            error_msg = f"校验备份失败: {e}"
+            self.logger.error(error_msg)
+            return False, {}, error_msg
+    
+    def restore_project_backup(self, snapshot_id: str, target_dir: str,
+                               project_id: Optional[str] = None) -> Tuple[bool, str, str]:
+        """
+        将项目备份恢复到指定文件夹（不覆盖正在使用的项目）
+        
+        Args:
+            snapshot_id: 备份ID
+            target_dir: 目标文件夹
+            project_id: 项目ID，如果为None则使用当前项目
+            
+        Returns:
+            (是否成功, 恢复到的文件夹, 错误信息)
+        """
+        try:
+            repository = self.get_backup_repository(project_id)
+            if not repository:
+                return False, "", "项目不存在"
+            
+            target = Path(target_dir) / f"restore_{snapshot_id}"
+            count = repository.restore_snapshot(snapshot_id, target)
+            self.logger.info(f"恢复备份成功: {snapshot_id}，{count}个文件")
+            return True, str(target), ""
+            
+        except Exception as e:
+            error_msg = f"恢复备份失败: {e}"
+            self.logger.error(error_msg)
             return False, "", error_msg
     
+    def rollover_project(self, source_project_id: str, project_name: str, project_description: str = "",
+                         storage_path: Optional[str] = None, include_attachments: bool = True,
+                         progress_callback: Optional[Callable[[int, int], None]] = None,
+                         cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Dict, str]:
+        """
+        年度结转：以现有项目为基础创建新项目
+        
+        新项目沿用每条记录的合同号、客户名、收入主体、差异备注和关联附件，金额清零待重新导入。
+        附件依次尝试写时复制(reflink)和硬链接，不复制文件内容；两个项目的附件位于不同磁盘时只能复制。
+        硬链接与原项目共用同一份数据：附件删除、改名、移动互不影响，但原地修改文件内容会同时改变两个项目的附件
+        （通过本程序打开附件前会先换成独立副本，见 FileManager.detach_attachment）。
+        原项目已休眠时先解出全部附件（原项目恢复为活动状态）。
+        
+        Args:
+            source_project_id: 结转的项目ID
+            project_name: 新项目名称
+            project_description: 新项目描述
+            storage_path: 新项目的附件存储路径；为空时原项目使用默认路径则同样使用默认路径，
+                原项目使用外部存储则放在原附件目录旁边（同一磁盘才能链接）
+            include_attachments: 是否结转附件
+            progress_callback: 附件进度回调 (已处理数, 总数)，解出休眠项目的附件时也使用
+            cancel_event: 设置后停止，并删除未完成的新项目
+            
+        Returns:
+            (是否成功, 结果 {project_id, record_count, attachment_count, missing_count, methods, elapsed}, 错误信息)
+        """
+        from ..models.database import Database
+        from ..models.income_record import IncomeRecord
+        from .attachment_archive import AttachmentArchive
+        from .fast_copy import FastCopier
+        from .project_summary import ProjectSummaryWriter
+        
+        start = datetime.now()
+        source_config = self.projects_config["projects"].get(source_project_id)
+        if not source_config:
+            return False, {}, "项目不存在"
+        
+        source_root = Path(source_config["attachments_dir"])
+        
+        # 休眠项目的附件在附件包中，先全部解出，否则所有附件都会被当作缺失
+        if include_attachments and AttachmentArchive.exists(source_root):
+            success, _, error_msg = self.thaw_project(source_project_id, progress_callback, cancel_event)
+            if not success:
+                return False, {}, f"解出原项目的附件失败: {error_msg}"
+        
+        if not storage_path and Path(source_config["project_dir"]) not in source_root.parents:
+            storage_path = str(source_root.parent / f"{self._sanitize_name(project_name.strip())}_attachments")
+        created_storage = bool(storage_path) and not Path(storage_path).exists()
+        
+        project_id = ""
+        try:
+            source_database = Database(Path(source_config["database_file"]))
+            
+            success, project_id, error_msg = self.create_project(project_name, project_description, storage_path)
+            if not success:
+                return False, {}, error_msg
+            project_config = self.projects_config["projects"][project_id]
+            target_root = Path(project_config["attachments_dir"])
+            
+            # 附件：源路径 -> 新路径（保持合同文件夹结构）
+            links: Dict[str, Path] = {}
+            missing_count = 0
+            if include_attachments:
+                for record in source_database.income_records.values():
+                    for file_path in record.attached_files:
+                        source_path = Path(file_path)
+                        if not source_path.is_file():
+                            missing_count += 1
+                            continue
+                        try:
+                            relative = source_path.relative_to(source_root)
+                        except ValueError:
+                            relative = Path(self._sanitize_name(record.contract_id)) / source_path.name
+                        links[file_path] = target_root / relative
+            
+            methods = self._link_attachments(FastCopier("link"), links, progress_callback, cancel_event)
+            if cancel_event is not None and cancel_event.is_set():
+                raise InterruptedError("已取消")
+            
+            # 结转记录：金额清零，保留客户、主体、备注和附件
+            database = Database(Path(project_config["database_file"]))
+            for contract_id, record in source_database.income_records.items():
+                database.income_records[contract_id] = IncomeRecord(
+                    contract_id=record.contract_id,
+                    client_name=record.client_name,
+                    annual_confirmed_income=0,
+                    subject_entity=record.subject_entity,
+                    difference_note=record.difference_note,
+                    attached_files=[str(links[f]) for f in record.attached_files if f in links]
+                )
+            for attachment_id, attachment in source_database.attachments.items():
+                if attachment.stored_path in links and attachment.contract_id in database.income_records:
+                    carried = copy.copy(attachment)
+                    carried.stored_path = str(links[attachment.stored_path])
+                    database.attachments[attachment_id] = carried
+            database.metadata["rolled_over_from"] = source_project_id
+            database.mark_records_changed()
+            if not database.save():
+                raise IOError("保存新项目数据库失败")
+            
+            ProjectSummaryWriter(project_config["data_dir"])(database)
+            self.update_global_index(project_id, database)
+            
+            with self._config_lock:
+                project_config["record_count"] = len(database.income_records)
+                project_config["ingest_mode"] = source_config.get("ingest_mode", project_config["ingest_mode"])
+                project_config["rolled_over_from"] = source_project_id
+            self.save_projects_config()
+            
+            result = {
+                "project_id": project_id,
+                "record_count": len(database.income_records),
+                "attachment_count": len(links),
+                "missing_count": missing_count,
+                "methods": methods,
+                "elapsed": round((datetime.now() - start).total_seconds(), 2)
+            }
+            self.logger.info(f"项目结转完成: {source_project_id} -> {project_id}，{result}")
+            return True, result, ""
+            
+        except Exception as e:
+            # 删除未完成的新项目
+            if project_id:
+                self.delete_project(project_id, delete_files=True)
+                if created_storage:
+                    remove_tree(storage_path, ignore_errors=True)
+            error_msg = "项目结转已取消" if isinstance(e, InterruptedError) else f"项目结转失败: {e}"
+            self.logger.error(error_msg)
+            return False, {}, error_msg
+    
+    def _link_attachments(self, copier, links: Dict[str, Path],
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          cancel_event: Optional[threading.Event] = None) -> Dict[str, int]:
+        """并行链接附件（网络驱动器上每个文件的元数据操作延迟较大），返回各方式的文件数"""
+        for target in {target.parent for target in links.values()}:
+            target.mkdir(parents=True, exist_ok=True)
+        
+        def link_one(item):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            return copier.copy(Path(item[0]), item[1])
+        
+        methods: Dict[str, int] = {}
+        with ThreadPoolExecutor(max_workers=self.LINK_WORKERS) as executor:
+            for done, method in enumerate(executor.map(link_one, links.items()), start=1):
+                if method:
+                    methods[method] = methods.get(method, 0) + 1
+                if progress_callback and (done % 100 == 0 or done == len(links)):
+                    progress_callback(done, len(links))
+        return methods
+    
+    def hibernate_project(self, project_id: str,
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          cancel_event: Optional[threading.Event] = None) -> Tuple[bool, Dict, str]:
+        """
+        休眠已完成的项目，减少占用的磁盘空间
+        
+        - 压缩数据库（清理版本历史中的合同号列表，gzip压缩保存；打开项目时自动识别，之后的保存恢复为不压缩）
+        - 附件打包为一个zip附件包，打开合同时只解出该合同的附件（见 AttachmentArchive）
+        - 删除可以重新生成的缓存（附件目录、全文索引、缩略图）
+        - 已有增量备份时先备份一次数据和附件包，成功后只保留这一次备份
+        - 更新项目摘要，项目列表仍然显示统计信息
+        
+        Args:
+            project_id: 项目ID（不能是当前打开的项目）
+            progress_callback: 附件打包进度回调 (已打包文件数, 文件总数)
+            cancel_event: 设置后停止打包（附件保持原样，数据库已压缩）
+            
+        Returns:
+            (是否成功, 统计信息, 错误信息)
+        """
+        from ..models.database import Database
+        from .attachment_archive import AttachmentArchive
+        from .blob_store import BlobStore
+        from .project_summary import ProjectSummaryWriter
+        
+        project_config = self.projects_config["projects"].get(project_id)
+        if not project_config:
+            return False, {}, "项目不存在"
+        if project_id == self.current_project:
+            return False, {}, "不能休眠当前打开的项目，请先切换到其他项目"
+        
+        try:
+            stats: Dict = {}
+            data_dir = Path(project_config["data_dir"])
+            database_file = Path(project_config["database_file"])
+            storage_root = Path(project_config["attachments_dir"])
+            
+            # 数据库
+            stats["database_before"] = database_file.stat().st_size if database_file.exists() else 0
+            database = Database(database_file)
+            database.compact()
+            if not database.save(compress=True):
+                return False, {}, "保存压缩后的数据库失败"
+            stats["database_after"] = database_file.stat().st_size
+            
+            # 附件（启用去重时同时释放去重存储的引用，对象无引用后删除）
+            archive = AttachmentArchive(storage_root)
+            if storage_root.is_dir() and not AttachmentArchive.exists(storage_root):
+                blob_store = BlobStore(storage_root) if (storage_root / BlobStore.OBJECTS_DIR_NAME).is_dir() else None
+                try:
+                    packed = archive.pack(progress_callback, cancel_event,
+                                          blob_store.release if blob_store else None)
+                finally:
+                    if blob_store:
+                        blob_store.close()
+                if packed is None:
+                    return False, stats, "已取消，附件未打包"
+                stats.update(packed)
+            
+            # 可以重新生成的缓存
+            freed = 0
+            for pattern in ("attachments_*.db*", "content_*.db*"):
+                for cache_file in data_dir.glob(pattern):
+                    freed += cache_file.stat().st_size
+                    cache_file.unlink()
+            thumbnails_dir = data_dir / "thumbnails"
+            if thumbnails_dir.is_dir():
+                freed += sum(f.stat().st_size for f in thumbnails_dir.rglob("*") if f.is_file())
+                shutil.rmtree(thumbnails_dir, ignore_errors=True)
+            stats["cache_freed"] = freed
+            
+            # 旧备份中的附件是打包前的文件，清理前先备份附件包，否则只剩的一次备份可能不含附件
+            repository = self.get_backup_repository(project_id)
+            if repository and repository.list_snapshots():
+                backed_up, _, error_msg = self.backup_project(project_id, include_attachments=True,
+                                                              cancel_event=cancel_event)
+                if backed_up:
+                    stats["backups_freed"] = repository.prune(self.HIBERNATE_KEEP_BACKUPS)["freed_bytes"]
+                else:
+                    self.logger.warning(f"休眠前备份失败，保留旧备份: {error_msg}")
+            
+            # 摘要（附件统计来自附件包索引）
+            totals = archive.pending_totals() if AttachmentArchive.exists(storage_root) else None
+            ProjectSummaryWriter(data_dir, lambda: totals)(database)
+            
+            with self._config_lock:
+                project_config["status"] = "hibernated"
+                project_config["hibernated_time"] = datetime.now().isoformat()
+            self.save_projects_config()
+            
+            self.logger.info(f"项目休眠完成: {project_config['name']} ({project_id})，{stats}")
+            return True, stats, ""
+            
+        except Exception as e:
+            error_msg = f"项目休眠失败: {e}"
+            self.logger.error(error_msg)
+            return False, {}, error_msg
+    
+    def thaw_project(self, project_id: str,
+                     progress_callback: Optional[Callable[[int, int], None]] = None,
+                     cancel_event: Optional[threading.Event] = None) -> Tuple[bool, int, str]:
+        """
+        解出休眠项目的全部附件（打开合同时会自动解出该合同的附件，只有需要全部附件时才调用）
+        
+        Args:
+            project_id: 项目ID
+            progress_callback: 进度回调 (已解出文件数, 文件总数)
+            cancel_event: 设置后停止，已解出的合同保留
+            
+        Returns:
+            (是否成功, 解出的文件数, 错误信息)
+        """
+        from .attachment_archive import AttachmentArchive
+        
+        project_config = self.projects_config["projects"].get(project_id)
+        if not project_config:
+            return False, 0, "项目不存在"
+        
+        try:
+            storage_root = Path(project_config["attachments_dir"])
+            count = 0
+            if AttachmentArchive.exists(storage_root):
+                archive = AttachmentArchive(storage_root)
+                count = archive.thaw_all(progress_callback, cancel_event)
+                archive.close()
+                if AttachmentArchive.exists(storage_root):
+                    return False, count, "已取消，部分附件尚未解出"
+            
+            with self._config_lock:
+                project_config["status"] = "active"
+            self.save_projects_config()
+            return True, count, ""
+            
+        except Exception as e:
+            error_msg = f"解出项目附件失败: {e}"
+            self.logger.error(error_msg)
+            return False, 0, error_msg
+    
     def _sanitize_name(self, name: str) -> str:
         """清理名称，移除不合法字符"""
         # 移除或替换不合法的文件名字符
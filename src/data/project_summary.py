@@ -0,0 +1,105 @@
+"""
+项目摘要模块
+数据库保存后在项目数据目录中写入一个小的摘要文件（记录数、收入合计、证据比例、差异数量、
+附件大小、最近导入时间），项目列表直接读取摘要，无需加载项目数据库
+"""
+
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+SUMMARY_FILE_NAME = "summary.json"
+
+
+def summary_file(data_dir) -> Path:
+    """项目摘要文件路径"""
+    return Path(data_dir) / SUMMARY_FILE_NAME
+
+
+def load_summary(data_dir) -> Optional[Dict[str, Any]]:
+    """读取项目摘要，不存在或无法读取时返回None"""
+    try:
+        with open(summary_file(data_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_summary(database, attachment_totals: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    根据数据库生成项目摘要
+
+    Args:
+        database: 项目数据库
+        attachment_totals: 附件目录统计（file_count、total_size），未知时为None
+
+    Returns:
+        摘要字典
+    """
+    stats = database.get_statistics()
+    last_import = ""
+    if database.versions:
+        import_time = database.versions[-1].get("import_time")
+        if isinstance(import_time, datetime):
+            last_import = import_time.isoformat()
+
+    return {
+        "record_count": stats.get("总记录数", 0),
+        "total_income": stats.get("总收入金额", 0),
+        "attachment_income": stats.get("已确认附件收入", 0),
+        "evidence_ratio": stats.get("证据获取比例", 0),
+        "difference_count": stats.get("有差异记录数", 0),
+        "matched_count": stats.get("无差异记录数", 0),
+        "records_with_files": stats.get("已关联附件数", 0),
+        "new_count": stats.get("新增合同数", 0),
+        "attachment_files": attachment_totals.get("file_count") if attachment_totals else None,
+        "attachment_bytes": attachment_totals.get("total_size") if attachment_totals else None,
+        "last_import": last_import,
+        "records_version": database.records_version,
+        "updated_time": datetime.now().isoformat()
+    }
+
+
+class ProjectSummaryWriter:
+    """项目摘要写入类
+
+    注册为数据库的保存监听器（Database.add_save_listener），记录和附件统计都没有变化时不重写摘要。
+    """
+
+    def __init__(self, data_dir, attachment_totals: Optional[Callable[[], Optional[Dict[str, Any]]]] = None):
+        """
+        Args:
+            data_dir: 项目数据目录
+            attachment_totals: 返回附件目录统计（file_count、total_size）的函数
+        """
+        self.logger = logging.getLogger(__name__)
+        self.summary_file = summary_file(data_dir)
+        self.attachment_totals = attachment_totals
+        self._written_key = None
+
+        existing = load_summary(data_dir)
+        if existing:
+            self._written_key = (existing.get("records_version"), existing.get("attachment_files"),
+                                 existing.get("attachment_bytes"))
+
+    def __call__(self, database):
+        """数据库保存后调用"""
+        try:
+            totals = self.attachment_totals() if self.attachment_totals else None
+            key = (database.records_version,
+                   totals.get("file_count") if totals else None,
+                   totals.get("total_size") if totals else None)
+            if key == self._written_key:
+                return
+
+            summary = build_summary(database, totals)
+            temp = self.summary_file.with_name(self.summary_file.name + ".tmp")
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False)
+            os.replace(temp, self.summary_file)
+            self._written_key = key
+        except Exception as e:
+            self.logger.warning(f"写入项目摘要失败: {e}")
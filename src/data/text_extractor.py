@@ -0,0 +1,155 @@
+"""
+附件文本提取模块
+从 .txt、.eml、.docx 和带文字层的 PDF 中提取纯文本，供全文索引使用
+
+函数都定义在模块顶层，可直接在进程池中调用。
+"""
+
+import importlib.util
+import re
+import shutil
+import subprocess
+import zipfile
+from email import policy
+from email.parser import BytesParser
+from html import unescape
+from pathlib import Path
+from typing import Tuple
+from xml.etree import ElementTree
+
+SUPPORTED_SUFFIXES = {".txt", ".eml", ".docx", ".pdf"}
+
+MAX_FILE_SIZE = 50 * 1024 * 1024  # 超过该大小的文件不提取
+MAX_TEXT_CHARS = 1_000_000  # 每个文件最多保留的字符数
+PDFTOTEXT_TIMEOUT = 60  # 秒
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_TAG_RE = re.compile(r"<[^>]+>")
+_BLANK_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+def can_extract(file_path) -> bool:
+    """文件类型是否支持提取文本"""
+    return Path(file_path).suffix.lower() in SUPPORTED_SUFFIXES
+
+
+def extract_text(file_path) -> str:
+    """
+    提取文件的纯文本
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        提取到的文本，不支持的类型或没有文字层的PDF返回空字符串
+    """
+    file_path = Path(file_path)
+    suffix = file_path.suffix.lower()
+    if suffix not in SUPPORTED_SUFFIXES or file_path.stat().st_size > MAX_FILE_SIZE:
+        return ""
+
+    if suffix == ".txt":
+        text = decode_bytes(file_path.read_bytes())
+    elif suffix == ".eml":
+        text = _extract_eml(file_path)
+    elif suffix == ".docx":
+        text = _extract_docx(file_path)
+    else:
+        text = _extract_pdf(file_path)
+
+    return _normalize(text)[:MAX_TEXT_CHARS]
+
+
+def extract_text_safe(file_path) -> Tuple[str, str]:
+    """
+    提取文本并捕获异常（用于进程池）
+
+    Returns:
+        (文本, 错误信息)
+    """
+    try:
+        return extract_text(file_path), ""
+    except Exception as e:
+        return "", str(e)
+
+
+def decode_bytes(data: bytes) -> str:
+    """按 UTF-8、GB18030 的顺序尝试解码文本"""
+    for encoding in ("utf-8-sig", "gb18030"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+
+def _normalize(text: str) -> str:
+    """合并连续空白，去掉空行"""
+    lines = (_BLANK_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _extract_eml(file_path: Path) -> str:
+    """提取邮件的主题、收发件人和正文"""
+    with open(file_path, "rb") as f:
+        message = BytesParser(policy=policy.default).parse(f)
+
+    parts = [str(message.get(header, "") or "") for header in ("Subject", "From", "To", "Date")]
+    plain, html = [], []
+    for part in message.walk():
+        if part.is_multipart() or part.get_content_disposition() == "attachment":
+            continue
+        content_type = part.get_content_type()
+        if content_type not in ("text/plain", "text/html"):
+            continue
+        try:
+            content = part.get_content()
+        except (LookupError, UnicodeDecodeError):
+            content = decode_bytes(part.get_payload(decode=True) or b"")
+        (plain if content_type == "text/plain" else html).append(content)
+
+    # 有纯文本正文时不再使用 HTML 版本
+    body = plain or [unescape(_TAG_RE.sub(" ", content)) for content in html]
+    return "\n".join(parts + body)
+
+
+def _extract_docx(file_path: Path) -> str:
+    """直接解析 docx 中的 word/document.xml（不依赖 python-docx）"""
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open("word/document.xml") as f:
+            pieces = []
+            for event, element in ElementTree.iterparse(f, events=("end",)):
+                tag = element.tag
+                if tag == _WORD_NS + "t":
+                    pieces.append(element.text or "")
+                elif tag == _WORD_NS + "tab":
+                    pieces.append("\t")
+                elif tag in (_WORD_NS + "p", _WORD_NS + "br"):
+                    pieces.append("\n")
+                    if tag == _WORD_NS + "p":
+                        element.clear()
+    return "".join(pieces)
+
+
+def _extract_pdf(file_path: Path) -> str:
+    """提取 PDF 文字层，依次尝试 PyMuPDF、pypdf 和 poppler 的 pdftotext，都不可用时返回空字符串"""
+    if importlib.util.find_spec("fitz") is not None:
+        import fitz
+
+        with fitz.open(str(file_path)) as document:
+            return "\n".join(page.get_text() for page in document)
+
+    if importlib.util.find_spec("pypdf") is not None:
+        from pypdf import PdfReader
+
+        reader = PdfReader(str(file_path))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+    if shutil.which("pdftotext"):
+        result = subprocess.run(
+            ["pdftotext", "-enc", "UTF-8", str(file_path), "-"],
+            check=True, capture_output=True, timeout=PDFTOTEXT_TIMEOUT
+        )
+        return result.stdout.decode("utf-8", errors="replace")
+
+    return ""
@@ -0,0 +1,193 @@
+"""
+附件缩略图缓存模块
+在后台线程池中生成图片缩略图和PDF首页预览，按内容哈希缓存到本地磁盘
+"""
+
+import logging
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import uuid
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import Optional, Callable
+
+from ..config import ATTACHMENT_CONFIG
+
+
+class ThumbnailCache:
+    """缩略图缓存类
+
+    缩略图保存在 <缓存目录>/<哈希前两位>/<哈希>_<尺寸>.png，内容相同的附件共用一张缩略图。
+    PDF首页依次尝试 PyMuPDF(fitz) 和 poppler 的 pdftoppm，都不可用时不生成预览。
+    """
+
+    IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+    PDF_SUFFIXES = {".pdf"}
+    HASH_ALGORITHM = "sha256"
+    HASH_CHUNK_SIZE = 1024 * 1024  # 分块计算哈希的块大小
+    INLINE_IMAGE_LIMIT = 16 * 1024 * 1024  # 不超过此大小的图片整体读入，哈希后直接解码
+    PDFTOPPM_TIMEOUT = 30  # 秒
+
+    def __init__(self, cache_dir: Path, size: Optional[int] = None, max_workers: Optional[int] = None):
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = Path(cache_dir)
+        self.size = size or ATTACHMENT_CONFIG.get("thumbnail_size", 160)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or ATTACHMENT_CONFIG.get("thumbnail_workers", 4),
+            thread_name_prefix="Thumbnail"
+        )
+        self._pil_available = importlib.util.find_spec("PIL") is not None
+        self._pdf_renderer = self._detect_pdf_renderer()
+
+    @staticmethod
+    def _detect_pdf_renderer() -> Optional[str]:
+        """检测可用的PDF渲染方式"""
+        if importlib.util.find_spec("fitz") is not None:
+            return "fitz"
+        if shutil.which("pdftoppm"):
+            return "pdftoppm"
+        return None
+
+    def can_preview(self, file_path: Path) -> bool:
+        """文件类型是否支持预览（需要安装 Pillow）"""
+        if not self._pil_available:
+            return False
+        suffix = Path(file_path).suffix.lower()
+        return suffix in self.IMAGE_SUFFIXES or (suffix in self.PDF_SUFFIXES and self._pdf_renderer is not None)
+
+    def thumbnail_path(self, digest: str) -> Path:
+        """缩略图缓存路径"""
+        return self.cache_dir / digest[:2] / f"{digest}_{self.size}.png"
+
+    def request(self, file_path: Path, digest: Optional[str] = None,
+                callback: Optional[Callable[[Path, Optional[Path]], None]] = None) -> Future:
+        """
+        请求生成缩略图（在后台线程中执行）
+
+        Args:
+            file_path: 附件路径
+            digest: 内容哈希（已知时可避免重新计算）
+            callback: 完成后在后台线程中调用 callback(附件路径, 缩略图路径或None)
+
+        Returns:
+            Future，结果为缩略图路径或None
+        """
+        def work() -> Optional[Path]:
+            thumb = None
+            try:
+                thumb = self.get_thumbnail(Path(file_path), digest)
+            except Exception as e:
+                self.logger.warning(f"生成缩略图失败: {file_path}: {e}")
+            if callback:
+                callback(Path(file_path), thumb)
+            return thumb
+
+        return self._executor.submit(work)
+
+    def get_thumbnail(self, file_path: Path, digest: Optional[str] = None) -> Optional[Path]:
+        """
+        获取缩略图，缓存中没有时生成
+
+        Returns:
+            缩略图路径，不支持的文件类型返回None
+        """
+        if not self.can_preview(file_path):
+            return None
+
+        data = None
+        if not digest:
+            # 小图片整体读入，哈希后直接解码，避免读两次；PDF和大文件分块计算，不占用与文件同样大的内存
+            if (Path(file_path).suffix.lower() in self.IMAGE_SUFFIXES
+                    and Path(file_path).stat().st_size <= self.INLINE_IMAGE_LIMIT):
+                data = Path(file_path).read_bytes()
+                digest = hashlib.new(self.HASH_ALGORITHM, data).hexdigest()
+            else:
+                digest = self._hash_file(Path(file_path))
+
+        thumb_path = self.thumbnail_path(digest)
+        if thumb_path.exists():
+            return thumb_path
+
+        if Path(file_path).suffix.lower() in self.PDF_SUFFIXES:
+            image = self._render_pdf_first_page(Path(file_path))
+        else:
+            image = self._load_image(Path(file_path), data)
+        if image is None:
+            return None
+
+        self._save(image, thumb_path)
+        return thumb_path
+
+    def _hash_file(self, file_path: Path) -> str:
+        """分块计算文件内容哈希"""
+        hasher = hashlib.new(self.HASH_ALGORITHM)
+        buffer = bytearray(self.HASH_CHUNK_SIZE)
+        view = memoryview(buffer)
+        with open(file_path, 'rb', buffering=0) as f:
+            while True:
+                n = f.readinto(buffer)
+                if not n:
+                    break
+                hasher.update(view[:n])
+        return hasher.hexdigest()
+
+    def _load_image(self, file_path: Path, data: Optional[bytes]):
+        """读取图片并缩小"""
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(data) if data is not None else file_path) as image:
+            # JPEG 可在解码时直接按比例缩小，大幅减少解码时间和内存
+            image.draft("RGB", (self.size * 2, self.size * 2))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((self.size, self.size))
+            return image.convert("RGBA") if image.mode not in ("RGB", "RGBA") else image.copy()
+
+    def _render_pdf_first_page(self, file_path: Path):
+        """渲染PDF首页"""
+        from PIL import Image
+
+        if self._pdf_renderer == "fitz":
+            import fitz
+
+            with fitz.open(str(file_path)) as document:
+                if document.page_count == 0:
+                    return None
+                page = document.load_page(0)
+                zoom = self.size * 2 / max(page.rect.width, page.rect.height)
+                pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+                image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        elif self._pdf_renderer == "pdftoppm":
+            with tempfile.TemporaryDirectory() as temp_dir:
+                prefix = Path(temp_dir) / "page"
+                subprocess.run(
+                    ["pdftoppm", "-f", "1", "-l", "1", "-png", "-singlefile",
+                     "-scale-to", str(self.size * 2), str(file_path), str(prefix)],
+                    check=True, capture_output=True, timeout=self.PDFTOPPM_TIMEOUT
+                )
+                with Image.open(f"{prefix}.png") as page_image:
+                    image = page_image.copy()
+        else:
+            return None
+
+        image.thumbnail((self.size, self.size))
+        return image
+
+    def _save(self, image, thumb_path: Path):
+        """原子写入缩略图"""
+        thumb_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = thumb_path.with_name(f"{thumb_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            image.save(temp_file, format="PNG")
+            os.replace(temp_file, thumb_path)
+        finally:
+            if temp_file.exists():
+                temp_file.unlink()
+
+    def shutdown(self):
+        """停止后台线程池，未开始的任务将被取消"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
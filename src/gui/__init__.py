@@ -3,6 +3,12 @@ GUI用户界面包
 包含所有的图形用户界面组件
 """
 
-from .main_window import MainWindow
+__all__ = ["MainWindow"]
 
-__all__ = ["MainWindow"] 
\ No newline at end of file
+
+def __getattr__(name):
+    """延迟导入主窗口，启动器只需导入自己的模块"""
+    if name == "MainWindow":
+        from .main_window import MainWindow
+        return MainWindow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}") 
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""
+附件金额审核对话框
+批量从附件中提取金额，生成附件确认收入的建议，审核后一次性写入记录
+"""
+
+import logging
+import queue
+import threading
+import customtkinter as ctk
+from tkinter import messagebox
+from tkinter import ttk
+from decimal import Decimal
+from typing import List, Dict, Any
+
+from ..models.database import Database
+from ..models.income_record import IncomeRecord
+from ..data.file_manager import FileManager
+from ..data.amount_extractor import AmountExtractor
+from ..config import get_font
+
+
+class AmountReviewDialog:
+    """附件金额审核对话框"""
+
+    def __init__(self, parent, database: Database, file_manager: FileManager, records: List[IncomeRecord]):
+        self.parent = parent
+        self.database = database
+        self.file_manager = file_manager
+        self.records = records
+        self.logger = logging.getLogger(__name__)
+
+        self.result = 0  # 已写入记录的建议数量
+        self.proposals: Dict[str, Dict[str, Any]] = {}
+        self.chosen: Dict[str, Decimal] = {}  # 合同号 -> 审核时改选的候选金额
+
+        # 后台提取
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.events = queue.Queue()
+
+        self.create_dialog()
+        self.load_proposals()
+
+    def create_dialog(self):
+        """创建对话框"""
+        self.dialog = ctk.CTkToplevel(self.parent)
+        self.dialog.title("附件金额提取与审核")
+        self.dialog.geometry("1100x660")
+        self.dialog.resizable(True, True)
+        self.dialog.transient(self.parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # 提取
+        extract_frame = ctk.CTkFrame(main_frame)
+        extract_frame.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkLabel(extract_frame, text=f"当前列表共 {len(self.records)} 条记录",
+                     font=get_font("body_large")).pack(side="left", padx=5)
+        self.include_existing_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(extract_frame, text="包含已填写附件确认收入的记录",
+                        variable=self.include_existing_var).pack(side="left", padx=10)
+        self.extract_btn = ctk.CTkButton(extract_frame, text="提取金额", command=self.start_extract, width=100)
+        self.extract_btn.pack(side="left", padx=5)
+        self.stop_btn = ctk.CTkButton(extract_frame, text="停止", command=self.cancel_event.set, width=60,
+                                      state="disabled")
+        self.stop_btn.pack(side="left", padx=5)
+
+        self.progress_bar = ctk.CTkProgressBar(extract_frame)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side="left", fill="x", expand=True, padx=10)
+        self.progress_label = ctk.CTkLabel(extract_frame, text="", font=get_font("body_small"))
+        self.progress_label.pack(side="left", padx=5)
+
+        # 建议列表
+        tree_frame = ctk.CTkFrame(main_frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        columns = ("contract", "client", "income", "amount", "difference", "confidence", "source", "context")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="extended")
+        headings = {
+            "contract": ("合同编号", 130), "client": ("客户名称", 140), "income": ("本年确认收入", 110),
+            "amount": ("建议金额", 110), "difference": ("差异", 90), "confidence": ("可信度", 60),
+            "source": ("来源文件", 150), "context": ("上下文", 300)
+        }
+        for column, (text, width) in headings.items():
+            self.tree.heading(column, text=text)
+            anchor = "e" if column in ("income", "amount", "difference") else "w"
+            self.tree.column(column, width=width, anchor="center" if column == "confidence" else anchor)
+        self.tree.tag_configure("high", foreground="#2B8C2B")
+        self.tree.tag_configure("low", foreground="gray")
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+
+        # 候选金额
+        candidate_frame = ctk.CTkFrame(main_frame)
+        candidate_frame.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkLabel(candidate_frame, text="候选金额:").pack(side="left", padx=5)
+        self.candidate_menu = ctk.CTkOptionMenu(candidate_frame, values=[""], width=420)
+        self.candidate_menu.pack(side="left", padx=5)
+        ctk.CTkButton(candidate_frame, text="改用该金额", command=self.use_candidate, width=100).pack(side="left", padx=5)
+
+        self.summary_label = ctk.CTkLabel(candidate_frame, text="", font=get_font("body_small"))
+        self.summary_label.pack(side="right", padx=10)
+
+        # 按钮
+        button_frame = ctk.CTkFrame(main_frame)
+        button_frame.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkButton(button_frame, text="关闭", command=self.close, width=100,
+                      fg_color="gray", hover_color="darkgray").pack(side="right", padx=5)
+        ctk.CTkButton(button_frame, text="忽略选中", command=self.discard_selected, width=100).pack(side="right", padx=5)
+        ctk.CTkButton(button_frame, text="接受全部高可信度", command=self.accept_high_confidence, width=140,
+                      fg_color="#2B8C2B", hover_color="#228B22").pack(side="right", padx=5)
+        ctk.CTkButton(button_frame, text="接受选中", command=self.accept_selected, width=100,
+                      fg_color="#2B8C2B", hover_color="#228B22").pack(side="right", padx=5)
+
+        self.center_dialog()
+
+    def load_proposals(self):
+        """显示待审核的建议"""
+        self.proposals = {p["contract_id"]: p for p in self.database.get_amount_proposals()}
+        self.chosen = {cid: amount for cid, amount in self.chosen.items() if cid in self.proposals}
+        self.tree.delete(*self.tree.get_children())
+
+        for contract_id, proposal in sorted(self.proposals.items(), key=lambda item: -item[1]["score"]):
+            record = self.database.get_income_record(contract_id)
+            amount = self.chosen.get(contract_id, proposal["amount"])
+            tag = {"高": "high", "低": "low"}.get(proposal["confidence"], "")
+            self.tree.insert("", "end", iid=contract_id, tags=(tag,), values=(
+                contract_id,
+                record.client_name if record else "",
+                f"{proposal['annual_income']:,.2f}",
+                f"{amount:,.2f}",
+                f"{proposal['annual_income'] - amount:,.2f}",
+                proposal["confidence"],
+                proposal["source"],
+                proposal["context"]
+            ))
+
+        high = sum(1 for p in self.proposals.values() if p["confidence"] == "高")
+        self.summary_label.configure(text=f"待审核 {len(self.proposals)} 条，其中高可信度 {high} 条")
+
+    def start_extract(self):
+        """在后台提取附件金额"""
+        if self.worker and self.worker.is_alive():
+            return
+
+        include_existing = self.include_existing_var.get()
+        records = [r for r in self.records if include_existing or r.attachment_confirmed_income is None]
+        if not records:
+            messagebox.showinfo("提示", "没有需要提取的记录", parent=self.dialog)
+            return
+
+        self.cancel_event.clear()
+        self.extract_btn.configure(state="disabled")
+        self.stop_btn.configure(state="normal")
+        self.progress_bar.set(0)
+        self.progress_label.configure(text="正在读取附件列表...")
+
+        def run():
+            try:
+                jobs = []
+                for record in records:
+                    if self.cancel_event.is_set():
+                        break
+                    entries = self.file_manager.get_contract_attachment_entries(record.contract_id)
+                    if entries:
+                        jobs.append((record.contract_id, record.annual_confirmed_income,
+                                     [entry["path"] for entry in entries]))
+
+                proposals = AmountExtractor().build_proposals(
+                    jobs, lambda done, total: self.events.put(("progress", done, total)), self.cancel_event
+                )
+                self.events.put(("done", proposals))
+            except Exception as e:
+                self.logger.error(f"提取附件金额失败: {e}")
+                self.events.put(("error", str(e)))
+
+        self.worker = threading.Thread(target=run, name="AmountExtract", daemon=True)
+        self.worker.start()
+        self.dialog.after(100, self.poll_events)
+
+    def poll_events(self):
+        """处理后台提取的事件"""
+        if not self.dialog.winfo_exists():
+            return
+
+        finished = None
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event[0] == "progress":
+                    _, done, total = event
+                    self.progress_bar.set(done / total if total else 1)
+                    self.progress_label.configure(text=f"已处理 {done}/{total} 个附件")
+                else:
+                    finished = event
+        except queue.Empty:
+            pass
+
+        if finished is None:
+            self.dialog.after(100, self.poll_events)
+            return
+
+        self.extract_btn.configure(state="normal")
+        self.stop_btn.configure(state="disabled")
+        if finished[0] == "error":
+            messagebox.showerror("错误", f"提取附件金额失败: {finished[1]}", parent=self.dialog)
+            return
+
+        proposals = finished[1]
+        # 数据库只在界面线程中修改
+        if proposals and not self.database.set_amount_proposals(proposals):
+            messagebox.showerror("错误", "保存金额建议失败", parent=self.dialog)
+        self.progress_label.configure(text=f"生成 {len(proposals)} 条建议")
+        self.load_proposals()
+
+    def on_select(self, event=None):
+        """显示选中建议的候选金额"""
+        selection = self.tree.selection()
+        if len(selection) != 1:
+            self.candidate_menu.configure(values=[""])
+            self.candidate_menu.set("")
+            return
+
+        proposal = self.proposals[selection[0]]
+        values = [
+            f"{c['amount']:,.2f}  得分{c['score']:.2f}  出现{c['count']}次  {', '.join(c['files'])}"
+            for c in proposal["candidates"]
+        ]
+        self.candidate_menu.configure(values=values)
+        current = self.chosen.get(selection[0], proposal["amount"])
+        index = next((i for i, c in enumerate(proposal["candidates"]) if c["amount"] == current), 0)
+        self.candidate_menu.set(values[index])
+
+    def use_candidate(self):
+        """把选中建议的金额改为另一个候选金额"""
+        selection = self.tree.selection()
+        if len(selection) != 1:
+            messagebox.showwarning("警告", "请选择一条建议", parent=self.dialog)
+            return
+
+        contract_id = selection[0]
+        proposal = self.proposals[contract_id]
+        values = self.candidate_menu.cget("values")
+        choice = self.candidate_menu.get()
+        if choice not in values:
+            return
+        self.chosen[contract_id] = proposal["candidates"][values.index(choice)]["amount"]
+        self.load_proposals()
+        self.tree.selection_set(contract_id)
+        self.tree.see(contract_id)
+
+    def apply(self, contract_ids: List[str]):
+        """接受建议并一次性写入记录"""
+        if not contract_ids:
+            messagebox.showwarning("警告", "没有可接受的建议", parent=self.dialog)
+            return
+
+        decisions = {cid: self.chosen.get(cid, self.proposals[cid]["amount"]) for cid in contract_ids}
+        if not messagebox.askyesno(
+            "确认", f"将 {len(decisions)} 条建议写入附件确认收入，是否继续？", parent=self.dialog
+        ):
+            return
+
+        success, count = self.database.apply_amount_proposals(decisions)
+        if not success:
+            messagebox.showerror("错误", "写入附件确认收入失败，记录未修改", parent=self.dialog)
+            return
+
+        self.result += count
+        self.load_proposals()
+
+    def accept_selected(self):
+        """接受选中的建议"""
+        self.apply(list(self.tree.selection()))
+
+    def accept_high_confidence(self):
+        """接受全部高可信度的建议"""
+        self.apply([cid for cid, p in self.proposals.items() if p["confidence"] == "高"])
+
+    def discard_selected(self):
+        """忽略选中的建议"""
+        selection = list(self.tree.selection())
+        if not selection:
+            messagebox.showwarning("警告", "请先选择要忽略的建议", parent=self.dialog)
+            return
+        if not self.database.discard_amount_proposals(selection):
+            messagebox.showerror("错误", "忽略建议失败", parent=self.dialog)
+        self.load_proposals()
+
+    def close(self):
+        """关闭对话框，提取进行中时先请求停止"""
+        if self.worker and self.worker.is_alive():
+            self.cancel_event.set()
+            self.progress_label.configure(text="正在停止，请稍候...")
+            return
+        self.dialog.destroy()
+
+    def center_dialog(self):
+        """居中显示对话框"""
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+    def show(self) -> int:
+        """显示对话框，返回写入记录的建议数量"""
+        self.dialog.wait_window()
+        return self.result
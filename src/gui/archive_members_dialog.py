@@ -0,0 +1,191 @@
+"""
+压缩包内容对话框
+列出压缩包中的文件（来自附件目录，不解压），按需提取单个文件查看或保存
+"""
+
+import logging
+import os
+import platform
+import subprocess
+import customtkinter as ctk
+from tkinter import messagebox, filedialog
+from tkinter import ttk
+from pathlib import Path
+from typing import List, Dict, Any
+
+from ..data.file_manager import FileManager
+from ..config import get_font
+
+
+class ArchiveMembersDialog:
+    """压缩包内容对话框"""
+
+    def __init__(self, parent, file_manager: FileManager, archive_path: str):
+        self.parent = parent
+        self.file_manager = file_manager
+        self.archive_path = Path(archive_path)
+        self.logger = logging.getLogger(__name__)
+
+        members = self.file_manager.get_archive_members(str(self.archive_path))
+        self.readable = members is not None
+        self.members: List[Dict[str, Any]] = members or []
+
+        self.create_dialog()
+        self.show_members()
+
+    def create_dialog(self):
+        """创建对话框"""
+        self.dialog = ctk.CTkToplevel(self.parent)
+        self.dialog.title(f"压缩包内容 - {self.archive_path.name}")
+        self.dialog.geometry("760x520")
+        self.dialog.resizable(True, True)
+        self.dialog.transient(self.parent)
+        self.dialog.grab_set()
+
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # 筛选
+        filter_frame = ctk.CTkFrame(main_frame)
+        filter_frame.pack(fill="x", padx=5, pady=5)
+        ctk.CTkLabel(filter_frame, text="筛选:").pack(side="left", padx=5)
+        self.filter_entry = ctk.CTkEntry(filter_frame, placeholder_text="输入文件名关键词")
+        self.filter_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.filter_entry.bind("<KeyRelease>", lambda event: self.show_members())
+
+        # 成员列表
+        tree_frame = ctk.CTkFrame(main_frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        columns = ("member", "size", "compressed", "crc")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        self.tree.heading("member", text="文件")
+        self.tree.heading("size", text="大小")
+        self.tree.heading("compressed", text="压缩后")
+        self.tree.heading("crc", text="CRC32")
+        self.tree.column("member", width=400)
+        self.tree.column("size", width=100, anchor="e")
+        self.tree.column("compressed", width=100, anchor="e")
+        self.tree.column("crc", width=90, anchor="center")
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<Double-1>", lambda event: self.open_selected())
+
+        # 按钮
+        button_frame = ctk.CTkFrame(main_frame)
+        button_frame.pack(fill="x", padx=5, pady=5)
+
+        self.summary_label = ctk.CTkLabel(button_frame, text="", font=get_font("body_small"))
+        self.summary_label.pack(side="left", padx=10)
+
+        ctk.CTkButton(button_frame, text="关闭", command=self.dialog.destroy, width=100,
+                      fg_color="gray", hover_color="darkgray").pack(side="right", padx=5)
+        ctk.CTkButton(button_frame, text="提取到...", command=self.extract_selected, width=100).pack(side="right", padx=5)
+        ctk.CTkButton(button_frame, text="提取并打开", command=self.open_selected, width=100).pack(side="right", padx=5)
+
+        self.center_dialog()
+
+    def show_members(self):
+        """显示（筛选后的）成员列表"""
+        self.tree.delete(*self.tree.get_children())
+        keyword = self.filter_entry.get().strip().lower()
+
+        shown = 0
+        for index, member in enumerate(self.members):
+            if keyword and keyword not in member["member"].lower():
+                continue
+            crc = f"{member['crc']:08X}" if member.get("crc") is not None else ""
+            compressed = member.get("compressed_size")
+            self.tree.insert("", "end", iid=str(index), values=(
+                member["member"],
+                self.format_file_size(member["size"]),
+                self.format_file_size(compressed) if compressed is not None else "",
+                crc
+            ))
+            shown += 1
+
+        total_size = sum(m["size"] for m in self.members)
+        self.summary_label.configure(
+            text=f"共 {len(self.members)} 个文件，解压后 {self.format_file_size(total_size)}"
+                 + (f"，显示 {shown} 个" if keyword else "")
+        )
+        if not self.readable:
+            self.summary_label.configure(text="无法读取压缩包内容（7z/rar 需要安装 py7zr/rarfile）")
+
+    def get_selected_members(self) -> List[str]:
+        """获取选中的成员"""
+        return [self.members[int(iid)]["member"] for iid in self.tree.selection()]
+
+    def open_selected(self):
+        """提取选中的文件到临时文件夹并打开"""
+        members = self.get_selected_members()
+        if not members:
+            messagebox.showwarning("警告", "请先选择一个文件", parent=self.dialog)
+            return
+
+        success, extracted, error_msg = self.file_manager.extract_archive_member(str(self.archive_path), members[0])
+        if not success:
+            messagebox.showerror("错误", f"提取文件失败: {error_msg}", parent=self.dialog)
+            return
+
+        try:
+            if platform.system() == "Windows":
+                os.startfile(extracted)
+            elif platform.system() == "Darwin":  # macOS
+                subprocess.run(["open", extracted])
+            else:  # Linux
+                subprocess.run(["xdg-open", extracted])
+        except Exception as e:
+            self.logger.error(f"打开文件失败: {e}")
+            messagebox.showerror("错误", f"打开文件失败: {e}", parent=self.dialog)
+
+    def extract_selected(self):
+        """提取选中的文件到指定文件夹"""
+        members = self.get_selected_members()
+        if not members:
+            messagebox.showwarning("警告", "请先选择要提取的文件", parent=self.dialog)
+            return
+
+        target_dir = filedialog.askdirectory(title="选择提取到的文件夹", parent=self.dialog)
+        if not target_dir:
+            return
+
+        failed = []
+        for member in members:
+            success, _, error_msg = self.file_manager.extract_archive_member(
+                str(self.archive_path), member, target_dir
+            )
+            if not success:
+                failed.append(f"{member}: {error_msg}")
+
+        if failed:
+            messagebox.showwarning("警告", "部分文件提取失败:\n" + "\n".join(failed[:10]), parent=self.dialog)
+        else:
+            messagebox.showinfo("成功", f"已提取 {len(members)} 个文件到:\n{target_dir}", parent=self.dialog)
+
+    def center_dialog(self):
+        """居中显示对话框"""
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+    def format_file_size(self, size_bytes: int) -> str:
+        """格式化文件大小"""
+        if size_bytes < 1024:
+            return f"{size_bytes} B"
+        elif size_bytes < 1024 * 1024:
+            return f"{size_bytes / 1024:.1f} KB"
+        elif size_bytes < 1024 * 1024 * 1024:
+            return f"{size_bytes / (1024 * 1024):.1f} MB"
+        else:
+            return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+
+    def show(self):
+        """显示对话框"""
+        self.dialog.wait_window()
@@ -4,6 +4,9 @@
 """
 
 import logging
+import queue
+import threading
+from collections import deque
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
 from tkinter import ttk
@@ -16,12 +19,15 @@ import platform
 
 from ..models.income_record import IncomeRecord
 from ..data.file_manager import FileManager
+from ..data.archive_reader import is_archive
 from ..config import get_font
 
 
 class AttachmentDialog:
     """附件管理对话框"""
     
+    PREVIEW_IN_FLIGHT = 8  # 同时排队生成的缩略图数量，其余按顺序逐步加载
+    
     def __init__(self, parent, record: IncomeRecord, file_manager: FileManager):
         self.parent = parent
         self.record = record
@@ -31,6 +37,20 @@ class AttachmentDialog:
         self.result = None
         self.dialog = None
         
+        # 后台批量添加附件
+        self.ingest_thread = None
+        self.ingest_cancel = threading.Event()
+        self.ingest_events = queue.Queue()
+        
+        # 预览条（缩略图在后台逐步加载）
+        self.preview_events = queue.Queue()
+        self.preview_generation = 0
+        self.preview_pending = deque()
+        self.preview_futures = []
+        self.preview_labels = {}
+        self.preview_images = {}
+        self.preview_polling = False
+        
         # 创建对话框
         self.create_dialog()
     
@@ -44,6 +64,7 @@ class AttachmentDialog:
         # 设置模态
         self.dialog.transient(self.parent)
         self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
         
         # 创建主框架
         main_frame = ctk.CTkFrame(self.dialog)
@@ -108,9 +129,24 @@ class AttachmentDialog:
             hover_color="#4169E1"
         )
         add_btn.pack(side="right", padx=10)
+        self.add_btn = add_btn
+        
+        # 批量添加进度（添加时显示）
+        self.ingest_frame = ctk.CTkFrame(list_frame)
+        self.ingest_progress = ctk.CTkProgressBar(self.ingest_frame)
+        self.ingest_progress.set(0)
+        self.ingest_progress.pack(side="left", fill="x", expand=True, padx=10, pady=5)
+        self.ingest_label = ctk.CTkLabel(self.ingest_frame, text="", font=get_font("body_small"))
+        self.ingest_label.pack(side="left", padx=5)
+        ctk.CTkButton(self.ingest_frame, text="停止", command=self.ingest_cancel.set, width=60).pack(side="right", padx=10)
         
         # 附件列表
         self.create_attachment_tree(list_frame)
+        
+        # 预览条
+        self.preview_frame = ctk.CTkScrollableFrame(list_frame, orientation="horizontal", height=200,
+                                                    label_text="预览（单击选中，双击打开）")
+        self.preview_frame.pack(fill="x", padx=5, pady=(0, 5))
     
     def create_attachment_tree(self, parent):
         """创建附件树形列表"""
@@ -160,6 +196,7 @@ class AttachmentDialog:
         self.context_menu = tk.Menu(self.dialog, tearoff=0)
         self.context_menu.add_command(label="打开文件", command=self.open_selected_attachment)
         self.context_menu.add_command(label="打开文件夹", command=self.open_file_location)
+        self.context_menu.add_command(label="查看压缩包内容", command=self.show_archive_members)
         self.context_menu.add_separator()
         self.context_menu.add_command(label="重命名", command=self.rename_attachment)
         self.context_menu.add_command(label="删除", command=self.delete_selected_attachment)
@@ -186,7 +223,7 @@ class AttachmentDialog:
         refresh_btn = ctk.CTkButton(
             left_frame, 
             text="🔄 刷新", 
-            command=self.load_attachments, 
+            command=self.refresh_attachments, 
             width=120, 
             height=35,
             font=get_font("body_large")
@@ -278,33 +315,130 @@ class AttachmentDialog:
             for item in self.attachment_tree.get_children():
                 self.attachment_tree.delete(item)
             
-            # 获取合同附件
-            attachments = self.file_manager.get_contract_attachments(self.record.contract_id)
+            # 获取合同附件（来自附件目录，不逐个读取文件信息）
+            attachments = self.file_manager.get_contract_attachment_entries(self.record.contract_id)
+            
+            member_total = 0
+            for entry in attachments:
+                size_text = self.format_file_size(entry["size"])
+                if entry.get("member_count") is not None:
+                    # 压缩包内的文件也计为证据
+                    size_text += f" (含{entry['member_count']}个文件)"
+                    member_total += entry["member_count"]
+                entry["item"] = self.attachment_tree.insert("", "end", values=(
+                    entry["name"],
+                    size_text,
+                    self.format_timestamp(entry["mtime_ns"] / 1e9),
+                    str(entry["path"])
+                ))
             
-            for file_path in attachments:
-                if file_path.is_file():
-                    try:
-                        stat = file_path.stat()
-                        size = self.format_file_size(stat.st_size)
-                        mtime = self.format_timestamp(stat.st_mtime)
-                        
-                        self.attachment_tree.insert("", "end", values=(
-                            file_path.name,
-                            size,
-                            mtime,
-                            str(file_path)
-                        ))
-                    except Exception as e:
-                        self.logger.error(f"读取文件信息失败: {e}")
+            # 预览条
+            self.load_previews(attachments)
             
             # 更新附件数量显示
             count = len(attachments)
-            self.dialog.title(f"附件管理 - {self.record.contract_id} ({count}个附件)")
+            member_text = f"，压缩包内{member_total}个文件" if member_total else ""
+            self.dialog.title(f"附件管理 - {self.record.contract_id} ({count}个附件{member_text})")
             
         except Exception as e:
             self.logger.error(f"加载附件列表失败: {e}")
             messagebox.showerror("错误", f"加载附件列表失败: {e}")
     
+    def load_previews(self, attachments: List[dict]):
+        """重建预览条，缩略图在后台按顺序逐步生成"""
+        self.cancel_previews()
+        self.preview_generation += 1
+        for widget in self.preview_frame.winfo_children():
+            widget.destroy()
+        self.preview_labels = {}
+        self.preview_images = {}
+        
+        for entry in attachments:
+            if not self.file_manager.can_preview_attachment(entry["path"]):
+                continue
+            name = entry["name"] if len(entry["name"]) <= 18 else entry["name"][:16] + "…"
+            label = ctk.CTkLabel(self.preview_frame, text=f"加载中…\n{name}", width=170, height=180,
+                                 compound="top", font=get_font("body_small"))
+            label.pack(side="left", padx=5, pady=5)
+            item = entry["item"]
+            label.bind("<Button-1>", lambda event, item=item: self.select_tree_item(item))
+            label.bind("<Double-1>", lambda event, item=item: self.open_preview_item(item))
+            self.preview_labels[item] = (label, name)
+            self.preview_pending.append((item, entry))
+        
+        self.request_next_previews()
+    
+    def request_next_previews(self):
+        """补充排队中的缩略图请求"""
+        generation = self.preview_generation
+        self.preview_futures = [f for f in self.preview_futures if not f.done()]
+        while self.preview_pending and len(self.preview_futures) < self.PREVIEW_IN_FLIGHT:
+            item, entry = self.preview_pending.popleft()
+            
+            def on_done(file_path, thumb_path, item=item):
+                self.preview_events.put((generation, item, thumb_path))
+            
+            future = self.file_manager.request_thumbnail(entry["path"], entry.get("digest"), on_done)
+            if future is not None:
+                self.preview_futures.append(future)
+        
+        if (self.preview_futures or not self.preview_events.empty()) and not self.preview_polling:
+            self.preview_polling = True
+            self.dialog.after(100, self.poll_preview_events)
+    
+    def poll_preview_events(self):
+        """显示已生成的缩略图"""
+        self.preview_polling = False
+        if not self.dialog.winfo_exists():
+            return
+        
+        try:
+            while True:
+                generation, item, thumb_path = self.preview_events.get_nowait()
+                if generation != self.preview_generation or item not in self.preview_labels:
+                    continue
+                label, name = self.preview_labels[item]
+                if thumb_path is None:
+                    label.configure(text=f"无法预览\n{name}")
+                    continue
+                try:
+                    from PIL import Image
+                    with Image.open(thumb_path) as image:
+                        image.load()
+                        preview = ctk.CTkImage(light_image=image, dark_image=image, size=image.size)
+                    self.preview_images[item] = preview
+                    label.configure(image=preview, text=name)
+                except Exception as e:
+                    self.logger.warning(f"读取缩略图失败: {thumb_path}: {e}")
+                    label.configure(text=f"无法预览\n{name}")
+        except queue.Empty:
+            pass
+        
+        self.request_next_previews()
+    
+    def cancel_previews(self):
+        """取消尚未开始的缩略图请求"""
+        self.preview_pending.clear()
+        for future in self.preview_futures:
+            future.cancel()
+        self.preview_futures = []
+    
+    def select_tree_item(self, item: str):
+        """在列表中选中预览对应的附件"""
+        if self.attachment_tree.exists(item):
+            self.attachment_tree.selection_set(item)
+            self.attachment_tree.see(item)
+    
+    def open_preview_item(self, item: str):
+        """双击预览打开附件"""
+        self.select_tree_item(item)
+        self.open_selected_attachment()
+    
+    def refresh_attachments(self):
+        """重新扫描合同文件夹并刷新列表"""
+        self.file_manager.refresh_catalog(self.record.contract_id)
+        self.load_attachments()
+    
     def add_attachment(self):
         """添加附件"""
         try:
@@ -320,13 +454,78 @@ class AttachmentDialog:
                 ]
             )
             
-            for file_path in file_paths:
-                self.add_file_attachment(file_path)
+            if file_paths:
+                self.start_bulk_ingest(list(file_paths))
                 
         except Exception as e:
             self.logger.error(f"添加附件失败: {e}")
             messagebox.showerror("错误", f"添加附件失败: {e}")
     
+    def start_bulk_ingest(self, file_paths: List[str]):
+        """在后台线程中批量添加附件"""
+        if self.ingest_thread and self.ingest_thread.is_alive():
+            messagebox.showwarning("警告", "正在添加附件，请稍候")
+            return
+        
+        self.ingest_cancel.clear()
+        self.ingest_progress.set(0)
+        self.ingest_label.configure(text=f"0/{len(file_paths)}")
+        self.ingest_frame.pack(fill="x", padx=5, pady=(0, 5), before=self.attachment_tree.master)
+        self.add_btn.configure(state="disabled")
+        
+        def on_progress(done: int, total: int, bytes_done: int, elapsed: float):
+            self.ingest_events.put(("progress", done, total, bytes_done, elapsed))
+        
+        def run():
+            result = self.file_manager.save_attachments_bulk(
+                file_paths, self.record.contract_id, on_progress, self.ingest_cancel
+            )
+            self.ingest_events.put(("done", result))
+        
+        self.ingest_thread = threading.Thread(target=run, name="AttachmentIngest", daemon=True)
+        self.ingest_thread.start()
+        self.dialog.after(100, self.poll_ingest_events)
+    
+    def poll_ingest_events(self):
+        """处理批量添加的进度事件"""
+        if not self.dialog.winfo_exists():
+            return
+        
+        finished = None
+        try:
+            while True:
+                event = self.ingest_events.get_nowait()
+                if event[0] == "progress":
+                    _, done, total, bytes_done, elapsed = event
+                    speed = bytes_done / elapsed if elapsed > 0 else 0
+                    self.ingest_progress.set(done / total if total else 1)
+                    self.ingest_label.configure(
+                        text=f"{done}/{total}  {self.format_file_size(bytes_done)}  {self.format_file_size(int(speed))}/s"
+                    )
+                else:
+                    finished = event[1]
+        except queue.Empty:
+            pass
+        
+        if finished is None:
+            self.dialog.after(100, self.poll_ingest_events)
+            return
+        
+        self.ingest_frame.pack_forget()
+        self.add_btn.configure(state="normal")
+        self.load_attachments()
+        
+        success, result, error_msg = finished
+        if error_msg:
+            messagebox.showerror("错误", error_msg)
+        elif result["failed"]:
+            failed_text = "\n".join(f"{Path(path).name}: {error}" for path, error in result["failed"][:10])
+            messagebox.showwarning(
+                "警告", f"成功添加{len(result['saved'])}个附件，{len(result['failed'])}个失败:\n{failed_text}"
+            )
+        elif result["cancelled"]:
+            messagebox.showinfo("提示", f"已停止添加，已添加{len(result['saved'])}个附件")
+    
     def add_file_attachment(self, file_path: str):
         """添加单个文件附件"""
         try:
@@ -359,6 +558,9 @@ class AttachmentDialog:
             item = selection[0]
             file_path = self.attachment_tree.item(item)["values"][3]  # 路径列
             
+            # 外部程序可能原地修改文件，先换成独立副本（与其他合同共用的数据不受影响）
+            self.file_manager.detach_attachment(file_path)
+            
             # 使用系统默认程序打开文件
             if platform.system() == "Windows":
                 os.startfile(file_path)
@@ -371,6 +573,28 @@ class AttachmentDialog:
             self.logger.error(f"打开附件失败: {e}")
             messagebox.showerror("错误", f"打开附件失败: {e}")
     
+    def show_archive_members(self):
+        """查看选中压缩包中的文件"""
+        try:
+            selection = self.attachment_tree.selection()
+            if not selection:
+                messagebox.showwarning("警告", "请先选择一个附件")
+                return
+            
+            file_path = self.attachment_tree.item(selection[0])["values"][3]  # 路径列
+            if not is_archive(file_path):
+                messagebox.showwarning("警告", "选中的附件不是压缩包")
+                return
+            
+            from .archive_members_dialog import ArchiveMembersDialog
+            
+            ArchiveMembersDialog(self.dialog, self.file_manager, file_path).show()
+            self.load_attachments()
+            
+        except Exception as e:
+            self.logger.error(f"查看压缩包内容失败: {e}")
+            messagebox.showerror("错误", f"查看压缩包内容失败: {e}")
+    
     def open_file_location(self):
         """打开文件所在位置"""
         try:
@@ -404,7 +628,6 @@ class AttachmentDialog:
             
             item = selection[0]
             old_path = Path(self.attachment_tree.item(item)["values"][3])
-            old_name = old_path.name
             
             # 显示重命名对话框
             new_name = ctk.CTkInputDialog(
@@ -413,23 +636,14 @@ class AttachmentDialog:
             ).get_input()
             
             if new_name and new_name.strip():
-                new_name = new_name.strip()
-                
-                # 确保保留扩展名
-                if not new_name.endswith(old_path.suffix):
-                    new_name += old_path.suffix
-                
-                new_path = old_path.parent / new_name
-                
-                # 检查新文件名是否已存在
-                if new_path.exists():
-                    messagebox.showerror("错误", "文件名已存在")
+                # 重命名文件（保留扩展名）
+                success, new_path, error_msg = self.file_manager.rename_attachment(str(old_path), new_name.strip())
+                if not success:
+                    messagebox.showerror("错误", error_msg)
                     return
                 
-                # 重命名文件
-                old_path.rename(new_path)
                 self.load_attachments()  # 刷新列表
-                messagebox.showinfo("成功", f"文件已重命名为: {new_name}")
+                messagebox.showinfo("成功", f"文件已重命名为: {Path(new_path).name}")
                 
         except Exception as e:
             self.logger.error(f"重命名附件失败: {e}")
@@ -479,10 +693,15 @@ class AttachmentDialog:
     def save_and_close(self):
         """保存并关闭"""
         try:
+            if self.ingest_thread and self.ingest_thread.is_alive():
+                messagebox.showwarning("警告", "正在添加附件，请稍候")
+                return
+            
             # 更新记录的附件列表
             attachments = self.file_manager.get_contract_attachments(self.record.contract_id)
             self.record.attached_files = [str(f) for f in attachments]
             
+            self.cancel_previews()
             self.result = True
             self.dialog.destroy()
             
@@ -491,7 +710,12 @@ class AttachmentDialog:
             messagebox.showerror("错误", f"保存失败: {e}")
     
     def cancel(self):
-        """取消"""
+        """取消，批量添加进行中时先请求停止（已存入的附件会显示在列表中，确定后才加入记录）"""
+        if self.ingest_thread and self.ingest_thread.is_alive():
+            self.ingest_cancel.set()
+            self.ingest_label.configure(text="正在停止，请稍候...")
+            return
+        self.cancel_previews()
         self.result = False
         self.dialog.destroy()
     
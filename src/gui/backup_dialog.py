@@ -0,0 +1,285 @@
+"""
+项目备份对话框
+在后台创建增量备份，列出历史备份，将任意一次备份恢复到指定文件夹
+"""
+
+import logging
+import queue
+import threading
+import customtkinter as ctk
+from tkinter import messagebox, filedialog
+from tkinter import ttk
+from datetime import datetime
+from typing import List, Dict, Any
+
+from ..data.project_manager import ProjectManager
+from ..config import get_font
+
+
+class BackupDialog:
+    """项目备份对话框"""
+
+    def __init__(self, parent, project_manager: ProjectManager, project_id: str):
+        self.parent = parent
+        self.project_manager = project_manager
+        self.project_id = project_id
+        self.logger = logging.getLogger(__name__)
+
+        self.snapshots: List[Dict[str, Any]] = []
+
+        # 后台备份/恢复
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.events = queue.Queue()
+
+        self.create_dialog()
+        self.load_snapshots()
+
+    def create_dialog(self):
+        """创建对话框"""
+        project_config = self.project_manager.projects_config["projects"].get(self.project_id, {})
+
+        self.dialog = ctk.CTkToplevel(self.parent)
+        self.dialog.title(f"项目备份 - {project_config.get('name', self.project_id)}")
+        self.dialog.geometry("820x520")
+        self.dialog.resizable(True, True)
+        self.dialog.transient(self.parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # 备份
+        backup_frame = ctk.CTkFrame(main_frame)
+        backup_frame.pack(fill="x", padx=5, pady=5)
+
+        self.include_attachments_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(backup_frame, text="同时备份附件",
+                        variable=self.include_attachments_var).pack(side="left", padx=10)
+        self.backup_btn = ctk.CTkButton(backup_frame, text="立即备份", command=self.start_backup, width=100)
+        self.backup_btn.pack(side="left", padx=5)
+        self.stop_btn = ctk.CTkButton(backup_frame, text="停止", command=self.cancel_event.set, width=60,
+                                      state="disabled")
+        self.stop_btn.pack(side="left", padx=5)
+
+        self.progress_bar = ctk.CTkProgressBar(backup_frame)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side="left", fill="x", expand=True, padx=10)
+        self.progress_label = ctk.CTkLabel(backup_frame, text="", font=get_font("body_small"))
+        self.progress_label.pack(side="left", padx=5)
+
+        # 备份列表
+        tree_frame = ctk.CTkFrame(main_frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        columns = ("time", "label", "files", "total", "new", "verified")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="browse")
+        headings = {
+            "time": ("备份时间", 160), "label": ("内容", 100), "files": ("文件数", 80),
+            "total": ("数据大小", 110), "new": ("新增占用", 110), "verified": ("校验", 90)
+        }
+        for column, (text, width) in headings.items():
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor="w" if column in ("time", "label", "verified") else "e")
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        # 按钮
+        button_frame = ctk.CTkFrame(main_frame)
+        button_frame.pack(fill="x", padx=5, pady=5)
+
+        self.summary_label = ctk.CTkLabel(button_frame, text="", font=get_font("body_small"))
+        self.summary_label.pack(side="left", padx=10)
+
+        ctk.CTkButton(button_frame, text="关闭", command=self.close, width=100,
+                      fg_color="gray", hover_color="darkgray").pack(side="right", padx=5)
+        self.restore_btn = ctk.CTkButton(button_frame, text="恢复到...", command=self.restore_selected, width=100)
+        self.restore_btn.pack(side="right", padx=5)
+        self.verify_btn = ctk.CTkButton(button_frame, text="完整校验", command=self.verify_selected, width=100)
+        self.verify_btn.pack(side="right", padx=5)
+
+        self.center_dialog()
+
+    def load_snapshots(self):
+        """显示历史备份"""
+        self.snapshots = self.project_manager.list_project_backups(self.project_id)
+        self.tree.delete(*self.tree.get_children())
+
+        for index, snapshot in enumerate(self.snapshots):
+            try:
+                created = datetime.fromisoformat(snapshot["created_time"]).strftime("%Y-%m-%d %H:%M:%S")
+            except (KeyError, ValueError):
+                created = snapshot.get("id", "")
+            self.tree.insert("", "end", iid=str(index), values=(
+                created,
+                snapshot.get("label", ""),
+                snapshot.get("file_count", 0),
+                self.format_file_size(snapshot.get("total_size", 0)),
+                self.format_file_size(snapshot.get("new_bytes", 0)),
+                self.format_verification(snapshot.get("verification"))
+            ))
+
+        repository = self.project_manager.get_backup_repository(self.project_id)
+        if repository:
+            stats = repository.get_stats()
+            self.summary_label.configure(
+                text=f"共 {stats['snapshot_count']} 次备份，备份仓库占用 {self.format_file_size(stats['stored_size'])}"
+            )
+
+    def set_running(self, running: bool):
+        """备份或恢复进行中时禁用按钮"""
+        self.backup_btn.configure(state="disabled" if running else "normal")
+        self.restore_btn.configure(state="disabled" if running else "normal")
+        self.verify_btn.configure(state="disabled" if running else "normal")
+        self.stop_btn.configure(state="normal" if running else "disabled")
+
+    def run_in_background(self, kind: str, target):
+        """在后台线程中执行，结果 (是否成功, 结果, 错误信息) 通过事件队列返回"""
+        self.cancel_event.clear()
+        self.set_running(True)
+        self.progress_bar.set(0)
+
+        def run():
+            try:
+                self.events.put(("done", kind) + tuple(target()))
+            except Exception as e:
+                self.logger.error(f"后台任务失败: {e}")
+                self.events.put(("done", kind, False, None, str(e)))
+
+        self.worker = threading.Thread(target=run, name=f"Project{kind.capitalize()}", daemon=True)
+        self.worker.start()
+        self.dialog.after(100, self.poll_events)
+
+    def start_backup(self):
+        """在后台创建备份"""
+        if self.worker and self.worker.is_alive():
+            return
+
+        include_attachments = self.include_attachments_var.get()
+        self.progress_label.configure(text="正在扫描文件...")
+        self.run_in_background("backup", lambda: self.project_manager.backup_project(
+            self.project_id, include_attachments,
+            lambda done, total: self.events.put(("progress", done, total)), self.cancel_event
+        ))
+
+    def restore_selected(self):
+        """将选中的备份恢复到指定文件夹"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择一次备份", parent=self.dialog)
+            return
+
+        target_dir = filedialog.askdirectory(title="选择恢复到的文件夹", parent=self.dialog)
+        if not target_dir:
+            return
+
+        snapshot_id = self.snapshots[int(selection[0])]["id"]
+        self.progress_label.configure(text="正在恢复...")
+        self.run_in_background("restore", lambda: self.project_manager.restore_project_backup(
+            snapshot_id, target_dir, self.project_id
+        ))
+
+    def verify_selected(self):
+        """完整校验选中的备份"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择一次备份", parent=self.dialog)
+            return
+
+        snapshot_id = self.snapshots[int(selection[0])]["id"]
+        self.progress_label.configure(text="正在校验...")
+        self.run_in_background("verify", lambda: self.project_manager.verify_project_backup(
+            snapshot_id, self.project_id
+        ))
+
+    def format_verification(self, verification) -> str:
+        """格式化校验结果"""
+        if not verification:
+            return "未校验"
+        if verification.get("failed_chunks"):
+            return f"损坏 {verification['failed_chunks']} 块"
+        return "已通过"
+
+    def poll_events(self):
+        """处理后台任务的事件"""
+        if not self.dialog.winfo_exists():
+            return
+
+        finished = None
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event[0] == "progress":
+                    _, done, total = event
+                    self.progress_bar.set(done / total if total else 1)
+                    self.progress_label.configure(text=f"已处理 {done}/{total} 个文件")
+                else:
+                    finished = event[1:]
+        except queue.Empty:
+            pass
+
+        if finished is None:
+            self.dialog.after(100, self.poll_events)
+            return
+
+        self.set_running(False)
+        self.progress_bar.set(1)
+        kind, success, result, error_msg = finished
+
+        if not success:
+            self.progress_label.configure(text="")
+            if kind == "verify":
+                self.load_snapshots()
+            messagebox.showerror("错误", error_msg, parent=self.dialog)
+            return
+
+        if kind == "backup":
+            self.progress_label.configure(
+                text=f"备份完成: {result['file_count']} 个文件，沿用 {result['reused_files']} 个未变化的文件，"
+                     f"新增 {self.format_file_size(result['new_bytes'])}，用时 {result['elapsed']} 秒"
+            )
+            self.load_snapshots()
+        elif kind == "verify":
+            self.progress_label.configure(
+                text=f"校验通过: {result['checked_chunks']} 个数据块，用时 {result['elapsed']} 秒"
+            )
+            self.load_snapshots()
+        else:
+            self.progress_label.configure(text="恢复完成")
+            messagebox.showinfo("成功", f"备份已恢复到:\n{result}", parent=self.dialog)
+
+    def close(self):
+        """关闭对话框，备份进行中时先请求停止"""
+        if self.worker and self.worker.is_alive():
+            self.cancel_event.set()
+            self.progress_label.configure(text="正在停止，请稍候...")
+            return
+        self.dialog.destroy()
+
+    def center_dialog(self):
+        """居中显示对话框"""
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+    def format_file_size(self, size_bytes: int) -> str:
+        """格式化文件大小"""
+        if size_bytes < 1024:
+            return f"{size_bytes} B"
+        elif size_bytes < 1024 * 1024:
+            return f"{size_bytes / 1024:.1f} KB"
+        elif size_bytes < 1024 * 1024 * 1024:
+            return f"{size_bytes / (1024 * 1024):.1f} MB"
+        else:
+            return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+
+    def show(self):
+        """显示对话框"""
+        self.dialog.wait_window()
@@ -0,0 +1,208 @@
+"""
+附件全文搜索对话框
+按关键词（发票号、金额、公司名等）检索附件内容和压缩包内的文件名，列出所属合同和文件
+"""
+
+import logging
+import os
+import platform
+import subprocess
+import time
+import customtkinter as ctk
+from tkinter import messagebox
+from tkinter import ttk
+from typing import List, Dict, Any
+
+from ..data.file_manager import FileManager
+from ..config import get_font
+
+
+class ContentSearchDialog:
+    """附件全文搜索对话框"""
+
+    SEARCH_DELAY = 300  # 输入停止后多久开始搜索（毫秒）
+    RESULT_LIMIT = 500
+
+    def __init__(self, parent, file_manager: FileManager):
+        self.parent = parent
+        self.file_manager = file_manager
+        self.logger = logging.getLogger(__name__)
+
+        self.results: List[Dict[str, Any]] = []
+        self.search_job = None
+        self.index = self.file_manager.get_content_index()
+
+        self.create_dialog()
+
+        # 打开时增量更新索引（首次使用时建立索引）
+        if self.index:
+            self.file_manager.update_content_index()
+            self.poll_index_status()
+
+    def create_dialog(self):
+        """创建对话框"""
+        self.dialog = ctk.CTkToplevel(self.parent)
+        self.dialog.title("附件全文搜索")
+        self.dialog.geometry("1000x620")
+        self.dialog.resizable(True, True)
+        self.dialog.transient(self.parent)
+
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # 搜索框
+        search_frame = ctk.CTkFrame(main_frame)
+        search_frame.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkLabel(search_frame, text="关键词:", font=get_font("body_large")).pack(side="left", padx=5)
+        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="发票号、金额、公司名等，多个关键词用空格分隔")
+        self.search_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", lambda event: self.search())
+        ctk.CTkButton(search_frame, text="搜索", command=self.search, width=80).pack(side="left", padx=5)
+
+        # 结果列表
+        tree_frame = ctk.CTkFrame(main_frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        columns = ("contract", "name", "snippet")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        self.tree.heading("contract", text="合同编号")
+        self.tree.heading("name", text="文件名")
+        self.tree.heading("snippet", text="内容摘要")
+        self.tree.column("contract", width=160)
+        self.tree.column("name", width=240)
+        self.tree.column("snippet", width=560)
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<Double-1>", lambda event: self.open_selected())
+
+        # 状态和按钮
+        bottom_frame = ctk.CTkFrame(main_frame)
+        bottom_frame.pack(fill="x", padx=5, pady=5)
+
+        self.status_label = ctk.CTkLabel(bottom_frame, text="", font=get_font("body_small"))
+        self.status_label.pack(side="left", padx=10)
+
+        ctk.CTkButton(bottom_frame, text="关闭", command=self.dialog.destroy, width=100,
+                      fg_color="gray", hover_color="darkgray").pack(side="right", padx=5)
+        ctk.CTkButton(bottom_frame, text="打开所在文件夹", command=self.open_selected_folder,
+                      width=120).pack(side="right", padx=5)
+        ctk.CTkButton(bottom_frame, text="打开文件", command=self.open_selected, width=100).pack(side="right", padx=5)
+
+        if not self.index:
+            self.status_label.configure(text="全文索引不可用")
+
+        self.center_dialog()
+        self.search_entry.focus_set()
+
+    def poll_index_status(self):
+        """显示索引状态，索引更新完成后刷新当前搜索结果"""
+        if not self.dialog.winfo_exists():
+            return
+
+        doc_count = self.index.get_stats()["doc_count"]
+        if self.index.is_updating():
+            self.status_label.configure(text=f"正在更新全文索引... 已索引 {doc_count} 个文件（可先搜索已索引的内容）")
+            self.dialog.after(1000, self.poll_index_status)
+            return
+
+        self.status_label.configure(text=f"已索引 {doc_count} 个文件")
+        if self.search_entry.get().strip():
+            self.search()
+
+    def schedule_search(self, event=None):
+        """输入停止一段时间后再搜索"""
+        if self.search_job:
+            self.dialog.after_cancel(self.search_job)
+        self.search_job = self.dialog.after(self.SEARCH_DELAY, self.search)
+
+    def search(self):
+        """执行搜索"""
+        self.search_job = None
+        query = self.search_entry.get().strip()
+        self.tree.delete(*self.tree.get_children())
+        if not query or not self.index:
+            self.results = []
+            return
+
+        start = time.perf_counter()
+        self.results = self.file_manager.search_attachment_content(query, self.RESULT_LIMIT)
+        self.results += self.file_manager.search_archive_members(query, self.RESULT_LIMIT)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for index, result in enumerate(self.results):
+            if result.get("member"):
+                name = f"{result['name']} › {result['member']}"
+                snippet = "压缩包内的文件（打开时单独提取）"
+            else:
+                name, snippet = result["name"], result["snippet"]
+            self.tree.insert("", "end", iid=str(index), values=(result["contract"], name, snippet))
+
+        contracts = len({r["contract"] for r in self.results})
+        limit_note = f"（每类仅显示前{self.RESULT_LIMIT}个）" if len(self.results) >= self.RESULT_LIMIT else ""
+        self.status_label.configure(
+            text=f"找到 {len(self.results)} 个文件{limit_note}，涉及 {contracts} 个合同，用时 {elapsed_ms:.0f} 毫秒"
+        )
+
+    def get_selected_result(self):
+        """获取选中的结果"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("警告", "请先选择一个文件", parent=self.dialog)
+            return None
+        return self.results[int(selection[0])]
+
+    def open_path(self, path):
+        """使用系统默认程序打开文件或文件夹"""
+        try:
+            if platform.system() == "Windows":
+                os.startfile(str(path))
+            elif platform.system() == "Darwin":  # macOS
+                subprocess.run(["open", str(path)])
+            else:  # Linux
+                subprocess.run(["xdg-open", str(path)])
+        except Exception as e:
+            self.logger.error(f"打开文件失败: {e}")
+            messagebox.showerror("错误", f"打开文件失败: {e}", parent=self.dialog)
+
+    def open_selected(self):
+        """打开选中的文件，压缩包内的文件先单独提取到临时文件夹"""
+        result = self.get_selected_result()
+        if not result:
+            return
+        if not result.get("member"):
+            # 外部程序可能原地修改文件，先换成独立副本（与其他合同共用的数据不受影响）
+            self.file_manager.detach_attachment(str(result["path"]))
+            self.open_path(result["path"])
+            return
+
+        success, extracted, error_msg = self.file_manager.extract_archive_member(
+            str(result["path"]), result["member"]
+        )
+        if success:
+            self.open_path(extracted)
+        else:
+            messagebox.showerror("错误", f"提取文件失败: {error_msg}", parent=self.dialog)
+
+    def open_selected_folder(self):
+        """打开选中文件所在的合同文件夹"""
+        result = self.get_selected_result()
+        if result:
+            self.open_path(result["path"].parent)
+
+    def center_dialog(self):
+        """居中显示对话框"""
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+    def show(self):
+        """显示对话框"""
+        self.dialog.wait_window()
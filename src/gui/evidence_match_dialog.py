@@ -0,0 +1,368 @@
+"""
+证据批量匹配对话框
+扫描证据文件夹，按文件名（和邮件主题）自动对应合同，确认后批量添加为附件
+"""
+
+import logging
+import queue
+import threading
+import customtkinter as ctk
+from tkinter import messagebox, filedialog
+from tkinter import ttk
+from typing import List, Dict, Any, Optional
+from pathlib import Path
+
+from ..data.file_manager import FileManager
+from ..data.evidence_matcher import EvidenceMatcher
+from ..config import get_font
+
+
+class EvidenceMatchDialog:
+    """证据批量匹配对话框"""
+
+    STATUS_NAMES = {
+        EvidenceMatcher.STATUS_MATCHED: "已匹配",
+        EvidenceMatcher.STATUS_CONFLICT: "冲突",
+        EvidenceMatcher.STATUS_UNMATCHED: "未匹配"
+    }
+
+    def __init__(self, parent, contract_ids: List[str], file_manager: FileManager):
+        self.parent = parent
+        self.contract_ids = contract_ids
+        self.file_manager = file_manager
+        self.logger = logging.getLogger(__name__)
+
+        self.result = None
+        self.matches: List[Dict[str, Any]] = []
+        self.assigned: Dict[str, str] = {}  # 行ID -> 确认的合同号
+        self.ignored = set()  # 不导入的行ID
+
+        # 后台任务（扫描或导入）
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.events = queue.Queue()
+
+        self.create_dialog()
+
+    def create_dialog(self):
+        """创建对话框"""
+        self.dialog = ctk.CTkToplevel(self.parent)
+        self.dialog.title("批量匹配证据")
+        self.dialog.geometry("1000x680")
+        self.dialog.resizable(True, True)
+        self.dialog.transient(self.parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
+
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # 文件夹选择
+        folder_frame = ctk.CTkFrame(main_frame)
+        folder_frame.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkLabel(folder_frame, text="证据文件夹:", font=get_font("body_large")).pack(side="left", padx=5)
+        self.folder_entry = ctk.CTkEntry(folder_frame, placeholder_text="选择包含证据文件的文件夹")
+        self.folder_entry.pack(side="left", fill="x", expand=True, padx=5)
+        ctk.CTkButton(folder_frame, text="浏览", command=self.browse_folder, width=60).pack(side="left", padx=5)
+
+        self.email_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(folder_frame, text="匹配邮件主题(.eml)", variable=self.email_var).pack(side="left", padx=5)
+
+        self.scan_btn = ctk.CTkButton(folder_frame, text="开始匹配", command=self.start_scan, width=100)
+        self.scan_btn.pack(side="left", padx=5)
+
+        # 匹配结果
+        tree_frame = ctk.CTkFrame(main_frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        columns = ("file", "contract", "status", "source")
+        self.tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+        self.tree.heading("file", text="文件")
+        self.tree.heading("contract", text="合同号")
+        self.tree.heading("status", text="状态")
+        self.tree.heading("source", text="匹配来源")
+        self.tree.column("file", width=480)
+        self.tree.column("contract", width=220)
+        self.tree.column("status", width=80, anchor="center")
+        self.tree.column("source", width=120, anchor="center")
+        self.tree.tag_configure("conflict", foreground="#DC143C")
+        self.tree.tag_configure("ignored", foreground="gray")
+
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+
+        # 冲突处理
+        resolve_frame = ctk.CTkFrame(main_frame)
+        resolve_frame.pack(fill="x", padx=5, pady=5)
+
+        ctk.CTkLabel(resolve_frame, text="指定合同:").pack(side="left", padx=5)
+        self.contract_menu = ctk.CTkOptionMenu(resolve_frame, values=[""], width=220)
+        self.contract_menu.pack(side="left", padx=5)
+        ctk.CTkButton(resolve_frame, text="确认", command=self.assign_selected, width=80).pack(side="left", padx=5)
+        ctk.CTkButton(resolve_frame, text="忽略/恢复", command=self.toggle_ignore_selected, width=100).pack(side="left", padx=5)
+
+        self.summary_label = ctk.CTkLabel(resolve_frame, text="", font=get_font("body_small"))
+        self.summary_label.pack(side="right", padx=10)
+
+        # 进度
+        progress_frame = ctk.CTkFrame(main_frame)
+        progress_frame.pack(fill="x", padx=5, pady=5)
+        self.progress_bar = ctk.CTkProgressBar(progress_frame)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(side="left", fill="x", expand=True, padx=10, pady=5)
+        self.progress_label = ctk.CTkLabel(progress_frame, text="", font=get_font("body_small"))
+        self.progress_label.pack(side="left", padx=5)
+
+        # 按钮
+        button_frame = ctk.CTkFrame(main_frame)
+        button_frame.pack(fill="x", padx=5, pady=5)
+        ctk.CTkButton(button_frame, text="关闭", command=self.cancel, width=100,
+                      fg_color="gray", hover_color="darkgray").pack(side="right", padx=5)
+        self.ingest_btn = ctk.CTkButton(button_frame, text="导入匹配文件", command=self.start_ingest, width=140,
+                                        fg_color="#2B8C2B", hover_color="#228B22", state="disabled")
+        self.ingest_btn.pack(side="right", padx=5)
+
+        self.center_dialog()
+
+    def browse_folder(self):
+        """选择证据文件夹"""
+        folder = filedialog.askdirectory(title="选择证据文件夹", parent=self.dialog)
+        if folder:
+            self.folder_entry.delete(0, "end")
+            self.folder_entry.insert(0, folder)
+
+    def is_busy(self) -> bool:
+        """后台任务是否正在运行"""
+        if self.worker and self.worker.is_alive():
+            messagebox.showwarning("警告", "正在处理，请稍候", parent=self.dialog)
+            return True
+        return False
+
+    def start_worker(self, target):
+        """启动后台任务并开始轮询事件"""
+        self.cancel_event.clear()
+        self.scan_btn.configure(state="disabled")
+        self.ingest_btn.configure(state="disabled")
+        self.worker = threading.Thread(target=target, name="EvidenceMatch", daemon=True)
+        self.worker.start()
+        self.dialog.after(100, self.poll_events)
+
+    def start_scan(self):
+        """在后台扫描文件夹并匹配合同"""
+        if self.is_busy():
+            return
+
+        folder = self.folder_entry.get().strip()
+        if not folder or not Path(folder).is_dir():
+            messagebox.showerror("错误", "请选择有效的证据文件夹", parent=self.dialog)
+            return
+
+        include_email = self.email_var.get()
+        self.progress_bar.configure(mode="indeterminate")
+        self.progress_bar.start()
+        self.progress_label.configure(text="正在建立合同号索引...")
+
+        def run():
+            try:
+                matcher = EvidenceMatcher(self.contract_ids)
+                matches = matcher.scan_folder(
+                    folder, include_email,
+                    lambda count: self.events.put(("scan_progress", count)),
+                    self.cancel_event
+                )
+                self.events.put(("scan_done", matches))
+            except Exception as e:
+                self.logger.error(f"匹配证据文件失败: {e}")
+                self.events.put(("error", f"匹配证据文件失败: {e}"))
+
+        self.start_worker(run)
+
+    def poll_events(self):
+        """处理后台任务事件"""
+        if not self.dialog.winfo_exists():
+            return
+
+        finished = False
+        try:
+            while True:
+                event = self.events.get_nowait()
+                kind = event[0]
+                if kind == "scan_progress":
+                    self.progress_label.configure(text=f"已扫描 {event[1]} 个文件")
+                elif kind == "scan_done":
+                    self.progress_bar.stop()
+                    self.progress_bar.configure(mode="determinate")
+                    self.progress_bar.set(1)
+                    self.show_matches(event[1])
+                    finished = True
+                elif kind == "ingest_progress":
+                    _, done, total, bytes_done, elapsed = event
+                    speed = bytes_done / elapsed / (1024 * 1024) if elapsed > 0 else 0
+                    self.progress_bar.set(done / total if total else 1)
+                    self.progress_label.configure(
+                        text=f"{done}/{total}  {bytes_done / (1024 * 1024):.1f} MB  {speed:.1f} MB/s"
+                    )
+                elif kind == "ingest_done":
+                    self.finish_ingest(event[1])
+                    finished = True
+                elif kind == "error":
+                    self.progress_bar.stop()
+                    self.progress_bar.configure(mode="determinate")
+                    messagebox.showerror("错误", event[1], parent=self.dialog)
+                    finished = True
+        except queue.Empty:
+            pass
+
+        if finished:
+            self.scan_btn.configure(state="normal")
+            self.update_summary()
+        else:
+            self.dialog.after(100, self.poll_events)
+
+    def show_matches(self, matches: List[Dict[str, Any]]):
+        """显示匹配结果（只列出匹配到合同的文件）"""
+        self.matches = matches
+        self.assigned.clear()
+        self.ignored.clear()
+        self.tree.delete(*self.tree.get_children())
+
+        for index, match in enumerate(matches):
+            if match["status"] == EvidenceMatcher.STATUS_UNMATCHED:
+                continue
+            iid = str(index)
+            if match["status"] == EvidenceMatcher.STATUS_MATCHED:
+                self.assigned[iid] = match["contract_ids"][0]
+            self.tree.insert("", "end", iid=iid, values=(
+                str(match["path"]),
+                " / ".join(match["contract_ids"]),
+                self.STATUS_NAMES[match["status"]],
+                match["source"]
+            ), tags=("conflict",) if match["status"] == EvidenceMatcher.STATUS_CONFLICT else ())
+
+        self.progress_label.configure(text=f"共扫描 {len(matches)} 个文件")
+
+    def update_summary(self):
+        """更新统计信息和导入按钮状态"""
+        counts = {status: 0 for status in self.STATUS_NAMES}
+        for match in self.matches:
+            counts[match["status"]] += 1
+        pending = sum(1 for iid in self.assigned if iid not in self.ignored)
+        self.summary_label.configure(
+            text=f"已匹配 {counts[EvidenceMatcher.STATUS_MATCHED]}  冲突 {counts[EvidenceMatcher.STATUS_CONFLICT]}  "
+                 f"未匹配 {counts[EvidenceMatcher.STATUS_UNMATCHED]}  待导入 {pending}"
+        )
+        self.ingest_btn.configure(state="normal" if pending else "disabled")
+
+    def on_select(self, event=None):
+        """选中冲突行时列出候选合同"""
+        selection = self.tree.selection()
+        if not selection:
+            return
+        candidates = self.matches[int(selection[0])]["contract_ids"]
+        self.contract_menu.configure(values=candidates)
+        self.contract_menu.set(self.assigned.get(selection[0], candidates[0]))
+
+    def assign_selected(self):
+        """为选中的文件指定合同"""
+        contract_id = self.contract_menu.get()
+        for iid in self.tree.selection():
+            if contract_id in self.matches[int(iid)]["contract_ids"]:
+                self.assigned[iid] = contract_id
+                self.ignored.discard(iid)
+                self.tree.set(iid, "contract", contract_id)
+                self.tree.set(iid, "status", "已确认")
+                self.tree.item(iid, tags=())
+        self.update_summary()
+
+    def toggle_ignore_selected(self):
+        """忽略或恢复选中的文件"""
+        for iid in self.tree.selection():
+            if iid in self.ignored:
+                self.ignored.discard(iid)
+                self.tree.item(iid, tags=())
+            else:
+                self.ignored.add(iid)
+                self.tree.item(iid, tags=("ignored",))
+        self.update_summary()
+
+    def start_ingest(self):
+        """在后台并行导入已确认的匹配文件"""
+        if self.is_busy():
+            return
+
+        assignments = [
+            (str(self.matches[int(iid)]["path"]), contract_id)
+            for iid, contract_id in self.assigned.items() if iid not in self.ignored
+        ]
+        if not assignments:
+            return
+
+        if not messagebox.askyesno("确认", f"确定将 {len(assignments)} 个文件添加为对应合同的附件吗？",
+                                   parent=self.dialog):
+            return
+
+        self.progress_bar.set(0)
+
+        def run():
+            result = self.file_manager.save_attachments_assigned(
+                assignments,
+                lambda *progress: self.events.put(("ingest_progress",) + progress),
+                self.cancel_event
+            )
+            self.events.put(("ingest_done", result))
+
+        self.start_worker(run)
+
+    def finish_ingest(self, outcome):
+        """导入完成"""
+        success, result, error_msg = outcome
+        if error_msg:
+            messagebox.showerror("错误", error_msg, parent=self.dialog)
+            return
+
+        # 已导入的文件不再重复导入
+        saved_sources = {item["source"] for item in result["saved"]}
+        for iid in list(self.assigned):
+            if str(self.matches[int(iid)]["path"]) in saved_sources:
+                del self.assigned[iid]
+                self.tree.delete(iid)
+
+        self.result = self.result or {"saved": []}
+        self.result["saved"].extend(result["saved"])
+
+        message = (f"成功导入 {len(result['saved'])} 个文件"
+                   f"（{result['total_bytes'] / (1024 * 1024):.1f} MB，"
+                   f"{result['throughput'] / (1024 * 1024):.1f} MB/s）")
+        if result["failed"]:
+            message += f"\n{len(result['failed'])} 个文件失败:\n" + "\n".join(
+                f"{Path(path).name}: {error}" for path, error in result["failed"][:10]
+            )
+            messagebox.showwarning("导入完成", message, parent=self.dialog)
+        else:
+            messagebox.showinfo("导入完成", message, parent=self.dialog)
+
+    def cancel(self):
+        """关闭对话框，后台任务运行时先请求停止"""
+        if self.worker and self.worker.is_alive():
+            self.cancel_event.set()
+            self.progress_label.configure(text="正在停止，请稍候...")
+            return
+        self.dialog.destroy()
+
+    def center_dialog(self):
+        """居中显示对话框"""
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+    def show(self) -> Optional[Dict[str, Any]]:
+        """显示对话框，返回已导入的文件 {"saved": [...]}"""
+        self.dialog.wait_window()
+        return self.result
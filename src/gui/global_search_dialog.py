@@ -0,0 +1,310 @@
+"""
+跨项目查找对话框
+按合同号、客户名或收入主体查找出现过的所有项目，或按这些字段跨项目汇总金额，
+直接查询跨项目索引，不加载各项目的数据库
+"""
+
+import logging
+import queue
+import threading
+import time
+import customtkinter as ctk
+from tkinter import messagebox
+from tkinter import ttk
+from typing import List, Dict, Any
+
+from ..data.project_manager import ProjectManager
+from ..data.global_index import GlobalIndex
+from ..config import get_font
+
+
+class GlobalSearchDialog:
+    """跨项目查找对话框"""
+
+    SEARCH_DELAY = 300  # 输入停止后多久开始查找（毫秒）
+    RESULT_LIMIT = 1000
+    ALL_FIELDS = "全部字段"
+
+    FIND_COLUMNS = {
+        "project": ("项目", 180, "w"), "contract_id": ("合同号", 130, "w"), "client_name": ("客户名", 180, "w"),
+        "subject_entity": ("收入主体", 140, "w"), "annual_income": ("本年确认的收入", 120, "e"),
+        "attachment_income": ("附件确认的收入", 120, "e"), "attachment_count": ("附件数", 60, "center")
+    }
+    ROLLUP_COLUMNS = {
+        "key": ("", 220, "w"), "project_count": ("项目数", 70, "center"), "record_count": ("记录数", 70, "center"),
+        "annual_income": ("本年确认的收入", 130, "e"), "attachment_income": ("附件确认的收入", 130, "e"),
+        "projects": ("出现的项目", 320, "w")
+    }
+
+    def __init__(self, parent, project_manager: ProjectManager):
+        self.parent = parent
+        self.project_manager = project_manager
+        self.logger = logging.getLogger(__name__)
+
+        self.index = self.project_manager.get_global_index()
+        self.results: List[Dict[str, Any]] = []
+        self.search_job = None
+
+        # 后台收录未索引的项目
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.events = queue.Queue()
+
+        self.create_dialog()
+        self.update_index_status()
+        self.search()
+
+    def create_dialog(self):
+        """创建对话框"""
+        self.dialog = ctk.CTkToplevel(self.parent)
+        self.dialog.title("跨项目查找")
+        self.dialog.geometry("1080x620")
+        self.dialog.resizable(True, True)
+        self.dialog.transient(self.parent)
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        # 查找条件
+        search_frame = ctk.CTkFrame(main_frame)
+        search_frame.pack(fill="x", padx=5, pady=5)
+
+        self.mode_var = ctk.StringVar(value="查找记录")
+        ctk.CTkSegmentedButton(search_frame, values=["查找记录", "跨项目汇总"], variable=self.mode_var,
+                               command=lambda value: self.on_mode_changed()).pack(side="left", padx=5)
+
+        self.field_var = ctk.StringVar(value=self.ALL_FIELDS)
+        self.field_menu = ctk.CTkOptionMenu(
+            search_frame, variable=self.field_var, width=110,
+            values=[self.ALL_FIELDS] + list(GlobalIndex.FIELDS.values()),
+            command=lambda value: self.search()
+        )
+        self.field_menu.pack(side="left", padx=5)
+
+        self.search_entry = ctk.CTkEntry(search_frame, placeholder_text="合同号、客户名或收入主体")
+        self.search_entry.pack(side="left", fill="x", expand=True, padx=5)
+        self.search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.search_entry.bind("<Return>", lambda event: self.search())
+
+        self.exact_var = ctk.BooleanVar(value=False)
+        ctk.CTkCheckBox(search_frame, text="精确匹配", variable=self.exact_var,
+                        command=self.search).pack(side="left", padx=5)
+
+        # 结果列表
+        tree_frame = ctk.CTkFrame(main_frame)
+        tree_frame.pack(fill="both", expand=True, padx=5, pady=5)
+
+        self.tree = ttk.Treeview(tree_frame, show="headings")
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        self.tree.bind("<Double-1>", lambda event: self.drill_down())
+        self.configure_columns()
+
+        # 状态和按钮
+        bottom_frame = ctk.CTkFrame(main_frame)
+        bottom_frame.pack(fill="x", padx=5, pady=5)
+
+        self.status_label = ctk.CTkLabel(bottom_frame, text="", font=get_font("body_small"))
+        self.status_label.pack(side="left", padx=10)
+
+        ctk.CTkButton(bottom_frame, text="关闭", command=self.close, width=100,
+                      fg_color="gray", hover_color="darkgray").pack(side="right", padx=5)
+        self.index_btn = ctk.CTkButton(bottom_frame, text="收录未索引的项目", command=self.index_missing_projects,
+                                       width=140)
+        self.index_btn.pack(side="right", padx=5)
+        self.index_status_label = ctk.CTkLabel(bottom_frame, text="", font=get_font("body_small"))
+        self.index_status_label.pack(side="right", padx=10)
+
+        if not self.index:
+            self.status_label.configure(text="跨项目索引不可用")
+            self.index_btn.configure(state="disabled")
+
+        self.center_dialog()
+        self.search_entry.focus_set()
+
+    def is_rollup(self) -> bool:
+        """是否为跨项目汇总模式"""
+        return self.mode_var.get() == "跨项目汇总"
+
+    def get_field(self):
+        """选中的字段名，全部字段时返回None"""
+        for field, label in GlobalIndex.FIELDS.items():
+            if label == self.field_var.get():
+                return field
+        return None
+
+    def configure_columns(self):
+        """按当前模式设置列"""
+        columns = self.ROLLUP_COLUMNS if self.is_rollup() else self.FIND_COLUMNS
+        self.tree.delete(*self.tree.get_children())
+        self.tree.configure(columns=list(columns))
+        for column, (text, width, anchor) in columns.items():
+            if column == "key":
+                text = GlobalIndex.FIELDS[self.get_field() or "client_name"]
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width, anchor=anchor)
+
+    def on_mode_changed(self):
+        """切换查找/汇总模式，汇总需要指定字段（默认按客户名）"""
+        if self.is_rollup():
+            self.field_menu.configure(values=list(GlobalIndex.FIELDS.values()))
+            if self.get_field() is None:
+                self.field_var.set(GlobalIndex.FIELDS["client_name"])
+        else:
+            self.field_menu.configure(values=[self.ALL_FIELDS] + list(GlobalIndex.FIELDS.values()))
+        self.search()
+
+    def schedule_search(self, event=None):
+        """输入停止一段时间后再查找"""
+        if self.search_job:
+            self.dialog.after_cancel(self.search_job)
+        self.search_job = self.dialog.after(self.SEARCH_DELAY, self.search)
+
+    def project_name(self, project_id: str) -> str:
+        """项目名称，项目已删除时显示项目ID"""
+        project_config = self.project_manager.projects_config["projects"].get(project_id)
+        return project_config["name"] if project_config else project_id
+
+    def search(self):
+        """执行查找或汇总"""
+        self.search_job = None
+        self.configure_columns()
+        if not self.index:
+            return
+
+        keyword = self.search_entry.get().strip()
+        start = time.perf_counter()
+        if self.is_rollup():
+            self.results = self.index.rollup(self.get_field(), keyword, self.RESULT_LIMIT)
+        else:
+            self.results = self.index.find(keyword, self.get_field(), self.exact_var.get(), self.RESULT_LIMIT)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        for index, result in enumerate(self.results):
+            if self.is_rollup():
+                values = (
+                    result["key"], result["project_count"], result["record_count"],
+                    f"{result['annual_income']:,.2f}", f"{result['attachment_income']:,.2f}",
+                    "、".join(self.project_name(project_id) for project_id in result["projects"])
+                )
+            else:
+                attachment_income = result["attachment_income"]
+                values = (
+                    self.project_name(result["project_id"]), result["contract_id"], result["client_name"],
+                    result["subject_entity"], f"{result['annual_income']:,.2f}",
+                    f"{attachment_income:,.2f}" if attachment_income is not None else "",
+                    result["attachment_count"]
+                )
+            self.tree.insert("", "end", iid=str(index), values=values)
+
+        limit_note = f"（仅显示前{self.RESULT_LIMIT}条）" if len(self.results) >= self.RESULT_LIMIT else ""
+        if self.is_rollup():
+            text = f"共 {len(self.results)} 个{self.field_var.get()}{limit_note}，用时 {elapsed_ms:.0f} 毫秒"
+        elif keyword:
+            projects = len({r["project_id"] for r in self.results})
+            text = f"找到 {len(self.results)} 条记录{limit_note}，涉及 {projects} 个项目，用时 {elapsed_ms:.0f} 毫秒"
+        else:
+            text = "输入关键词查找，或切换到跨项目汇总"
+        self.status_label.configure(text=text)
+
+    def drill_down(self):
+        """双击汇总行时查找该分组在各项目中的记录"""
+        selection = self.tree.selection()
+        if not selection or not self.is_rollup():
+            return
+
+        key = self.results[int(selection[0])]["key"]
+        self.mode_var.set("查找记录")
+        self.field_menu.configure(values=[self.ALL_FIELDS] + list(GlobalIndex.FIELDS.values()))
+        self.exact_var.set(True)
+        self.search_entry.delete(0, "end")
+        self.search_entry.insert(0, key)
+        self.search()
+
+    def update_index_status(self):
+        """显示索引收录情况"""
+        if not self.index:
+            return
+
+        stats = self.index.get_stats()
+        indexed = self.index.get_indexed_versions()
+        missing = sum(1 for project_id in self.project_manager.projects_config["projects"] if project_id not in indexed)
+        text = f"已索引 {stats['project_count']} 个项目、{stats['record_count']} 条记录"
+        if missing:
+            text += f"，{missing} 个项目未收录"
+        self.index_status_label.configure(text=text)
+        if not (self.worker and self.worker.is_alive()):
+            self.index_btn.configure(state="normal" if missing else "disabled")
+
+    def index_missing_projects(self):
+        """在后台收录未索引的项目（需要逐个加载项目数据库）"""
+        if self.worker and self.worker.is_alive():
+            return
+
+        self.cancel_event.clear()
+        self.index_btn.configure(state="disabled")
+
+        def run():
+            try:
+                self.events.put(("done",) + tuple(self.project_manager.index_missing_projects(
+                    lambda done, total: self.events.put(("progress", done, total)), self.cancel_event
+                )))
+            except Exception as e:
+                self.logger.error(f"收录项目失败: {e}")
+                self.events.put(("done", False, 0, str(e)))
+
+        self.worker = threading.Thread(target=run, name="GlobalIndexUpdate", daemon=True)
+        self.worker.start()
+        self.dialog.after(200, self.poll_events)
+
+    def poll_events(self):
+        """处理后台收录的事件"""
+        if not self.dialog.winfo_exists():
+            return
+
+        finished = None
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event[0] == "progress":
+                    _, done, total = event
+                    self.index_status_label.configure(text=f"正在收录项目 {done}/{total}...")
+                else:
+                    finished = event[1:]
+        except queue.Empty:
+            pass
+
+        if finished is None:
+            self.dialog.after(200, self.poll_events)
+            return
+
+        success, count, error_msg = finished
+        self.update_index_status()
+        self.search()
+        if not success and not self.cancel_event.is_set():
+            messagebox.showerror("错误", error_msg, parent=self.dialog)
+
+    def close(self):
+        """关闭对话框，收录进行中时先请求停止"""
+        if self.worker and self.worker.is_alive():
+            self.cancel_event.set()
+            self.index_status_label.configure(text="正在停止，请稍候...")
+            self.dialog.after(200, self.close)
+            return
+        self.dialog.destroy()
+
+    def center_dialog(self):
+        """居中显示对话框"""
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+
+    def show(self):
+        """显示对话框"""
+        self.dialog.wait_window()
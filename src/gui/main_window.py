@@ -4,6 +4,7 @@
 """
 
 import logging
+import time
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
 from typing import List, Dict, Any, Optional
@@ -17,7 +18,10 @@ from ..data.excel_handler import ExcelHandler
 from ..data.data_processor import DataProcessor
 from ..data.file_manager import FileManager
 from ..data.project_manager import ProjectManager
-from ..config import WINDOW_CONFIG, THEME_CONFIG, APP_NAME, get_font
+from ..data.import_worker import ImportWorker
+from ..data.backup_scheduler import BackupScheduler
+from ..data.project_summary import ProjectSummaryWriter
+from ..config import WINDOW_CONFIG, THEME_CONFIG, APP_NAME, INGEST_MODES, get_font
 
 
 class MainWindow:
@@ -38,7 +42,9 @@ class MainWindow:
         if self.current_project_config:
             # 如果有当前项目，使用项目的数据库和存储路径
             self.database = Database(Path(self.current_project_config["database_file"]))
-            self.file_manager = FileManager(self.current_project_config["attachments_dir"])
+            self.file_manager = FileManager(self.current_project_config["attachments_dir"],
+                                            self.current_project_config.get("ingest_mode"),
+                                            self.current_project_config.get("data_dir"))
         
         # 设置CustomTkinter主题
         ctk.set_appearance_mode(THEME_CONFIG["appearance_mode"])
@@ -73,9 +79,19 @@ class MainWindow:
             "mode": "包含"
         }
         
+        # 后台导入任务
+        self.import_worker: Optional[ImportWorker] = None
+        
+        # 自动备份（最近一次键盘鼠标操作的时间用于判断是否空闲）
+        self.backup_scheduler: Optional[BackupScheduler] = None
+        self.backup_status_job = None
+        self.last_activity = time.monotonic()
+        
         # 创建界面
         self.create_widgets()
         self.load_data()
+        self.attach_save_listeners()
+        self.start_backup_scheduler()
         
         self.logger.info("主窗口初始化完成")
     
@@ -117,8 +133,10 @@ class MainWindow:
         file_frame.pack(side="left", padx=5)
         
         ctk.CTkLabel(file_frame, text="文件操作:", font=get_font("body_large")).pack(side="left", padx=5)
-        ctk.CTkButton(file_frame, text="导入Excel", command=self.import_excel, width=100).pack(side="left", padx=2)
+        self.import_btn = ctk.CTkButton(file_frame, text="导入Excel", command=self.import_excel, width=100)
+        self.import_btn.pack(side="left", padx=2)
         ctk.CTkButton(file_frame, text="导出数据", command=self.export_data, width=100).pack(side="left", padx=2)
+        ctk.CTkButton(file_frame, text="分组导出", command=self.export_grouped_data, width=100).pack(side="left", padx=2)
         
         # 项目操作
         project_frame = ctk.CTkFrame(toolbar_frame)
@@ -126,6 +144,7 @@ class MainWindow:
         
         ctk.CTkLabel(project_frame, text="项目操作:", font=get_font("body_large")).pack(side="left", padx=5)
         ctk.CTkButton(project_frame, text="切换项目", command=self.switch_project, width=100).pack(side="left", padx=2)
+        ctk.CTkButton(project_frame, text="跨项目查找", command=self.search_all_projects, width=100).pack(side="left", padx=2)
         
         # 数据操作
         data_frame = ctk.CTkFrame(toolbar_frame)
@@ -133,6 +152,9 @@ class MainWindow:
         
         ctk.CTkLabel(data_frame, text="数据操作:", font=get_font("body_large")).pack(side="left", padx=5)
         ctk.CTkButton(data_frame, text="新增记录", command=self.add_record, width=100).pack(side="left", padx=2)
+        ctk.CTkButton(data_frame, text="批量匹配证据", command=self.match_evidence, width=110).pack(side="left", padx=2)
+        ctk.CTkButton(data_frame, text="全文搜索", command=self.search_attachment_content, width=100).pack(side="left", padx=2)
+        ctk.CTkButton(data_frame, text="提取附件金额", command=self.review_attachment_amounts, width=110).pack(side="left", padx=2)
         ctk.CTkButton(data_frame, text="统计分析", command=self.show_statistics, width=100).pack(side="left", padx=2)
         ctk.CTkButton(data_frame, text="设置", command=self.show_settings, width=100).pack(side="left", padx=2)
         
@@ -355,8 +377,98 @@ class MainWindow:
         self.status_label = ctk.CTkLabel(status_frame, text="就绪")
         self.status_label.pack(side="left", padx=10, pady=5)
         
+        # 导入进度（仅在后台导入时显示）
+        self.import_progress_frame = ctk.CTkFrame(status_frame, fg_color="transparent")
+        self.import_progress_bar = ctk.CTkProgressBar(self.import_progress_frame, width=200)
+        self.import_progress_bar.pack(side="left", padx=5)
+        self.import_progress_label = ctk.CTkLabel(self.import_progress_frame, text="", font=get_font("body_small"))
+        self.import_progress_label.pack(side="left", padx=5)
+        self.import_cancel_btn = ctk.CTkButton(self.import_progress_frame, text="取消导入", width=80,
+                                               command=self.cancel_import,
+                                               fg_color="gray", hover_color="darkgray")
+        self.import_cancel_btn.pack(side="left", padx=5)
+        
         version_label = ctk.CTkLabel(status_frame, text=f"{APP_NAME} v1.0.0")
         version_label.pack(side="right", padx=10, pady=5)
+        
+        # 自动备份状态
+        self.backup_status_label = ctk.CTkLabel(status_frame, text="", font=get_font("body_small"),
+                                                text_color="gray")
+        self.backup_status_label.pack(side="right", padx=10, pady=5)
+        
+        # 记录用户操作时间
+        for sequence in ("<Any-KeyPress>", "<Any-ButtonPress>", "<Motion>", "<MouseWheel>"):
+            self.root.bind_all(sequence, self.on_user_activity, add="+")
+    
+    def attach_save_listeners(self):
+        """数据库保存后更新项目摘要文件（供项目列表显示）和跨项目索引"""
+        if not self.current_project_config or not self.current_project_config.get("data_dir"):
+            return
+        
+        file_manager = self.file_manager
+        writer = ProjectSummaryWriter(self.current_project_config["data_dir"], file_manager.get_attachment_totals)
+        self.database.add_save_listener(writer)
+        
+        project_id = self.current_project_config["id"]
+        project_manager = self.project_manager
+        # 索引在后台线程中更新，保存时界面无需等待
+        index_updater = lambda database: project_manager.schedule_global_index_update(project_id, database)
+        self.database.add_save_listener(index_updater)
+        
+        # 旧项目首次打开时生成摘要并加入索引（记录未变化时不重写）
+        writer(self.database)
+        index_updater(self.database)
+    
+    def on_user_activity(self, event=None):
+        """记录最近一次用户操作的时间"""
+        self.last_activity = time.monotonic()
+    
+    def start_backup_scheduler(self):
+        """为当前项目启动自动备份"""
+        self.stop_backup_scheduler()
+        if not self.current_project_config:
+            self.backup_status_label.configure(text="")
+            return
+        
+        self.backup_scheduler = BackupScheduler(
+            self.project_manager, self.current_project_config["id"],
+            idle_seconds=lambda: time.monotonic() - self.last_activity,
+            is_busy=lambda: self.import_worker is not None
+        )
+        self.backup_scheduler.start()
+        self.refresh_backup_status()
+    
+    def stop_backup_scheduler(self):
+        """停止自动备份（进行中的备份会被取消）"""
+        if self.backup_status_job:
+            self.root.after_cancel(self.backup_status_job)
+            self.backup_status_job = None
+        if self.backup_scheduler:
+            self.backup_scheduler.stop()
+            self.backup_scheduler = None
+    
+    def refresh_backup_status(self):
+        """在状态栏显示上次备份的时间和用时"""
+        if not self.backup_scheduler:
+            return
+        
+        status = self.backup_scheduler.get_status()
+        last_backup = status["last_backup"]
+        if status["running"]:
+            text = "正在自动备份..."
+        elif last_backup:
+            try:
+                created = datetime.fromisoformat(last_backup["created_time"]).strftime("%Y-%m-%d %H:%M")
+            except (KeyError, ValueError):
+                created = last_backup.get("id", "")
+            text = f"上次备份: {created}（用时 {last_backup.get('elapsed', 0)} 秒）"
+        else:
+            text = "尚未备份"
+        if status["last_error"] and not status["running"]:
+            text += "，自动备份失败"
+        self.backup_status_label.configure(text=text, text_color="red" if status["last_error"] else "gray")
+        
+        self.backup_status_job = self.root.after(5000, self.refresh_backup_status)
     
     def load_data(self):
         """加载数据"""
@@ -571,10 +683,15 @@ class MainWindow:
     def import_excel(self):
         """导入Excel文件"""
         try:
-            # 1. 选择Excel文件
+            # 1. 选择Excel或CSV文件
             file_path = filedialog.askopenfilename(
                 title="选择Excel文件",
-                filetypes=[("Excel files", "*.xlsx *.xls"), ("All files", "*.*")]
+                filetypes=[
+                    ("Excel/CSV files", "*.xlsx *.xls *.csv *.tsv *.txt"),
+                    ("Excel files", "*.xlsx *.xls"),
+                    ("CSV files", "*.csv *.tsv *.txt"),
+                    ("All files", "*.*")
+                ]
             )
             
             if not file_path:
@@ -606,42 +723,28 @@ class MainWindow:
             selected_sheet = result['sheet_name']
             column_mapping = result['column_mapping']
             
-            self.update_status(f"正在导入工作表: {selected_sheet}...")
+            # 4. 在后台线程中导入数据，界面保持可用
+            version_info = {
+                "import_time": str(datetime.now()),
+                "source_file": file_path,
+                "sheet_name": selected_sheet,
+                "column_mapping": column_mapping
+            }
             
-            # 4. 导入数据，使用列映射
-            self.update_status("正在处理数据...")
-            self.root.update_idletasks()  # 立即更新界面
+            self.import_worker = ImportWorker(
+                self.excel_handler, self.database, file_path,
+                selected_sheet, column_mapping, version_info
+            )
+            self.import_worker.start()
             
-            records = self.excel_handler.import_excel(file_path, selected_sheet, column_mapping)
+            self.import_btn.configure(state="disabled")
+            self.import_cancel_btn.configure(state="normal")
+            self.import_progress_bar.set(0)
+            self.import_progress_label.configure(text="")
+            self.import_progress_frame.pack(side="left", padx=10, pady=5)
+            self.update_status(f"正在后台导入工作表: {selected_sheet}...")
             
-            if records:
-                self.update_status(f"正在保存 {len(records)} 条记录到数据库...")
-                self.root.update_idletasks()
-                
-                # 保存到数据库
-                version_info = {
-                    "import_time": str(datetime.now()),
-                    "source_file": file_path,
-                    "sheet_name": selected_sheet,
-                    "column_mapping": column_mapping,
-                    "record_count": len(records)
-                }
-                
-                if self.database.import_excel_data(records, version_info):
-                    self.update_status("正在刷新界面...")
-                    self.root.update_idletasks()
-                    
-                    # 重新加载数据，但保持筛选状态
-                    self.current_records = self.database.get_all_income_records()
-                    self.apply_multi_filters()
-                    self.update_status(f"成功导入 {len(records)} 条记录")
-                    messagebox.showinfo("成功", f"从工作表 '{selected_sheet}' 成功导入 {len(records)} 条记录")
-                else:
-                    self.update_status("导入失败")
-                    messagebox.showerror("错误", "保存导入数据失败")
-            else:
-                self.update_status("没有导入任何数据")
-                messagebox.showwarning("警告", "没有找到有效的数据，请检查Excel文件格式和列映射")
+            self.root.after(100, self.poll_import_events)
                 
         except Exception as e:
             error_msg = f"导入Excel失败: {e}"
@@ -649,6 +752,105 @@ class MainWindow:
             self.update_status("导入失败")
             messagebox.showerror("错误", error_msg)
     
+    # 各导入阶段在进度条中所占的区间
+    IMPORT_STAGE_RANGES = {
+        "parse": (0.0, 0.2),
+        "convert": (0.2, 0.5),
+        "diff": (0.5, 0.6),
+        "write": (0.6, 1.0)
+    }
+    
+    def poll_import_events(self):
+        """轮询后台导入事件"""
+        worker = self.import_worker
+        if worker is None:
+            return
+        
+        try:
+            while True:
+                try:
+                    event = worker.events.get_nowait()
+                except Exception:
+                    break
+                
+                if event["type"] == "progress":
+                    self.show_import_progress(event["stage"], event["current"], event["total"])
+                else:
+                    self.finish_import(event)
+                    return
+            
+            self.root.after(100, self.poll_import_events)
+            
+        except Exception as e:
+            self.logger.error(f"处理导入进度失败: {e}")
+            self.finish_import({"type": "error", "message": str(e)})
+    
+    def show_import_progress(self, stage: str, current: int, total: int):
+        """显示导入进度"""
+        start, end = self.IMPORT_STAGE_RANGES.get(stage, (0.0, 1.0))
+        fraction = min(current / total, 1.0) if total > 0 else 0.0
+        self.import_progress_bar.set(start + (end - start) * fraction)
+        
+        stage_name = ImportWorker.STAGE_NAMES.get(stage, stage)
+        if stage == "write":
+            text = f"{stage_name} {current / (1024 * 1024):.1f} MB"
+        elif total > 0:
+            text = f"{stage_name} {current}/{total}"
+        elif current > 0:
+            text = f"{stage_name} {current}"
+        else:
+            text = f"{stage_name}..."
+        self.import_progress_label.configure(text=text)
+    
+    def finish_import(self, event: Dict[str, Any]):
+        """处理后台导入结束事件"""
+        worker = self.import_worker
+        self.import_worker = None
+        
+        self.import_progress_frame.pack_forget()
+        self.import_btn.configure(state="normal")
+        
+        if event["type"] == "done":
+            # 结果送达前已点击取消，丢弃临时文件
+            if worker.is_cancelled:
+                worker.discard(event["temp_file"])
+                self.update_status("导入已取消，数据未改变")
+                return
+            
+            if self.database.commit_import(event["snapshot"], event["temp_file"]):
+                # 重新加载数据，但保持筛选状态
+                self.current_records = self.database.get_all_income_records()
+                self.apply_multi_filters()
+                
+                record_count = event["record_count"]
+                sheet_name = worker.sheet_name
+                self.update_status(f"成功导入 {record_count} 条记录")
+                messagebox.showinfo("成功", f"从工作表 '{sheet_name}' 成功导入 {record_count} 条记录")
+            else:
+                worker.discard(event["temp_file"])
+                self.update_status("导入失败")
+                messagebox.showerror("错误", "保存导入数据失败")
+        elif event["type"] == "cancelled":
+            self.update_status("导入已取消，数据未改变")
+        else:
+            self.update_status("导入失败")
+            messagebox.showerror("错误", event.get("message") or "导入失败")
+    
+    def cancel_import(self):
+        """取消后台导入"""
+        if self.import_worker is not None:
+            self.import_worker.cancel()
+            self.import_cancel_btn.configure(state="disabled")
+            self.update_status("正在取消导入...")
+    
+    def is_import_running(self, warn: bool = True) -> bool:
+        """检查是否有后台导入正在进行，导入期间禁止修改数据"""
+        if self.import_worker is not None:
+            if warn:
+                messagebox.showwarning("提示", "数据正在后台导入，请等待导入完成或取消后再修改数据")
+            return True
+        return False
+    
     def export_data(self):
         """导出数据"""
         try:
@@ -656,10 +858,14 @@ class MainWindow:
                 messagebox.showwarning("警告", "没有数据可以导出")
                 return
             
+            # 可用的导出格式（Parquet/Feather需要pyarrow）
+            export_formats = self.excel_handler.get_export_formats()
+            filetypes = [(f"{name} files", f"*{suffix}") for suffix, name in export_formats.items()]
+            
             file_path = filedialog.asksaveasfilename(
-                title="保存Excel文件",
+                title="导出数据",
                 defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+                filetypes=filetypes + [("All files", "*.*")]
             )
             
             if not file_path:
@@ -684,6 +890,69 @@ class MainWindow:
     
 
 
+    def export_grouped_data(self):
+        """按字段分组导出数据（每组一个工作表并附汇总表）"""
+        try:
+            if not self.filtered_records:
+                messagebox.showwarning("警告", "没有数据可以导出")
+                return
+            
+            # 选择分组字段
+            dialog = ctk.CTkToplevel(self.root)
+            dialog.title("分组导出")
+            dialog.geometry("360x180")
+            dialog.transient(self.root)
+            dialog.grab_set()
+            
+            ctk.CTkLabel(dialog, text="分组字段:", font=get_font("body_large")).pack(anchor="w", padx=20, pady=(20, 5))
+            field_var = ctk.StringVar(value=self.data_processor.GROUP_FIELDS[0])
+            ctk.CTkOptionMenu(dialog, values=self.data_processor.GROUP_FIELDS, variable=field_var).pack(
+                fill="x", padx=20, pady=5)
+            
+            selected = {"field": None}
+            
+            def confirm():
+                selected["field"] = field_var.get()
+                dialog.destroy()
+            
+            btn_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+            btn_frame.pack(pady=15)
+            ctk.CTkButton(btn_frame, text="取消", command=dialog.destroy, width=100).pack(side="left", padx=5)
+            ctk.CTkButton(btn_frame, text="确定", command=confirm, width=100).pack(side="left", padx=5)
+            
+            dialog.wait_window()
+            
+            group_field = selected["field"]
+            if not group_field:
+                return
+            
+            file_path = filedialog.asksaveasfilename(
+                title="保存分组导出文件",
+                defaultextension=".xlsx",
+                filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")]
+            )
+            
+            if not file_path:
+                return
+            
+            self.update_status(f"正在按{group_field}分组导出数据...")
+            
+            success, error_msg = self.excel_handler.export_grouped_excel(
+                self.filtered_records, file_path, group_field
+            )
+            if success:
+                self.update_status(f"成功分组导出 {len(self.filtered_records)} 条记录")
+                messagebox.showinfo("成功", f"已按{group_field}分组导出 {len(self.filtered_records)} 条记录到 {file_path}")
+            else:
+                self.update_status("导出失败")
+                messagebox.showerror("错误", error_msg)
+                
+        except Exception as e:
+            error_msg = f"分组导出失败: {e}"
+            self.logger.error(error_msg)
+            self.update_status("导出失败")
+            messagebox.showerror("错误", error_msg)
+    
     def go_first_page(self):
         """跳转到首页"""
         self.current_page = 1
@@ -1096,6 +1365,9 @@ class MainWindow:
     def add_record(self):
         """新增记录"""
         try:
+            if self.is_import_running():
+                return
+            
             from .record_dialog import RecordEditDialog
             
             dialog = RecordEditDialog(self.root)
@@ -1178,6 +1450,9 @@ class MainWindow:
                     self.reload_project()
                     settings_dialog.destroy()
                     messagebox.showinfo("提示", "项目切换成功，数据已重新加载")
+                elif self.backup_scheduler:
+                    # 可能手动备份过
+                    self.backup_scheduler.refresh()
             
             ctk.CTkButton(project_btn_frame, text="新建项目", command=new_project, width=120).pack(side="left", padx=5)
             ctk.CTkButton(project_btn_frame, text="项目管理", command=manage_projects, width=120).pack(side="left", padx=5)
@@ -1211,17 +1486,67 @@ class MainWindow:
             
             ctk.CTkButton(path_frame, text="更改存储路径", command=change_storage_path).pack(anchor="w", padx=5, pady=5)
             
+            # 附件导入方式（按项目保存）
+            mode_frame = ctk.CTkFrame(storage_frame)
+            mode_frame.pack(fill="x", padx=10, pady=5)
+            
+            ctk.CTkLabel(mode_frame, text="附件导入方式:").pack(side="left", padx=5)
+            mode_names = {name: mode for mode, name in INGEST_MODES.items()}
+            
+            def change_ingest_mode(choice):
+                mode = mode_names[choice]
+                if mode == "link" and not messagebox.askyesno(
+                    "确认", "硬链接方式下附件与源文件共用同一份数据，修改源文件会同时改变已导入的附件。\n确定使用该方式吗？"
+                ):
+                    mode_menu.set(INGEST_MODES[self.file_manager.copier.mode])
+                    return
+                self.file_manager.set_ingest_mode(mode)
+                if self.current_project_config:
+                    self.project_manager.set_project_ingest_mode(mode)
+            
+            mode_menu = ctk.CTkOptionMenu(mode_frame, values=list(INGEST_MODES.values()), command=change_ingest_mode)
+            mode_menu.set(INGEST_MODES[self.file_manager.copier.mode])
+            mode_menu.pack(side="left", padx=5)
+            
             # 存储信息
             info_frame = ctk.CTkFrame(storage_frame)
             info_frame.pack(fill="x", padx=10, pady=5)
             
-            storage_info = self.file_manager.get_storage_info()
-            info_text = f"""存储统计信息:
+            info_label = ctk.CTkLabel(info_frame, text="", justify="left")
+            info_label.pack(anchor="w", padx=10, pady=10)
+            
+            # 统计信息来自附件目录的累计统计，后台校验期间定时刷新
+            def refresh_storage_info():
+                if not settings_dialog.winfo_exists():
+                    return
+                storage_info = self.file_manager.get_storage_info()
+                info_text = f"""存储统计信息:
 • 合同文件夹数量: {storage_info['contract_count']}
 • 附件文件数量: {storage_info['file_count']}
 • 总存储大小: {storage_info['total_size_mb']} MB"""
-            
-            ctk.CTkLabel(info_frame, text=info_text, justify="left").pack(anchor="w", padx=10, pady=10)
+                if storage_info.get("archive_member_count"):
+                    info_text += f"\n• 压缩包内文件数量: {storage_info['archive_member_count']}"
+                if storage_info.get("dedup_saved_mb"):
+                    info_text += f"\n• 去重节省空间: {storage_info['dedup_saved_mb']} MB"
+                if storage_info.get("verifying"):
+                    info_text += "\n（正在后台校验存储目录...）"
+                    settings_dialog.after(1000, refresh_storage_info)
+                info_label.configure(text=info_text)
+            
+            def verify_storage():
+                if not self.file_manager.verify_storage():
+                    messagebox.showinfo("提示", "存储目录校验正在进行中")
+                refresh_storage_info()
+            
+            info_btn_frame = ctk.CTkFrame(info_frame)
+            info_btn_frame.pack(anchor="w", padx=5, pady=(0, 5))
+            ctk.CTkButton(info_btn_frame, text="按合同统计", command=lambda: self.show_contract_usage(settings_dialog),
+                          width=120).pack(side="left", padx=5)
+            ctk.CTkButton(info_btn_frame, text="校验存储目录", command=verify_storage, width=120).pack(side="left", padx=5)
+            ctk.CTkButton(info_btn_frame, text="查找重复附件", command=lambda: self.show_duplicate_report(settings_dialog),
+                          width=120).pack(side="left", padx=5)
+            
+            refresh_storage_info()
             
             # 关闭按钮
             close_btn = ctk.CTkButton(main_frame, text="关闭", command=settings_dialog.destroy)
@@ -1239,9 +1564,161 @@ class MainWindow:
             self.logger.error(f"显示设置对话框失败: {e}")
             messagebox.showerror("错误", f"显示设置对话框失败: {e}")
     
+    def show_contract_usage(self, parent):
+        """显示每个合同的附件数量和占用空间"""
+        try:
+            from tkinter import ttk
+            
+            usage = self.file_manager.get_contract_usage()
+            
+            dialog = ctk.CTkToplevel(parent)
+            dialog.title(f"按合同统计 ({len(usage)}个合同)")
+            dialog.geometry("520x480")
+            dialog.transient(parent)
+            
+            tree_frame = ctk.CTkFrame(dialog)
+            tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
+            
+            tree = ttk.Treeview(tree_frame, columns=("contract", "count", "size"), show="headings")
+            tree.heading("contract", text="合同文件夹")
+            tree.heading("count", text="附件数")
+            tree.heading("size", text="占用空间(MB)")
+            tree.column("contract", width=260)
+            tree.column("count", width=80, anchor="e")
+            tree.column("size", width=120, anchor="e")
+            
+            scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side="left", fill="both", expand=True)
+            scrollbar.pack(side="right", fill="y")
+            
+            for item in usage:
+                tree.insert("", "end", values=(
+                    item["contract"],
+                    item["file_count"],
+                    f"{item['total_size'] / (1024 * 1024):,.2f}"
+                ))
+            
+            ctk.CTkButton(dialog, text="关闭", command=dialog.destroy).pack(pady=(0, 10))
+            
+        except Exception as e:
+            self.logger.error(f"显示合同存储统计失败: {e}")
+            messagebox.showerror("错误", f"显示合同存储统计失败: {e}")
+    
+    def show_duplicate_report(self, parent):
+        """在后台查找重复附件并显示重复组"""
+        try:
+            import queue
+            import threading
+            from tkinter import ttk
+            
+            dialog = ctk.CTkToplevel(parent)
+            dialog.title("重复附件")
+            dialog.geometry("900x560")
+            dialog.transient(parent)
+            
+            status_label = ctk.CTkLabel(dialog, text="正在查找重复附件...", font=get_font("body"))
+            status_label.pack(anchor="w", padx=10, pady=(10, 0))
+            
+            tree_frame = ctk.CTkFrame(dialog)
+            tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
+            
+            tree = ttk.Treeview(tree_frame, columns=("contract", "size", "path"), show="tree headings")
+            tree.heading("#0", text="重复组 / 文件")
+            tree.heading("contract", text="合同")
+            tree.heading("size", text="大小(MB)")
+            tree.heading("path", text="路径")
+            tree.column("#0", width=220)
+            tree.column("contract", width=160)
+            tree.column("size", width=90, anchor="e")
+            tree.column("path", width=380)
+            
+            scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side="left", fill="both", expand=True)
+            scrollbar.pack(side="right", fill="y")
+            
+            cancel_event = threading.Event()
+            events = queue.Queue()
+            
+            def close():
+                cancel_event.set()
+                dialog.destroy()
+            
+            dialog.protocol("WM_DELETE_WINDOW", close)
+            button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+            button_frame.pack(pady=(0, 10))
+            stop_btn = ctk.CTkButton(button_frame, text="停止", command=cancel_event.set, width=80)
+            stop_btn.pack(side="left", padx=5)
+            ctk.CTkButton(button_frame, text="关闭", command=close).pack(side="left", padx=5)
+            
+            stage_names = {"partial": "比较首尾数据块", "full": "比较完整内容"}
+            
+            def run():
+                result = self.file_manager.find_duplicates(
+                    lambda stage, current, total: events.put(("progress", stage, current, total)),
+                    cancel_event
+                )
+                events.put(("done", result))
+            
+            def poll():
+                if not dialog.winfo_exists():
+                    return
+                try:
+                    while True:
+                        event = events.get_nowait()
+                        if event[0] == "progress":
+                            _, stage, current, total = event
+                            status_label.configure(text=f"正在{stage_names.get(stage, stage)}: {current}/{total}")
+                        else:
+                            show_result(*event[1])
+                            return
+                except queue.Empty:
+                    pass
+                dialog.after(200, poll)
+            
+            def show_result(success, result, error_msg):
+                stop_btn.configure(state="disabled")
+                if not success:
+                    status_label.configure(text=error_msg)
+                    return
+                
+                duplicates = result["groups"]
+                cross = sum(1 for d in duplicates if d["cross_contract"])
+                wasted = sum(d["wasted_size"] for d in duplicates) / (1024 * 1024)
+                text = f"共{len(duplicates)}组重复附件，其中{cross}组跨合同，多余副本共 {wasted:,.2f} MB（已去重的硬链接不计）"
+                if result["cancelled"]:
+                    text = "查找已取消，结果不完整: " + text
+                status_label.configure(text=text)
+                for index, group in enumerate(duplicates, 1):
+                    label = f"第{index}组（{len(group['files'])}个文件）"
+                    if group["copies"] < len(group["files"]):
+                        label += " 已去重" if group["copies"] == 1 else f" {group['copies']}份副本"
+                    if group["cross_contract"]:
+                        label += " 跨合同"
+                    parent_item = tree.insert("", "end", text=label, open=group["cross_contract"], values=(
+                        "、".join(group["contracts"]),
+                        f"{group['size'] / (1024 * 1024):,.2f}",
+                        group["digest"][:16]
+                    ))
+                    for file_info in group["files"]:
+                        tree.insert(parent_item, "end", text=file_info["name"], values=(
+                            file_info["contract"], "", str(file_info["path"])
+                        ))
+            
+            threading.Thread(target=run, name="DuplicateFinder", daemon=True).start()
+            dialog.after(200, poll)
+            
+        except Exception as e:
+            self.logger.error(f"查找重复附件失败: {e}")
+            messagebox.showerror("错误", f"查找重复附件失败: {e}")
+    
     def edit_record(self, record: IncomeRecord):
         """编辑记录"""
         try:
+            if self.is_import_running():
+                return
+            
             from .record_dialog import RecordEditDialog
             
             dialog = RecordEditDialog(self.root, record)
@@ -1265,6 +1742,9 @@ class MainWindow:
     def manage_attachments(self, record: IncomeRecord):
         """管理附件"""
         try:
+            if self.is_import_running():
+                return
+            
             from .attachment_dialog import AttachmentDialog
             
             dialog = AttachmentDialog(self.root, record, self.file_manager)
@@ -1284,16 +1764,99 @@ class MainWindow:
             self.logger.error(f"管理附件失败: {e}")
             messagebox.showerror("错误", f"管理附件失败: {e}")
     
+    def match_evidence(self):
+        """批量匹配证据文件夹并添加为对应合同的附件"""
+        try:
+            if self.is_import_running():
+                return
+            
+            if not self.database.income_records:
+                messagebox.showwarning("警告", "当前没有收入记录，请先导入数据")
+                return
+            
+            from .evidence_match_dialog import EvidenceMatchDialog
+            
+            dialog = EvidenceMatchDialog(self.root, list(self.database.income_records.keys()), self.file_manager)
+            result = dialog.show()
+            
+            if result and result["saved"]:
+                # 更新记录的附件列表后统一保存一次
+                for item in result["saved"]:
+                    record = self.database.income_records.get(item["contract_id"])
+                    if record:
+                        record.add_attachment(item["stored_path"])
+                self.database.mark_records_changed()
+                
+                if self.database.save():
+                    self.current_records = self.database.get_all_income_records()
+                    self.apply_multi_filters()
+                    self.update_status(f"已批量添加 {len(result['saved'])} 个附件")
+                else:
+                    messagebox.showerror("错误", "保存附件信息失败")
+            
+        except Exception as e:
+            self.logger.error(f"批量匹配证据失败: {e}")
+            messagebox.showerror("错误", f"批量匹配证据失败: {e}")
+    
+    def review_attachment_amounts(self):
+        """从当前列表记录的附件中提取金额，审核后写入附件确认收入"""
+        try:
+            if self.is_import_running():
+                return
+            
+            if not self.filtered_records and not self.database.get_amount_proposals():
+                messagebox.showwarning("警告", "当前没有收入记录，请先导入数据")
+                return
+            
+            from .amount_review_dialog import AmountReviewDialog
+            
+            dialog = AmountReviewDialog(self.root, self.database, self.file_manager, list(self.filtered_records))
+            applied = dialog.show()
+            
+            if applied:
+                self.current_records = self.database.get_all_income_records()
+                self.apply_multi_filters()
+                self.update_status(f"已写入 {applied} 条附件确认收入")
+            
+        except Exception as e:
+            self.logger.error(f"提取附件金额失败: {e}")
+            messagebox.showerror("错误", f"提取附件金额失败: {e}")
+    
+    def search_attachment_content(self):
+        """打开附件全文搜索"""
+        try:
+            from .content_search_dialog import ContentSearchDialog
+            
+            ContentSearchDialog(self.root, self.file_manager).show()
+            
+        except Exception as e:
+            self.logger.error(f"全文搜索失败: {e}")
+            messagebox.showerror("错误", f"全文搜索失败: {e}")
+    
+    def search_all_projects(self):
+        """打开跨项目查找和汇总"""
+        try:
+            from .global_search_dialog import GlobalSearchDialog
+            
+            GlobalSearchDialog(self.root, self.project_manager).show()
+            
+        except Exception as e:
+            self.logger.error(f"跨项目查找失败: {e}")
+            messagebox.showerror("错误", f"跨项目查找失败: {e}")
+    
     def delete_record(self, record: IncomeRecord):
         """删除记录"""
         try:
+            if self.is_import_running():
+                return
+            
             result = messagebox.askyesno(
                 "确认删除", 
                 f"确定要删除合同号为 {record.contract_id} 的记录吗？\n此操作不可撤销。"
             )
             
             if result:
-                if self.database.delete_income_record(record.contract_id):
+                if self.database.delete_income_record(record.contract_id, self.file_manager.delete_attachment):
                     # 重新加载数据，但保持筛选状态
                     self.current_records = self.database.get_all_income_records()
                     self.apply_multi_filters()
@@ -1313,10 +1876,14 @@ class MainWindow:
     def switch_project(self):
         """切换项目"""
         try:
+            if self.is_import_running():
+                return
+            
             from .project_launcher import ProjectLauncher
             
             # 保存当前数据
             self.database.save()
+            self.project_manager.flush()
             
             # 获取当前项目ID以检查是否切换了项目
             old_project_id = self.current_project_config["id"] if self.current_project_config else None
@@ -1329,6 +1896,9 @@ class MainWindow:
             selected_project_id = launcher.show()
             
             if selected_project_id:
+                # 启动器使用独立的项目管理器，重新读取它保存的配置
+                self.project_manager.reload()
+                
                 # 检查是否真的切换了项目
                 if selected_project_id != old_project_id:
                     # 如果选择了不同的项目，重新加载
@@ -1350,16 +1920,23 @@ class MainWindow:
     def reload_project(self):
         """重新加载项目"""
         try:
+            if self.is_import_running():
+                return
+            
             if self.current_project_config:
                 # 先保存当前数据
                 self.database.save()
                 
                 # 重新初始化数据库和文件管理器
                 self.database = Database(Path(self.current_project_config["database_file"]))
-                self.file_manager = FileManager(self.current_project_config["attachments_dir"])
+                self.file_manager = FileManager(self.current_project_config["attachments_dir"],
+                                                self.current_project_config.get("ingest_mode"),
+                                                self.current_project_config.get("data_dir"))
                 
                 # 重新加载数据
                 self.load_data()
+                self.attach_save_listeners()
+                self.start_backup_scheduler()
                 
                 # 更新窗口标题
                 title = WINDOW_CONFIG["title"] + f" - [{self.current_project_config['name']}]"
@@ -1378,6 +1955,15 @@ class MainWindow:
     def on_closing(self):
         """窗口关闭事件"""
         try:
+            # 取消未完成的后台导入，数据库保持不变；最多等待2秒让工作线程删除临时文件
+            if self.import_worker is not None:
+                self.import_worker.cancel()
+                self.import_worker.join(2.0)
+                self.import_worker.discard_pending()
+            
+            # 停止自动备份，未完成的备份不会保存
+            self.stop_backup_scheduler()
+            
             # 保存数据
             self.database.save()
             
@@ -1385,6 +1971,7 @@ class MainWindow:
             if self.current_project_config:
                 record_count = len(self.current_records)
                 self.project_manager.update_project_record_count(count=record_count)
+            self.project_manager.flush()
             
             self.logger.info("程序正常退出")
             self.root.destroy()
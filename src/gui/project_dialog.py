@@ -4,14 +4,19 @@
 """
 
 import logging
+import queue
+import re
+import threading
 import customtkinter as ctk
 from tkinter import messagebox, filedialog
 from tkinter import ttk
 import tkinter as tk
 from typing import List, Optional, Dict
 from pathlib import Path
+from datetime import datetime
 
 from ..data.project_manager import ProjectManager
+from .backup_dialog import BackupDialog
 from ..config import get_font
 
 
@@ -195,6 +200,180 @@ class NewProjectDialog:
         return self.result
 
 
+class RolloverDialog:
+    """年度结转对话框"""
+    
+    def __init__(self, parent, project_manager: ProjectManager, project_id: str):
+        self.parent = parent
+        self.project_manager = project_manager
+        self.project_id = project_id
+        self.project_config = project_manager.projects_config["projects"][project_id]
+        self.logger = logging.getLogger(__name__)
+        
+        self.result = None
+        
+        # 后台结转
+        self.worker = None
+        self.cancel_event = threading.Event()
+        self.events = queue.Queue()
+        
+        self.create_dialog()
+    
+    def default_name(self) -> str:
+        """新项目默认名称：名称中的年份加一，没有年份时加上今年"""
+        name = self.project_config["name"]
+        match = re.search(r"(19|20)\d{2}", name)
+        if match:
+            return name[:match.start()] + str(int(match.group()) + 1) + name[match.end():]
+        return f"{name} {datetime.now().year}"
+    
+    def create_dialog(self):
+        """创建对话框"""
+        self.dialog = ctk.CTkToplevel(self.parent)
+        self.dialog.title(f"年度结转 - {self.project_config['name']}")
+        self.dialog.geometry("520x420")
+        self.dialog.resizable(False, False)
+        self.dialog.transient(self.parent)
+        self.dialog.grab_set()
+        self.dialog.protocol("WM_DELETE_WINDOW", self.cancel)
+        
+        main_frame = ctk.CTkFrame(self.dialog)
+        main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        ctk.CTkLabel(main_frame, text="新项目名称 *", font=get_font("body_large")).pack(anchor="w", padx=10)
+        self.name_entry = ctk.CTkEntry(main_frame, font=get_font("body"))
+        self.name_entry.insert(0, self.default_name())
+        self.name_entry.pack(fill="x", padx=10, pady=(5, 10))
+        
+        ctk.CTkLabel(main_frame, text="项目描述", font=get_font("body_large")).pack(anchor="w", padx=10)
+        self.desc_entry = ctk.CTkEntry(main_frame, font=get_font("body"))
+        self.desc_entry.insert(0, self.project_config.get("description", ""))
+        self.desc_entry.pack(fill="x", padx=10, pady=(5, 10))
+        
+        self.include_attachments_var = ctk.BooleanVar(value=True)
+        ctk.CTkCheckBox(main_frame, text="结转附件（链接到原文件，不占用额外空间）",
+                        variable=self.include_attachments_var).pack(anchor="w", padx=10, pady=5)
+        
+        tip_text = """说明：
+• 结转合同号、客户名、收入主体、差异备注和关联附件
+• 本年确认的收入和附件确认的收入清零，待重新导入
+• 附件与原项目位于同一磁盘时通过链接结转，否则需要复制"""
+        ctk.CTkLabel(main_frame, text=tip_text, font=get_font("body_small"), justify="left").pack(
+            anchor="w", padx=10, pady=10)
+        
+        self.progress_bar = ctk.CTkProgressBar(main_frame)
+        self.progress_bar.set(0)
+        self.progress_bar.pack(fill="x", padx=10, pady=(5, 0))
+        self.progress_label = ctk.CTkLabel(main_frame, text="", font=get_font("body_small"))
+        self.progress_label.pack(anchor="w", padx=10)
+        
+        btn_container = ctk.CTkFrame(main_frame)
+        btn_container.pack(pady=10)
+        ctk.CTkButton(btn_container, text="取消", command=self.cancel, width=100).pack(side="left", padx=(0, 10))
+        self.start_btn = ctk.CTkButton(btn_container, text="开始结转", command=self.start_rollover, width=100)
+        self.start_btn.pack(side="left")
+        
+        self.center_dialog()
+        self.name_entry.focus()
+    
+    def start_rollover(self):
+        """在后台执行结转"""
+        if self.worker and self.worker.is_alive():
+            return
+        
+        project_name = self.name_entry.get().strip()
+        if not project_name:
+            messagebox.showerror("错误", "项目名称不能为空", parent=self.dialog)
+            return
+        
+        description = self.desc_entry.get().strip()
+        include_attachments = self.include_attachments_var.get()
+        self.start_btn.configure(state="disabled")
+        self.progress_label.configure(text="正在结转...")
+        
+        def run():
+            try:
+                self.events.put(("done",) + tuple(self.project_manager.rollover_project(
+                    self.project_id, project_name, description, None, include_attachments,
+                    lambda done, total: self.events.put(("progress", done, total)), self.cancel_event
+                )))
+            except Exception as e:
+                self.logger.error(f"项目结转失败: {e}")
+                self.events.put(("done", False, {}, str(e)))
+        
+        self.cancel_event.clear()
+        self.worker = threading.Thread(target=run, name="ProjectRollover", daemon=True)
+        self.worker.start()
+        self.dialog.after(100, self.poll_events)
+    
+    def poll_events(self):
+        """处理后台结转的事件"""
+        if not self.dialog.winfo_exists():
+            return
+        
+        finished = None
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event[0] == "progress":
+                    _, done, total = event
+                    self.progress_bar.set(done / total if total else 1)
+                    self.progress_label.configure(text=f"已处理 {done}/{total} 个附件")
+                else:
+                    finished = event[1:]
+        except queue.Empty:
+            pass
+        
+        if finished is None:
+            self.dialog.after(100, self.poll_events)
+            return
+        
+        success, result, error_msg = finished
+        if not success:
+            if self.cancel_event.is_set():
+                self.dialog.destroy()
+                return
+            self.start_btn.configure(state="normal")
+            self.progress_label.configure(text="")
+            messagebox.showerror("错误", error_msg, parent=self.dialog)
+            return
+        
+        self.result = result
+        self.progress_bar.set(1)
+        methods = result["methods"]
+        copied = methods.get("copy", 0) + methods.get("copy_file_range", 0)
+        message = (f"已创建项目，结转 {result['record_count']} 条记录、{result['attachment_count']} 个附件，"
+                   f"用时 {result['elapsed']} 秒")
+        if copied:
+            message += f"\n其中 {copied} 个附件无法链接，已复制"
+        if result["missing_count"]:
+            message += f"\n{result['missing_count']} 个附件文件不存在，未结转"
+        self.dialog.destroy()
+        messagebox.showinfo("成功", message, parent=self.parent)
+    
+    def cancel(self):
+        """取消，结转进行中时先请求停止（删除未完成的新项目）"""
+        if self.worker and self.worker.is_alive():
+            self.cancel_event.set()
+            self.progress_label.configure(text="正在停止，请稍候...")
+            return
+        self.dialog.destroy()
+    
+    def center_dialog(self):
+        """居中显示对话框"""
+        self.dialog.update_idletasks()
+        width = self.dialog.winfo_width()
+        height = self.dialog.winfo_height()
+        x = (self.dialog.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (height // 2)
+        self.dialog.geometry(f"{width}x{height}+{x}+{y}")
+    
+    def show(self) -> Optional[Dict]:
+        """显示对话框并返回结转结果"""
+        self.dialog.wait_window()
+        return self.result
+
+
 class ProjectListDialog:
     """项目列表对话框"""
     
@@ -266,13 +445,16 @@ class ProjectListDialog:
         style = ttk.Style()
         style.theme_use("default")
         
-        columns = ("名称", "描述", "记录数", "创建时间", "最后访问", "状态")
+        columns = ("名称", "描述", "记录数", "收入合计", "证据比例", "差异数", "创建时间", "最后访问", "状态")
         self.project_tree = ttk.Treeview(list_frame, columns=columns, show="headings", height=20)
         
         # 设置列标题
         self.project_tree.heading("名称", text="项目名称")
         self.project_tree.heading("描述", text="项目描述")
         self.project_tree.heading("记录数", text="记录数")
+        self.project_tree.heading("收入合计", text="收入合计")
+        self.project_tree.heading("证据比例", text="证据比例")
+        self.project_tree.heading("差异数", text="差异数")
         self.project_tree.heading("创建时间", text="创建时间")
         self.project_tree.heading("最后访问", text="最后访问")
         self.project_tree.heading("状态", text="状态")
@@ -281,6 +463,9 @@ class ProjectListDialog:
         self.project_tree.column("名称", width=150, anchor="w")
         self.project_tree.column("描述", width=200, anchor="w")
         self.project_tree.column("记录数", width=80, anchor="center")
+        self.project_tree.column("收入合计", width=110, anchor="e")
+        self.project_tree.column("证据比例", width=80, anchor="center")
+        self.project_tree.column("差异数", width=70, anchor="center")
         self.project_tree.column("创建时间", width=130, anchor="center")
         self.project_tree.column("最后访问", width=130, anchor="center")
         self.project_tree.column("状态", width=80, anchor="center")
@@ -313,6 +498,8 @@ class ProjectListDialog:
         self.context_menu.add_command(label="切换到此项目", command=self.switch_to_selected_project)
         self.context_menu.add_separator()
         self.context_menu.add_command(label="备份项目", command=self.backup_selected_project)
+        self.context_menu.add_command(label="年度结转", command=self.rollover_selected_project)
+        self.context_menu.add_command(label="休眠/唤醒项目", command=self.hibernate_selected_project)
         self.context_menu.add_command(label="删除项目", command=self.delete_selected_project)
         
         # 绑定右键事件
@@ -340,6 +527,12 @@ class ProjectListDialog:
         backup_btn = ctk.CTkButton(btn_container, text="备份项目", command=self.backup_selected_project, width=100)
         backup_btn.pack(side="left", padx=5)
         
+        rollover_btn = ctk.CTkButton(btn_container, text="年度结转", command=self.rollover_selected_project, width=100)
+        rollover_btn.pack(side="left", padx=5)
+        
+        hibernate_btn = ctk.CTkButton(btn_container, text="休眠/唤醒", command=self.hibernate_selected_project, width=100)
+        hibernate_btn.pack(side="left", padx=5)
+        
         delete_btn = ctk.CTkButton(btn_container, text="删除项目", command=self.delete_selected_project, width=100)
         delete_btn.pack(side="left", padx=5)
         
@@ -362,13 +555,32 @@ class ProjectListDialog:
                 last_accessed = self.format_datetime(project["last_accessed"])
                 
                 # 状态显示
-                status = "当前项目" if project["is_current"] else "活跃"
+                if project["is_current"]:
+                    status = "当前项目"
+                elif project["status"] == "hibernated":
+                    status = "已休眠"
+                else:
+                    status = "活跃"
+                
+                # 统计信息读取项目摘要，不加载项目数据库
+                summary = self.project_manager.get_project_summary(project["id"])
+                if summary:
+                    record_count = summary.get("record_count", 0)
+                    total_income = f"{summary.get('total_income', 0):,.2f}"
+                    evidence_ratio = f"{summary.get('evidence_ratio', 0):.1f}%"
+                    difference_count = summary.get("difference_count", 0)
+                else:
+                    record_count = project["record_count"]
+                    total_income = evidence_ratio = difference_count = "-"
                 
                 # 插入项目
                 item = self.project_tree.insert("", "end", values=(
                     project["name"],
                     project["description"][:50] + "..." if len(project["description"]) > 50 else project["description"],
-                    project["record_count"],
+                    record_count,
+                    total_income,
+                    evidence_ratio,
+                    difference_count,
                     created_time,
                     last_accessed,
                     status
@@ -438,22 +650,146 @@ class ProjectListDialog:
             messagebox.showerror("错误", f"切换项目失败: {e}")
     
     def backup_selected_project(self):
-        """备份选中的项目"""
+        """备份选中的项目（增量备份和恢复）"""
         try:
             if not self.selected_project_id:
                 messagebox.showwarning("警告", "请先选择一个项目")
                 return
             
-            success, backup_path, error_msg = self.project_manager.backup_project(self.selected_project_id)
+            BackupDialog(self.dialog, self.project_manager, self.selected_project_id).show()
+                
+        except Exception as e:
+            self.logger.error(f"打开项目备份失败: {e}")
+            messagebox.showerror("错误", f"打开项目备份失败: {e}")
+    
+    def rollover_selected_project(self):
+        """以选中的项目为基础创建下一年度的项目"""
+        try:
+            if not self.selected_project_id:
+                messagebox.showwarning("警告", "请先选择一个项目")
+                return
             
-            if success:
-                messagebox.showinfo("成功", f"项目备份成功\n备份文件: {backup_path}")
-            else:
-                messagebox.showerror("错误", f"备份项目失败: {error_msg}")
+            result = RolloverDialog(self.dialog, self.project_manager, self.selected_project_id).show()
+            if result:
+                self.load_projects()
                 
         except Exception as e:
-            self.logger.error(f"备份项目失败: {e}")
-            messagebox.showerror("错误", f"备份项目失败: {e}")
+            self.logger.error(f"项目结转失败: {e}")
+            messagebox.showerror("错误", f"项目结转失败: {e}")
+    
+    def hibernate_selected_project(self):
+        """休眠选中的项目（压缩数据库、打包附件），已休眠的项目则解出全部附件"""
+        try:
+            if not self.selected_project_id:
+                messagebox.showwarning("警告", "请先选择一个项目")
+                return
+            
+            project_id = self.selected_project_id
+            project_config = self.project_manager.projects_config["projects"][project_id]
+            
+            if project_config.get("status") == "hibernated":
+                if not messagebox.askyesno(
+                    "确认唤醒",
+                    f"解出项目 '{project_config['name']}' 的全部附件？\n\n"
+                    "打开项目后查看合同附件时也会自动解出该合同的附件，一般不需要全部解出。"
+                ):
+                    return
+                self.run_project_task("唤醒项目", lambda progress, cancel_event: self.project_manager.thaw_project(
+                    project_id, progress, cancel_event
+                ), lambda count: f"已解出 {count} 个附件")
+                return
+            
+            if project_id == self.project_manager.current_project:
+                messagebox.showwarning("警告", "不能休眠当前打开的项目，请先切换到其他项目")
+                return
+            
+            if not messagebox.askyesno(
+                "确认休眠",
+                f"休眠项目 '{project_config['name']}'？\n\n"
+                "• 压缩数据库，附件打包为一个文件，打开合同时自动解出\n"
+                "• 删除可以重新生成的缓存（附件目录、全文索引、缩略图）\n"
+                "• 增量备份只保留最近一次"
+            ):
+                return
+            
+            def describe(stats):
+                saved = (stats["database_before"] - stats["database_after"]
+                         + stats.get("total_size", 0) - stats.get("archive_size", 0)
+                         + stats["cache_freed"] + stats.get("backups_freed", 0))
+                return f"项目已休眠，释放约 {saved / (1024 * 1024):.1f} MB"
+            
+            self.run_project_task("休眠项目", lambda progress, cancel_event: self.project_manager.hibernate_project(
+                project_id, progress, cancel_event
+            ), describe)
+                
+        except Exception as e:
+            self.logger.error(f"项目休眠失败: {e}")
+            messagebox.showerror("错误", f"项目休眠失败: {e}")
+    
+    def run_project_task(self, title: str, target, describe):
+        """
+        在后台执行项目任务并显示进度
+        
+        Args:
+            title: 进度窗口标题
+            target: 任务函数 (进度回调, 取消事件) -> (是否成功, 结果, 错误信息)
+            describe: 根据结果生成完成提示
+        """
+        events = queue.Queue()
+        cancel_event = threading.Event()
+        
+        progress_dialog = ctk.CTkToplevel(self.dialog)
+        progress_dialog.title(title)
+        progress_dialog.geometry("400x140")
+        progress_dialog.resizable(False, False)
+        progress_dialog.transient(self.dialog)
+        progress_dialog.grab_set()
+        progress_dialog.protocol("WM_DELETE_WINDOW", cancel_event.set)
+        
+        progress_label = ctk.CTkLabel(progress_dialog, text="正在处理...", font=get_font("body"))
+        progress_label.pack(pady=(20, 5))
+        progress_bar = ctk.CTkProgressBar(progress_dialog)
+        progress_bar.set(0)
+        progress_bar.pack(fill="x", padx=20)
+        ctk.CTkButton(progress_dialog, text="停止", command=cancel_event.set, width=80).pack(pady=10)
+        
+        def run():
+            try:
+                events.put(("done",) + tuple(target(
+                    lambda done, total: events.put(("progress", done, total)), cancel_event
+                )))
+            except Exception as e:
+                self.logger.error(f"{title}失败: {e}")
+                events.put(("done", False, None, str(e)))
+        
+        def poll():
+            finished = None
+            try:
+                while True:
+                    event = events.get_nowait()
+                    if event[0] == "progress":
+                        _, done, total = event
+                        progress_bar.set(done / total if total else 1)
+                        progress_label.configure(text=f"已处理 {done}/{total} 个附件")
+                    else:
+                        finished = event[1:]
+            except queue.Empty:
+                pass
+            
+            if finished is None:
+                progress_dialog.after(100, poll)
+                return
+            
+            progress_dialog.destroy()
+            success, result, error_msg = finished
+            if success:
+                messagebox.showinfo("成功", describe(result), parent=self.dialog)
+            else:
+                messagebox.showerror("错误", error_msg, parent=self.dialog)
+            self.load_projects()
+        
+        threading.Thread(target=run, name="ProjectTask", daemon=True).start()
+        progress_dialog.after(100, poll)
     
     def delete_selected_project(self):
         """删除选中的项目"""
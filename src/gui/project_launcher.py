@@ -3,7 +3,9 @@
 程序启动时的项目选择界面
 """
 
+import importlib
 import logging
+import threading
 import customtkinter as ctk
 from tkinter import messagebox
 from typing import Optional, Dict
@@ -15,13 +17,27 @@ from .project_dialog import NewProjectDialog
 
 
 class ProjectLauncher:
-    """项目启动器类"""
+    """项目启动器类
+    
+    项目较多时分页显示，每页只创建当前页的列表项；统计信息读取各项目的摘要文件，不加载项目数据库。
+    """
+    
+    PAGE_SIZE = 20
+    SEARCH_DELAY = 200  # 搜索输入停止多久后刷新列表（毫秒）
+    # 启动器显示后在后台预先导入的模块（导入较慢，打开项目和导入数据时需要）
+    WARMUP_MODULES = ("pandas", "openpyxl", "PIL.Image", "src.gui.main_window")
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.project_manager = ProjectManager()
         self.selected_project = None
         
+        # 项目列表、搜索结果和分页
+        self.projects = []
+        self.filtered_projects = []
+        self.page = 0
+        self._search_job = None
+        
         # 设置CustomTkinter主题
         ctk.set_appearance_mode(THEME_CONFIG["appearance_mode"])
         ctk.set_default_color_theme(THEME_CONFIG["default_color_theme"])
@@ -34,6 +50,9 @@ class ProjectLauncher:
         # 加载项目列表
         self.load_projects()
         
+        # 窗口显示后再预先导入较慢的模块
+        self.root.after_idle(lambda: self.root.after(100, self.warm_up_imports))
+        
         self.logger.info("项目启动器初始化完成")
     
     def setup_window(self):
@@ -120,17 +139,45 @@ class ProjectLauncher:
         list_frame = ctk.CTkFrame(parent)
         list_frame.pack(fill="both", expand=True, padx=20, pady=(20, 0))
         
-        # 列表标题
+        # 列表标题和搜索
+        title_frame = ctk.CTkFrame(list_frame, fg_color="transparent")
+        title_frame.pack(fill="x", padx=15, pady=(15, 10))
+        
         list_title = ctk.CTkLabel(
-            list_frame,
+            title_frame,
             text="现有项目",
             font=get_font("subtitle")
         )
-        list_title.pack(pady=(15, 10))
+        list_title.pack(side="left")
+        
+        self.search_var = ctk.StringVar()
+        self.search_var.trace_add("write", self.on_search_changed)
+        search_entry = ctk.CTkEntry(
+            title_frame,
+            textvariable=self.search_var,
+            placeholder_text="搜索项目名称或描述",
+            width=220
+        )
+        search_entry.pack(side="right")
         
         # 项目列表容器
         self.projects_container = ctk.CTkScrollableFrame(list_frame)
-        self.projects_container.pack(fill="both", expand=True, padx=15, pady=(0, 15))
+        self.projects_container.pack(fill="both", expand=True, padx=15, pady=(0, 5))
+        
+        # 分页
+        page_frame = ctk.CTkFrame(list_frame, fg_color="transparent")
+        page_frame.pack(fill="x", padx=15, pady=(0, 10))
+        
+        self.next_page_btn = ctk.CTkButton(
+            page_frame, text="下一页", width=80, command=lambda: self.show_page(self.page + 1)
+        )
+        self.next_page_btn.pack(side="right")
+        self.page_label = ctk.CTkLabel(page_frame, text="", font=get_font("body_small"))
+        self.page_label.pack(side="right", padx=10)
+        self.prev_page_btn = ctk.CTkButton(
+            page_frame, text="上一页", width=80, command=lambda: self.show_page(self.page - 1)
+        )
+        self.prev_page_btn.pack(side="right")
         
     def create_buttons(self, parent):
         """创建按钮区域"""
@@ -180,13 +227,50 @@ class ProjectLauncher:
     
     def load_projects(self):
         """加载项目列表"""
+        self.projects = self.project_manager.get_projects_list()
+        self.apply_filter(keep_page=False)
+        
+        # 如果有当前项目，翻到当前项目所在页并选择它
+        for index, project in enumerate(self.filtered_projects):
+            if project.get("is_current", False):
+                self.show_page(index // self.PAGE_SIZE)
+                for widget in self.projects_container.winfo_children():
+                    if hasattr(widget, '_project_data') and widget._project_data["id"] == project["id"]:
+                        self.select_project(project, widget)
+                        break
+                break
+    
+    def on_search_changed(self, *args):
+        """搜索内容变化，输入停止后再刷新列表"""
+        if self._search_job is not None:
+            self.root.after_cancel(self._search_job)
+        self._search_job = self.root.after(self.SEARCH_DELAY, self.apply_filter)
+    
+    def apply_filter(self, keep_page: bool = False):
+        """按搜索内容筛选项目并显示第一页"""
+        self._search_job = None
+        keyword = self.search_var.get().strip().lower()
+        if keyword:
+            self.filtered_projects = [
+                p for p in self.projects
+                if keyword in p["name"].lower() or keyword in p["description"].lower()
+                or keyword in p["id"].lower()
+            ]
+        else:
+            self.filtered_projects = list(self.projects)
+        self.show_page(self.page if keep_page else 0)
+    
+    def show_page(self, page: int):
+        """显示指定页的项目"""
+        page_count = max(1, (len(self.filtered_projects) + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
+        self.page = min(max(page, 0), page_count - 1)
+        
         # 清空现有项目
         for widget in self.projects_container.winfo_children():
             widget.destroy()
+        self._selected_frame = None
         
-        projects = self.project_manager.get_projects_list()
-        
-        if not projects:
+        if not self.projects:
             # 没有项目时显示提示
             no_project_frame = ctk.CTkFrame(self.projects_container)
             no_project_frame.pack(fill="x", pady=10)
@@ -204,24 +288,28 @@ class ProjectLauncher:
                 font=get_font("body_large"),
                 text_color="gray"
             ).pack(pady=(0, 20))
+        elif not self.filtered_projects:
+            ctk.CTkLabel(
+                self.projects_container,
+                text="没有匹配的项目",
+                font=get_font("heading"),
+                text_color="gray"
+            ).pack(pady=20)
         else:
-            # 显示项目列表
-            for project in projects:
+            start = self.page * self.PAGE_SIZE
+            for project in self.filtered_projects[start:start + self.PAGE_SIZE]:
                 self.create_project_item(project)
-            
-            # 如果有当前项目，自动选择它
-            current_project = None
-            for project in projects:
-                if project.get("is_current", False):
-                    current_project = project
-                    break
-            
-            if current_project:
-                # 查找对应的框架并选择
-                for widget in self.projects_container.winfo_children():
-                    if hasattr(widget, '_project_data') and widget._project_data["id"] == current_project["id"]:
-                        self.select_project(current_project, widget)
-                        break
+                
+                # 保持已选项目的高亮
+                if self.selected_project and project["id"] == self.selected_project["id"]:
+                    widget = self.projects_container.winfo_children()[-1]
+                    widget.configure(fg_color=("gray70", "gray30"))
+                    self._selected_frame = widget
+        
+        # 分页状态
+        self.page_label.configure(text=f"第 {self.page + 1}/{page_count} 页，共 {len(self.filtered_projects)} 个项目")
+        self.prev_page_btn.configure(state="normal" if self.page > 0 else "disabled")
+        self.next_page_btn.configure(state="normal" if self.page < page_count - 1 else "disabled")
     
     def create_project_item(self, project: Dict):
         """创建项目列表项"""
@@ -256,7 +344,7 @@ class ProjectLauncher:
         desc_label.pack(anchor="w", padx=10, pady=2)
         
         # 项目统计信息
-        stats_text = f"记录数: {project['record_count']} | 创建时间: {self.format_datetime(project['created_time'])}"
+        stats_text = self.format_project_stats(project)
         stats_label = ctk.CTkLabel(
             info_frame,
             text=stats_text,
@@ -297,6 +385,40 @@ class ProjectLauncher:
             widget.bind("<Enter>", on_enter)
             widget.bind("<Leave>", on_leave)
     
+    def format_project_stats(self, project: Dict) -> str:
+        """项目统计信息，读取项目摘要，没有摘要的旧项目只显示记录数"""
+        summary = self.project_manager.get_project_summary(project["id"])
+        created = f"创建时间: {self.format_datetime(project['created_time'])}"
+        if not summary:
+            return f"记录数: {project['record_count']} | {created}"
+        
+        parts = [
+            f"记录数: {summary.get('record_count', 0)}",
+            f"收入合计: {summary.get('total_income', 0):,.2f}",
+            f"证据比例: {summary.get('evidence_ratio', 0):.1f}%",
+            f"差异: {summary.get('difference_count', 0)}"
+        ]
+        if summary.get("attachment_bytes") is not None:
+            parts.append(f"附件: {self.format_file_size(summary['attachment_bytes'])}")
+        if summary.get("last_import"):
+            parts.append(f"最近导入: {self.format_datetime(summary['last_import'])}")
+        else:
+            parts.append(created)
+        if project.get("status") == "hibernated":
+            parts.append("已休眠")
+        return " | ".join(parts)
+    
+    def format_file_size(self, size_bytes: int) -> str:
+        """格式化文件大小"""
+        if size_bytes < 1024:
+            return f"{size_bytes} B"
+        elif size_bytes < 1024 * 1024:
+            return f"{size_bytes / 1024:.1f} KB"
+        elif size_bytes < 1024 * 1024 * 1024:
+            return f"{size_bytes / (1024 * 1024):.1f} MB"
+        else:
+            return f"{size_bytes / (1024 * 1024 * 1024):.1f} GB"
+    
     def select_project(self, project: Dict, selected_frame=None):
         """选择项目"""
         # 清除之前的选中状态
@@ -400,6 +522,17 @@ class ProjectLauncher:
         except:
             return datetime_str
     
+    def warm_up_imports(self):
+        """在后台线程中导入较慢的模块，选择项目时无需再等待"""
+        def run():
+            for name in self.WARMUP_MODULES:
+                try:
+                    importlib.import_module(name)
+                except ImportError as e:
+                    self.logger.warning(f"预先导入 {name} 失败: {e}")
+        
+        threading.Thread(target=run, name="ImportWarmup", daemon=True).start()
+    
     def on_enter_key(self, event):
         """回车键事件处理"""
         if self.selected_project:
@@ -415,6 +548,9 @@ class ProjectLauncher:
         """显示启动器并返回选中的项目ID"""
         self.root.mainloop()
         
+        # 主窗口使用自己的项目管理器读取配置，先写入延迟保存的修改
+        self.project_manager.flush()
+        
         # 获取当前项目
         current_project = self.project_manager.get_current_project_config()
         if current_project:
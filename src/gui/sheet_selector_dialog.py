@@ -5,7 +5,6 @@
 
 import customtkinter as ctk
 from tkinter import messagebox
-import pandas as pd
 from typing import Optional, List, Tuple, Dict
 from pathlib import Path
 
@@ -16,6 +15,8 @@ from ..config import get_font
 class SheetSelectorDialog:
     """工作表选择和列映射对话框"""
     
+    CSV_PREVIEW_ROWS = 50  # CSV文件预览读取的行数
+    
     def __init__(self, parent, file_path: str):
         self.parent = parent
         self.file_path = file_path
@@ -220,13 +221,18 @@ class SheetSelectorDialog:
     
     def preview_sheet(self):
         """预览选中的工作表"""
+        import pandas as pd
+        
         try:
             selected_sheet = self.sheet_var.get()
             if not selected_sheet:
                 return
             
-            # 读取工作表数据
-            success, df, error = self.excel_handler.read_excel_file(self.file_path, selected_sheet)
+            # 读取工作表数据（CSV文件只读取前若干行用于预览）
+            if self.excel_handler.is_csv_file(self.file_path):
+                success, df, error = self.excel_handler.read_csv_file(self.file_path, nrows=self.CSV_PREVIEW_ROWS)
+            else:
+                success, df, error = self.excel_handler.read_excel_file(self.file_path, selected_sheet)
             
             if not success:
                 self.preview_text.delete("0.0", "end")
@@ -253,7 +259,10 @@ class SheetSelectorDialog:
             
             # 显示预览信息
             preview_info = f"工作表: {selected_sheet}\n"
-            preview_info += f"总行数: {len(df)}\n"
+            if self.excel_handler.is_csv_file(self.file_path):
+                preview_info += f"预览行数: {len(df)}（导入时读取全部数据）\n"
+            else:
+                preview_info += f"总行数: {len(df)}\n"
             preview_info += f"总列数: {len(df.columns)}\n\n"
             
             # 显示列名
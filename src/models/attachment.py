@@ -2,9 +2,10 @@
 附件数据模型
 """
 
+import logging
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable
 from datetime import datetime
 
 
@@ -108,10 +109,10 @@ class Attachment:
         """获取显示名称"""
         return self.original_name or f"附件_{self.id[:8]}"
     
-    def copy_to_storage(self, target_dir: Path) -> bool:
-        """复制文件到存储目录"""
+    def copy_to_storage(self, target_dir: Path, ingest_mode: Optional[str] = None) -> bool:
+        """复制文件到存储目录，ingest_mode 为附件导入方式（copy/fast/link）"""
         try:
-            import shutil
+            from ..data.fast_copy import FastCopier
             
             # 确保目标目录存在
             target_dir.mkdir(parents=True, exist_ok=True)
@@ -126,8 +127,8 @@ class Attachment:
                 suffix = target_file.suffix
                 target_file = target_dir / f"{stem}_{timestamp}{suffix}"
             
-            # 复制文件
-            shutil.copy2(self.file_path, target_file)
+            # 复制文件（同一文件系统上尽量避免复制数据）
+            FastCopier(ingest_mode).copy(Path(self.file_path), target_file)
             self.stored_path = str(target_file)
             
             return True
@@ -136,16 +137,26 @@ class Attachment:
             print(f"复制文件失败: {e}")
             return False
     
-    def delete_from_storage(self) -> bool:
-        """从存储目录删除文件"""
+    def delete_from_storage(self, delete_file: Optional[Callable[[str], bool]] = None) -> bool:
+        """
+        从存储目录删除文件
+        
+        Args:
+            delete_file: 删除附件文件的函数（如 FileManager.delete_attachment，会同时释放去重存储的引用），
+                         为None时直接删除文件
+        """
         try:
+            from ..data.blob_store import unlink_file
+            
             stored_file = Path(self.stored_path)
-            if stored_file.exists():
-                stored_file.unlink()
-                return True
-            return False
+            if not stored_file.exists():
+                return False
+            if delete_file is not None:
+                return delete_file(str(stored_file))
+            unlink_file(stored_file)
+            return True
         except Exception as e:
-            print(f"删除文件失败: {e}")
+            logging.getLogger(__name__).error(f"删除文件失败: {e}")
             return False
     
     def __str__(self) -> str:
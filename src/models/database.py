@@ -3,10 +3,14 @@
 负责数据的持久化存储和检索
 """
 
+import os
+import copy
+import gzip
 import pickle
 import logging
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Callable, Tuple
 from datetime import datetime
 from decimal import Decimal
 
@@ -15,9 +19,45 @@ from .attachment import Attachment
 from ..config import DATABASE_FILE, BACKUP_DIR
 
 
+class _WriteCancelled(Exception):
+    """写入过程被取消"""
+
+
+class _ProgressWriter:
+    """统计写入字节数并支持取消的文件包装器"""
+    
+    REPORT_INTERVAL = 1024 * 1024  # 每写入1MB报告一次进度
+    
+    def __init__(self, fileobj, progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                 cancel_event: Optional[threading.Event] = None, estimated_total: int = 0):
+        self._file = fileobj
+        self._progress_callback = progress_callback
+        self._cancel_event = cancel_event
+        self._estimated_total = estimated_total
+        self._last_report = 0
+        self.bytes_written = 0
+    
+    def write(self, data) -> int:
+        if self._cancel_event is not None and self._cancel_event.is_set():
+            raise _WriteCancelled()
+        
+        written = self._file.write(data)
+        self.bytes_written += written
+        
+        if self._progress_callback and self.bytes_written - self._last_report >= self.REPORT_INTERVAL:
+            self._last_report = self.bytes_written
+            self._progress_callback("write", self.bytes_written, self._estimated_total)
+        
+        return written
+
+
 class Database:
     """数据库管理类"""
     
+    GZIP_MAGIC = b"\x1f\x8b"
+    # 本进程中已写入或正在写入、尚未提交的导入临时文件（其他实例加载同一数据库时不删除）
+    _writing_imports = set()
+    
     def __init__(self, db_file: Path = DATABASE_FILE):
         self.db_file = db_file
         self.logger = logging.getLogger(__name__)
@@ -27,27 +67,72 @@ class Database:
         self.attachments: Dict[str, Attachment] = {}  # 附件ID -> 附件信息
         self.versions: List[Dict[str, Any]] = []  # 版本历史
         self.filter_states: Dict[str, Any] = {}  # 筛选状态
+        self.amount_proposals: Dict[str, Dict[str, Any]] = {}  # 合同号 -> 待审核的附件确认收入建议
         self.metadata: Dict[str, Any] = {
             "created_time": datetime.now(),
             "last_modified": datetime.now(),
             "version": 1,
-            "total_records": 0
+            "total_records": 0,
+            "records_version": 0  # 记录每次变化时加一
         }
         
+        # 保存成功后调用的监听器（如项目摘要）
+        self._save_listeners: List[Callable[["Database"], None]] = []
+        
         # 加载数据
         self.load()
     
+    @property
+    def records_version(self) -> int:
+        """记录版本号，记录增删改或导入后递增"""
+        return self.metadata.get("records_version", 0)
+    
+    def mark_records_changed(self):
+        """标记记录已变化（直接修改记录对象后调用）"""
+        self.metadata["records_version"] = self.records_version + 1
+    
+    def add_save_listener(self, listener: Callable[["Database"], None]):
+        """添加保存监听器，每次成功保存后以数据库为参数调用"""
+        self._save_listeners.append(listener)
+    
+    def remove_save_listener(self, listener: Callable[["Database"], None]):
+        """移除保存监听器"""
+        if listener in self._save_listeners:
+            self._save_listeners.remove(listener)
+    
+    def _notify_saved(self):
+        """通知保存监听器"""
+        for listener in list(self._save_listeners):
+            try:
+                listener(self)
+            except Exception as e:
+                self.logger.warning(f"保存监听器执行失败: {e}")
+    
     def load(self) -> bool:
         """从文件加载数据"""
         try:
+            # 上次退出时未提交的后台导入临时文件
+            stale_import = self.db_file.with_name(self.db_file.name + ".import.tmp")
+            if stale_import.exists() and stale_import not in Database._writing_imports:
+                stale_import.unlink(missing_ok=True)
+                self.logger.info("删除未提交的导入临时文件")
+            
             if self.db_file.exists():
                 with open(self.db_file, 'rb') as f:
-                    data = pickle.load(f)
+                    # 休眠项目的数据库经过gzip压缩（见 save 的 compress 参数）
+                    if f.read(2) == self.GZIP_MAGIC:
+                        f.seek(0)
+                        with gzip.GzipFile(fileobj=f) as gz:
+                            data = pickle.load(gz)
+                    else:
+                        f.seek(0)
+                        data = pickle.load(f)
                 
                 self.income_records = data.get('income_records', {})
                 self.attachments = data.get('attachments', {})
                 self.versions = data.get('versions', [])
                 self.filter_states = data.get('filter_states', {})
+                self.amount_proposals = data.get('amount_proposals', {})
                 self.metadata = data.get('metadata', self.metadata)
                 
                 self.logger.info(f"成功加载数据库，共{len(self.income_records)}条记录")
@@ -60,8 +145,13 @@ class Database:
             self.logger.error(f"加载数据库失败: {e}")
             return False
     
-    def save(self) -> bool:
-        """保存数据到文件"""
+    def save(self, compress: bool = False) -> bool:
+        """
+        保存数据到文件
+        
+        Args:
+            compress: 是否压缩（休眠项目使用，加载时自动识别；之后的普通保存恢复为不压缩）
+        """
         try:
             # 更新元数据
             self.metadata["last_modified"] = datetime.now()
@@ -76,13 +166,22 @@ class Database:
                 'attachments': self.attachments,
                 'versions': self.versions,
                 'filter_states': self.filter_states,
+                'amount_proposals': self.amount_proposals,
                 'metadata': self.metadata
             }
             
-            with open(self.db_file, 'wb') as f:
-                pickle.dump(data, f)
+            # 先写入临时文件再替换，避免写入中断损坏数据库
+            temp_file = self.db_file.with_name(self.db_file.name + ".tmp")
+            if compress:
+                with gzip.open(temp_file, 'wb', compresslevel=6) as f:
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            else:
+                with open(temp_file, 'wb') as f:
+                    pickle.dump(data, f)
+            os.replace(temp_file, self.db_file)
             
             self.logger.info(f"成功保存数据库，共{len(self.income_records)}条记录")
+            self._notify_saved()
             return True
             
         except Exception as e:
@@ -111,6 +210,35 @@ class Database:
             self.logger.error(f"创建备份失败: {e}")
             return False
     
+    def compact(self) -> Dict[str, int]:
+        """
+        压缩历史数据（项目休眠前调用）：版本历史中的新增/变更合同号列表只保留数量，
+        删除已不存在的合同的附件信息和待审核建议
+        
+        Returns:
+            清理统计: version_entries（移除的合同号条目数）、attachments、proposals
+        """
+        stats = {"version_entries": 0, "attachments": 0, "proposals": 0}
+        
+        for version_info in self.versions:
+            for key in ("new_contracts", "changed_contracts"):
+                contracts = version_info.get(key)
+                if isinstance(contracts, list):
+                    version_info[f"{key}_count"] = len(contracts)
+                    stats["version_entries"] += len(contracts)
+                    del version_info[key]
+        
+        for attachment_id in [a_id for a_id, a in self.attachments.items() if a.contract_id not in self.income_records]:
+            del self.attachments[attachment_id]
+            stats["attachments"] += 1
+        
+        for contract_id in [c for c in self.amount_proposals if c not in self.income_records]:
+            del self.amount_proposals[contract_id]
+            stats["proposals"] += 1
+        
+        self.logger.info(f"压缩数据库: {stats}")
+        return stats
+    
     def restore(self, backup_file: Path) -> bool:
         """从备份恢复数据"""
         try:
@@ -130,6 +258,7 @@ class Database:
         """添加收入记录"""
         try:
             self.income_records[record.contract_id] = record
+            self.mark_records_changed()
             self.save()
             self.logger.info(f"添加收入记录: {record.contract_id}")
             return True
@@ -142,6 +271,7 @@ class Database:
         try:
             if contract_id in self.income_records:
                 self.income_records[contract_id] = record
+                self.mark_records_changed()
                 self.save()
                 self.logger.info(f"更新收入记录: {contract_id}")
                 return True
@@ -152,8 +282,15 @@ class Database:
             self.logger.error(f"更新收入记录失败: {e}")
             return False
     
-    def delete_income_record(self, contract_id: str) -> bool:
-        """删除收入记录"""
+    def delete_income_record(self, contract_id: str,
+                             delete_file: Optional[Callable[[str], bool]] = None) -> bool:
+        """
+        删除收入记录和相关附件
+        
+        Args:
+            contract_id: 合同号
+            delete_file: 删除附件文件的函数（见 delete_attachment）
+        """
         try:
             if contract_id in self.income_records:
                 del self.income_records[contract_id]
@@ -164,8 +301,9 @@ class Database:
                     if att.contract_id == contract_id
                 ]
                 for att_id in attachments_to_delete:
-                    self.delete_attachment(att_id)
+                    self.delete_attachment(att_id, delete_file)
                 
+                self.mark_records_changed()
                 self.save()
                 self.logger.info(f"删除收入记录: {contract_id}")
                 return True
@@ -194,6 +332,7 @@ class Database:
                 record = self.income_records[attachment.contract_id]
                 record.add_attachment(attachment.stored_path)
                 self.income_records[attachment.contract_id] = record
+                self.mark_records_changed()
             
             self.save()
             self.logger.info(f"添加附件: {attachment.original_name}")
@@ -202,8 +341,16 @@ class Database:
             self.logger.error(f"添加附件失败: {e}")
             return False
     
-    def delete_attachment(self, attachment_id: str) -> bool:
-        """删除附件"""
+    def delete_attachment(self, attachment_id: str,
+                          delete_file: Optional[Callable[[str], bool]] = None) -> bool:
+        """
+        删除附件
+        
+        Args:
+            attachment_id: 附件ID
+            delete_file: 删除附件文件的函数，传入 FileManager.delete_attachment 时同时释放去重存储的引用；
+                         为None时直接删除文件
+        """
         try:
             if attachment_id in self.attachments:
                 attachment = self.attachments[attachment_id]
@@ -213,9 +360,10 @@ class Database:
                     record = self.income_records[attachment.contract_id]
                     record.remove_attachment(attachment.stored_path)
                     self.income_records[attachment.contract_id] = record
+                    self.mark_records_changed()
                 
                 # 删除物理文件
-                attachment.delete_from_storage()
+                attachment.delete_from_storage(delete_file)
                 
                 # 从数据库中删除
                 del self.attachments[attachment_id]
@@ -242,9 +390,50 @@ class Database:
         try:
             self.logger.info(f"开始导入Excel数据，共{len(records)}条记录")
             
+            snapshot = self.prepare_import(records, version_info)
+            if snapshot is None:
+                return False
+            
+            # 应用快照并一次性保存所有数据
+            self.income_records = snapshot["income_records"]
+            self.versions = snapshot["versions"]
+            self.mark_records_changed()
+            
+            self.logger.info("开始保存数据到文件...")
+            success = self.save()
+            
+            if success:
+                self.logger.info(f"导入Excel数据成功，共{len(records)}条记录")
+            else:
+                self.logger.error("保存数据到文件失败")
+            
+            return success
+            
+        except Exception as e:
+            self.logger.error(f"导入Excel数据失败: {e}")
+            return False
+    
+    def prepare_import(self, records: List[IncomeRecord], version_info: Dict[str, Any],
+                       progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Optional[Dict[str, Any]]:
+        """
+        对比导入数据并生成新的数据快照，不修改当前数据库
+        
+        Args:
+            records: 导入的记录列表
+            version_info: 版本信息
+            progress_callback: 进度回调 (阶段, 当前数量, 总数量)
+            cancel_event: 取消事件，设置后中止对比
+            
+        Returns:
+            数据快照字典，取消或失败时返回None
+        """
+        try:
+            total = len(records)
+            
             # 记录版本信息
             version_info["import_time"] = datetime.now()
-            version_info["record_count"] = len(records)
+            version_info["record_count"] = total
             
             # 比较与上一版本的差异
             if self.income_records:
@@ -252,15 +441,19 @@ class Database:
                 changed_contracts = []
                 
                 for i, record in enumerate(records):
-                    # 每处理100条记录输出一次日志
-                    if i % 100 == 0 and i > 0:
-                        self.logger.info(f"已处理 {i}/{len(records)} 条记录")
+                    # 每处理1000条记录检查取消并报告进度
+                    if i % 1000 == 0 and i > 0:
+                        if cancel_event is not None and cancel_event.is_set():
+                            self.logger.info("数据对比已取消")
+                            return None
+                        if progress_callback:
+                            progress_callback("diff", i, total)
                     
-                    if record.contract_id not in self.income_records:
+                    old_record = self.income_records.get(record.contract_id)
+                    if old_record is None:
                         record.is_new = True
                         new_contracts.append(record.contract_id)
                     else:
-                        old_record = self.income_records[record.contract_id]
                         if old_record.annual_confirmed_income != record.annual_confirmed_income:
                             record.change_amount = record.annual_confirmed_income - old_record.annual_confirmed_income
                             changed_contracts.append(record.contract_id)
@@ -275,32 +468,112 @@ class Database:
                 version_info["changed_contracts"] = changed_contracts
                 self.logger.info(f"数据对比完成：新增{len(new_contracts)}个，变更{len(changed_contracts)}个")
             
-            # 批量更新数据（避免逐条保存）
-            self.logger.info("开始批量更新数据...")
-            for i, record in enumerate(records):
-                record.version = len(self.versions) + 1
-                self.income_records[record.contract_id] = record
-                
-                # 每更新1000条记录输出一次日志
-                if i % 1000 == 0 and i > 0:
-                    self.logger.info(f"已更新 {i}/{len(records)} 条记录到内存")
+            if progress_callback:
+                progress_callback("diff", total, total)
             
-            # 保存版本信息
-            self.versions.append(version_info)
+            # 在副本上批量更新数据，原数据保持不变直到提交
+            income_records = dict(self.income_records)
+            version = len(self.versions) + 1
+            for record in records:
+                record.version = version
+                income_records[record.contract_id] = record
             
-            # 一次性保存所有数据
-            self.logger.info("开始保存数据到文件...")
-            success = self.save()
+            return {
+                "income_records": income_records,
+                "attachments": dict(self.attachments),
+                "versions": self.versions + [version_info],
+                "filter_states": copy.deepcopy(self.filter_states),
+                "amount_proposals": dict(self.amount_proposals),
+                "metadata": dict(self.metadata)
+            }
             
-            if success:
-                self.logger.info(f"导入Excel数据成功，共{len(records)}条记录")
-            else:
-                self.logger.error("保存数据到文件失败")
+        except Exception as e:
+            self.logger.error(f"对比导入数据失败: {e}")
+            return None
+    
+    def write_snapshot(self, snapshot: Dict[str, Any],
+                       progress_callback: Optional[Callable[[str, int, int], None]] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Optional[Path]:
+        """
+        将数据快照写入临时文件，供后台导入使用
+        
+        Args:
+            snapshot: prepare_import生成的数据快照
+            progress_callback: 进度回调 (阶段, 已写入字节, 预计总字节)
+            cancel_event: 取消事件，设置后中止写入并删除临时文件
             
-            return success
+        Returns:
+            临时文件路径，取消或失败时返回None
+        """
+        temp_file = self.db_file.with_name(self.db_file.name + ".import.tmp")
+        Database._writing_imports.add(temp_file)
+        try:
+            snapshot["metadata"]["last_modified"] = datetime.now()
+            snapshot["metadata"]["records_version"] = snapshot["metadata"].get("records_version", 0) + 1
+            snapshot["metadata"]["total_records"] = len(snapshot["income_records"])
             
+            # 按现有文件大小和记录数估算写入总量
+            estimated_total = 0
+            if self.db_file.exists() and self.income_records:
+                estimated_total = int(self.db_file.stat().st_size * 
+                                      len(snapshot["income_records"]) / len(self.income_records))
+            
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_file, 'wb') as f:
+                writer = _ProgressWriter(f, progress_callback, cancel_event, estimated_total)
+                pickle.dump(snapshot, writer)
+            
+            if progress_callback:
+                progress_callback("write", writer.bytes_written, writer.bytes_written)
+            
+            return temp_file
+            
+        except _WriteCancelled:
+            self.logger.info("数据写入已取消")
+            self.discard_import(temp_file)
+            return None
         except Exception as e:
-            self.logger.error(f"导入Excel数据失败: {e}")
+            self.logger.error(f"写入数据快照失败: {e}")
+            self.discard_import(temp_file)
+            return None
+    
+    def discard_import(self, temp_file: Path):
+        """删除未提交的导入临时文件"""
+        Database._writing_imports.discard(temp_file)
+        Path(temp_file).unlink(missing_ok=True)
+    
+    def commit_import(self, snapshot: Dict[str, Any], temp_file: Path) -> bool:
+        """
+        提交后台导入：替换数据库文件并应用快照
+        
+        Args:
+            snapshot: 数据快照
+            temp_file: write_snapshot生成的临时文件
+            
+        Returns:
+            是否提交成功
+        """
+        try:
+            os.replace(temp_file, self.db_file)
+            Database._writing_imports.discard(temp_file)
+            
+            self.income_records = snapshot["income_records"]
+            self.versions = snapshot["versions"]
+            self.metadata = snapshot["metadata"]
+            
+            # 导入期间修改的筛选状态、金额建议和附件不在快照中，重新保存当前内容
+            if (self.filter_states != snapshot["filter_states"]
+                    or self.amount_proposals != snapshot["amount_proposals"]
+                    or self.attachments != snapshot["attachments"]):
+                self.logger.info(f"导入数据已提交，共{len(self.income_records)}条记录，保存导入期间的修改")
+                return self.save()
+            
+            self.logger.info(f"导入数据已提交，共{len(self.income_records)}条记录")
+            self._notify_saved()
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"提交导入数据失败: {e}")
             return False
     
     def get_statistics(self) -> Dict[str, Any]:
@@ -383,6 +656,71 @@ class Database:
             self.logger.error(f"清除筛选状态失败: {e}")
             return False
     
+    def set_amount_proposals(self, proposals: Dict[str, Dict[str, Any]]) -> bool:
+        """
+        写入附件确认收入建议（覆盖同一合同的旧建议），等待人工审核
+        
+        Args:
+            proposals: 合同号 -> 建议（见 AmountExtractor.build_proposals）
+        """
+        try:
+            self.amount_proposals.update(
+                {cid: p for cid, p in proposals.items() if cid in self.income_records}
+            )
+            return self.save()
+        except Exception as e:
+            self.logger.error(f"保存金额建议失败: {e}")
+            return False
+    
+    def get_amount_proposals(self) -> List[Dict[str, Any]]:
+        """获取待审核的附件确认收入建议（已删除记录的建议不返回）"""
+        return [p for cid, p in self.amount_proposals.items() if cid in self.income_records]
+    
+    def discard_amount_proposals(self, contract_ids: List[str]) -> bool:
+        """忽略建议"""
+        try:
+            for contract_id in contract_ids:
+                self.amount_proposals.pop(contract_id, None)
+            return self.save()
+        except Exception as e:
+            self.logger.error(f"忽略金额建议失败: {e}")
+            return False
+    
+    def apply_amount_proposals(self, decisions: Dict[str, Decimal]) -> Tuple[bool, int]:
+        """
+        接受建议：批量写入附件确认收入并移除建议，只保存一次；保存失败时恢复原值
+        
+        Args:
+            decisions: 合同号 -> 确认的金额
+            
+        Returns:
+            (是否成功, 更新的记录数)
+        """
+        old_values = {}
+        old_proposals = dict(self.amount_proposals)
+        try:
+            for contract_id, amount in decisions.items():
+                record = self.income_records.get(contract_id)
+                if record is None:
+                    continue
+                old_values[contract_id] = record.attachment_confirmed_income
+                record.attachment_confirmed_income = Decimal(str(amount))
+                self.amount_proposals.pop(contract_id, None)
+            
+            self.mark_records_changed()
+            if not self.save():
+                raise RuntimeError("保存数据库失败")
+            
+            self.logger.info(f"已接受{len(old_values)}条附件确认收入建议")
+            return True, len(old_values)
+            
+        except Exception as e:
+            for contract_id, value in old_values.items():
+                self.income_records[contract_id].attachment_confirmed_income = value
+            self.amount_proposals = old_proposals
+            self.logger.error(f"接受金额建议失败: {e}")
+            return False, 0
+    
     def clear_all_data(self) -> bool:
         """清空所有数据"""
         try:
@@ -390,11 +728,13 @@ class Database:
             self.attachments.clear()
             self.versions.clear()
             self.filter_states.clear()
+            self.amount_proposals.clear()
             self.metadata = {
                 "created_time": datetime.now(),
                 "last_modified": datetime.now(),
                 "version": 1,
-                "total_records": 0
+                "total_records": 0,
+                "records_version": self.records_version + 1
             }
             
             self.save()
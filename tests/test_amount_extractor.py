@@ -0,0 +1,70 @@
+"""
+附件金额提取测试：中文大写金额、候选金额提取和排序
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from src.data.amount_extractor import (
+    parse_chinese_amount, extract_amounts, rank_candidates, KIND_CHINESE, KIND_CURRENCY, KIND_NUMBER
+)
+
+
+class TestParseChineseAmount:
+
+    @pytest.mark.parametrize("text, expected", [
+        ("壹拾贰万叁仟肆佰伍拾陆元柒角捌分", "123456.78"),
+        ("人民币伍万元整", "50000.00"),
+        ("拾万元", "100000.00"),
+        ("壹亿贰仟万元", "120000000.00"),
+        ("贰佰零伍元", "205.00"),
+        ("叁万零伍拾元整", "30050.00"),
+        ("伍角", "0.50"),
+    ])
+    def test_parse(self, text, expected):
+        assert parse_chinese_amount(text) == Decimal(expected)
+
+    def test_without_digits(self):
+        assert parse_chinese_amount("元整") is None
+
+
+class TestExtractAmounts:
+
+    TEXT = ("合同总金额：¥1,234,567.80元，大写：壹佰贰拾叁万肆仟伍佰陆拾柒元捌角整。"
+            "发票号12345678，日期2024年3月5日，服务费5万元，单价 88.50")
+
+    def test_candidates(self):
+        found = {(c["amount"], c["kind"]) for c in extract_amounts(self.TEXT)}
+        assert found == {
+            (Decimal("1234567.80"), KIND_CHINESE),
+            (Decimal("1234567.80"), KIND_CURRENCY),
+            (Decimal("50000.00"), KIND_CURRENCY),
+            (Decimal("88.50"), KIND_NUMBER),
+        }
+
+    def test_keyword_context(self):
+        currency = next(c for c in extract_amounts(self.TEXT) if c["kind"] == KIND_CURRENCY
+                        and c["amount"] == Decimal("1234567.80"))
+        assert currency["keyword"]
+        assert "1,234,567.80" in currency["context"]
+
+    def test_plain_numbers_are_ignored(self):
+        assert extract_amounts("编号 2024 共 15 页，电话 13800138000") == []
+
+
+class TestRankCandidates:
+
+    def test_exact_match_ranks_first(self):
+        candidates = [dict(c, file="a.pdf") for c in extract_amounts(TestExtractAmounts.TEXT)]
+        ranked = rank_candidates(candidates, Decimal("1234567.80"))
+        assert ranked[0]["amount"] == Decimal("1234567.80")
+        assert ranked[0]["count"] == 2
+        assert ranked[0]["kind"] == KIND_CHINESE
+        assert ranked[0]["files"] == ["a.pdf"]
+        assert [r["score"] for r in ranked] == sorted((r["score"] for r in ranked), reverse=True)
+
+    def test_zero_target(self):
+        candidates = [{"amount": Decimal("10.00"), "kind": KIND_NUMBER, "keyword": False,
+                       "context": "", "file": "a.pdf"}]
+        assert rank_candidates(candidates, Decimal(0))[0]["score"] < 0.5
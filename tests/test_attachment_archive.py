@@ -0,0 +1,126 @@
+"""
+休眠附件包测试：打包、按合同解包、硬链接去重
+"""
+
+import json
+import os
+import threading
+
+import pytest
+
+from src.data.attachment_archive import AttachmentArchive
+
+
+def make_storage(root):
+    """三个合同文件夹，其中 x.pdf 在每个合同中都是同一文件的硬链接"""
+    for folder in ("HT001", "HT002", "HT003"):
+        (root / folder).mkdir(parents=True)
+    (root / "HT001" / "x.pdf").write_bytes(os.urandom(50000))
+    for folder in ("HT002", "HT003"):
+        os.link(root / "HT001" / "x.pdf", root / folder / "x.pdf")
+    (root / "HT001" / "合同.txt").write_text("合同正文" * 1000, encoding="utf-8")
+    (root / "HT002" / "sub").mkdir()
+    (root / "HT002" / "sub" / "发票.jpg").write_bytes(os.urandom(2000))
+    (root / ".objects").mkdir()
+    (root / ".objects" / "keep").write_bytes(b"not packed")
+    return root
+
+
+def read_tree(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in sorted(root.rglob("*"))
+            if p.is_file() and not p.relative_to(root).parts[0].startswith(".")}
+
+
+class TestAttachmentArchive:
+
+    def test_pack_thaw_round_trip(self, tmp_path):
+        storage = make_storage(tmp_path / "attachments")
+        original = read_tree(storage)
+        mtime = int((storage / "HT001" / "合同.txt").stat().st_mtime)
+
+        archive = AttachmentArchive(storage)
+        stats = archive.pack()
+        assert stats["file_count"] == 5
+        assert stats["total_size"] == sum(len(data) for data in original.values())
+        assert AttachmentArchive.exists(storage)
+        assert read_tree(storage) == {}
+        assert (storage / ".objects" / "keep").exists()
+        assert archive.pending_totals() == {"file_count": 5, "total_size": stats["total_size"]}
+
+        assert archive.thaw_all() == 5
+        archive.close()
+        assert read_tree(storage) == original
+        assert not AttachmentArchive.exists(storage)
+        # zip 只保存到2秒精度
+        assert abs(int((storage / "HT001" / "合同.txt").stat().st_mtime) - mtime) <= 2
+
+    def test_hardlinked_files_stored_once(self, tmp_path):
+        storage = make_storage(tmp_path / "attachments")
+        archive = AttachmentArchive(storage)
+        stats = archive.pack()
+        assert stats["linked_count"] == 2
+        assert stats["archive_size"] < 2 * 50000
+
+        index = json.loads(archive.index_file.read_text(encoding="utf-8"))
+        assert len(index["aliases"]) == 2
+        assert len(set(index["aliases"].values())) == 1
+
+        archive.thaw_all()
+        archive.close()
+        inodes = {(storage / folder / "x.pdf").stat().st_ino for folder in ("HT001", "HT002", "HT003")}
+        assert len(inodes) == 1
+
+    def test_thaw_contract_only_extracts_that_folder(self, tmp_path):
+        storage = make_storage(tmp_path / "attachments")
+        original = read_tree(storage)
+        archive = AttachmentArchive(storage)
+        archive.pack()
+
+        # 别名所在合同先于成员所在合同解包时，直接写出成员数据
+        folder = next(name.split("/")[0] for name in archive._load_index()["aliases"])
+        count = archive.thaw_contract(folder)
+        assert count == sum(1 for path in original if path.startswith(folder + "/"))
+        assert {path for path in read_tree(storage)} == {path for path in original if path.startswith(folder + "/")}
+        assert not archive.is_packed(folder)
+        assert archive.thaw_contract(folder) == 0
+
+        archive.thaw_all()
+        archive.close()
+        assert read_tree(storage) == original
+
+    def test_modified_thawed_file_is_not_linked(self, tmp_path):
+        storage = make_storage(tmp_path / "attachments")
+        archive = AttachmentArchive(storage)
+        archive.pack()
+        member = next(iter(archive._load_index()["aliases"].values()))
+        member_folder = member.split("/")[0]
+
+        archive.thaw_contract(member_folder)
+        (storage / member).write_bytes(b"edited")
+        archive.thaw_all()
+        archive.close()
+
+        for folder in ("HT001", "HT002", "HT003"):
+            path = storage / folder / "x.pdf"
+            if folder != member_folder:
+                assert path.stat().st_size == 50000
+                assert path.stat().st_ino != (storage / member).stat().st_ino
+
+    def test_cancelled_pack_keeps_files(self, tmp_path):
+        storage = make_storage(tmp_path / "attachments")
+        original = read_tree(storage)
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        archive = AttachmentArchive(storage)
+        assert archive.pack(cancel_event=cancel_event) is None
+        assert read_tree(storage) == original
+        assert not AttachmentArchive.exists(storage)
+
+    def test_pack_twice_raises(self, tmp_path):
+        storage = make_storage(tmp_path / "attachments")
+        archive = AttachmentArchive(storage)
+        archive.pack()
+        with pytest.raises(RuntimeError):
+            archive.pack()
+        archive.close()
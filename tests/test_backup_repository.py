@@ -0,0 +1,139 @@
+"""
+增量备份仓库测试：分块、备份、恢复、校验和清理
+"""
+
+import io
+import os
+import random
+import threading
+import zlib
+
+import pytest
+
+from src.data.backup_repository import BackupRepository, iter_chunks, CHUNK_MIN_SIZE, CHUNK_MAX_SIZE
+
+
+def random_bytes(size: int, seed: int = 0) -> bytes:
+    return random.Random(seed).randbytes(size)
+
+
+def make_source(root):
+    """创建一个包含子文件夹、隐藏文件夹和临时文件的备份源"""
+    (root / "sub").mkdir(parents=True)
+    (root / ".hidden").mkdir()
+    (root / "a.bin").write_bytes(random_bytes(600 * 1024, seed=1))
+    (root / "sub" / "b.txt").write_text("合同附件" * 5000, encoding="utf-8")
+    (root / "empty.txt").write_bytes(b"")
+    (root / ".hidden" / "c.bin").write_bytes(b"hidden")
+    (root / "skip.tmp").write_bytes(b"temp")
+    return root
+
+
+def read_tree(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in sorted(root.rglob("*")) if p.is_file()}
+
+
+class TestIterChunks:
+
+    @pytest.mark.parametrize("size", [0, 1, CHUNK_MIN_SIZE - 1, CHUNK_MAX_SIZE + 1, 3 * 1024 * 1024 + 17])
+    def test_chunks_reassemble_input(self, size):
+        data = random_bytes(size, seed=size)
+        chunks = list(iter_chunks(io.BytesIO(data)))
+        assert b"".join(chunks) == data
+        assert all(len(chunk) <= CHUNK_MAX_SIZE for chunk in chunks)
+        # 只有最后一块可能小于最小块大小
+        assert all(len(chunk) >= CHUNK_MIN_SIZE for chunk in chunks[:-1])
+
+    def test_insert_only_changes_nearby_chunks(self):
+        data = random_bytes(4 * 1024 * 1024, seed=7)
+        edited = data[:2 * 1024 * 1024] + b"inserted" * 10 + data[2 * 1024 * 1024:]
+        before = set(iter_chunks(io.BytesIO(data)))
+        after = list(iter_chunks(io.BytesIO(edited)))
+        changed = [chunk for chunk in after if chunk not in before]
+        assert len(changed) <= 3
+        assert len(after) > 10
+
+
+class TestBackupRepository:
+
+    def test_snapshot_restore_round_trip(self, tmp_path):
+        source = make_source(tmp_path / "data")
+        config = tmp_path / "project_config.json"
+        config.write_text('{"name": "项目"}', encoding="utf-8")
+        repository = BackupRepository(tmp_path / "repo")
+
+        snapshot = repository.create_snapshot({"data": source, "config": config}, "测试", ["*.tmp"])
+        assert snapshot["file_count"] == 4
+        assert snapshot["verification"]["failed_chunks"] == 0
+
+        restored = tmp_path / "restored"
+        assert repository.restore_snapshot(snapshot["id"], restored) == 4
+        expected = {path: data for path, data in read_tree(source).items()
+                    if not path.startswith(".hidden/") and not path.endswith(".tmp")}
+        assert read_tree(restored / "data") == expected
+        assert (restored / "project_config.json").read_bytes() == config.read_bytes()
+        assert (restored / "data" / "a.bin").stat().st_mtime_ns == (source / "a.bin").stat().st_mtime_ns
+
+    def test_include_hidden_folder(self, tmp_path):
+        source = make_source(tmp_path / "data")
+        repository = BackupRepository(tmp_path / "repo")
+
+        snapshot = repository.create_snapshot({"data": source}, include_hidden=[".hidden"])
+        repository.restore_snapshot(snapshot["id"], tmp_path / "restored")
+        assert (tmp_path / "restored" / "data" / ".hidden" / "c.bin").read_bytes() == b"hidden"
+
+    def test_unchanged_files_are_reused(self, tmp_path):
+        source = make_source(tmp_path / "data")
+        repository = BackupRepository(tmp_path / "repo")
+        first = repository.create_snapshot({"data": source})
+
+        (source / "sub" / "b.txt").write_text("修改后的内容", encoding="utf-8")
+        second = repository.create_snapshot({"data": source})
+        assert second["id"] != first["id"]
+        assert second["reused_files"] == first["file_count"] - 1
+
+        repository.restore_snapshot(first["id"], tmp_path / "first")
+        assert (tmp_path / "first" / "data" / "sub" / "b.txt").read_text(encoding="utf-8") == "合同附件" * 5000
+        repository.restore_snapshot(second["id"], tmp_path / "second")
+        assert (tmp_path / "second" / "data" / "sub" / "b.txt").read_text(encoding="utf-8") == "修改后的内容"
+
+    def test_cancelled_snapshot_saves_no_manifest(self, tmp_path):
+        source = make_source(tmp_path / "data")
+        repository = BackupRepository(tmp_path / "repo")
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        assert repository.create_snapshot({"data": source}, cancel_event=cancel_event) == {}
+        assert repository.list_snapshot_ids() == []
+
+    def test_verify_detects_corrupted_chunk(self, tmp_path):
+        source = make_source(tmp_path / "data")
+        repository = BackupRepository(tmp_path / "repo")
+        snapshot = repository.create_snapshot({"data": source})
+        assert repository.verify_snapshot(snapshot["id"])["failed_chunks"] == 0
+
+        digest = repository.load_manifest(snapshot["id"])["files"][0]["chunks"][0]
+        chunk_file = repository.chunk_path(digest)
+        payload = bytearray(chunk_file.read_bytes())
+        payload[-1] ^= 0xFF
+        chunk_file.write_bytes(bytes(payload))
+
+        assert repository.verify_snapshot(snapshot["id"])["failed_chunks"] == 1
+        with pytest.raises((ValueError, zlib.error)):
+            repository.restore_snapshot(snapshot["id"], tmp_path / "restored")
+
+    def test_prune_keeps_latest_restorable(self, tmp_path):
+        source = make_source(tmp_path / "data")
+        repository = BackupRepository(tmp_path / "repo")
+        repository.create_snapshot({"data": source})
+        (source / "a.bin").write_bytes(random_bytes(300 * 1024, seed=2))
+        latest = repository.create_snapshot({"data": source})
+
+        result = repository.prune(1)
+        assert result["removed_snapshots"] == 1
+        assert result["removed_chunks"] > 0
+        assert repository.list_snapshot_ids() == [latest["id"]]
+
+        repository.restore_snapshot(latest["id"], tmp_path / "restored")
+        assert (tmp_path / "restored" / "data" / "a.bin").read_bytes() == (source / "a.bin").read_bytes()
+        assert repository.verify_snapshot(latest["id"])["failed_chunks"] == 0
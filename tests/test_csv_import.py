@@ -0,0 +1,124 @@
+"""
+CSV导入测试：编码和分隔符探测、文本列、金额解析、导出后再导入
+"""
+
+import threading
+from decimal import Decimal, InvalidOperation
+
+import pytest
+
+from src.data.excel_handler import ExcelHandler
+from src.models.income_record import IncomeRecord
+
+
+@pytest.fixture
+def handler():
+    return ExcelHandler()
+
+
+def import_csv(handler, path, column_mapping=None):
+    ok, df, error = handler.read_data_file(str(path), column_mapping=column_mapping)
+    assert ok, error
+    return handler.dataframe_to_income_records(df, column_mapping)
+
+
+class TestParseAmount:
+
+    @pytest.mark.parametrize("value, expected", [
+        ("1,000.50", Decimal("1000.50")),
+        ("1，234，567", Decimal("1234567")),
+        (" 300 ", Decimal("300")),
+        ("-2,000", Decimal("-2000")),
+        (1500, Decimal("1500")),
+        (12.5, Decimal("12.5")),
+    ])
+    def test_valid(self, value, expected):
+        assert ExcelHandler.parse_amount(value) == expected
+
+    @pytest.mark.parametrize("value", ["abc", "1.2.3", "NaN", "inf", ""])
+    def test_invalid(self, value):
+        with pytest.raises(InvalidOperation):
+            ExcelHandler.parse_amount(value)
+
+
+class TestCsvImport:
+
+    def test_gbk_semicolon_file(self, handler, tmp_path):
+        path = tmp_path / "收入.csv"
+        path.write_bytes(
+            "合同编号;客户名称;收入金额;附件收入;收入主体;备注\n"
+            "00123;客户甲;\"1,000.50\";2，000;主体A;忽略\n"
+            "HT-2;客户乙; 300 ;;;\n".encode("gbk")
+        )
+        assert handler.detect_csv_encoding(str(path)) == "gb18030"
+        assert handler.detect_csv_delimiter(str(path), "gb18030") == ";"
+
+        ok, records, error = import_csv(handler, path)
+        assert ok, error
+        first, second = records
+        # 合同号按文本读取，保留前导零
+        assert first.contract_id == "00123"
+        assert first.client_name == "客户甲"
+        assert first.annual_confirmed_income == Decimal("1000.50")
+        assert first.attachment_confirmed_income == Decimal("2000")
+        assert first.subject_entity == "主体A"
+        assert second.annual_confirmed_income == Decimal("300")
+        assert second.attachment_confirmed_income is None
+
+    def test_bad_amount_reports_format_error(self, handler, tmp_path):
+        path = tmp_path / "bad.csv"
+        path.write_text("合同号,客户名,本年确认的收入\nHT1,客户,abc\n", encoding="utf-8")
+
+        ok, records, error = import_csv(handler, path)
+        assert not ok
+        assert records == []
+        assert "第2行: 本年确认的收入格式错误" in error
+
+    def test_partial_failure_keeps_valid_rows(self, handler, tmp_path):
+        path = tmp_path / "partial.csv"
+        path.write_text("合同号,客户名,本年确认的收入\nHT1,客户,100\n,客户,200\nHT3,客户,\n", encoding="utf-8")
+
+        ok, records, error = import_csv(handler, path)
+        assert ok, error
+        assert [record.contract_id for record in records] == ["HT1"]
+
+    def test_column_mapping_reads_only_mapped_columns(self, handler, tmp_path):
+        path = tmp_path / "mapped.tsv"
+        path.write_text("编号\t名称\t金额\t其他\nA01\t客户\t88.8\tx\n", encoding="utf-8")
+        mapping = {"编号": "合同号", "名称": "客户名", "金额": "本年确认的收入"}
+
+        ok, df, error = handler.read_data_file(str(path), column_mapping=mapping)
+        assert ok, error
+        assert list(df.columns) == ["编号", "名称", "金额"]
+        ok, records, error = handler.dataframe_to_income_records(df, mapping)
+        assert ok, error
+        assert records[0].contract_id == "A01"
+        assert records[0].annual_confirmed_income == Decimal("88.8")
+
+    def test_cancel(self, handler, tmp_path):
+        path = tmp_path / "cancel.csv"
+        path.write_text("合同号,客户名,本年确认的收入\nHT1,客户,1\n", encoding="utf-8")
+        cancel_event = threading.Event()
+        cancel_event.set()
+
+        ok, _, error = handler.read_csv_file(str(path), cancel_event=cancel_event)
+        assert not ok
+        assert error == "导入已取消"
+
+    def test_export_then_import(self, handler, tmp_path):
+        records = [
+            IncomeRecord("007", "客户甲", Decimal("1234567.89"), subject_entity="主体A",
+                         attachment_confirmed_income=Decimal("1000")),
+            IncomeRecord("HT-2", "客户乙", Decimal("-50.5")),
+        ]
+        path = tmp_path / "export.csv"
+        ok, error = handler.export_to_csv(records, str(path))
+        assert ok, error
+
+        ok, imported, error = import_csv(handler, path)
+        assert ok, error
+        assert [(r.contract_id, r.client_name, r.annual_confirmed_income, r.attachment_confirmed_income,
+                 r.subject_entity) for r in imported] == [
+            ("007", "客户甲", Decimal("1234567.89"), Decimal("1000"), "主体A"),
+            ("HT-2", "客户乙", Decimal("-50.5"), None, ""),
+        ]
@@ -0,0 +1,42 @@
+"""
+证据文件匹配测试：合同号边界、重叠和冲突
+"""
+
+from src.data.evidence_matcher import EvidenceMatcher
+
+
+CONTRACTS = ["HT2024-015", "HT2024-0153", "ht-7", "合同A"]
+
+
+class TestEvidenceMatcher:
+
+    def test_match_text(self):
+        matcher = EvidenceMatcher(CONTRACTS)
+        assert matcher.match_text("扫描_HT2024-0153_发票") == ["HT2024-0153"]
+        assert matcher.match_text("HT2024-015-补充") == ["HT2024-015"]
+        assert matcher.match_text("关于合同A的说明") == ["合同A"]
+
+    def test_word_boundaries(self):
+        matcher = EvidenceMatcher(CONTRACTS)
+        assert matcher.match_text("xHT2024-015") == []
+        assert matcher.match_text("HT2024-01") == []
+
+    def test_case_insensitive_and_multiple(self):
+        matcher = EvidenceMatcher(CONTRACTS)
+        assert matcher.match_text("HT-7 与 ht2024-015 合并") == ["ht-7", "HT2024-015"]
+
+    def test_scan_folder(self, tmp_path):
+        (tmp_path / "sub").mkdir()
+        (tmp_path / ".hidden").mkdir()
+        for name in ("sub/HT2024-015.pdf", "HT-7_HT2024-0153.pdf", "无关.pdf", ".hidden/HT-7.pdf", ".HT-7.pdf"):
+            (tmp_path / name).write_bytes(b"")
+        (tmp_path / "邮件.eml").write_bytes("Subject: =?utf-8?b?5ZCI5ZCMQQ==?=\r\n\r\nbody".encode("ascii"))
+
+        matcher = EvidenceMatcher(CONTRACTS)
+        results = {r["path"].name: r for r in matcher.scan_folder(str(tmp_path), include_email_subject=True)}
+        assert set(results) == {"HT2024-015.pdf", "HT-7_HT2024-0153.pdf", "无关.pdf", "邮件.eml"}
+        assert results["HT2024-015.pdf"]["status"] == EvidenceMatcher.STATUS_MATCHED
+        assert results["HT-7_HT2024-0153.pdf"]["status"] == EvidenceMatcher.STATUS_CONFLICT
+        assert results["无关.pdf"]["status"] == EvidenceMatcher.STATUS_UNMATCHED
+        assert results["邮件.eml"]["contract_ids"] == ["合同A"]
+        assert results["邮件.eml"]["source"] == "邮件主题"
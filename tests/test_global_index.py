@@ -0,0 +1,102 @@
+"""
+跨项目索引测试：增量更新与整体重建的结果一致
+"""
+
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from src.data.global_index import GlobalIndex
+from src.models.income_record import IncomeRecord
+
+
+def make_database(records, version=1):
+    return SimpleNamespace(records_version=version,
+                           income_records={record.contract_id: record for record in records})
+
+
+def make_records(count):
+    return [
+        IncomeRecord(f"HT{i:04d}", f"客户{i % 7}" if i % 3 else f"Client{i % 5}", Decimal(100 + i),
+                     subject_entity=f"主体{i % 4}",
+                     attachment_confirmed_income=Decimal(90 + i) if i % 2 else None)
+        for i in range(count)
+    ]
+
+
+def snapshot(index, project_id):
+    """索引中该项目的记录和分组（分组键按小写比较，金额按分比较）"""
+    conn = index._conn
+    records = sorted(tuple(row) for row in conn.execute(
+        "SELECT * FROM records WHERE project_id = ?", (project_id,)))
+    groups = sorted(
+        (row["field"], row["key"].lower(), row["record_count"], round(row["annual_income"], 2),
+         round(row["attachment_income"], 2))
+        for row in conn.execute("SELECT * FROM groups WHERE project_id = ?", (project_id,))
+    )
+    return records, groups
+
+
+@pytest.fixture
+def indexes(tmp_path):
+    incremental = GlobalIndex(tmp_path / "incremental.db")
+    rebuilt = GlobalIndex(tmp_path / "rebuilt.db")
+    yield incremental, rebuilt
+    incremental.close()
+    rebuilt.close()
+
+
+class TestGlobalIndex:
+
+    def test_incremental_matches_full_rebuild(self, indexes):
+        incremental, rebuilt = indexes
+        records = make_records(200)
+        database = make_database(records)
+        assert incremental.update_project("p1", database)
+        assert not incremental.update_project("p1", database)
+
+        # 修改金额、客户名（包括只改大小写）、删除和新增记录
+        records[1].annual_confirmed_income = Decimal("5000")
+        records[2].client_name = "新客户"
+        records[3].client_name = records[3].client_name.upper()
+        records[4].attachment_confirmed_income = None
+        records[5].attached_files = ["a.pdf", "b.pdf"]
+        del records[10:20]
+        records.append(IncomeRecord("HT9999", "client0", Decimal("1.5"), subject_entity="主体0"))
+        database = make_database(records, version=2)
+
+        assert incremental.update_project("p1", database)
+        assert rebuilt.update_project("p1", database)
+        assert snapshot(incremental, "p1") == snapshot(rebuilt, "p1")
+        assert incremental.get_stats() == {"project_count": 1, "record_count": len(records)}
+
+    def test_large_change_rebuilds(self, indexes, monkeypatch):
+        incremental, rebuilt = indexes
+        records = make_records(50)
+        incremental.update_project("p1", make_database(records))
+
+        monkeypatch.setattr(GlobalIndex, "INCREMENTAL_LIMIT", 5)
+        changed = make_records(30)
+        incremental.update_project("p1", make_database(changed, version=2))
+        rebuilt.update_project("p1", make_database(changed, version=2))
+        assert snapshot(incremental, "p1") == snapshot(rebuilt, "p1")
+
+    def test_find_and_rollup_across_projects(self, indexes):
+        index, _ = indexes
+        index.update_project("p1", make_database([
+            IncomeRecord("HT1", "Acme", Decimal("100"), attachment_confirmed_income=Decimal("80")),
+            IncomeRecord("HT2", "其他", Decimal("5")),
+        ]))
+        index.update_project("p2", make_database([IncomeRecord("HT1", "ACME", Decimal("50"))]))
+
+        assert [row["project_id"] for row in index.find("ht1", "contract_id", exact=True)] == ["p1", "p2"]
+        group = index.rollup("client_name", "acme")[0]
+        assert group["project_count"] == 2
+        assert group["record_count"] == 2
+        assert group["annual_income"] == pytest.approx(150)
+        assert group["attachment_income"] == pytest.approx(80)
+        assert sorted(group["projects"]) == ["p1", "p2"]
+
+        index.remove_project("p1")
+        assert index.rollup("client_name", "acme")[0]["record_count"] == 1